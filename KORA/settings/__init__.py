@@ -10,5 +10,7 @@ _env = os.getenv('DJANGO_ENV', 'development').lower()
 
 if _env == 'production':
     from .prod import *
+elif _env == 'test':
+    from .test import *
 else:
     from .dev import *
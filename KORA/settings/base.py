@@ -2,6 +2,7 @@
 Django settings — BASE (commun à tous les environnements)
 """
 import os
+import tempfile
 from pathlib import Path
 from datetime import timedelta
 from dotenv import load_dotenv
@@ -71,7 +72,9 @@ MIDDLEWARE = [
     'shared.middleware.MediaFrameOptionsMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'shared.middleware.JWTCookieMiddleware',
+    'shared.middleware.PrincipalMiddleware',
     'middleware.application_maintenance.ApplicationMaintenanceMiddleware',
+    'middleware.kpi_snapshot_batch.KpiSnapshotBatchMiddleware',
 ]
 
 ROOT_URLCONF = 'KORA.urls'
@@ -132,10 +135,136 @@ SESSION_COOKIE_HTTPONLY = True
 # Utilisé par shared.middleware._get_ip() et shared.throttles._get_ip() pour lire le bon XFF index.
 TRUSTED_PROXY_COUNT = int(os.getenv('TRUSTED_PROXY_COUNT', '0'))
 
+# Cache partagé entre les workers (permissions, throttling, rate limiting, JWT)
+# CACHE_BACKEND : 'redis' (REDIS_URL, paquet redis requis), 'sqlite' (fichier local
+# partagé par les workers d'un même hôte, sans service externe) ou 'locmem' (un
+# cache par processus, développement uniquement).
+# CACHE_TWO_TIER : ajoute devant le cache partagé un L1 en mémoire à TTL court pour
+# les clés très lues ; les invalidations sont diffusées aux autres workers.
+# Les tests utilisent KORA/settings/test.py (DJANGO_ENV=test), où le L2 est un LocMem.
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'sqlite').lower()
+if CACHE_BACKEND == 'redis':
+    _SHARED_CACHE = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.getenv('REDIS_URL', 'redis://127.0.0.1:6379/1'),
+    }
+elif CACHE_BACKEND == 'locmem':
+    _SHARED_CACHE = {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}
+else:
+    _SHARED_CACHE = {
+        'BACKEND': 'shared.cache.SQLiteCache',
+        'LOCATION': os.getenv('CACHE_SQLITE_PATH', str(BASE_DIR / 'cache.sqlite3')),
+        'OPTIONS': {'MAX_ENTRIES': int(os.getenv('CACHE_MAX_ENTRIES', '50000'))},
+    }
+
+if os.getenv('CACHE_TWO_TIER', 'true').lower() == 'true' and CACHE_BACKEND != 'locmem':
+    CACHES = {
+        'default': {
+            'BACKEND': 'shared.cache.TwoTierCache',
+            'LOCATION': 'shared',
+            'OPTIONS': {
+                'L1_TIMEOUT': float(os.getenv('CACHE_L1_TIMEOUT', '5')),
+                'BROADCAST_INTERVAL': float(os.getenv('CACHE_BROADCAST_INTERVAL', '0.5')),
+                # Clés lues à chaque requête ; les compteurs de rate limiting restent dans le L2
+                'L1_KEY_PREFIXES': ['perm', 'jwt_user:', 'throttle_config'],
+            },
+        },
+        'shared': _SHARED_CACHE,
+    }
+else:
+    CACHES = {'default': _SHARED_CACHE, 'shared': _SHARED_CACHE}
+
+# Audit des vérifications de permissions (permissions.services.audit_writer)
+# Écriture groupée en arrière-plan ; les refus sont toujours enregistrés.
+PERMISSION_AUDIT_ENABLED = os.getenv('PERMISSION_AUDIT_ENABLED', 'true').lower() == 'true'
+PERMISSION_AUDIT_ASYNC = os.getenv('PERMISSION_AUDIT_ASYNC', 'true').lower() == 'true'
+PERMISSION_AUDIT_BATCH_SIZE = int(os.getenv('PERMISSION_AUDIT_BATCH_SIZE', '100'))
+PERMISSION_AUDIT_FLUSH_INTERVAL = float(os.getenv('PERMISSION_AUDIT_FLUSH_INTERVAL', '5'))
+PERMISSION_AUDIT_MAX_QUEUE_SIZE = int(os.getenv('PERMISSION_AUDIT_MAX_QUEUE_SIZE', '10000'))
+# Fraction des accès accordés servis depuis le cache qui sont audités (1.0 = tous)
+PERMISSION_AUDIT_CACHE_HIT_SAMPLE_RATE = float(os.getenv('PERMISSION_AUDIT_CACHE_HIT_SAMPLE_RATE', '0.1'))
+
+# Journal d'activités (parametre.services.activity_log_writer)
+# Écriture groupée en arrière-plan ; file pleine → vidage synchrone, aucune entrée perdue.
+ACTIVITY_LOG_ASYNC = os.getenv('ACTIVITY_LOG_ASYNC', 'true').lower() == 'true'
+ACTIVITY_LOG_BATCH_SIZE = int(os.getenv('ACTIVITY_LOG_BATCH_SIZE', '200'))
+ACTIVITY_LOG_FLUSH_INTERVAL = float(os.getenv('ACTIVITY_LOG_FLUSH_INTERVAL', '2'))
+ACTIVITY_LOG_MAX_QUEUE_SIZE = int(os.getenv('ACTIVITY_LOG_MAX_QUEUE_SIZE', '10000'))
+
+# Archivage des journaux (parametre.services.log_archiver, commande archive_logs)
+# Lignes plus anciennes que la rétention (jours, 0 = illimitée) déplacées dans
+# LOG_ARCHIVE_ROOT/<journal>/<AAAA-MM>.jsonl.gz puis SUPPRIMÉES de la base.
+# Désactivé par défaut : tant qu'aucune rétention n'est fixée, le job quotidien
+# archive_logs_daily n'archive rien. Exemple : ACTIVITY_LOG_RETENTION_DAYS=365,
+# PERMISSION_AUDIT_RETENTION_DAYS=90, ACTIVITY_LOG_VIEW_RETENTION_DAYS=90,
+# ACTIVITY_LOG_LOGIN_RETENTION_DAYS=180.
+LOG_ARCHIVE_RETENTION_DAYS = {
+    'activity_log': int(os.getenv('ACTIVITY_LOG_RETENTION_DAYS', '0')),
+    'permission_audit': int(os.getenv('PERMISSION_AUDIT_RETENTION_DAYS', '0')),
+}
+# Rétention par action, prioritaire sur la valeur du journal
+LOG_ARCHIVE_RETENTION_BY_ACTION = {
+    'activity_log': {
+        'view': int(os.getenv('ACTIVITY_LOG_VIEW_RETENTION_DAYS', '0')),
+        'login': int(os.getenv('ACTIVITY_LOG_LOGIN_RETENTION_DAYS', '0')),
+        'logout': int(os.getenv('ACTIVITY_LOG_LOGIN_RETENTION_DAYS', '0')),
+    },
+    'permission_audit': {},
+}
+LOG_ARCHIVE_BATCH_SIZE = int(os.getenv('LOG_ARCHIVE_BATCH_SIZE', '5000'))
+
+# Flux SSE app-status/stream (parametre.services.app_status_broadcaster)
+# Un thread par processus relit le compteur partagé (cache 'shared') et, en filet de
+# sécurité, la base ; servi en asynchrone sous ASGI (KORA.asgi), en synchrone sous WSGI.
+APP_STATUS_POLL_INTERVAL = float(os.getenv('APP_STATUS_POLL_INTERVAL', '1'))
+APP_STATUS_DB_POLL_INTERVAL = float(os.getenv('APP_STATUS_DB_POLL_INTERVAL', '30'))
+APP_STATUS_HEARTBEAT_INTERVAL = float(os.getenv('APP_STATUS_HEARTBEAT_INTERVAL', '15'))
+# Délai maximal avant qu'un worker relise la version partagée des ApplicationConfig (middleware de maintenance)
+APP_CONFIG_SNAPSHOT_CHECK_INTERVAL = float(os.getenv('APP_CONFIG_SNAPSHOT_CHECK_INTERVAL', '0.5'))
+
+# Cache des documents rendus (parametre.services.document_cache) : PAC complet, CDR,
+# objectifs et analyse d'un tableau. Invalidé par révision à chaque écriture ; durée
+# de vie (secondes) des documents non validés, puis des validés (plus longue, mais
+# finie : les rendus d'une révision ou d'une époque dépassée ne sont plus jamais lus).
+DOCUMENT_CACHE_TIMEOUT = int(os.getenv('DOCUMENT_CACHE_TIMEOUT', '3600'))
+DOCUMENT_CACHE_VALIDATED_TIMEOUT = int(os.getenv('DOCUMENT_CACHE_VALIDATED_TIMEOUT', str(3 * 24 * 3600)))
+
+# Exports CSV/XLSX en streaming (parametre.services.document_export) : nombre de
+# lignes lues par lot (.iterator) et écrites entre deux envois au client.
+EXPORT_CHUNK_SIZE = int(os.getenv('EXPORT_CHUNK_SIZE', '2000'))
+
+# Tâches de fond (parametre.services.background_jobs), exécutées par
+# python manage.py run_worker : attente entre deux recherches de tâche (secondes),
+# délai avant la première reprise d'une tâche en échec (doublé à chaque essai),
+# et silence (secondes) au-delà duquel une tâche en cours est reprise (worker tué).
+# Pendant une tâche, le worker bat toutes les BACKGROUND_JOB_HEARTBEAT_INTERVAL
+# secondes (à garder bien en dessous de BACKGROUND_JOB_STALE_AFTER) ; sans
+# battement d'un worker depuis BACKGROUND_WORKER_TTL secondes, les endpoints
+# ?async=1 s'exécutent en synchrone et le déclenchement manuel d'un job répond 503.
+BACKGROUND_JOB_POLL_INTERVAL = float(os.getenv('BACKGROUND_JOB_POLL_INTERVAL', '1'))
+BACKGROUND_JOB_RETRY_DELAY = int(os.getenv('BACKGROUND_JOB_RETRY_DELAY', '30'))
+BACKGROUND_JOB_STALE_AFTER = int(os.getenv('BACKGROUND_JOB_STALE_AFTER', '900'))
+BACKGROUND_JOB_HEARTBEAT_INTERVAL = int(os.getenv('BACKGROUND_JOB_HEARTBEAT_INTERVAL', '60'))
+BACKGROUND_WORKER_TTL = int(os.getenv('BACKGROUND_WORKER_TTL', '90'))
+
+# Canal de commandes Gunicorn → service scheduler (parametre.services.scheduler_commands).
+# Table scheduler_command ; le service est réveillé par un datagramme sur la socket
+# Unix locale dès l'envoi, et relit la table au plus tard toutes les
+# SCHEDULER_COMMAND_POLL_INTERVAL secondes (socket indisponible, autre hôte).
+SCHEDULER_COMMAND_POLL_INTERVAL = float(os.getenv('SCHEDULER_COMMAND_POLL_INTERVAL', '1'))
+SCHEDULER_COMMAND_SOCKET = os.getenv(
+    'SCHEDULER_COMMAND_SOCKET', os.path.join(tempfile.gettempdir(), 'kora_scheduler_commands.sock')
+)
+# Commandes traitées conservées (jours)
+SCHEDULER_COMMAND_RETENTION_DAYS = int(os.getenv('SCHEDULER_COMMAND_RETENTION_DAYS', '7'))
+
 STATIC_URL = 'static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 MEDIA_URL = '/medias/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'medias')
+# Archives des journaux (noms d'utilisateur, IP, audit des permissions) : dossier privé,
+# hors de MEDIA_ROOT, que ni Django (DEBUG) ni nginx (/medias/) ne servent
+LOG_ARCHIVE_ROOT = os.getenv('LOG_ARCHIVE_ROOT', os.path.join(BASE_DIR, 'log_archives'))
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 CORS_ALLOWED_ORIGINS = [
@@ -0,0 +1,15 @@
+"""
+Django settings — TESTS
+
+Sélectionné par DJANGO_ENV=test (positionné par défaut par `manage.py test`) ;
+les autres lanceurs (pytest, IDE, coverage) définissent DJANGO_ENV=test eux-mêmes.
+"""
+from .dev import *
+
+# Cache propre à l'exécution : jamais le fichier cache.sqlite3 du poste ni un Redis
+# partagé (cache.clear() des tests le viderait, et l'état fuirait d'une exécution à l'autre).
+_TEST_CACHE = {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'kora-tests'}
+if CACHES['default']['BACKEND'] == 'shared.cache.TwoTierCache':
+    CACHES = {**CACHES, 'shared': _TEST_CACHE}
+else:
+    CACHES = {'default': _TEST_CACHE, 'shared': _TEST_CACHE}
@@ -12,6 +12,7 @@ urlpatterns = [
     path('activites-periodiques/', views.activites_periodiques_list, name='activites_periodiques_list'),
     path('activites-periodiques/get-or-create/', views.activite_periodique_get_or_create, name='activite_periodique_get_or_create'),
     path('activites-periodiques/last-previous-year/', views.get_last_ap_previous_year, name='get_last_ap_previous_year'),
+    path('activites-periodiques/export/', views.activites_periodiques_export, name='activites_periodiques_export'),
     path('activites-periodiques/stats/', views.activite_periodique_stats, name='activite_periodique_stats'),
     path('activites-periodiques/create/', views.activite_periodique_create, name='activite_periodique_create'),
     path('activites-periodiques/<uuid:uuid>/', views.activite_periodique_detail, name='activite_periodique_detail'),
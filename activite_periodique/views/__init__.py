@@ -3,3 +3,4 @@ from .utils import _has_amendements_following, _get_next_num_amendement_for_ap
 from .activites import activite_periodique_home, activites_periodiques_list, activite_periodique_detail, activite_periodique_get_or_create, activite_periodique_create, activite_periodique_update, activite_periodique_delete, activite_periodique_validate, activite_periodique_unvalidate
 from .details import details_ap_list, details_ap_by_activite_periodique, details_ap_create, details_ap_update, details_ap_delete
 from .suivis import suivis_ap_list, suivis_ap_by_detail_ap, suivi_ap_create, suivi_ap_update, suivi_ap_delete, get_last_ap_previous_year, activite_periodique_stats, media_livrables_by_suivi, media_livrable_create, media_livrable_update, media_livrable_delete
+from .exports import activites_periodiques_export
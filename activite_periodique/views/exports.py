@@ -0,0 +1,21 @@
+"""
+Export CSV/XLSX en streaming des activités périodiques (détail x suivi mensuel)
+"""
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAuthenticated
+
+from parametre.services.document_export import DocumentExportService
+from permissions.permissions import ActivitePeriodiqueListPermission
+from shared.exports import document_export_response
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated, ActivitePeriodiqueListPermission])
+def activites_periodiques_export(request):
+    """
+    GET ?type=csv|xlsx&annee=2025&processus=<uuid>
+
+    read_activite_periodique sur au moins un processus (comme activites_periodiques_list),
+    lignes limitées aux processus de l'utilisateur (get_user_processus_list).
+    """
+    return document_export_response(request, DocumentExportService.ACTIVITE_PERIODIQUE)
@@ -45,6 +45,7 @@ from parametre.views import (
     get_client_ip,
 )
 from parametre.permissions import check_permission_or_403, get_user_processus_list, user_has_access_to_processus
+from parametre.services.kpi_snapshot_service import KpiSnapshotService
 import logging
 
 logger = logging.getLogger(__name__)
@@ -392,13 +393,13 @@ def activite_periodique_stats(request):
         # Si user_processus_uuids est None, l'utilisateur est super admin (is_staff ET is_superuser)
         if user_processus_uuids is None:
             # Super admin : voir toutes les AP, avec filtre processus optionnel (?processus=UUID)
-            aps_base = ActivitePeriodique.objects.all()
+            processus_uuids = None
             processus_filter = request.query_params.get('processus')
             if processus_filter and str(processus_filter).upper() != 'ALL':
                 try:
                     from uuid import UUID
                     UUID(str(processus_filter))
-                    aps_base = aps_base.filter(processus__uuid=processus_filter)
+                    processus_uuids = [processus_filter]
                 except (ValueError, TypeError):
                     pass
         elif not user_processus_uuids:
@@ -413,63 +414,12 @@ def activite_periodique_stats(request):
                 'message': 'Aucune donnée d\'Activité Périodique trouvée pour vos processus attribués.'
             }, status=status.HTTP_200_OK)
         else:
-            # Récupérer toutes les Activités Périodiques des processus de l'utilisateur
-            aps_base = ActivitePeriodique.objects.filter(processus__uuid__in=user_processus_uuids)
-        logger.info("[activite_periodique_stats] Nombre total d'APs: %s", aps_base.count())
+            # Activités Périodiques des processus de l'utilisateur
+            processus_uuids = user_processus_uuids
         # ========== FIN FILTRAGE ==========
 
-        # Filtrer selon le scope
-        if scope == 'dernier':
-            from django.db.models import Case, When, IntegerField, Max
-            type_priority = Case(
-                When(num_amendement=2, then=3),
-                When(num_amendement=1, then=2),
-                When(num_amendement=0, then=1),
-                default=0, output_field=IntegerField()
-            )
-            annotated = aps_base.annotate(priority=type_priority)
-            last_uuids = []
-            for proc_uuid in annotated.values_list('processus', flat=True).distinct():
-                max_p = annotated.filter(processus=proc_uuid).aggregate(max_p=Max('priority'))['max_p']
-                last = annotated.filter(processus=proc_uuid, priority=max_p).first()
-                if last:
-                    last_uuids.append(last.uuid)
-            aps_initiaux = aps_base.filter(uuid__in=last_uuids)
-        else:
-            aps_initiaux = aps_base.filter(
-                num_amendement=0
-            )
-        logger.info("[activite_periodique_stats] Nombre d'APs initiaux: %s", aps_initiaux.count())
-
-        total_aps = aps_initiaux.count()
-
-        # Compter les APs validées
-        aps_valides = aps_initiaux.filter(is_validated=True).count()
-        logger.info("[activite_periodique_stats] APs validées: %s", aps_valides)
-
-        # Compter les APs en attente
-        aps_en_attente = aps_initiaux.filter(is_validated=False).count()
-        logger.info("[activite_periodique_stats] APs en attente: %s", aps_en_attente)
-
-        # Compter le total de détails et suivis pour les APs initiaux
-        total_details = DetailsAP.objects.filter(
-            activite_periodique__in=aps_initiaux
-        ).count()
-
-        total_suivis = SuivisAP.objects.filter(
-            details_ap__activite_periodique__in=aps_initiaux
-        ).count()
-
-        logger.info("[activite_periodique_stats] Détails: %s, Suivis: %s", total_details, total_suivis)
-
-        # Construire la réponse
-        stats = {
-            'total_aps': total_aps,
-            'aps_valides': aps_valides,
-            'aps_en_attente': aps_en_attente,
-            'total_details': total_details,
-            'total_suivis': total_suivis
-        }
+        # Snapshots KPI : une ligne par AP, pas de comptage sur les détails / suivis
+        stats = KpiSnapshotService.activite_periodique_stats(processus_uuids, scope)
 
         logger.info("[activite_periodique_stats] Statistiques calculées: %s", stats)
 
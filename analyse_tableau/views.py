@@ -16,6 +16,8 @@ from .serializers import (
 )
 from dashboard.models import TableauBord, Objectives, Indicateur
 from parametre.models import Periodicite, Cible
+from parametre.services.document_cache import DocumentCache
+from shared.responses import etag_response
 
 # Import des classes de permissions pour l'analyse tableau
 from permissions.permissions import (
@@ -150,21 +152,24 @@ def get_analyse_by_tableau(request, tableau_uuid):
 
     # Security by Design : Tous les utilisateurs authentifiés peuvent lire l'analyse (lecture publique)
 
-    try:
+    def render():
         analyse = AnalyseTableau.objects.prefetch_related(
             'lignes',
             'lignes__actions',
             'lignes__actions__responsables_directions',
             'lignes__actions__responsables_sous_directions'
         ).get(tableau_bord=tableau)
+        return AnalyseTableauSerializer(analyse).data, tableau.is_validated
+
+    # Rendu en cache par révision du tableau, ETag fort : If-None-Match → 304
+    try:
+        entry = DocumentCache.get_or_render(DocumentCache.TABLEAU_BORD, tableau.uuid, 'analyse', render)
     except AnalyseTableau.DoesNotExist:
         return Response(
             {'detail': "Aucune analyse n'est définie pour ce tableau de bord."},
             status=status.HTTP_404_NOT_FOUND
         )
-
-    serializer = AnalyseTableauSerializer(analyse)
-    return Response(serializer.data, status=status.HTTP_200_OK)
+    return etag_response(request, entry['data'], entry['etag'])
 
 
 @api_view(['POST'])
@@ -205,10 +205,8 @@ class DetailsCDRCreateSerializer(serializers.ModelSerializer):
         # CAS 3: Génération automatique du numéro
         # Si aucun numéro n'est fourni ou si c'est une chaîne vide, générer automatiquement
         if not numero_cdr_provided or (isinstance(numero_cdr_provided, str) and numero_cdr_provided.strip() == ''):
-            # Compter les détails existants pour cette CDR
-            existing_count = DetailsCDR.objects.filter(cdr=cdr).count()
-            numero_cdr = f"CDR-{existing_count + 1}"
-            validated_data['numero_cdr'] = numero_cdr
+            from parametre.services.sequence_allocator import SequenceAllocator
+            validated_data['numero_cdr'] = SequenceAllocator.next_number('numero_cdr', 'CDR-{}', group=cdr.pk)
 
         return super().create(validated_data)
 
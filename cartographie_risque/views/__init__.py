@@ -4,3 +4,4 @@ from .cdr import cartographie_risque_home, cdr_list, cdr_stats, cdr_detail, cdr_
 from .details import details_cdr_by_cdr, details_cdr_create, evaluations_by_detail_cdr, plans_action_by_detail_cdr, suivi_action_detail, suivis_by_plan_action, details_cdr_update, details_cdr_delete
 from .actions import evaluation_risque_create, evaluation_risque_update, plan_action_create, plan_action_update, suivi_action_create, suivi_action_update
 from .validation import validate_cdr, unvalidate_cdr, versions_evaluation_list, create_reevaluation, get_last_cdr_previous_year
+from .exports import cdr_export
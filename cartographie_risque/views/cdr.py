@@ -2,7 +2,7 @@ from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
-from ..models import CDR, DetailsCDR, EvaluationRisque, PlanAction, SuiviAction
+from ..models import CDR, EvaluationRisque, SuiviAction
 from ..serializers import (
     CDRSerializer, CDRCreateSerializer,
     DetailsCDRSerializer, DetailsCDRCreateSerializer, DetailsCDRUpdateSerializer,
@@ -17,6 +17,9 @@ from parametre.views import (
 )
 from parametre.permissions import get_user_processus_list, user_has_access_to_processus
 from permissions.services.permission_service import PermissionService
+from parametre.services.kpi_snapshot_service import KpiSnapshotService
+from parametre.services.document_cache import DocumentCache
+from shared.responses import etag_response
 import logging
 
 logger = logging.getLogger(__name__)
@@ -110,13 +113,13 @@ def cdr_stats(request):
 
         # Si user_processus_uuids est None, l'utilisateur est super admin
         if user_processus_uuids is None:
-            cdrs_base = CDR.objects.all()
+            processus_uuids = None
             processus_filter = request.query_params.get('processus')
             if processus_filter and str(processus_filter).upper() != 'ALL':
                 try:
                     from uuid import UUID
                     UUID(str(processus_filter))
-                    cdrs_base = cdrs_base.filter(processus__uuid=processus_filter)
+                    processus_uuids = [processus_filter]
                 except (ValueError, TypeError):
                     pass
         elif not user_processus_uuids:
@@ -130,49 +133,11 @@ def cdr_stats(request):
                 'total_plans_action': 0,
             }, status=status.HTTP_200_OK)
         else:
-            cdrs_base = CDR.objects.filter(processus__uuid__in=user_processus_uuids)
+            processus_uuids = user_processus_uuids
         # ========== FIN FILTRAGE ==========
 
-        # Filtrer selon le scope
-        if scope == 'dernier':
-            from django.db.models import Case, When, IntegerField, Max
-            type_priority = Case(
-                When(num_amendement=2, then=3),
-                When(num_amendement=1, then=2),
-                When(num_amendement=0, then=1),
-                default=0, output_field=IntegerField()
-            )
-            annotated = cdrs_base.filter(num_amendement__gte=0).annotate(priority=type_priority)
-            last_uuids = []
-            for proc_uuid in annotated.values_list('processus', flat=True).distinct():
-                max_p = annotated.filter(processus=proc_uuid).aggregate(max_p=Max('priority'))['max_p']
-                last = annotated.filter(processus=proc_uuid, priority=max_p).first()
-                if last:
-                    last_uuids.append(last.uuid)
-            cdrs_initiaux = cdrs_base.filter(uuid__in=last_uuids)
-        else:
-            cdrs_initiaux = cdrs_base.filter(num_amendement=0)
-
-        total_cdrs = cdrs_initiaux.count()
-        cdrs_valides = cdrs_initiaux.filter(is_validated=True).count()
-        cdrs_en_cours = cdrs_initiaux.filter(is_validated=False).count()
-
-        # Amendements (AMENDEMENT_1, AMENDEMENT_2)
-        total_amendements = cdrs_base.filter(
-            num_amendement__gt=0
-        ).count()
-
-        total_details = DetailsCDR.objects.filter(cdr__in=cdrs_base).count()
-        total_plans_action = PlanAction.objects.filter(details_cdr__cdr__in=cdrs_base).count()
-
-        stats = {
-            'total_cdrs': total_cdrs,
-            'cdrs_valides': cdrs_valides,
-            'total_amendements': total_amendements,
-            'cdrs_en_cours': cdrs_en_cours,
-            'total_details': total_details,
-            'total_plans_action': total_plans_action,
-        }
+        # Snapshots KPI : une ligne par CDR, pas de comptage sur les détails / plans d'action
+        stats = KpiSnapshotService.cdr_stats(processus_uuids, scope)
         logger.info("[cdr_stats] Statistiques calculées: %s", stats)
         return Response(stats, status=status.HTTP_200_OK)
 
@@ -208,11 +173,14 @@ def cdr_detail(request, uuid):
             return error_response
         # ========== FIN PERMISSION ==========
         
-        serializer = CDRSerializer(cdr)
-        return Response({
+        # Rendu en cache par révision de la CDR, ETag fort : If-None-Match → 304
+        entry = DocumentCache.get_or_render(
+            DocumentCache.CDR, cdr.uuid, 'detail', lambda: (CDRSerializer(cdr).data, cdr.is_validated)
+        )
+        return etag_response(request, {
             'success': True,
-            'data': serializer.data
-        }, status=status.HTTP_200_OK)
+            'data': entry['data']
+        }, entry['etag'])
     except CDR.DoesNotExist:
         return Response({
             'error': 'CDR non trouvée'
@@ -0,0 +1,20 @@
+"""
+Export CSV/XLSX en streaming des lignes de CDR (détail x plan d'action)
+"""
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAuthenticated
+
+from parametre.services.document_export import DocumentExportService
+from shared.exports import document_export_response
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def cdr_export(request):
+    """
+    GET ?type=csv|xlsx&annee=2025&processus=<uuid>
+
+    Mêmes droits que cdr_list (authentifié), lignes limitées aux processus de
+    l'utilisateur (get_user_processus_list).
+    """
+    return document_export_response(request, DocumentExportService.CDR)
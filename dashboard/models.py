@@ -65,26 +65,10 @@ class Objectives(models.Model):
 
     def generate_number(self):
         """
-        Génère un numéro d'objectif unique (OB01, OB02, etc.)
+        Génère un numéro d'objectif unique dans son tableau (OB01, OB02, etc.)
         """
-        # Compter les objectifs existants du même tableau
-        if not self.tableau_bord:
-            # Par sécurité, mais en pratique tableau_bord est requis
-            count = Objectives.objects.count()
-            number = f"OB{count + 1:02d}"
-            # Vérifier l'unicité globalement
-            while Objectives.objects.filter(number=number).exists():
-                count += 1
-                number = f"OB{count + 1:02d}"
-        else:
-            count = Objectives.objects.filter(tableau_bord=self.tableau_bord).count()
-            number = f"OB{count + 1:02d}"
-            # Vérifier l'unicité dans le même tableau
-            while Objectives.objects.filter(tableau_bord=self.tableau_bord, number=number).exists():
-                count += 1
-                number = f"OB{count + 1:02d}"
-
-        return number
+        from parametre.services.sequence_allocator import SequenceAllocator
+        return SequenceAllocator.next_number('objective_number', 'OB{:02d}', group=self.tableau_bord_id)
 
 
 class Indicateur(models.Model):
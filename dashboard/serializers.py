@@ -3,6 +3,7 @@ Serializers pour l'application Dashboard
 """
 from rest_framework import serializers
 from django.contrib.auth.models import User
+from django.db.models import Count, Exists, OuterRef
 from .models import Objectives, Indicateur, Observation, TableauBord
 from parametre.models import Cible, Periodicite, Frequence
 
@@ -39,6 +40,13 @@ class ObjectivesSerializer(serializers.ModelSerializer):
             'indicateurs_count', 'created_at', 'updated_at'
         ]
         read_only_fields = ['uuid', 'number', 'created_at', 'updated_at']
+
+    @staticmethod
+    def setup_queryset(queryset):
+        """Jointures et annotations lues par le serializer (listes : nombre de requêtes constant)"""
+        return queryset.select_related('cree_par', 'tableau_bord').annotate(
+            indicateurs_count_annot=Count('indicateurs')
+        )
     
     def get_createur_nom(self, obj):
         """Retourner le nom du créateur"""
@@ -46,6 +54,8 @@ class ObjectivesSerializer(serializers.ModelSerializer):
     
     def get_indicateurs_count(self, obj):
         """Retourner le nombre d'indicateurs associés"""
+        if hasattr(obj, 'indicateurs_count_annot'):
+            return obj.indicateurs_count_annot
         return obj.indicateurs.count()
 
     def get_tableau_bord_uuid(self, obj):
@@ -125,12 +135,31 @@ class TableauBordSerializer(serializers.ModelSerializer):
     has_amendements = serializers.SerializerMethodField()
     has_analyse = serializers.SerializerMethodField()
 
+    @staticmethod
+    def setup_queryset(queryset):
+        """Jointures et annotations lues par le serializer (listes : nombre de requêtes constant)"""
+        from analyse_tableau.models import AnalyseTableau
+
+        suivants = TableauBord.objects.filter(
+            annee=OuterRef('annee'),
+            processus=OuterRef('processus'),
+            num_amendement=OuterRef('num_amendement') + 1,
+        )
+        return queryset.select_related('processus', 'valide_par').annotate(
+            has_amendements_annot=Exists(suivants),
+            has_analyse_annot=Exists(AnalyseTableau.objects.filter(tableau_bord=OuterRef('pk'))),
+        )
+
     def get_has_amendements(self, obj):
         """Vérifier si le tableau initial a des amendements"""
+        if hasattr(obj, 'has_amendements_annot'):
+            return obj.has_amendements_annot
         return obj.has_amendements()
 
     def get_has_analyse(self, obj):
         """Vérifier si une analyse existe pour ce tableau (accessible à tous les utilisateurs authentifiés)"""
+        if hasattr(obj, 'has_analyse_annot'):
+            return obj.has_analyse_annot
         return hasattr(obj, 'analyse_tableau')
 
     class Meta:
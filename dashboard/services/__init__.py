@@ -0,0 +1,3 @@
+"""
+Services du tableau de bord (logique métier sans couche HTTP)
+"""
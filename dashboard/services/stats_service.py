@@ -0,0 +1,180 @@
+"""
+Calcul des statistiques du tableau de bord — logique métier pure, sans couche HTTP.
+
+Lecture des snapshots KPI (une ligne par tableau de bord, voir KpiSnapshotService) :
+  1. snapshots 'dashboard' des processus du périmètre
+  2. nombre de fréquences
+
+Année, derniers tableaux par processus et sommes des compteurs sont calculés en
+Python sur ces lignes ; le coût ne dépend plus du nombre d'objectifs, d'indicateurs
+ou de périodicités.
+"""
+import logging
+from datetime import timedelta
+
+from django.utils import timezone
+
+from parametre.models import Frequence
+from parametre.services.kpi_snapshot_service import KpiSnapshotService
+
+logger = logging.getLogger(__name__)
+
+
+class DashboardStatsService:
+    """
+    Statistiques du tableau de bord pour un périmètre de processus
+
+    Usage :
+        stats = DashboardStatsService.compute(user_processus_uuids, processus_uuid_filter, scope)
+    """
+
+    @classmethod
+    def compute(cls, user_processus_uuids, processus_uuid_filter=None, scope='tous'):
+        """
+        Args:
+            user_processus_uuids: None (super admin : tous les processus) ou liste d'UUIDs accessibles
+            processus_uuid_filter: UUID d'un processus précis (optionnel)
+            scope: 'tous' ou 'dernier' (dernier tableau par processus)
+
+        Returns:
+            dict: statistiques (format de la réponse de dashboard_stats)
+        """
+        # Vue globale = utilisateur normal sans filtre sur un processus précis
+        is_global_view = (processus_uuid_filter is None and user_processus_uuids is not None)
+        if processus_uuid_filter:
+            if user_processus_uuids is None:
+                # Super admin : autoriser le filtre unique
+                user_processus_uuids = [processus_uuid_filter]
+            elif str(processus_uuid_filter) in [str(u) for u in user_processus_uuids]:
+                user_processus_uuids = [processus_uuid_filter]
+            # Si l'utilisateur n'a pas accès au processus demandé, ignorer le filtre (sécurité)
+
+        rows = KpiSnapshotService.snapshots('dashboard', user_processus_uuids)
+
+        current_year = timezone.now().year
+        year_to_use = cls._resolve_year(rows, current_year)
+
+        # ========== PÉRIMÈTRE DES TABLEAUX ==========
+        # tableaux_annee : tableaux des processus accessibles pour l'année déterminée
+        # tableaux       : périmètre des objectifs / indicateurs (derniers tableaux si scope='dernier')
+        tableaux_annee = [row for row in rows if row['annee'] == year_to_use]
+
+        if scope == 'dernier' and is_global_view:
+            # Vue globale : dernier tableau par processus toutes années confondues
+            # (chaque processus peut avoir son tableau dans une année différente)
+            tableaux = cls._latest_per_processus(rows)
+            # Cibles et analyses sont alors elles aussi limitées aux derniers tableaux
+            tableaux_elargis = tableaux
+        elif scope == 'dernier':
+            tableaux = cls._latest_per_processus(tableaux_annee)
+            # Historiquement, cibles et analyses restent comptées sur toute l'année
+            tableaux_elargis = tableaux_annee
+        else:
+            tableaux = tableaux_annee
+            tableaux_elargis = tableaux_annee
+
+        counters = cls._counters(tableaux, tableaux_elargis)
+        total_frequences = Frequence.objects.count()
+
+        # ========== INDICATEURS / OBJECTIFS / CIBLES ATTEINTS ==========
+        total_cibles = counters['total_cibles']
+        indicateurs_atteints = counters['indicateurs_atteints']
+        indicateurs_non_atteints = counters['indicateurs_non_atteints']
+        objectifs_atteints = counters['objectifs_atteints']
+        objectifs_non_atteints = counters['objectifs_non_atteints']
+        cibles_atteintes = indicateurs_atteints
+        # Les cibles non évaluables (pas de périodicité ou taux invalide) sont comptées comme non atteintes
+        cibles_non_atteintes = total_cibles - cibles_atteintes
+
+        pourcentage_atteintes = (cibles_atteintes / total_cibles * 100) if total_cibles > 0 else 0
+        pourcentage_non_atteintes = (cibles_non_atteintes / total_cibles * 100) if total_cibles > 0 else 0
+
+        tableaux_sans_analyse = counters['total_tableaux'] - counters['tableaux_avec_analyse']
+
+        logger.info(
+            "[DashboardStats] Résultats calculés - objectifs=%s, indicateurs=%s, cibles=%s, "
+            "indicateurs_atteints=%s, objectifs_atteints=%s, total_analyses=%s, total_tableaux=%s",
+            counters['total_objectives'], counters['total_indicateurs'], total_cibles,
+            indicateurs_atteints, objectifs_atteints, counters['total_analyses'], counters['total_tableaux']
+        )
+
+        return {
+            'year_used': year_to_use,
+            'is_current_year': year_to_use == current_year,
+            'scope': scope,
+            'total_objectives': counters['total_objectives'],
+            'total_frequences': total_frequences,
+            'total_indicateurs': counters['total_indicateurs'],
+            'objectives_today': counters['objectives_today'],
+            'objectives_this_week': counters['objectives_this_week'],
+            'objectives_this_month': counters['objectives_this_month'],
+            'total_cibles': total_cibles,
+            'cibles_atteintes': cibles_atteintes,
+            'cibles_non_atteintes': cibles_non_atteintes,
+            'pourcentage_atteintes': round(pourcentage_atteintes, 2),
+            'pourcentage_non_atteintes': round(pourcentage_non_atteintes, 2),
+            # Nouvelles statistiques basées sur la règle métier
+            'indicateurs_atteints': indicateurs_atteints,
+            'indicateurs_non_atteints': indicateurs_non_atteints,
+            'objectifs_atteints': objectifs_atteints,
+            'objectifs_non_atteints': objectifs_non_atteints,
+            # Statistiques d'analyse
+            'total_analyses': counters['total_analyses'],
+            'tableaux_avec_analyse': counters['tableaux_avec_analyse'],
+            'tableaux_sans_analyse': tableaux_sans_analyse,
+        }
+
+    # ── Étapes ────────────────────────────────────────────────────────────────
+
+    @staticmethod
+    def _resolve_year(rows, current_year):
+        """Année en cours si des tableaux existent, sinon année la plus récente avec des tableaux"""
+        years = {row['annee'] for row in rows if row['annee'] is not None}
+        if not years or current_year in years:
+            return current_year
+        return max(years)
+
+    @staticmethod
+    def _latest_per_processus(rows):
+        """Dernier tableau de chaque processus (année puis numéro d'amendement les plus élevés)"""
+        return KpiSnapshotService.latest_per_processus(rows, lambda r: (r['annee'] or 0, r['num_amendement']))
+
+    @staticmethod
+    def _counters(tableaux, tableaux_elargis):
+        """
+        Sommes des métriques des snapshots
+
+        Objectifs, indicateurs et statuts atteints portent sur tableaux ; cibles et
+        analyses sur tableaux_elargis (⊇ tableaux).
+        """
+        today = timezone.now().date()
+        week_ago = (today - timedelta(days=7)).isoformat()
+        month_ago = (today - timedelta(days=30)).isoformat()
+        today = today.isoformat()
+
+        def total(rows, metric):
+            return sum(row['metrics'].get(metric, 0) for row in rows)
+
+        def created(predicate):
+            return sum(
+                count
+                for row in tableaux
+                for day, count in row['metrics'].get('objectives_created', {}).items()
+                if predicate(day)
+            )
+
+        return {
+            'total_tableaux': len(tableaux),
+            'tableaux_avec_analyse': sum(1 for row in tableaux if row['metrics'].get('analyses')),
+            'total_objectives': total(tableaux, 'objectives'),
+            'objectives_today': created(lambda day: day == today),
+            'objectives_this_week': created(lambda day: day >= week_ago),
+            'objectives_this_month': created(lambda day: day >= month_ago),
+            'total_indicateurs': total(tableaux, 'indicateurs'),
+            'indicateurs_atteints': total(tableaux, 'indicateurs_atteints'),
+            'indicateurs_non_atteints': total(tableaux, 'indicateurs_non_atteints'),
+            'objectifs_atteints': total(tableaux, 'objectifs_atteints'),
+            'objectifs_non_atteints': total(tableaux, 'objectifs_non_atteints'),
+            'total_analyses': total(tableaux_elargis, 'analyses'),
+            'total_cibles': total(tableaux_elargis, 'cibles'),
+        }
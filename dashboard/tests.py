@@ -0,0 +1,174 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from dashboard.models import Indicateur, Objectives, TableauBord
+from dashboard.serializers import ObjectivesSerializer, TableauBordSerializer
+from parametre.models import Cible, Frequence, Periodicite, Processus, Role, UserProcessus, UserProcessusRole
+from parametre.services.amendment_copier import AmendmentCopier
+
+
+@override_settings(PERMISSION_AUDIT_ENABLED=False)
+class DashboardStatsQueryCountTests(TestCase):
+    """Le nombre de requêtes de dashboard_stats ne dépend pas du nombre de processus"""
+
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create(username='owner')
+        self.role = Role.objects.create(code='lire', nom='Lecture')
+        self.year = timezone.now().year
+
+    def _user_with_processus(self, username, nb_processus):
+        # Les snapshots KPI sont recalculés au commit
+        with self.captureOnCommitCallbacks(execute=True):
+            return self._create_user_with_processus(username, nb_processus)
+
+    def _create_user_with_processus(self, username, nb_processus):
+        user = User.objects.create(username=username)
+        for i in range(nb_processus):
+            processus = Processus.objects.create(nom=f'{username} processus {i}', cree_par=self.owner)
+            UserProcessus.objects.create(user=user, processus=processus)
+            UserProcessusRole.objects.create(user=user, processus=processus, role=self.role)
+
+            initial = TableauBord.objects.create(annee=self.year, processus=processus, cree_par=self.owner)
+            amendement = TableauBord.objects.create(
+                annee=self.year, processus=processus, num_amendement=1,
+                initial_ref=initial, cree_par=self.owner
+            )
+            for tableau in (initial, amendement):
+                objective = Objectives.objects.create(libelle='Objectif', tableau_bord=tableau, cree_par=self.owner)
+                indicateur = Indicateur.objects.create(libelle='Indicateur', objective_id=objective)
+                Cible.objects.create(indicateur_id=indicateur, valeur=50, condition='≥')
+                Periodicite.objects.create(indicateur_id=indicateur, periode='T1', a_realiser=10, realiser=8)
+        return user
+
+    def _stats_query_count(self, user, params):
+        client = APIClient()
+        client.force_authenticate(user)
+        client.get('/api/dashboard/stats/', params)  # caches froids (config, throttles)
+        with CaptureQueriesContext(connection) as ctx:
+            response = client.get('/api/dashboard/stats/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()['data'], len(ctx.captured_queries)
+
+    def test_query_count_independent_of_processus_count(self):
+        small = self._user_with_processus('small', 1)
+        large = self._user_with_processus('large', 12)
+
+        for scope in ('tous', 'dernier'):
+            with self.subTest(scope=scope):
+                small_data, small_count = self._stats_query_count(small, {'scope': scope})
+                large_data, large_count = self._stats_query_count(large, {'scope': scope})
+
+                self.assertEqual(small_count, large_count)
+                expected_tableaux = 12 if scope == 'dernier' else 24
+                self.assertEqual(large_data['tableaux_sans_analyse'], expected_tableaux)
+                self.assertEqual(large_data['total_objectives'], expected_tableaux)
+                self.assertEqual(large_data['objectifs_atteints'], expected_tableaux)
+                # Vue globale : les cibles suivent le même périmètre que les tableaux
+                self.assertEqual(large_data['total_cibles'], expected_tableaux)
+
+
+@override_settings(PERMISSION_AUDIT_ENABLED=False)
+class TableauAmendmentCopyTests(TestCase):
+    """Clonage d'un tableau vers son amendement : requêtes indépendantes de la taille du tableau"""
+
+    def setUp(self):
+        self.owner = User.objects.create(username='owner')
+        self.frequence = Frequence.objects.create(nom='Trimestrielle')
+        self.year = timezone.now().year
+
+    def _tableau(self, nom, nb_objectives, nb_indicateurs):
+        processus = Processus.objects.create(nom=nom, cree_par=self.owner)
+        initial = TableauBord.objects.create(annee=self.year, processus=processus, cree_par=self.owner)
+        amendement = TableauBord.objects.create(
+            annee=self.year, processus=processus, num_amendement=1, initial_ref=initial, cree_par=self.owner
+        )
+        for i in range(nb_objectives):
+            objective = Objectives.objects.create(libelle=f'Objectif {i}', tableau_bord=initial, cree_par=self.owner)
+            for j in range(nb_indicateurs):
+                indicateur = Indicateur.objects.create(
+                    libelle=f'Indicateur {i}.{j}', objective_id=objective, frequence_id=self.frequence
+                )
+                Cible.objects.create(indicateur_id=indicateur, valeur=50, condition='≥')
+                for periode in ('T1', 'T2'):
+                    Periodicite.objects.create(indicateur_id=indicateur, periode=periode, a_realiser=10, realiser=8)
+        return initial, amendement
+
+    def _copy(self, source, target):
+        with CaptureQueriesContext(connection) as ctx:
+            AmendmentCopier.copy_tableau_bord(source, target, self.owner)
+        return len(ctx.captured_queries)
+
+    def test_copy_is_level_by_level(self):
+        small = self._copy(*self._tableau('Petit', 1, 1))
+        source, target = self._tableau('Grand', 5, 8)
+        self.assertEqual(self._copy(source, target), small)
+
+        self.assertEqual(target.objectives.count(), 5)
+        self.assertEqual(
+            list(target.objectives.values_list('number', flat=True)),
+            list(source.objectives.values_list('number', flat=True)),
+        )
+        copied = Indicateur.objects.filter(objective_id__tableau_bord=target)
+        self.assertEqual(copied.count(), 40)
+        self.assertEqual(Cible.objects.filter(indicateur_id__in=copied).count(), 40)
+        periodicite = Periodicite.objects.filter(indicateur_id__in=copied).first()
+        self.assertEqual((periodicite.taux, periodicite.indicateur_id.frequence_id), (80, self.frequence))
+
+
+@override_settings(PERMISSION_AUDIT_ENABLED=False)
+class ListSerializerQueryCountTests(TestCase):
+    """Les serializers de liste lisent les annotations de setup_queryset : requêtes indépendantes du nombre de lignes"""
+
+    def setUp(self):
+        self.owner = User.objects.create(username='owner', first_name='Ada', last_name='Owner')
+        self.year = timezone.now().year
+        self.nb_tableaux = 0
+
+    def _add_tableau(self):
+        self.nb_tableaux += 1
+        processus = Processus.objects.create(nom=f'Processus {self.nb_tableaux}', cree_par=self.owner)
+        initial = TableauBord.objects.create(
+            annee=self.year, processus=processus, cree_par=self.owner, valide_par=self.owner
+        )
+        TableauBord.objects.create(
+            annee=self.year, processus=processus, num_amendement=1, initial_ref=initial, cree_par=self.owner
+        )
+        objective = Objectives.objects.create(libelle='Objectif', tableau_bord=initial, cree_par=self.owner)
+        for i in range(2):
+            Indicateur.objects.create(libelle=f'Indicateur {i}', objective_id=objective)
+        return initial
+
+    def _query_count(self, serializer_class, queryset):
+        with CaptureQueriesContext(connection) as ctx:
+            data = serializer_class(serializer_class.setup_queryset(queryset), many=True).data
+        return data, len(ctx.captured_queries)
+
+    def assertConstantQueries(self, serializer_class, queryset):
+        """Sérialise la liste avec 1 puis 5 jeux de données : même nombre de requêtes, mêmes valeurs qu'en unitaire"""
+        self._add_tableau()
+        _, small = self._query_count(serializer_class, queryset.all())
+        for _ in range(4):
+            self._add_tableau()
+        data, large = self._query_count(serializer_class, queryset.all())
+        self.assertEqual(large, small, f'{serializer_class.__name__} : {small} -> {large} requêtes')
+        # Repli sans annotation : mêmes valeurs
+        self.assertEqual(data, serializer_class(queryset.all(), many=True).data)
+        return data
+
+    def test_tableau_bord_serializer(self):
+        data = self.assertConstantQueries(
+            TableauBordSerializer, TableauBord.objects.order_by('processus__nom', 'num_amendement')
+        )
+        self.assertEqual([row['has_amendements'] for row in data[:2]], [True, False])
+        self.assertFalse(data[0]['has_analyse'])
+        self.assertEqual(data[0]['valide_par_nom'], 'Ada Owner')
+
+    def test_objectives_serializer(self):
+        data = self.assertConstantQueries(ObjectivesSerializer, Objectives.objects.order_by('created_at'))
+        self.assertEqual({row['indicateurs_count'] for row in data}, {2})
@@ -49,6 +49,7 @@ urlpatterns = [
 
     # ==================== TABLEAUX DE BORD ====================
     path('tableaux-bord/', views.tableaux_bord_list_create, name='tableaux_bord_list_create'),
+    path('tableaux-bord/export/', views.tableaux_bord_export, name='tableaux_bord_export'),
     path('tableaux-bord/<uuid:uuid>/', views.tableau_bord_detail, name='tableau_bord_detail'),
     path('tableaux-bord/<uuid:uuid>/objectives/', views.tableau_bord_objectives, name='tableau_bord_objectives'),
     path('tableaux-bord/<uuid:uuid>/validate/', views.validate_tableau_bord, name='validate_tableau_bord'),
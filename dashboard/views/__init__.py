@@ -6,3 +6,4 @@ from .indicateurs import indicateurs_list, indicateurs_detail, indicateurs_creat
 from .cibles import cibles_list, cibles_detail, cibles_create, cibles_update, cibles_delete, cibles_by_indicateur
 from .periodicites import periodicites_list, periodicites_detail, periodicites_create, periodicites_update, periodicites_delete, periodicites_by_indicateur
 from .observations import observations_list, observations_create, observations_detail, observations_update, observations_delete, observations_by_indicateur, get_last_tableau_bord_previous_year
+from .exports import tableaux_bord_export
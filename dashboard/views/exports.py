@@ -0,0 +1,21 @@
+"""
+Export CSV/XLSX en streaming des indicateurs des tableaux de bord (indicateur x périodicité)
+"""
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAuthenticated
+
+from parametre.services.document_export import DocumentExportService
+from permissions.permissions import DashboardTableauListCreatePermission
+from shared.exports import document_export_response
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated, DashboardTableauListCreatePermission])
+def tableaux_bord_export(request):
+    """
+    GET ?type=csv|xlsx&annee=2025&processus=<uuid>
+
+    Mêmes droits que tableaux_bord_list_create, lignes limitées aux
+    processus de l'utilisateur (get_user_processus_list).
+    """
+    return document_export_response(request, DocumentExportService.TABLEAU_BORD)
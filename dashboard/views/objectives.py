@@ -77,7 +77,7 @@ def objectives_list(request):
             objectives = Objectives.objects.none()  # Aucun processus, donc aucun objectif
         # ========== FIN FILTRAGE ==========
         
-        serializer = ObjectivesSerializer(objectives, many=True)
+        serializer = ObjectivesSerializer(ObjectivesSerializer.setup_queryset(objectives), many=True)
         
         return Response({
             'success': True,
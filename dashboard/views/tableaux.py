@@ -7,14 +7,20 @@ from django.http import JsonResponse
 from django.utils import timezone
 import logging
 from django.db import models
-from ..models import Objectives, Indicateur, Observation, TableauBord
+from ..models import Objectives, Observation, TableauBord
 from analyse_tableau.models import AnalyseTableau
+from parametre.services.amendment_copier import AmendmentCopier
+from parametre.services.background_jobs import BackgroundJobService
+from parametre.services.document_cache import DocumentCache
+from shared.responses import etag_response
 from parametre.views import (
     log_tableau_bord_creation,
     log_tableau_bord_update,
     log_objectif_creation,
     log_indicateur_creation,
-    get_client_ip
+    get_client_ip,
+    wants_async,
+    job_accepted,
 )
 from parametre.permissions import get_user_processus_list, user_has_access_to_processus
 from permissions.permissions import (
@@ -90,11 +96,12 @@ def tableaux_bord_list_create(request):
                 )
             # ========== FIN FILTRAGE ==========
             
-            serializer = TableauBordSerializer(qs, many=True)
+            serializer = TableauBordSerializer(TableauBordSerializer.setup_queryset(qs), many=True)
+            data = serializer.data
             return Response({
                 'success': True,
-                'data': serializer.data,
-                'count': qs.count()
+                'data': data,
+                'count': len(data)
             }, status=status.HTTP_200_OK)
         else:
             data = request.data.copy()
@@ -197,43 +204,19 @@ def tableaux_bord_list_create(request):
                             getattr(source_tableau, 'num_amendement', None)
                         )
 
-                        # cloner objectifs du tableau source (dernier tableau : initial ou dernier amendement)
-                        for obj in source_tableau.objectives.all():
-                            new_obj = Objectives.objects.create(
-                                number=obj.number,
-                                libelle=obj.libelle,
-                                cree_par=request.user,
-                                tableau_bord=instance
+                        # ?async=1 : copie par le worker, le tableau (vide) est renvoyé aussitôt avec la tâche
+                        if wants_async(request):
+                            job = BackgroundJobService.enqueue('copy_tableau_bord_amendment', {
+                                'source': source_tableau.uuid, 'target': instance.uuid,
+                            }, user=request.user)
+                            return job_accepted(
+                                job, message='Tableau de bord créé, copie des objectifs en cours',
+                                tableau_bord=TableauBordSerializer(instance).data,
                             )
-                            # cloner indicateurs et leur structure
-                            indicateurs = Indicateur.objects.filter(objective_id=obj)
-                            for ind in indicateurs:
-                                new_ind = Indicateur.objects.create(
-                                    libelle=ind.libelle,
-                                    objective_id=new_obj,
-                                    frequence_id=ind.frequence_id
-                                )
-                                # cibles (parametre.Cible)
-                                try:
-                                    from parametre.models import Cible as ParamCible, Periodicite as ParamPeriodicite
-                                    cible = ParamCible.objects.filter(indicateur_id=ind).first()
-                                    if cible:
-                                        ParamCible.objects.create(
-                                            valeur=cible.valeur,
-                                            condition=cible.condition,
-                                            indicateur_id=new_ind
-                                        )
-                                    # periodicites
-                                    for p in ParamPeriodicite.objects.filter(indicateur_id=ind):
-                                        ParamPeriodicite.objects.create(
-                                            indicateur_id=new_ind,
-                                            periode=p.periode,
-                                            a_realiser=p.a_realiser,
-                                            realiser=p.realiser
-                                        )
-                                except Exception:
-                                    # en cas d'erreur de copie d'éléments annexes, on continue quand même avec les objectifs/indicateurs
-                                    pass
+
+                        # cloner objectifs, indicateurs, cibles et périodicités du tableau source
+                        # (dernier tableau : initial ou dernier amendement), niveau par niveau
+                        AmendmentCopier.copy_tableau_bord(source_tableau, instance, request.user)
                     return Response({
                         'success': True,
                         'message': 'Tableau de bord créé avec succès',
@@ -396,41 +379,16 @@ def create_amendement(request, tableau_initial_uuid):
                     ).first() or initial_tableau
 
                     logger.info("Clonage depuis %s (num_amendement=%s)", source_tableau.uuid, source_tableau.num_amendement)
-                    logger.info("Nombre d'objectifs à cloner: %s", source_tableau.objectives.count())
-
-                    for obj in source_tableau.objectives.all():
-                        new_obj = Objectives.objects.create(
-                            number=obj.number,
-                            libelle=obj.libelle,
-                            cree_par=request.user,
-                            tableau_bord=instance
+                    if wants_async(request):
+                        job = BackgroundJobService.enqueue('copy_tableau_bord_amendment', {
+                            'source': source_tableau.uuid, 'target': instance.uuid,
+                        }, user=request.user)
+                        return job_accepted(
+                            job, message=f'Amendement {instance.nom_version} créé, copie des objectifs en cours',
+                            tableau_bord=TableauBordSerializer(instance).data,
                         )
-                        indicateurs = Indicateur.objects.filter(objective_id=obj)
-                        for ind in indicateurs:
-                            new_ind = Indicateur.objects.create(
-                                libelle=ind.libelle,
-                                objective_id=new_obj,
-                                frequence_id=ind.frequence_id
-                            )
-                            try:
-                                from parametre.models import Cible as ParamCible, Periodicite as ParamPeriodicite
-                                cible = ParamCible.objects.filter(indicateur_id=ind).first()
-                                if cible:
-                                    ParamCible.objects.create(
-                                        valeur=cible.valeur,
-                                        condition=cible.condition,
-                                        indicateur_id=new_ind
-                                    )
-                                for p in ParamPeriodicite.objects.filter(indicateur_id=ind):
-                                    ParamPeriodicite.objects.create(
-                                        indicateur_id=new_ind,
-                                        periode=p.periode,
-                                        a_realiser=p.a_realiser,
-                                        realiser=p.realiser
-                                    )
-                            except Exception as e:
-                                logger.warning("Erreur lors du clonage des éléments annexes: %s", str(e))
-                                pass
+                    nb_objectifs = AmendmentCopier.copy_tableau_bord(source_tableau, instance, request.user)
+                    logger.info("Objectifs clonés: %s", nb_objectifs)
 
                 return Response({
                     'success': True,
@@ -485,7 +443,7 @@ def get_amendements_by_initial(request, tableau_initial_uuid):
             initial_ref=initial_tableau
         ).order_by('num_amendement')
 
-        serializer = TableauBordSerializer(amendements, many=True)
+        serializer = TableauBordSerializer(TableauBordSerializer.setup_queryset(amendements), many=True)
 
         return Response({
             'success': True,
@@ -659,21 +617,25 @@ def tableau_bord_objectives(request, uuid):
         except TableauBord.DoesNotExist:
             return Response({'success': False, 'error': 'Tableau de bord non trouvé'}, status=status.HTTP_404_NOT_FOUND)
         
-        # Récupérer les objectifs du tableau de bord
-        objectives = Objectives.objects.filter(tableau_bord=tb).order_by('number')
-        serializer = ObjectivesSerializer(objectives, many=True)
-        
-        return Response({
-            'success': True,
-            'data': serializer.data,
-            'count': objectives.count(),
-            'tableau_bord': {
-                'uuid': str(tb.uuid),
-                'annee': tb.annee,
-                'processus_nom': tb.processus.nom,
-                'type_label': tb.get_type_display()
-            }
-        }, status=status.HTTP_200_OK)
+        def render():
+            # Récupérer les objectifs du tableau de bord
+            objectives = Objectives.objects.filter(tableau_bord=tb).order_by('number')
+            data = ObjectivesSerializer(ObjectivesSerializer.setup_queryset(objectives), many=True).data
+            return {
+                'success': True,
+                'data': data,
+                'count': len(data),
+                'tableau_bord': {
+                    'uuid': str(tb.uuid),
+                    'annee': tb.annee,
+                    'processus_nom': tb.processus.nom,
+                    'type_label': tb.get_type_display()
+                }
+            }, tb.is_validated
+
+        # Rendu en cache par révision du tableau, ETag fort : If-None-Match → 304
+        entry = DocumentCache.get_or_render(DocumentCache.TABLEAU_BORD, tb.uuid, 'objectives', render)
+        return etag_response(request, entry['data'], entry['etag'])
         
     except Exception as e:
         logger.error("Erreur lors de la récupération des objectifs du tableau de bord %s: %s", uuid, str(e))
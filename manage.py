@@ -7,6 +7,9 @@ import sys
 def main():
     """Run administrative tasks."""
     os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'KORA.settings')
+    if sys.argv[1:2] == ['test']:
+        # Réglages de test (KORA/settings/test.py) sauf choix explicite
+        os.environ.setdefault('DJANGO_ENV', 'test')
     try:
         from django.core.management import execute_from_command_line
     except ImportError as exc:
@@ -32,7 +32,20 @@ class ApplicationMaintenanceMiddleware(MiddlewareMixin):
         '/api/activite-periodique/': 'activite_periodique',
         '/api/documentation/': 'documentation',
     }
-    
+
+    # Index précalculé : segment après /api/ -> app_name (une recherche dict par requête)
+    APP_SEGMENTS = {
+        url_prefix.split('/')[2]: app_name for url_prefix, app_name in APP_ROUTES.items()
+    }
+
+    @classmethod
+    def resolve_app_name(cls, path):
+        """Application correspondant à l'URL ('/api/<segment>/...'), ou None"""
+        parts = path.split('/', 3)
+        if len(parts) < 4 or parts[0] or parts[1] != 'api':
+            return None
+        return cls.APP_SEGMENTS.get(parts[2])
+
     def process_request(self, request):
         """
         Vérifie si la route demandée correspond à une application en maintenance
@@ -44,52 +57,55 @@ class ApplicationMaintenanceMiddleware(MiddlewareMixin):
         4. Si config existe et is_enabled=False, bloquer (refus par défaut)
         5. Si config n'existe pas, laisser passer (pour compatibilité)
         6. Logger les tentatives d'accès bloquées
+
+        Les configurations sont lues dans l'instantané du processus
+        (parametre.services.application_config_snapshot), sans requête.
         """
         # Importer ici pour éviter les imports circulaires
-        from parametre.models import ApplicationConfig
-        
-        # Vérifier si la route correspond à une application
-        for url_prefix, app_name in self.APP_ROUTES.items():
-            if request.path.startswith(url_prefix):
-                user = request.user
-                is_auth = user.is_authenticated
-                is_admin = is_auth and getattr(user, 'is_staff', False) and getattr(user, 'is_superuser', False)
+        from parametre.services.application_config_snapshot import application_config_snapshot
 
-                # Super admin bypass
-                if is_admin:
-                    return None
+        app_name = self.resolve_app_name(request.path)
+        if app_name is None:
+            # Route ne correspond à aucune application, continuer normalement
+            return None
 
-                # Vérifier si l'app est activée
-                try:
-                    config = ApplicationConfig.objects.get(app_name=app_name)
+        user = request.user
+        is_auth = user.is_authenticated
+        is_admin = is_auth and getattr(user, 'is_staff', False) and getattr(user, 'is_superuser', False)
 
-                    # Security by Design : Refus par défaut si is_enabled=False
-                    if not config.is_enabled:
-                        user_info = f"user: {user.username}" if is_auth else "anonymous"
-                        logger.warning(
-                            "[ApplicationMaintenance] Accès bloqué à %s (%s)", app_name, user_info
-                        )
-                        return JsonResponse({
-                            'error': 'Application en maintenance',
-                            'message': config.maintenance_message or 'Cette application est temporairement indisponible',
-                            'app_name': app_name,
-                            'maintenance_start': config.maintenance_start.isoformat() if config.maintenance_start else None,
-                            'maintenance_end': config.maintenance_end.isoformat() if config.maintenance_end else None,
-                            'code': 'APP_MAINTENANCE'
-                        }, status=503)
+        # Super admin bypass
+        if is_admin:
+            return None
 
-                    return None
+        # Vérifier si l'app est activée
+        try:
+            config = application_config_snapshot.get(app_name)
+        except Exception as e:
+            logger.error(
+                "[ApplicationMaintenance] Erreur lors de la vérification de %s: %s", app_name, e,
+                exc_info=True
+            )
+            return None
+
+        # Config absente : laisser passer (compatibilité)
+        if config is None:
+            return None
+
+        # Security by Design : Refus par défaut si is_enabled=False
+        if not config['is_enabled']:
+            user_info = f"user: {user.username}" if is_auth else "anonymous"
+            logger.warning(
+                "[ApplicationMaintenance] Accès bloqué à %s (%s)", app_name, user_info
+            )
+            return JsonResponse({
+                'error': 'Application en maintenance',
+                'message': config['maintenance_message'] or 'Cette application est temporairement indisponible',
+                'app_name': app_name,
+                'maintenance_start': config['maintenance_start'].isoformat() if config['maintenance_start'] else None,
+                'maintenance_end': config['maintenance_end'].isoformat() if config['maintenance_end'] else None,
+                'code': 'APP_MAINTENANCE'
+            }, status=503)
 
-                except ApplicationConfig.DoesNotExist:
-                    return None
-                except Exception as e:
-                    logger.error(
-                        "[ApplicationMaintenance] Erreur lors de la vérification de %s: %s", app_name, e,
-                        exc_info=True
-                    )
-                    return None
-        
-        # Route ne correspond à aucune application, continuer normalement
         return None
     
     def _get_client_ip(self, request):
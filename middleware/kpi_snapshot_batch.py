@@ -0,0 +1,17 @@
+"""
+Middleware de regroupement des recalculs de snapshots KPI
+
+En autocommit, chaque écriture est sa propre transaction : sans regroupement, une
+requête qui modifie N lignes d'un même document recalculerait N fois son snapshot.
+Les marquages de la requête sont fusionnés et vidés une seule fois en fin de requête.
+"""
+from parametre.services.kpi_snapshot_service import KpiSnapshotService
+
+
+class KpiSnapshotBatchMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with KpiSnapshotService.batch():
+            return self.get_response(request)
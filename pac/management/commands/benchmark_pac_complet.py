@@ -0,0 +1,124 @@
+"""
+Benchmark du rendu d'un PAC complet (PacCompletSerializer + PacTreeLoader)
+
+Crée un PAC synthétique (détails, traitements avec responsables, suivis, preuves
+et médias) dans une transaction annulée à la fin : rien n'est conservé en base.
+
+Usage :
+    python manage.py benchmark_pac_complet
+    python manage.py benchmark_pac_complet --lines 300 1000 --runs 5
+"""
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from pac.models import DetailsPac, Pac, PacSuivi, TraitementPac
+from pac.serializers import PacCompletSerializer
+from pac.services.pac_tree_loader import PacTreeLoader
+from parametre.models import Appreciation, Direction, EtatMiseEnOeuvre, Media, Preuve, Processus
+
+# Objectif de rendu d'un PAC de 300 lignes
+TARGET_MS = 100
+
+
+def seed_pac(nb_lines, user, suffix=''):
+    """PAC de `nb_lines` lignes complètes (traitement, 2 directions, suivi, preuves avec média)"""
+    processus = Processus.objects.create(nom=f'Bench PAC {nb_lines}{suffix}', cree_par=user)
+    pac = Pac.objects.create(processus=processus, cree_par=user)
+    directions = [
+        Direction.objects.get_or_create(nom=f'Bench direction {i}')[0] for i in range(2)
+    ]
+    etat = EtatMiseEnOeuvre.objects.get_or_create(nom='Bench en cours')[0]
+    appreciation = Appreciation.objects.get_or_create(nom='Bench satisfaisant')[0]
+    delai = timezone.now().date()
+
+    preuves = Preuve.objects.bulk_create([Preuve(titre=f'Preuve {i}') for i in range(2 * nb_lines)])
+    medias = Media.objects.bulk_create([
+        Media(url_fichier=f'https://example.org/preuve-{i}.pdf') for i in range(2 * nb_lines)
+    ])
+    Preuve.medias.through.objects.bulk_create([
+        Preuve.medias.through(preuve_id=preuve.pk, media_id=media.pk) for preuve, media in zip(preuves, medias)
+    ])
+    details = DetailsPac.objects.bulk_create([
+        DetailsPac(pac=pac, numero_pac=f'PAC{i + 1:04d}', libelle=f'Ligne {i}', periode_de_realisation=delai)
+        for i in range(nb_lines)
+    ])
+    traitements = TraitementPac.objects.bulk_create([
+        TraitementPac(details_pac=detail, action=f'Action {i}', delai_realisation=delai, preuve=preuves[2 * i])
+        for i, detail in enumerate(details)
+    ])
+    TraitementPac.responsables_directions.through.objects.bulk_create([
+        TraitementPac.responsables_directions.through(traitementpac_id=traitement.pk, direction_id=direction.pk)
+        for traitement in traitements for direction in directions
+    ])
+    PacSuivi.objects.bulk_create([
+        PacSuivi(
+            traitement=traitement, etat_mise_en_oeuvre=etat, appreciation=appreciation,
+            cree_par=user, preuve=preuves[2 * i + 1],
+        )
+        for i, traitement in enumerate(traitements)
+    ])
+    return pac
+
+
+def render_pac_complet(pac_uuid):
+    """Rendu de la vue pac_complet (lecture du PAC, arborescence, sérialisation)"""
+    pac = PacCompletSerializer.setup_queryset(Pac.objects.all()).get(uuid=pac_uuid)
+    return PacCompletSerializer(pac, context={'pac_details': PacTreeLoader.load([pac])}).data
+
+
+class Command(BaseCommand):
+    help = "Mesure le temps et le nombre de requêtes du rendu d'un PAC complet"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lines',
+            type=int,
+            nargs='+',
+            default=[1, 300],
+            help='Nombres de lignes (détails) des PACs testés'
+        )
+        parser.add_argument(
+            '--runs',
+            type=int,
+            default=5,
+            help='Nombre de rendus par PAC (le meilleur temps est retenu)'
+        )
+
+    def handle(self, *args, **options):
+        runs = options['runs']
+
+        self.stdout.write(self.style.SUCCESS(f'\n{"=" * 60}'))
+        self.stdout.write(self.style.SUCCESS('BENCHMARK PAC COMPLET'))
+        self.stdout.write(self.style.SUCCESS(f'{"=" * 60}\n'))
+        self.stdout.write(f'{"Lignes":>8} | {"Requêtes":>8} | {"Meilleur (ms)":>13} | {"Moyen (ms)":>10}')
+        self.stdout.write('-' * 50)
+
+        with transaction.atomic():
+            user = User.objects.create(username='bench_pac_complet_owner')
+            for nb_lines in options['lines']:
+                pac = seed_pac(nb_lines, user)
+                timings = []
+                for _ in range(runs):
+                    with CaptureQueriesContext(connection) as ctx:
+                        start = time.perf_counter()
+                        data = render_pac_complet(pac.uuid)
+                        timings.append((time.perf_counter() - start) * 1000)
+
+                if len(data['details']) != nb_lines:
+                    self.stdout.write(self.style.ERROR(f'❌ {len(data["details"])} ligne(s) rendue(s) sur {nb_lines}'))
+                best = min(timings)
+                style = self.style.SUCCESS if nb_lines > 300 or best < TARGET_MS else self.style.WARNING
+                self.stdout.write(style(
+                    f'{nb_lines:>8} | {len(ctx.captured_queries):>8} | {best:>13.1f} | '
+                    f'{sum(timings) / len(timings):>10.1f}'
+                ))
+
+            transaction.set_rollback(True)
+
+        self.stdout.write(self.style.SUCCESS(f'\nObjectif : < {TARGET_MS} ms pour 300 lignes'))
+        self.stdout.write(self.style.SUCCESS('✓ Données synthétiques annulées\n'))
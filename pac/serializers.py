@@ -4,6 +4,7 @@ Serializers pour l'application PAC
 from rest_framework import serializers
 from django.contrib.auth.models import User
 from django.db import transaction
+from django.db.models import OuterRef, Subquery
 from .models import Pac, TraitementPac, PacSuivi, DetailsPac
 from parametre.models import Processus, Preuve, Media
 import logging
@@ -11,6 +12,21 @@ import logging
 logger = logging.getLogger(__name__)
 
 
+def _premier_numero_pac():
+    """Sous-requête : numéro du premier détail du PAC (même ordre que pac.details.first())"""
+    return Subquery(DetailsPac.objects.filter(pac=OuterRef('pk')).order_by('pk').values('numero_pac')[:1])
+
+
+def _numero_pac_annote(obj):
+    """Numéro du premier détail, lu sur l'annotation de setup_queryset si présente"""
+    if hasattr(obj, 'numero_pac_annot'):
+        return obj.numero_pac_annot or None
+    premier_detail = obj.details.first()
+    if premier_detail and premier_detail.numero_pac:
+        return premier_detail.numero_pac
+    return None
+
+
 class UserSerializer(serializers.ModelSerializer):
     """Serializer pour les utilisateurs"""
     full_name = serializers.SerializerMethodField()
@@ -120,15 +136,19 @@ class PacSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['uuid', 'numero_pac', 'is_validated', 'validated_at', 'validated_by', 'created_at']
 
+    @staticmethod
+    def setup_queryset(queryset):
+        """Jointures et annotations lues par le serializer (listes : nombre de requêtes constant)"""
+        return queryset.select_related(
+            'processus', 'annee', 'initial_ref', 'cree_par', 'validated_by'
+        ).annotate(numero_pac_annot=_premier_numero_pac())
+
     def get_nom_version(self, obj):
         return obj.nom_version
 
     def get_numero_pac(self, obj):
         """Retourner le numéro du premier détail PAC associé, ou None"""
-        premier_detail = obj.details.first()
-        if premier_detail and premier_detail.numero_pac:
-            return premier_detail.numero_pac
-        return None
+        return _numero_pac_annote(obj)
 
     def get_createur_nom(self, obj):
         """Retourner le nom du créateur"""
@@ -642,15 +662,19 @@ class PacCompletSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['uuid', 'numero_pac', 'is_validated', 'validated_at', 'validated_by', 'created_at']
 
+    @staticmethod
+    def setup_queryset(queryset):
+        """Jointures et annotations lues par le serializer (en-têtes des PACs d'une liste)"""
+        return queryset.select_related(
+            'processus', 'annee', 'initial_ref', 'cree_par'
+        ).annotate(numero_pac_annot=_premier_numero_pac())
+
     def get_nom_version(self, obj):
         return obj.nom_version
 
     def get_numero_pac(self, obj):
         """Retourner le numéro du premier détail PAC associé, ou None"""
-        premier_detail = obj.details.first()
-        if premier_detail and premier_detail.numero_pac:
-            return premier_detail.numero_pac
-        return None
+        return _numero_pac_annote(obj)
 
     def get_createur_nom(self, obj):
         """Retourner le nom du créateur"""
@@ -659,204 +683,18 @@ class PacCompletSerializer(serializers.ModelSerializer):
         return "Utilisateur inconnu"
     
     def get_details(self, obj):
-        """Récupérer tous les détails avec leurs traitements et suivis"""
-        # Forcer le rafraîchissement depuis la base de données (éviter le cache)
-        # Trier par numero_pac pour préserver l'ordre (si les numéros sont séquentiels)
-        # Sinon, utiliser created_at comme fallback pour préserver l'ordre de création
-        details = DetailsPac.objects.filter(pac=obj).select_related(
-            'dysfonctionnement_recommandation',
-            'nature',
-            'categorie',
-            'source',
-            'traitement__suivi__etat_mise_en_oeuvre',
-            'traitement__suivi__appreciation',
-            'traitement__suivi__statut',
-            'traitement__suivi__cree_par',
-            'traitement__suivi__preuve'
-        ).order_by('numero_pac')
-        
-        # Log pour diagnostiquer
-        details_count = details.count()
-        logger.info("[PacCompletSerializer] PAC %s - Nombre de détails trouvés dans la DB: %s", obj.uuid, details_count)
-        if details_count > 0:
-            logger.info("[PacCompletSerializer] UUIDs des détails: %s", [str(d.uuid) for d in details])
-        details_data = []
-        
-        for detail in details:
-            detail_data = {
-                'uuid': str(detail.uuid),
-                'numero_pac': detail.numero_pac,
-                'libelle': detail.libelle,
-                'dysfonctionnement_recommandation': detail.dysfonctionnement_recommandation.uuid if detail.dysfonctionnement_recommandation else None,
-                'dysfonctionnement_recommandation_nom': detail.dysfonctionnement_recommandation.nom if detail.dysfonctionnement_recommandation else None,
-                'nature': detail.nature.uuid if detail.nature else None,
-                'nature_nom': detail.nature.nom if detail.nature else None,
-                'categorie': detail.categorie.uuid if detail.categorie else None,
-                'categorie_nom': detail.categorie.nom if detail.categorie else None,
-                'source': detail.source.uuid if detail.source else None,
-                'source_nom': detail.source.nom if detail.source else None,
-                'periode_de_realisation': detail.periode_de_realisation,
-                'traitement': None
-            }
-            
-            # Récupérer le traitement pour ce détail (OneToOne)
-            if hasattr(detail, 'traitement') and detail.traitement:
-                traitement = detail.traitement
-                # Récupérer les responsables M2M
-                responsables_directions = [
-                    {
-                        'uuid': str(dir.uuid),
-                        'nom': dir.nom
-                    }
-                    for dir in traitement.responsables_directions.all()
-                ] if hasattr(traitement, 'responsables_directions') else []
-                
-                responsables_sous_directions = [
-                    {
-                        'uuid': str(sous_dir.uuid),
-                        'nom': sous_dir.nom
-                    }
-                    for sous_dir in traitement.responsables_sous_directions.all()
-                ] if hasattr(traitement, 'responsables_sous_directions') else []
-                
-                traitement_data = {
-                    'uuid': str(traitement.uuid),
-                    'action': traitement.action,
-                    'type_action': traitement.type_action.uuid if traitement.type_action else None,
-                    'type_action_nom': traitement.type_action.nom if traitement.type_action else None,
-                    'responsable_direction': traitement.responsable_direction.uuid if traitement.responsable_direction else None,
-                    'responsable_direction_nom': traitement.responsable_direction.nom if traitement.responsable_direction else None,
-                    'responsable_sous_direction': traitement.responsable_sous_direction.uuid if traitement.responsable_sous_direction else None,
-                    'responsable_sous_direction_nom': traitement.responsable_sous_direction.nom if traitement.responsable_sous_direction else None,
-                    'responsables_directions': responsables_directions,
-                    'responsables_sous_directions': responsables_sous_directions,
-                    'delai_realisation': traitement.delai_realisation,
-                    'preuve': traitement.preuve.uuid if traitement.preuve else None,
-                    'preuve_uuid': str(traitement.preuve.uuid) if traitement.preuve else None,
-                    'preuve_titre': traitement.preuve.titre if traitement.preuve else None,
-                    'preuve_media_url': self.get_preuve_media_url(traitement),
-                    'preuve_medias': self.get_preuve_medias(traitement),
-                    'suivi': None
-                }
-                
-                # Récupérer le suivi pour ce traitement (OneToOne - relation inverse)
-                # Vérifier si le suivi existe en utilisant la relation inverse
-                try:
-                    suivi = traitement.suivi
-                    if suivi:
-                        suivi_data = {
-                            'uuid': str(suivi.uuid),
-                            'etat_mise_en_oeuvre': suivi.etat_mise_en_oeuvre.uuid if suivi.etat_mise_en_oeuvre else None,
-                            'etat_nom': suivi.etat_mise_en_oeuvre.nom if suivi.etat_mise_en_oeuvre else None,
-                            'resultat': suivi.resultat,
-                            'appreciation': suivi.appreciation.uuid if suivi.appreciation else None,
-                            'appreciation_nom': suivi.appreciation.nom if suivi.appreciation else None,
-                            'statut': suivi.statut.uuid if suivi.statut else None,
-                            'statut_nom': suivi.statut.nom if suivi.statut else None,
-                            'date_mise_en_oeuvre_effective': suivi.date_mise_en_oeuvre_effective,
-                            'date_cloture': suivi.date_cloture,
-                            'createur_nom': f"{suivi.cree_par.first_name} {suivi.cree_par.last_name}".strip() or suivi.cree_par.username,
-                            'created_at': suivi.created_at,
-                            'preuve': suivi.preuve.uuid if suivi.preuve else None,
-                            'preuve_uuid': str(suivi.preuve.uuid) if suivi.preuve else None,
-                            'preuve_titre': suivi.preuve.titre if suivi.preuve else None,
-                            'preuve_media_url': self.get_preuve_media_url_suivi(suivi),
-                            'preuve_media_urls': self.get_preuve_media_urls_suivi(suivi),
-                            'preuve_medias': self.get_preuve_medias_suivi(suivi)
-                        }
-                        traitement_data['suivi'] = suivi_data
-                except (AttributeError, PacSuivi.DoesNotExist):
-                    # Pas de suivi pour ce traitement
-                    pass
-                
-                detail_data['traitement'] = traitement_data
-            
-            details_data.append(detail_data)
-        
-        return details_data
-    
-    def get_preuve_media_url(self, traitement):
-        """Retourner l'URL du premier média de la preuve du traitement"""
-        try:
-            if traitement.preuve and traitement.preuve.medias.exists():
-                media = traitement.preuve.medias.first()
-                if media:
-                    if hasattr(media, 'get_url'):
-                        return media.get_url()
-                    return getattr(media, 'url_fichier', None)
-        except Exception:
-            pass
-        return None
-    
-    def get_preuve_media_url_suivi(self, suivi):
-        """Retourner l'URL du premier média de la preuve du suivi"""
-        try:
-            if suivi.preuve and suivi.preuve.medias.exists():
-                media = suivi.preuve.medias.first()
-                if media:
-                    if hasattr(media, 'get_url'):
-                        return media.get_url()
-                    return getattr(media, 'url_fichier', None)
-        except Exception:
-            pass
-        return None
-    
-    def get_preuve_media_urls_suivi(self, suivi):
-        """Retourner la liste de toutes les URLs des médias de la preuve du suivi"""
-        urls = []
-        try:
-            if suivi.preuve:
-                for media in suivi.preuve.medias.all():
-                    url = None
-                    if hasattr(media, 'get_url'):
-                        url = media.get_url()
-                    else:
-                        url = getattr(media, 'url_fichier', None)
-                    if url:
-                        urls.append(url)
-        except Exception:
-            pass
-        return urls
-    
-    def get_preuve_medias(self, traitement):
-        """Retourner la liste des médias avec uuid, url et description pour le traitement"""
-        medias = []
-        try:
-            if traitement.preuve:
-                for media in traitement.preuve.medias.all():
-                    url = None
-                    if hasattr(media, 'get_url'):
-                        url = media.get_url()
-                    else:
-                        url = getattr(media, 'url_fichier', None)
-                    medias.append({
-                        'uuid': str(media.uuid),
-                        'url': url,
-                        'description': getattr(media, 'description', None),
-                    })
-        except Exception:
-            pass
-        return medias
-    
-    def get_preuve_medias_suivi(self, suivi):
-        """Retourner la liste des médias avec uuid, url et description pour le suivi"""
-        medias = []
-        try:
-            if suivi.preuve:
-                for media in suivi.preuve.medias.all():
-                    url = None
-                    if hasattr(media, 'get_url'):
-                        url = media.get_url()
-                    else:
-                        url = getattr(media, 'url_fichier', None)
-                    medias.append({
-                        'uuid': str(media.uuid),
-                        'url': url,
-                        'description': getattr(media, 'description', None),
-                    })
-        except Exception:
-            pass
-        return medias
+        """
+        Récupérer tous les détails avec leurs traitements et suivis.
+
+        Les vues passent l'arborescence préchargée de tous leurs PACs dans
+        context['pac_details'] (PacTreeLoader) ; à défaut elle est chargée pour ce PAC.
+        """
+        from pac.services.pac_tree_loader import PacTreeLoader
+
+        tree = self.context.get('pac_details')
+        if tree is None or obj.pk not in tree:
+            tree = PacTreeLoader.load([obj])
+        return tree[obj.pk]
 
 
 class PacSuiviUpdateSerializer(serializers.ModelSerializer):
@@ -1129,43 +967,16 @@ class DetailsPacCreateSerializer(serializers.ModelSerializer):
         return super().create(validated_data)
     
     def generate_numero_pac(self):
-        """Générer un numéro PAC unique en trouvant le maximum existant.
+        """Générer un numéro PAC unique depuis la séquence dédiée.
 
-        Doit être appelé depuis un contexte @transaction.atomic afin que le
-        SELECT FOR UPDATE maintienne le verrou jusqu'à l'INSERT (Security by
-        Design — Complete Mediation, prévention TOCTOU).
+        L'incrément verrouille la seule ligne de séquence jusqu'à la fin de la
+        transaction englobante (le @transaction.atomic du create()) : pas de
+        doublon, sans verrouiller ni relire les DetailsPac existants.
         """
-        import re
-
-        # SELECT FOR UPDATE : bloque les lectures concurrentes jusqu'à la fin
-        # de la transaction englobante (le @transaction.atomic du create()).
-        existing_numbers = DetailsPac.objects.select_for_update().exclude(
-            numero_pac__isnull=True
-        ).exclude(
-            numero_pac__exact=''
-        ).values_list('numero_pac', flat=True)
-
-        max_num = 0
-        for num_str in existing_numbers:
-            if num_str:
-                match = re.search(r'(\d+)', str(num_str))
-                if match:
-                    try:
-                        num = int(match.group(1))
-                        max_num = max(max_num, num)
-                    except ValueError:
-                        continue
-
-        next_num = max_num + 1
-        numero = f"PAC{next_num:02d}"
-
-        # La boucle while est désormais purement défensive : le verrou empêche
-        # un doublon, mais on garde la vérification pour les cas legacy.
-        while DetailsPac.objects.filter(numero_pac=numero).exists():
-            next_num += 1
-            numero = f"PAC{next_num:02d}"
-
-        logger.info("[DetailsPacCreateSerializer] Génération nouveau numéro: %s (max trouvé: %s)", numero, max_num)
+        from parametre.services.sequence_allocator import SequenceAllocator
+
+        numero = SequenceAllocator.next_number('numero_pac', 'PAC{:02d}')
+        logger.info("[DetailsPacCreateSerializer] Génération nouveau numéro: %s", numero)
         return numero
 
 
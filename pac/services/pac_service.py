@@ -8,17 +8,20 @@ Peut être appelé depuis :
 """
 import logging
 import traceback
-from datetime import datetime as dt_class
+from datetime import datetime as dt_class, timedelta
 
-from django.contrib.contenttypes.models import ContentType
+from django.db.models import Q
 from django.utils import timezone
 
 from pac.models import TraitementPac
-from parametre.models import Notification
 from parametre.permissions import get_user_processus_list
+from parametre.services.notification_materializer import NotificationMaterializer
 
 logger = logging.getLogger(__name__)
 
+# Traitements notifiés : en retard ou à terme dans les N prochains jours
+UPCOMING_WINDOW_DAYS = 7
+
 
 def check_pac_completude(pac):
     """
@@ -74,10 +77,65 @@ def check_pac_completude(pac):
     return None
 
 
+class PacValidationError(Exception):
+    """PACs d'un amendement non validables : `details` liste les manques par PAC"""
+
+    def __init__(self, message, details=None):
+        super().__init__(message)
+        self.details = details or []
+
+
+def validate_pacs_by_amendement(processus_uuid, annee_uuid, num_amendement, user, progress=None):
+    """
+    Valide tous les PACs d'un même amendement (processus, année, num_amendement).
+
+    Aucun PAC n'est validé si l'un d'eux est incomplet (PacValidationError).
+
+    Args:
+        progress: fonction (pourcentage, message) appelée au fil du traitement (tâche de fond)
+
+    Returns:
+        dict: {'validated_count', 'total_count'}
+    """
+    from pac.models import Pac
+
+    pacs = list(
+        Pac.objects.filter(processus__uuid=processus_uuid, annee__uuid=annee_uuid, num_amendement=num_amendement)
+        .select_related('processus', 'annee').prefetch_related('details__traitement')
+    )
+    total = len(pacs)
+
+    # Vérifier que tous les PACs peuvent être validés
+    errors = []
+    for index, pac in enumerate(pacs, start=1):
+        if not pac.is_validated:
+            error_msg = check_pac_completude(pac)
+            if error_msg:
+                errors.append(error_msg)
+        if progress:
+            progress(50 * index // total, 'Vérification des PACs')
+    if errors:
+        raise PacValidationError('Certains PACs ne peuvent pas être validés', errors)
+
+    validated_count = 0
+    for index, pac in enumerate(pacs, start=1):
+        if not pac.is_validated:
+            pac.is_validated = True
+            pac.validated_at = timezone.now()
+            pac.validated_by = user
+            pac.save()
+            validated_count += 1
+        if progress:
+            progress(50 + 50 * index // total, 'Validation des PACs')
+
+    return {'validated_count': validated_count, 'total_count': total}
+
+
 def get_upcoming_notifications_data(user):
     """
     Retourne les traitements PAC bientôt à terme pour l'utilisateur.
-    Crée/met à jour les enregistrements Notification en base comme effet de bord.
+    Lecture seule : les enregistrements Notification sont écrits par
+    NotificationMaterializer (signaux et job quotidien), pas par cette fonction.
 
     Returns:
         dict avec les clés 'success', 'notifications' (list triée par priorité/date),
@@ -87,22 +145,8 @@ def get_upcoming_notifications_data(user):
 
     user_processus_uuids = get_user_processus_list(user)
 
-    if user_processus_uuids is None:
-        # Super admin : toutes les notifications sans filtre de processus
-        traitements = TraitementPac.objects.filter(
-            details_pac__isnull=False,
-            delai_realisation__isnull=False,
-        ).select_related(
-            'details_pac',
-            'details_pac__pac',
-            'details_pac__pac__processus',
-            'details_pac__nature',
-            'type_action',
-        ).prefetch_related(
-            'responsables_directions',
-            'responsables_sous_directions',
-        )
-    elif not user_processus_uuids:
+    # Super admin (None) : toutes les notifications sans filtre de processus
+    if user_processus_uuids is not None and not user_processus_uuids:
         return {
             'success': True,
             'data': [],
@@ -110,24 +154,32 @@ def get_upcoming_notifications_data(user):
             'notifications': [],
             'message': 'Aucune notification trouvée pour vos processus attribués.',
         }
-    else:
-        traitements = TraitementPac.objects.filter(
-            details_pac__isnull=False,
+
+    # Lecture seule : notifications matérialisées en retard ou à terme dans les 7 jours
+    # (index Notification(user, due_date)), puis les traitements correspondants
+    window_end = today + timedelta(days=UPCOMING_WINDOW_DAYS)
+    materialized = NotificationMaterializer.index(
+        user, TraitementPac, 'pac', 'traitement', Q(due_date__lte=window_end)
+    )
+    traitements = TraitementPac.objects.filter(
+        uuid__in=list(materialized),
+        details_pac__isnull=False,
+        delai_realisation__isnull=False,
+        delai_realisation__lte=window_end,
+    ).select_related(
+        'details_pac',
+        'details_pac__pac',
+        'details_pac__pac__processus',
+        'details_pac__nature',
+        'type_action',
+    )
+
+    if user_processus_uuids:
+        traitements = traitements.filter(
             details_pac__pac__processus__uuid__in=user_processus_uuids,
-            delai_realisation__isnull=False,
-        ).select_related(
-            'details_pac',
-            'details_pac__pac',
-            'details_pac__pac__processus',
-            'details_pac__nature',
-            'type_action',
-        ).prefetch_related(
-            'responsables_directions',
-            'responsables_sous_directions',
         )
 
     notifications = []
-    content_type = ContentType.objects.get_for_model(TraitementPac)
 
     for traitement in traitements:
         try:
@@ -135,9 +187,6 @@ def get_upcoming_notifications_data(user):
                 continue
 
             delai_date = traitement.delai_realisation
-            if not delai_date:
-                continue
-
             if isinstance(delai_date, dt_class):
                 delai_date = delai_date.date()
 
@@ -147,9 +196,6 @@ def get_upcoming_notifications_data(user):
                 logger.warning("[get_upcoming_notifications_data] Calcul diff jours: %s", e)
                 continue
 
-            if diff_days > 7:
-                continue
-
             if diff_days < 0:
                 priority = 'high'
                 delai_label = f'En retard de {abs(diff_days)} jour{"s" if abs(diff_days) > 1 else ""}'
@@ -163,6 +209,7 @@ def get_upcoming_notifications_data(user):
                 priority = 'medium'
                 delai_label = f'Échéance dans {diff_days} jours'
 
+            notification_uuid, read_at = materialized[traitement.uuid]
             pac = traitement.details_pac.pac
             numero_pac = traitement.details_pac.numero_pac or f'PAC-{pac.uuid}'
             raw_action = traitement.action or ''
@@ -176,7 +223,7 @@ def get_upcoming_notifications_data(user):
             nature_label = traitement.details_pac.nature.nom if traitement.details_pac.nature else None
             type_action = traitement.type_action.nom if traitement.type_action else None
 
-            entry = {
+            notifications.append({
                 'id': str(traitement.uuid),
                 'type': 'traitement',
                 'title': title,
@@ -191,45 +238,9 @@ def get_upcoming_notifications_data(user):
                 'delai_label': delai_label,
                 'pac_uuid': str(pac.uuid),
                 'traitement_uuid': str(traitement.uuid),
-                'notification_uuid': None,
-                'read_at': None,
-            }
-            notifications.append(entry)
-
-            # Upsert en table Notification
-            try:
-                notif, created = Notification.objects.get_or_create(
-                    user=user,
-                    content_type=content_type,
-                    object_id=traitement.uuid,
-                    source_app='pac',
-                    notification_type='traitement',
-                    defaults={
-                        'title': title,
-                        'message': message,
-                        'action_url': action_url,
-                        'priority': priority,
-                        'due_date': delai_date,
-                    },
-                )
-                if not created:
-                    updated_fields = []
-                    for field, value in [
-                        ('title', title),
-                        ('message', message),
-                        ('action_url', action_url),
-                        ('priority', priority),
-                        ('due_date', delai_date),
-                    ]:
-                        if getattr(notif, field) != value:
-                            setattr(notif, field, value)
-                            updated_fields.append(field)
-                    if updated_fields:
-                        notif.save(update_fields=updated_fields + ['updated_at'])
-                entry['notification_uuid'] = str(notif.uuid)
-                entry['read_at'] = notif.read_at.isoformat() if notif.read_at else None
-            except Exception as notif_err:
-                logger.warning("[get_upcoming_notifications_data] Notification upsert: %s", notif_err)
+                'notification_uuid': str(notification_uuid),
+                'read_at': read_at.isoformat() if read_at else None,
+            })
 
         except Exception as e:
             logger.error(
@@ -0,0 +1,225 @@
+"""
+Chargement de l'arborescence complète des PACs (détails, traitements, suivis, preuves) — logique pure.
+
+PacCompletSerializer.get_details relançait sa propre requête DetailsPac (plus un
+count() et une itération pour le log), puis chaque traitement et chaque suivi
+interrogeait séparément ses responsables et les médias de sa preuve (exists(),
+first(), all() : jusqu'à 6 requêtes par ligne).
+
+PacTreeLoader charge l'arborescence de n'importe quel nombre de PACs en
+4 requêtes au plus :
+
+1. détails + traitement + suivi + preuves et tables de référence (jointures,
+   lignes plates values()) ;
+2. directions responsables (M2M) ;
+3. sous-directions responsables (M2M) ;
+4. médias de toutes les preuves rencontrées.
+
+Le JSON imbriqué est ensuite assemblé depuis des dictionnaires en mémoire.
+"""
+import logging
+
+from django.db.models import F
+
+logger = logging.getLogger(__name__)
+
+
+# Tables de référence lues par (uuid, nom) : préfixe de la colonne -> clé JSON
+DETAIL_REFS = {
+    'dysfonctionnement_recommandation': 'dysfonctionnement_recommandation',
+    'nature': 'nature',
+    'categorie': 'categorie',
+    'source': 'source',
+}
+TRAITEMENT_REFS = {
+    'traitement__type_action': 'type_action',
+    'traitement__responsable_direction': 'responsable_direction',
+    'traitement__responsable_sous_direction': 'responsable_sous_direction',
+}
+SUIVI_REFS = {
+    'traitement__suivi__etat_mise_en_oeuvre': 'etat_mise_en_oeuvre',
+    'traitement__suivi__appreciation': 'appreciation',
+    'traitement__suivi__statut': 'statut',
+}
+
+COLUMNS = [
+    'uuid', 'pac_id', 'numero_pac', 'libelle', 'periode_de_realisation',
+    'traitement__uuid', 'traitement__action', 'traitement__delai_realisation',
+    'traitement__preuve__uuid', 'traitement__preuve__titre',
+    'traitement__suivi__uuid', 'traitement__suivi__resultat',
+    'traitement__suivi__date_mise_en_oeuvre_effective', 'traitement__suivi__date_cloture',
+    'traitement__suivi__created_at',
+    'traitement__suivi__cree_par__first_name', 'traitement__suivi__cree_par__last_name',
+    'traitement__suivi__cree_par__username',
+    'traitement__suivi__preuve__uuid', 'traitement__suivi__preuve__titre',
+] + [f'{prefix}__{name}' for refs in (DETAIL_REFS, TRAITEMENT_REFS, SUIVI_REFS) for prefix in refs for name in ('uuid', 'nom')]
+
+
+def _refs(row, refs):
+    """{'nature': uuid, 'nature_nom': nom, ...} depuis les colonnes jointes d'une ligne"""
+    data = {}
+    for prefix, key in refs.items():
+        data[key] = row[f'{prefix}__uuid']
+        data[f'{key}_nom'] = row[f'{prefix}__nom']
+    return data
+
+
+class PacTreeLoader:
+    """
+    Arborescence des détails de PACs en un nombre fixe de requêtes
+
+    Usage :
+        tree = PacTreeLoader.load(pacs)      # {pac_uuid: [détail, ...]}
+        PacCompletSerializer(pacs, many=True, context={'pac_details': tree})
+    """
+
+    @classmethod
+    def load(cls, pacs):
+        """
+        Returns:
+            dict: {uuid du PAC: liste des détails sérialisés, triés par numero_pac}
+        """
+        from pac.models import DetailsPac
+
+        pac_ids = [pac.pk for pac in pacs]
+        tree = {pk: [] for pk in pac_ids}
+        if not pac_ids:
+            return tree
+
+        # Lignes plates (values) : ni instances de modèle ni conversion des colonnes inutiles
+        rows = list(DetailsPac.objects.filter(pac__in=pac_ids).order_by('numero_pac').values(*COLUMNS))
+
+        traitement_ids = [row['traitement__uuid'] for row in rows if row['traitement__uuid'] is not None]
+        directions = cls._responsables(traitement_ids, 'responsables_directions')
+        sous_directions = cls._responsables(traitement_ids, 'responsables_sous_directions')
+        medias = cls._medias({
+            row[column] for row in rows
+            for column in ('traitement__preuve__uuid', 'traitement__suivi__preuve__uuid')
+            if row[column] is not None
+        })
+
+        for row in rows:
+            tree[row['pac_id']].append(cls._detail(row, directions, sous_directions, medias))
+        logger.debug("[PacTreeLoader] %s PAC(s), %s détail(s)", len(pac_ids), len(rows))
+        return tree
+
+    # ── Lectures groupées ──────────────────────────────────────────────────────
+
+    @staticmethod
+    def _responsables(traitement_ids, name):
+        """{uuid du traitement: [{'uuid', 'nom'}]} pour une relation M2M de TraitementPac"""
+        from pac.models import TraitementPac
+
+        grouped = {}
+        if not traitement_ids:
+            return grouped
+        field = TraitementPac._meta.get_field(name)
+        related_query = field.related_query_name()
+        rows = field.related_model.objects.filter(
+            **{f'{related_query}__in': traitement_ids}
+        ).values_list(related_query, 'uuid', 'nom')
+        for traitement_id, uuid, nom in rows:
+            grouped.setdefault(traitement_id, []).append({'uuid': str(uuid), 'nom': nom})
+        return grouped
+
+    @staticmethod
+    def _medias(preuve_ids):
+        """{uuid de la preuve: [médias]} triés par uuid (le premier est celui de medias.first())"""
+        from parametre.models import Media
+
+        grouped = {}
+        if not preuve_ids:
+            return grouped
+        rows = (
+            Media.objects.filter(preuves__in=preuve_ids)
+            .only('uuid', 'fichier', 'url_fichier', 'description')
+            .annotate(preuve_id=F('preuves'))
+            .order_by('pk')
+        )
+        for media in rows:
+            grouped.setdefault(media.preuve_id, []).append({
+                'uuid': str(media.uuid),
+                'url': media.get_url(),
+                'description': media.description,
+            })
+        return grouped
+
+    # ── Assemblage ─────────────────────────────────────────────────────────────
+
+    @classmethod
+    def _detail(cls, row, directions, sous_directions, medias):
+        refs = _refs(row, DETAIL_REFS)
+        return {
+            'uuid': str(row['uuid']),
+            'numero_pac': row['numero_pac'],
+            'libelle': row['libelle'],
+            'dysfonctionnement_recommandation': refs['dysfonctionnement_recommandation'],
+            'dysfonctionnement_recommandation_nom': refs['dysfonctionnement_recommandation_nom'],
+            'nature': refs['nature'],
+            'nature_nom': refs['nature_nom'],
+            'categorie': refs['categorie'],
+            'categorie_nom': refs['categorie_nom'],
+            'source': refs['source'],
+            'source_nom': refs['source_nom'],
+            'periode_de_realisation': row['periode_de_realisation'],
+            'traitement': (
+                cls._traitement(row, directions, sous_directions, medias)
+                if row['traitement__uuid'] is not None else None
+            ),
+        }
+
+    @classmethod
+    def _traitement(cls, row, directions, sous_directions, medias):
+        refs = _refs(row, TRAITEMENT_REFS)
+        traitement_id = row['traitement__uuid']
+        preuve = row['traitement__preuve__uuid']
+        preuve_medias = medias.get(preuve, []) if preuve is not None else []
+        return {
+            'uuid': str(traitement_id),
+            'action': row['traitement__action'],
+            'type_action': refs['type_action'],
+            'type_action_nom': refs['type_action_nom'],
+            'responsable_direction': refs['responsable_direction'],
+            'responsable_direction_nom': refs['responsable_direction_nom'],
+            'responsable_sous_direction': refs['responsable_sous_direction'],
+            'responsable_sous_direction_nom': refs['responsable_sous_direction_nom'],
+            'responsables_directions': directions.get(traitement_id, []),
+            'responsables_sous_directions': sous_directions.get(traitement_id, []),
+            'delai_realisation': row['traitement__delai_realisation'],
+            'preuve': preuve,
+            'preuve_uuid': str(preuve) if preuve is not None else None,
+            'preuve_titre': row['traitement__preuve__titre'],
+            'preuve_media_url': preuve_medias[0]['url'] if preuve_medias else None,
+            'preuve_medias': preuve_medias,
+            'suivi': cls._suivi(row, medias) if row['traitement__suivi__uuid'] is not None else None,
+        }
+
+    @staticmethod
+    def _suivi(row, medias):
+        refs = _refs(row, SUIVI_REFS)
+        preuve = row['traitement__suivi__preuve__uuid']
+        preuve_medias = medias.get(preuve, []) if preuve is not None else []
+        createur = (
+            f"{row['traitement__suivi__cree_par__first_name']} {row['traitement__suivi__cree_par__last_name']}".strip()
+            or row['traitement__suivi__cree_par__username']
+        )
+        return {
+            'uuid': str(row['traitement__suivi__uuid']),
+            'etat_mise_en_oeuvre': refs['etat_mise_en_oeuvre'],
+            'etat_nom': refs['etat_mise_en_oeuvre_nom'],
+            'resultat': row['traitement__suivi__resultat'],
+            'appreciation': refs['appreciation'],
+            'appreciation_nom': refs['appreciation_nom'],
+            'statut': refs['statut'],
+            'statut_nom': refs['statut_nom'],
+            'date_mise_en_oeuvre_effective': row['traitement__suivi__date_mise_en_oeuvre_effective'],
+            'date_cloture': row['traitement__suivi__date_cloture'],
+            'createur_nom': createur,
+            'created_at': row['traitement__suivi__created_at'],
+            'preuve': preuve,
+            'preuve_uuid': str(preuve) if preuve is not None else None,
+            'preuve_titre': row['traitement__suivi__preuve__titre'],
+            'preuve_media_url': preuve_medias[0]['url'] if preuve_medias else None,
+            'preuve_media_urls': [media['url'] for media in preuve_medias if media['url']],
+            'preuve_medias': preuve_medias,
+        }
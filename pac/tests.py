@@ -0,0 +1,136 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from pac.management.commands.benchmark_pac_complet import render_pac_complet, seed_pac
+from pac.models import DetailsPac, Pac, PacSuivi, TraitementPac
+from pac.serializers import PacCompletSerializer, PacSerializer
+from parametre.models import Appreciation, Direction, EtatMiseEnOeuvre, KpiSnapshot, Notification, Processus
+from parametre.services.amendment_copier import AmendmentCopier
+from parametre.services.kpi_snapshot_service import KpiSnapshotService
+
+
+@override_settings(PERMISSION_AUDIT_ENABLED=False)
+class PacAmendmentCopyTests(TestCase):
+    """Clonage d'un PAC vers son amendement : détails, traitements, responsables et suivis"""
+
+    def setUp(self):
+        self.admin = User.objects.create(username='admin', is_staff=True, is_superuser=True)
+        processus = Processus.objects.create(nom='Processus', cree_par=self.admin)
+        self.source = Pac.objects.create(processus=processus, cree_par=self.admin)
+        self.target = Pac.objects.create(
+            processus=processus, cree_par=self.admin, num_amendement=1, initial_ref=self.source
+        )
+        self.directions = [Direction.objects.create(nom=f'Direction {i}') for i in range(2)]
+        etat = EtatMiseEnOeuvre.objects.create(nom='En cours')
+        appreciation = Appreciation.objects.create(nom='Satisfaisant')
+        delai = timezone.now().date() + timedelta(days=3)
+
+        for i in range(3):
+            details = DetailsPac.objects.create(pac=self.source, numero_pac=f'PAC{i + 1:02d}', libelle=f'Détail {i}')
+            traitement = TraitementPac.objects.create(details_pac=details, action=f'Action {i}', delai_realisation=delai)
+            traitement.responsables_directions.set(self.directions)
+            PacSuivi.objects.create(
+                traitement=traitement, etat_mise_en_oeuvre=etat, appreciation=appreciation, cree_par=self.admin
+            )
+        # La transaction du test n'est jamais commitée : recalculs du jeu de données faits ici,
+        # ceux de la copie sont alors planifiés (et exécutés) dans captureOnCommitCallbacks
+        KpiSnapshotService.flush_pending()
+
+    def test_copy_keeps_numbers_responsables_and_suivis(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertNumQueries(11):
+                self.assertEqual(AmendmentCopier.copy_pac(self.source, self.target, self.admin), 3)
+
+        details = DetailsPac.objects.filter(pac=self.target).order_by('numero_pac')
+        self.assertEqual(list(details.values_list('numero_pac', flat=True)), ['PAC01', 'PAC02', 'PAC03'])
+        traitement = TraitementPac.objects.get(details_pac=details[0])
+        self.assertEqual(set(traitement.responsables_directions.all()), set(self.directions))
+        self.assertIsNone(traitement.suivi.preuve)
+        self.assertEqual(PacSuivi.objects.filter(traitement__details_pac__pac=self.target).count(), 3)
+        # Les copies en bulk_create n'émettent pas de signal : notifications et KPI recalculés explicitement
+        self.assertEqual(Notification.objects.filter(user=self.admin).count(), 3)
+        self.assertTrue(KpiSnapshot.objects.filter(module='pac', source_uuid=self.target.uuid).exists())
+
+
+@override_settings(PERMISSION_AUDIT_ENABLED=False)
+class PacListSerializerQueryCountTests(TestCase):
+    """PacSerializer en liste : numéro, créateur et validateur lus sur setup_queryset"""
+
+    def setUp(self):
+        self.admin = User.objects.create(username='admin', first_name='Ada', last_name='Admin')
+        self.nb_pacs = 0
+
+    def _add_pac(self):
+        self.nb_pacs += 1
+        processus = Processus.objects.create(nom=f'Processus {self.nb_pacs}', cree_par=self.admin)
+        pac = Pac.objects.create(processus=processus, cree_par=self.admin, validated_by=self.admin)
+        DetailsPac.objects.create(pac=pac, numero_pac=f'PAC{self.nb_pacs:02d}', libelle='Détail')
+        Pac.objects.create(processus=processus, cree_par=self.admin, num_amendement=1, initial_ref=pac)
+
+    def _serialize(self):
+        queryset = PacSerializer.setup_queryset(Pac.objects.order_by('created_at'))
+        with CaptureQueriesContext(connection) as ctx:
+            data = PacSerializer(queryset, many=True).data
+        return data, len(ctx.captured_queries)
+
+    def test_query_count_independent_of_row_count(self):
+        self._add_pac()
+        _, small = self._serialize()
+        for _ in range(4):
+            self._add_pac()
+        data, large = self._serialize()
+        self.assertEqual(large, small)
+
+        # Repli sans annotation : mêmes valeurs
+        self.assertEqual(data, PacSerializer(Pac.objects.order_by('created_at'), many=True).data)
+        self.assertEqual([row['numero_pac'] for row in data[:2]], ['PAC01', None])
+        self.assertEqual((data[0]['createur_nom'], data[0]['validateur_nom']), ('Ada Admin', 'Ada Admin'))
+
+
+@override_settings(PERMISSION_AUDIT_ENABLED=False)
+class PacCompletTreeTests(TestCase):
+    """PAC complet : arborescence chargée en un nombre fixe de requêtes (cible de temps : benchmark_pac_complet)"""
+
+    def setUp(self):
+        self.admin = User.objects.create(username='admin', is_staff=True, is_superuser=True)
+
+    def _render(self, pac):
+        with CaptureQueriesContext(connection) as ctx:
+            data = render_pac_complet(pac.uuid)
+        return data, len(ctx.captured_queries)
+
+    def test_query_count_independent_of_line_count(self):
+        _, small = self._render(seed_pac(1, self.admin))
+        data, large = self._render(seed_pac(300, self.admin))
+        self.assertEqual(large, small)
+        self.assertEqual(large, 5)
+
+        self.assertEqual(len(data['details']), 300)
+        self.assertEqual(data['details'][0]['numero_pac'], 'PAC0001')
+        traitement = data['details'][0]['traitement']
+        self.assertEqual(len(traitement['responsables_directions']), 2)
+        self.assertEqual(len(traitement['preuve_medias']), 1)
+        self.assertEqual(traitement['preuve_media_url'], traitement['preuve_medias'][0]['url'])
+        suivi = traitement['suivi']
+        self.assertEqual(suivi['preuve_media_urls'], [suivi['preuve_media_url']])
+        self.assertNotEqual(suivi['preuve_uuid'], traitement['preuve_uuid'])
+
+    def test_serializer_without_preloaded_tree_matches(self):
+        pac = seed_pac(3, self.admin)
+        self.assertEqual(PacCompletSerializer(pac).data['details'], render_pac_complet(pac.uuid)['details'])
+
+    def test_pac_list_view(self):
+        for i in range(3):
+            seed_pac(2, self.admin, suffix=f' {i}')
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        response = client.get('/api/pac/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['count'], 3)
+        self.assertEqual({len(pac['details']) for pac in response.json()['data']}, {2})
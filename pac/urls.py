@@ -23,6 +23,7 @@ urlpatterns = [
     
     # ==================== API PAC ====================
     path('pac/', views.pac_list, name='pac_list'),
+    path('pac/export/', views.pac_export, name='pac_export'),
     path('pac/create/', views.pac_create, name='pac_create'),
     path('pac/get-or-create/', views.pac_get_or_create, name='pac_get_or_create'),
     path('pac/<uuid:uuid>/', views.pac_detail, name='pac_detail'),
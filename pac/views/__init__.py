@@ -4,3 +4,4 @@ from .auth import register, login, logout, refresh_token, user_profile, update_p
 from .pac import processus_list, processus_create, processus_detail, pac_list, pac_create, pac_detail, pac_complet, pac_get_or_create, pac_update, pac_delete, pac_validate, pac_validate_by_type, pac_unvalidate
 from .traitements import traitement_list, traitement_create, pac_traitements, traitement_detail, traitement_update, suivi_list, traitement_suivis, suivi_create, suivi_detail, suivi_update, details_pac_list, details_pac_create, details_pac_detail, details_pac_update, details_pac_delete
 from .stats import pac_upcoming_notifications, pac_stats, pac_dashboard_stats, get_last_pac_previous_year
+from .exports import pac_export
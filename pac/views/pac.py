@@ -22,10 +22,14 @@ from django.core.mail import send_mail
 from django.template.loader import render_to_string
 from django.conf import settings
 from datetime import datetime, timedelta
-from pac.services.pac_service import check_pac_completude
-from ..models import Pac, TraitementPac, PacSuivi, DetailsPac
+from pac.services.pac_service import PacValidationError, check_pac_completude, validate_pacs_by_amendement
+from pac.services.pac_tree_loader import PacTreeLoader
+from parametre.services.document_cache import DocumentCache
+from parametre.services.amendment_copier import AmendmentCopier
+from parametre.services.background_jobs import BackgroundJobService
+from ..models import Pac
 from parametre.models import Processus, Media, Preuve, Notification, FailedLoginAttempt, LoginSecurityConfig, LoginBlock
-from parametre.views import log_pac_creation, log_pac_update, log_traitement_creation, log_suivi_creation, log_user_login, log_user_logout, get_client_ip, log_activity
+from parametre.views import log_pac_creation, log_pac_update, log_traitement_creation, log_suivi_creation, log_user_login, log_user_logout, get_client_ip, log_activity, wants_async, job_accepted
 from parametre.utils.email_security import EmailValidator, EmailContentSanitizer, EmailRateLimiter, SecureEmailLogger
 from parametre.utils.email_config import load_email_settings_into_django
 from parametre.permissions import (
@@ -64,6 +68,7 @@ from ..serializers import (
     DetailsPacSerializer, DetailsPacCreateSerializer, DetailsPacUpdateSerializer
 )
 from shared.authentication import AuthService
+from shared.responses import etag_response
 from shared.services.recaptcha_service import recaptcha_service, RecaptchaValidationError
 import json
 import logging
@@ -148,14 +153,7 @@ def pac_list(request):
         # Si user_processus_uuids est None, l'utilisateur est super admin (is_staff ET is_superuser)
         if user_processus_uuids is None:
             # Super admin : voir tous les PACs sans filtre
-            pacs = Pac.objects.all().select_related(
-            'processus', 'cree_par', 'annee', 'validated_by'
-        ).prefetch_related(
-            'details__dysfonctionnement_recommandation',
-            'details__nature',
-            'details__categorie',
-            'details__source'
-        )
+            pacs = Pac.objects.all()
         elif not user_processus_uuids:
             logger.info("[pac_list] Aucun processus assigné pour l'utilisateur %s", request.user.username)
             return Response({
@@ -166,25 +164,20 @@ def pac_list(request):
             }, status=status.HTTP_200_OK)
         else:
             # Filtrer les PACs par les processus où l'utilisateur a un rôle actif
-            pacs = Pac.objects.filter(processus__uuid__in=user_processus_uuids).select_related(
-                'processus', 'cree_par', 'annee', 'validated_by'
-            ).prefetch_related(
-                'details__dysfonctionnement_recommandation',
-                'details__nature',
-                'details__categorie',
-                'details__source'
-            )
+            pacs = Pac.objects.filter(processus__uuid__in=user_processus_uuids)
         # ========== FIN FILTRAGE ==========
 
-        logger.info("[pac_list] Nombre de PACs pour l'utilisateur %s: %s", request.user.username, pacs.count())
+        pacs = list(PacCompletSerializer.setup_queryset(pacs))
+        logger.info("[pac_list] Nombre de PACs pour l'utilisateur %s: %s", request.user.username, len(pacs))
 
-        # Utiliser PacCompletSerializer pour inclure les détails
-        serializer = PacCompletSerializer(pacs, many=True)
-        logger.info("[pac_list] Données sérialisées: %s PACs", len(serializer.data))
+        # Utiliser PacCompletSerializer pour inclure les détails (arborescence chargée en une passe)
+        serializer = PacCompletSerializer(pacs, many=True, context={'pac_details': PacTreeLoader.load(pacs)})
+        data = serializer.data
+        logger.info("[pac_list] Données sérialisées: %s PACs", len(data))
         return Response({
             'success': True,
-            'data': serializer.data,
-            'count': pacs.count()
+            'data': data,
+            'count': len(pacs)
         }, status=status.HTTP_200_OK)
     except Exception as e:
         logger.error("Erreur lors de la récupération des PACs: %s", str(e))
@@ -303,57 +296,17 @@ def pac_create(request):
                 processus_id=processus_uuid,
                 num_amendement=num_amendement - 1
             ).first()
+            if source_pac and wants_async(request):
+                # ?async=1 : copie par le worker, le PAC (vide) est renvoyé aussitôt avec la tâche
+                job = BackgroundJobService.enqueue('copy_pac_amendment', {
+                    'source': source_pac.uuid, 'target': pac.uuid,
+                    # Pour l'entrée d'audit « clone » écrite par la tâche
+                    'ip_address': get_client_ip(request), 'user_agent': request.META.get('HTTP_USER_AGENT'),
+                }, user=request.user)
+                return job_accepted(job, message='PAC créé, copie des lignes en cours', pac=PacSerializer(pac).data)
             if source_pac:
-                details_with_suivi = source_pac.details.select_related(
-                    'traitement', 'traitement__suivi',
-                    'traitement__suivi__etat_mise_en_oeuvre', 'traitement__suivi__appreciation',
-                    'traitement__suivi__preuve', 'traitement__suivi__statut'
-                ).all()
-                clone_count = 0
-                for detail in details_with_suivi:
-                    new_detail = DetailsPac.objects.create(
-                        pac=pac,
-                        numero_pac=detail.numero_pac,
-                        libelle=detail.libelle,
-                        dysfonctionnement_recommandation=detail.dysfonctionnement_recommandation,
-                        nature=detail.nature,
-                        categorie=detail.categorie,
-                        source=detail.source,
-                        periode_de_realisation=detail.periode_de_realisation,
-                    )
-                    if hasattr(detail, 'traitement') and detail.traitement:
-                        t = detail.traitement
-                        new_traitement = TraitementPac.objects.create(
-                            details_pac=new_detail,
-                            action=t.action,
-                            type_action=t.type_action,
-                            delai_realisation=t.delai_realisation,
-                            responsable_direction=t.responsable_direction,
-                            responsable_sous_direction=t.responsable_sous_direction,
-                        )
-                        if hasattr(t, 'responsables_directions'):
-                            new_traitement.responsables_directions.set(t.responsables_directions.all())
-                        if hasattr(t, 'responsables_sous_directions'):
-                            new_traitement.responsables_sous_directions.set(t.responsables_sous_directions.all())
-                        # Copier le suivi si présent
-                        if hasattr(t, 'suivi') and t.suivi:
-                            s = t.suivi
-                            if s.etat_mise_en_oeuvre and s.appreciation:
-                                # Chaque amendement repart avec sa propre preuve vide :
-                                # partager s.preuve ferait apparaître les médias ajoutés
-                                # sur le nouvel amendement dans tous les précédents.
-                                PacSuivi.objects.create(
-                                    traitement=new_traitement,
-                                    etat_mise_en_oeuvre=s.etat_mise_en_oeuvre,
-                                    resultat=s.resultat,
-                                    appreciation=s.appreciation,
-                                    preuve=None,
-                                    statut=s.statut,
-                                    date_mise_en_oeuvre_effective=s.date_mise_en_oeuvre_effective,
-                                    date_cloture=s.date_cloture,
-                                    cree_par=request.user,
-                                )
-                    clone_count += 1
+                # Détails, traitements (avec responsables) et suivis copiés niveau par niveau
+                clone_count = AmendmentCopier.copy_pac(source_pac, pac, request.user)
                 # Audit: log du clonage (Security by Design)
                 if clone_count > 0:
                     try:
@@ -415,34 +368,25 @@ def pac_detail(request, uuid):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated, PacDetailPermission])
 def pac_complet(request, uuid):
-    """Récupérer un PAC complet avec tous ses traitements et suivis"""
+    """
+    Récupérer un PAC complet avec tous ses traitements et suivis.
+
+    Rendu en cache par révision du PAC (DocumentCache), ETag fort : If-None-Match → 304.
+    """
     try:
-        pac = Pac.objects.select_related(
-            'processus', 'cree_par', 'annee'
-        ).prefetch_related(
-            'details__dysfonctionnement_recommandation',
-            'details__nature',
-            'details__categorie',
-            'details__source',
-            'details__traitement__type_action',
-            'details__traitement__responsable_direction',
-            'details__traitement__responsable_sous_direction',
-            'details__traitement__preuve__medias',
-            'details__traitement__suivi__etat_mise_en_oeuvre',
-            'details__traitement__suivi__appreciation',
-            'details__traitement__suivi__statut',
-            'details__traitement__suivi__cree_par',
-            'details__traitement__suivi__preuve__medias'
-        ).get(uuid=uuid)
-        
         # Security by Design : La vérification d'accès au processus est gérée par PacDetailPermission
         # via le décorateur @permission_classes
-        
-        serializer = PacCompletSerializer(pac)
-        return Response({
+
+        def render():
+            pac = PacCompletSerializer.setup_queryset(Pac.objects.all()).get(uuid=uuid)
+            serializer = PacCompletSerializer(pac, context={'pac_details': PacTreeLoader.load([pac])})
+            return serializer.data, pac.is_validated
+
+        entry = DocumentCache.get_or_render(DocumentCache.PAC, uuid, 'complet', render)
+        return etag_response(request, {
             'success': True,
-            'data': serializer.data
-        }, status=status.HTTP_200_OK)
+            'data': entry['data']
+        }, entry['etag'])
     except Pac.DoesNotExist:
         return Response({
             'success': False,
@@ -812,58 +756,41 @@ def pac_validate_by_type(request):
                 'error': 'processus et annee sont requis'
             }, status=status.HTTP_400_BAD_REQUEST)
 
-        # Récupérer tous les PACs du même contexte (processus, année, num_amendement)
-        pacs_to_validate = Pac.objects.filter(
+        if not Pac.objects.filter(
             processus__uuid=processus_uuid,
             annee__uuid=annee_uuid,
             num_amendement=num_amendement
-        ).select_related('processus', 'annee').prefetch_related('details__traitement')
-        
-        if not pacs_to_validate.exists():
+        ).exists():
             return Response({
                 'error': 'Aucun PAC trouvé pour ce contexte'
             }, status=status.HTTP_404_NOT_FOUND)
-        
-        # Vérifier que tous les PACs peuvent être validés
-        errors = []
-        for pac in pacs_to_validate:
-            if pac.is_validated:
-                continue  # Déjà validé, on continue
-
-            first_detail = pac.details.first()
-            numero_pac_display = first_detail.numero_pac if first_detail and first_detail.numero_pac else str(pac.uuid)
-
-            error_msg = _check_pac_completude(pac, numero_pac_display)
-            if error_msg:
-                errors.append(error_msg)
-        
-        if errors:
+
+        # ?async=1 : vérification et validation par le worker, réponse 202 immédiate
+        if wants_async(request):
+            job = BackgroundJobService.enqueue('validate_pacs_by_amendement', {
+                'processus': processus_uuid,
+                'annee': annee_uuid,
+                'num_amendement': num_amendement,
+            }, user=request.user)
+            return job_accepted(job, message='Validation des PACs en cours')
+
+        try:
+            result = validate_pacs_by_amendement(processus_uuid, annee_uuid, num_amendement, request.user)
+        except PacValidationError as e:
             return Response({
-                'error': 'Certains PACs ne peuvent pas être validés',
-                'details': errors
+                'error': str(e),
+                'details': e.details
             }, status=status.HTTP_400_BAD_REQUEST)
-        
-        # Valider tous les PACs
-        from django.utils import timezone
-        validated_count = 0
-        for pac in pacs_to_validate:
-            if not pac.is_validated:
-                pac.is_validated = True
-                pac.validated_at = timezone.now()
-                pac.validated_by = request.user
-                pac.save()
-                validated_count += 1
-        
+
         logger.info(
-            "%s PAC(s) validé(s) par %s: processus=%s, annee=%s, num_amendement=%s, IP: %s", validated_count, request.user.username, processus_uuid, annee_uuid, num_amendement, get_client_ip(request)
+            "%s PAC(s) validé(s) par %s: processus=%s, annee=%s, num_amendement=%s, IP: %s", result['validated_count'], request.user.username, processus_uuid, annee_uuid, num_amendement, get_client_ip(request)
         )
-        
+
         return Response({
-            'message': f'{validated_count} PAC(s) validé(s) avec succès',
-            'validated_count': validated_count,
-            'total_count': pacs_to_validate.count()
+            'message': f"{result['validated_count']} PAC(s) validé(s) avec succès",
+            **result
         }, status=status.HTTP_200_OK)
-        
+
     except Exception as e:
         import traceback
         logger.error("Erreur lors de la validation par amendement: %s\n%s", str(e), traceback.format_exc())
@@ -21,9 +21,10 @@ from django.utils.encoding import force_str, force_bytes
 from django.core.mail import send_mail
 from django.template.loader import render_to_string
 from django.conf import settings
-from datetime import datetime, timedelta
+from datetime import datetime
 from pac.services.pac_service import get_upcoming_notifications_data
-from ..models import Pac, TraitementPac, PacSuivi, DetailsPac
+from parametre.services.kpi_snapshot_service import KpiSnapshotService
+from ..models import Pac, TraitementPac, PacSuivi
 from parametre.models import Processus, Media, Preuve, Notification, FailedLoginAttempt, LoginSecurityConfig, LoginBlock
 from parametre.views import log_pac_creation, log_pac_update, log_traitement_creation, log_suivi_creation, log_user_login, log_user_logout, get_client_ip, log_activity
 from parametre.utils.email_security import EmailValidator, EmailContentSanitizer, EmailRateLimiter, SecureEmailLogger
@@ -97,8 +98,6 @@ def pac_upcoming_notifications(request):
 def pac_stats(request):
     """Statistiques des PACs de l'utilisateur connecté"""
     try:
-        from django.db.models import Q, Exists, OuterRef, Max
-
         scope = request.query_params.get('scope', 'tous')
 
         # ========== FILTRAGE PAR PROCESSUS (Security by Design) ==========
@@ -106,13 +105,13 @@ def pac_stats(request):
 
         if user_processus_uuids is None:
             # Super admin : tous les PACs, filtre processus optionnel
-            pacs_base = Pac.objects.all()
+            processus_uuids = None
             processus_filter = request.query_params.get('processus')
             if processus_filter and str(processus_filter).upper() != 'ALL':
                 try:
                     from uuid import UUID
                     UUID(str(processus_filter))
-                    pacs_base = pacs_base.filter(processus__uuid=processus_filter)
+                    processus_uuids = [processus_filter]
                 except (ValueError, TypeError):
                     pass
         elif not user_processus_uuids:
@@ -127,102 +126,16 @@ def pac_stats(request):
                 'message': 'Aucune donnée de PAC trouvée pour vos processus attribués.'
             }, status=status.HTTP_200_OK)
         else:
-            pacs_base = Pac.objects.filter(processus__uuid__in=user_processus_uuids)
+            processus_uuids = user_processus_uuids
             processus_uuid_filter = request.query_params.get('processus_uuid')
             if processus_uuid_filter and str(processus_uuid_filter) in [str(u) for u in user_processus_uuids]:
-                pacs_base = pacs_base.filter(processus__uuid=processus_uuid_filter)
+                processus_uuids = [processus_uuid_filter]
         # ========== FIN FILTRAGE ==========
 
-        # Scope : dernier amendement par processus ou PAC initial uniquement
-        if scope == 'dernier':
-            last_uuids = []
-            for proc_uuid in pacs_base.values_list('processus', flat=True).distinct():
-                max_num = pacs_base.filter(processus=proc_uuid).aggregate(m=Max('num_amendement'))['m']
-                last = pacs_base.filter(processus=proc_uuid, num_amendement=max_num).first()
-                if last:
-                    last_uuids.append(last.uuid)
-            pacs_initiaux_base = pacs_base.filter(uuid__in=last_uuids)
-        else:
-            pacs_initiaux_base = pacs_base.filter(num_amendement=0)
-
-        total_pacs = pacs_initiaux_base.count()
-
-        # Security by Design — Fail Secure : comptage ORM pur, pas de boucle Python.
-        # Q(is_validated=True) couvre le cas normal.
-        # Q(validated_at__isnull=False) couvre les PACs validés avant l'ajout du booléen
-        # (défense en profondeur contre toute incohérence de migration).
-        pacs_valides = pacs_initiaux_base.filter(
-            Q(is_validated=True) | Q(validated_at__isnull=False)
-        ).count()
-
-        # PACs avec au moins un traitement — sous-requête EXISTS, O(1) en DB
-        pacs_avec_traitement = pacs_base.filter(
-            Exists(
-                DetailsPac.objects.filter(
-                    pac=OuterRef('pk'),
-                    traitement__isnull=False,
-                )
-            )
-        ).count()
-
-        # PACs avec au moins un suivi — idem
-        pacs_avec_suivi = pacs_base.filter(
-            Exists(
-                DetailsPac.objects.filter(
-                    pac=OuterRef('pk'),
-                    traitement__suivi__isnull=False,
-                )
-            )
-        ).count()
-
-        pacs_initiaux_uuids = list(pacs_initiaux_base.values_list('uuid', flat=True))
-
-        if not pacs_initiaux_uuids:
-            total_traitements = 0
-            total_suivis = 0
-            traitements_arrives_termes = 0
-            traitements_bientot_termes = 0
-        else:
-            today = timezone.now().date()
-            base_filter = dict(
-                details_pac__isnull=False,
-                details_pac__pac__uuid__in=pacs_initiaux_uuids,
-            )
-
-            total_traitements = TraitementPac.objects.filter(**base_filter).count()
-
-            total_suivis = PacSuivi.objects.filter(
-                traitement__isnull=False,
-                traitement__details_pac__isnull=False,
-                traitement__details_pac__pac__uuid__in=pacs_initiaux_uuids,
-            ).count()
-
-            # Deux COUNT(*) WHERE au lieu d'une boucle Python sur N traitements
-            traitements_arrives_termes = TraitementPac.objects.filter(
-                **base_filter,
-                delai_realisation__isnull=False,
-                delai_realisation__lt=today,
-            ).count()
-
-            traitements_bientot_termes = TraitementPac.objects.filter(
-                **base_filter,
-                delai_realisation__isnull=False,
-                delai_realisation__gte=today,
-                delai_realisation__lte=today + timedelta(days=7),
-            ).count()
-
+        # Snapshots KPI : une ligne par PAC, pas de comptage sur les traitements / suivis
         return Response({
             'success': True,
-            'data': {
-                'total_pacs': total_pacs,
-                'pacs_valides': pacs_valides,
-                'pacs_avec_traitement': pacs_avec_traitement,
-                'pacs_avec_suivi': pacs_avec_suivi,
-                'total_traitements': total_traitements,
-                'total_suivis': total_suivis,
-                'traitements_arrives_termes': traitements_arrives_termes,
-                'traitements_bientot_termes': traitements_bientot_termes,
-            }
+            'data': KpiSnapshotService.pac_stats(processus_uuids, scope),
         }, status=status.HTTP_200_OK)
 
     except Exception as e:
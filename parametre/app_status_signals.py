@@ -0,0 +1,42 @@
+"""
+Signaux de diffusion du statut des applications.
+
+Toute modification d'une ApplicationConfig est publiée après le commit vers
+app_status_broadcaster : les flux SSE du processus sont notifiés immédiatement,
+ceux des autres workers au prochain passage de leur thread de fond. La même
+version partagée fait recharger l'instantané du middleware de maintenance.
+"""
+import logging
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+
+from parametre.services.app_status_broadcaster import app_status_broadcaster
+from parametre.services.application_config_snapshot import application_config_snapshot
+
+logger = logging.getLogger(__name__)
+
+DISPATCH_UID_PREFIX = 'kora_app_status_broadcaster'
+
+
+def _publish():
+    application_config_snapshot.invalidate()
+    try:
+        app_status_broadcaster.publish()
+    except Exception as e:
+        logger.error("[AppStatusBroadcaster] Erreur de publication: %s", str(e))
+
+
+def application_config_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        transaction.on_commit(_publish)
+
+
+def register():
+    """Connecte les signaux d'ApplicationConfig"""
+    from parametre.models import ApplicationConfig
+
+    post_save.connect(application_config_changed, sender=ApplicationConfig, dispatch_uid=f'{DISPATCH_UID_PREFIX}_save')
+    post_delete.connect(
+        application_config_changed, sender=ApplicationConfig, dispatch_uid=f'{DISPATCH_UID_PREFIX}_delete'
+    )
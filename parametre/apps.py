@@ -18,6 +18,30 @@ class ParametreConfig(AppConfig):
         # Signaux de sécurité — chargés inconditionnellement
         from . import signals  # noqa: F401
 
+        # Snapshots KPI des endpoints de statistiques
+        from . import kpi_signals
+        kpi_signals.register(self)
+
+        # Notifications d'échéance matérialisées à l'écriture
+        from . import notification_signals
+        notification_signals.register(self)
+
+        # Statut des applications diffusé aux flux SSE
+        from . import app_status_signals
+        app_status_signals.register()
+
+        # Bundle des données de référence invalidé à l'écriture
+        from . import reference_bundle_signals
+        reference_bundle_signals.register()
+
+        # Cache des documents rendus invalidé à l'écriture
+        from . import document_cache_signals
+        document_cache_signals.register()
+
+        # Compteurs d'activité par utilisateur tenus à l'écriture des journaux
+        from . import user_activity_stats_signals
+        user_activity_stats_signals.register(self)
+
         # Le scheduler NE démarre PLUS dans les workers Gunicorn.
         # Il tourne comme service systemd séparé via :
         #   python manage.py run_scheduler
@@ -0,0 +1,195 @@
+"""
+Signaux d'invalidation du cache des documents rendus (DocumentCache).
+
+Toute écriture d'un document ou d'une de ses lignes (détails, traitements,
+suivis, évaluations, plans d'action, objectifs, indicateurs, périodicités,
+analyse...) incrémente après le commit la révision du document parent, de même
+que les responsables (ManyToMany), les médias des preuves, le titre d'une preuve
+ou la description d'un média.
+
+Les écritures sur un référentiel (modèles HasActiveStatus et tables du bundle de
+référence : natures, directions, états, statuts...) changent les noms affichés
+dans les rendus : elles changent l'époque de tout le cache.
+"""
+import logging
+
+from django.apps import apps
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+
+from parametre.services.document_cache import DocumentCache
+
+PAC, CDR, TABLEAU_BORD = DocumentCache.PAC, DocumentCache.CDR, DocumentCache.TABLEAU_BORD
+
+logger = logging.getLogger(__name__)
+
+DISPATCH_UID_PREFIX = 'kora_document_cache'
+
+
+def _lookup(model, pk, field):
+    # Ligne parente éventuellement déjà supprimée (suppression en cascade)
+    if pk is None:
+        return None
+    return next(iter(model.objects.filter(pk=pk).values_list(field, flat=True)), None)
+
+
+def _resolvers():
+    """(modèle, type de document, fonction instance -> UUID du document)"""
+    from analyse_tableau.models import AnalyseAction, AnalyseLigne, AnalyseTableau
+    from cartographie_risque.models import (
+        CDR as CDRModel, DetailsCDR, EvaluationRisque, PlanAction, PlanActionResponsable, SuiviAction,
+    )
+    from dashboard.models import Indicateur, Objectives, TableauBord
+    from pac.models import DetailsPac, Pac, PacSuivi, TraitementPac
+    from parametre.models import Cible, Periodicite
+
+    return [
+        (Pac, PAC, lambda i: i.uuid),
+        (DetailsPac, PAC, lambda i: i.pac_id),
+        (TraitementPac, PAC, lambda i: _lookup(DetailsPac, i.details_pac_id, 'pac_id')),
+        (PacSuivi, PAC, lambda i: _lookup(TraitementPac, i.traitement_id, 'details_pac__pac_id')),
+        (CDRModel, CDR, lambda i: i.uuid),
+        (DetailsCDR, CDR, lambda i: i.cdr_id),
+        (EvaluationRisque, CDR, lambda i: _lookup(DetailsCDR, i.details_cdr_id, 'cdr_id')),
+        (PlanAction, CDR, lambda i: _lookup(DetailsCDR, i.details_cdr_id, 'cdr_id')),
+        (PlanActionResponsable, CDR, lambda i: _lookup(PlanAction, i.plan_action_id, 'details_cdr__cdr_id')),
+        (SuiviAction, CDR, lambda i: _lookup(PlanAction, i.plan_action_id, 'details_cdr__cdr_id')),
+        (TableauBord, TABLEAU_BORD, lambda i: i.uuid),
+        (Objectives, TABLEAU_BORD, lambda i: i.tableau_bord_id),
+        (Indicateur, TABLEAU_BORD, lambda i: _lookup(Objectives, i.objective_id_id, 'tableau_bord_id')),
+        (Cible, TABLEAU_BORD, lambda i: _lookup(Indicateur, i.indicateur_id_id, 'objective_id__tableau_bord_id')),
+        (Periodicite, TABLEAU_BORD, lambda i: _lookup(Indicateur, i.indicateur_id_id, 'objective_id__tableau_bord_id')),
+        (AnalyseTableau, TABLEAU_BORD, lambda i: i.tableau_bord_id),
+        (AnalyseLigne, TABLEAU_BORD, lambda i: _lookup(AnalyseTableau, i.analyse_tableau_id, 'tableau_bord_id')),
+        (AnalyseAction, TABLEAU_BORD, lambda i: _lookup(AnalyseLigne, i.ligne_id, 'analyse_tableau__tableau_bord_id')),
+    ]
+
+
+def _preuve_documents(preuve_ids):
+    """Documents qui affichent les médias des preuves (traitements et suivis PAC, actions d'analyse)"""
+    from analyse_tableau.models import AnalyseAction
+    from pac.models import PacSuivi, TraitementPac
+
+    documents = set()
+    for pac_id in TraitementPac.objects.filter(preuve__in=preuve_ids).values_list('details_pac__pac_id', flat=True):
+        documents.add((PAC, pac_id))
+    for pac_id in PacSuivi.objects.filter(preuve__in=preuve_ids).values_list(
+        'traitement__details_pac__pac_id', flat=True
+    ):
+        documents.add((PAC, pac_id))
+    for tableau_id in AnalyseAction.objects.filter(preuve__in=preuve_ids).values_list(
+        'ligne__analyse_tableau__tableau_bord_id', flat=True
+    ):
+        documents.add((TABLEAU_BORD, tableau_id))
+    return documents
+
+
+def _make_handler(kind, resolve):
+    def handler(sender, instance, raw=False, **kwargs):
+        if raw:
+            return
+        try:
+            DocumentCache.mark_changed(kind, resolve(instance))
+        except Exception as e:
+            logger.error("[DocumentCache] Marquage impossible (%s %s): %s", sender.__name__, instance.pk, str(e))
+    return handler
+
+
+def _make_m2m_handler(kind, resolve):
+    def handler(sender, instance, action, reverse, pk_set, **kwargs):
+        if not action.startswith('post_'):
+            return
+        try:
+            if reverse:
+                # Côté direction : les lignes concernées sont dans pk_set
+                model = kwargs['model']
+                for pk in pk_set or ():
+                    row = model.objects.filter(pk=pk).first()
+                    if row is not None:
+                        DocumentCache.mark_changed(kind, resolve(row))
+            else:
+                DocumentCache.mark_changed(kind, resolve(instance))
+        except Exception as e:
+            logger.error("[DocumentCache] Marquage impossible (%s): %s", sender.__name__, str(e))
+    return handler
+
+
+def preuve_medias_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith('post_'):
+        return
+    try:
+        preuve_ids = list(pk_set or ()) if reverse else [instance.pk]
+        for kind, uuid in _preuve_documents(preuve_ids):
+            DocumentCache.mark_changed(kind, uuid)
+    except Exception as e:
+        logger.error("[DocumentCache] Marquage impossible (médias de preuve): %s", str(e))
+
+
+def preuve_changed(sender, instance, raw=False, **kwargs):
+    """Titre d'une preuve ou description d'un média modifiés"""
+    from parametre.models import Preuve
+
+    if raw:
+        return
+    try:
+        if isinstance(instance, Preuve):
+            preuve_ids = [instance.pk]
+        else:
+            preuve_ids = list(instance.preuves.values_list('pk', flat=True))
+        for kind, uuid in _preuve_documents(preuve_ids):
+            DocumentCache.mark_changed(kind, uuid)
+    except Exception as e:
+        logger.error("[DocumentCache] Marquage impossible (%s %s): %s", sender.__name__, instance.pk, str(e))
+
+
+def reference_changed(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+
+    def run():
+        try:
+            DocumentCache.bump_epoch()
+        except Exception as e:
+            logger.error("[DocumentCache] Invalidation impossible (%s): %s", sender.__name__, str(e))
+    transaction.on_commit(run)
+
+
+def register():
+    """Connecte les signaux des documents, de leurs lignes et des référentiels"""
+    from analyse_tableau.models import AnalyseAction
+    from pac.models import TraitementPac
+    from parametre.models import HasActiveStatus, Media, Preuve
+    from parametre.services.reference_bundle_service import ReferenceBundleService
+
+    resolvers = _resolvers()
+    for model, kind, resolve in resolvers:
+        handler = _make_handler(kind, resolve)
+        uid = f'{DISPATCH_UID_PREFIX}_{model._meta.label_lower}'
+        post_save.connect(handler, sender=model, weak=False, dispatch_uid=f'{uid}_save')
+        post_delete.connect(handler, sender=model, weak=False, dispatch_uid=f'{uid}_delete')
+
+    by_model = {model: (kind, resolve) for model, kind, resolve in resolvers}
+    for model, name in (
+        (TraitementPac, 'responsables_directions'),
+        (TraitementPac, 'responsables_sous_directions'),
+        (AnalyseAction, 'responsables_directions'),
+        (AnalyseAction, 'responsables_sous_directions'),
+    ):
+        through = getattr(model, name).through
+        m2m_changed.connect(
+            _make_m2m_handler(*by_model[model]), sender=through, weak=False,
+            dispatch_uid=f'{DISPATCH_UID_PREFIX}_{model._meta.label_lower}_{name}',
+        )
+    m2m_changed.connect(
+        preuve_medias_changed, sender=Preuve.medias.through, dispatch_uid=f'{DISPATCH_UID_PREFIX}_preuve_medias'
+    )
+    for model in (Preuve, Media):
+        post_save.connect(preuve_changed, sender=model, dispatch_uid=f'{DISPATCH_UID_PREFIX}_{model._meta.label_lower}_save')
+
+    # Mêmes référentiels que le bundle des données de référence
+    bundle_models = ReferenceBundleService.models()
+    for model in apps.get_models():
+        if issubclass(model, HasActiveStatus) or model in bundle_models:
+            uid = f'{DISPATCH_UID_PREFIX}_reference_{model._meta.label_lower}'
+            post_save.connect(reference_changed, sender=model, dispatch_uid=f'{uid}_save')
+            post_delete.connect(reference_changed, sender=model, dispatch_uid=f'{uid}_delete')
@@ -0,0 +1,104 @@
+"""
+Signaux de mise à jour incrémentale des snapshots KPI.
+
+Toute écriture d'un document ou d'une de ses lignes (détails, traitements, suivis,
+plans d'action, objectifs, indicateurs...) marque le document parent ; son snapshot
+est recalculé une seule fois après le commit (KpiSnapshotService.mark_dirty), ou à
+la fin de la requête pour les écritures en autocommit (KpiSnapshotBatchMiddleware).
+
+Les écritures qui ne déclenchent pas de signaux (queryset.update, bulk_create, SQL brut)
+sont rattrapées par le job quotidien rebuild_kpi_snapshots.
+"""
+import logging
+
+from django.db.models.signals import post_delete, post_migrate, post_save
+
+from parametre.services.kpi_snapshot_service import KpiSnapshotService
+
+logger = logging.getLogger(__name__)
+
+DISPATCH_UID_PREFIX = 'kora_kpi_snapshot'
+
+
+def _resolvers():
+    """
+    (modèle, module, chemin de l'instance vers l'UUID du document parent)
+
+    Chemin simple : champ de l'instance. Chemin composé (`fk__...`) : suivi dans les
+    objets liés déjà chargés, sinon résolu au vidage à partir de la valeur de la FK.
+    """
+    from activite_periodique.models import ActivitePeriodique, DetailsAP, SuivisAP
+    from analyse_tableau.models import AnalyseTableau
+    from cartographie_risque.models import CDR, DetailsCDR, PlanAction
+    from dashboard.models import Indicateur, Objectives, TableauBord
+    from pac.models import DetailsPac, Pac, PacSuivi, TraitementPac
+    from parametre.models import Cible, Periodicite
+
+    return [
+        (Pac, 'pac', 'uuid'),
+        (DetailsPac, 'pac', 'pac_id'),
+        (TraitementPac, 'pac', 'details_pac__pac_id'),
+        (PacSuivi, 'pac', 'traitement__details_pac__pac_id'),
+        (CDR, 'cdr', 'uuid'),
+        (DetailsCDR, 'cdr', 'cdr_id'),
+        (PlanAction, 'cdr', 'details_cdr__cdr_id'),
+        (ActivitePeriodique, 'activite_periodique', 'uuid'),
+        (DetailsAP, 'activite_periodique', 'activite_periodique_id'),
+        (SuivisAP, 'activite_periodique', 'details_ap__activite_periodique_id'),
+        (TableauBord, 'dashboard', 'uuid'),
+        (Objectives, 'dashboard', 'tableau_bord_id'),
+        (Indicateur, 'dashboard', 'objective_id__tableau_bord_id'),
+        (Cible, 'dashboard', 'indicateur_id__objective_id__tableau_bord_id'),
+        (Periodicite, 'dashboard', 'indicateur_id__objective_id__tableau_bord_id'),
+        (AnalyseTableau, 'dashboard', 'tableau_bord_id'),
+    ]
+
+
+def _mark(module, instance, path):
+    """Marque le document parent de `instance` sans requête quand les objets liés sont chargés"""
+    names = path.split('__')
+    obj = instance
+    for depth, name in enumerate(names[:-1]):
+        related = obj._state.fields_cache.get(name)
+        if related is None:
+            # Parent non chargé : lu au vidage à partir de la FK (groupé par transaction)
+            field = obj._meta.get_field(name)
+            KpiSnapshotService.mark_dirty_related(
+                module, field.related_model, getattr(obj, field.attname), '__'.join(names[depth + 1:])
+            )
+            return
+        obj = related
+    KpiSnapshotService.mark_dirty(module, getattr(obj, names[-1]))
+
+
+def _make_handler(module, path):
+    def handler(sender, instance, raw=False, **kwargs):
+        # Chargement de fixtures : les snapshots seront reconstruits ensuite
+        if raw:
+            return
+        try:
+            _mark(module, instance, path)
+        except Exception as e:
+            logger.error("[KpiSnapshot] Marquage impossible (%s %s): %s", sender.__name__, instance.pk, str(e))
+    return handler
+
+
+def rebuild_if_empty(sender, **kwargs):
+    """Après migrate : construit les snapshots d'une base qui n'en a encore aucun"""
+    from parametre.models import KpiSnapshot
+
+    try:
+        if not KpiSnapshot.objects.exists():
+            KpiSnapshotService.rebuild()
+    except Exception as e:
+        logger.error("[KpiSnapshot] Construction initiale impossible: %s", str(e))
+
+
+def register(app_config):
+    """Connecte les signaux post_save / post_delete des modèles suivis"""
+    for model, module, path in _resolvers():
+        handler = _make_handler(module, path)
+        uid = f'{DISPATCH_UID_PREFIX}_{model._meta.label_lower}'
+        post_save.connect(handler, sender=model, weak=False, dispatch_uid=f'{uid}_save')
+        post_delete.connect(handler, sender=model, weak=False, dispatch_uid=f'{uid}_delete')
+    post_migrate.connect(rebuild_if_empty, sender=app_config, dispatch_uid=f'{DISPATCH_UID_PREFIX}_post_migrate')
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from parametre.services.log_archiver import LogArchiver
+
+
+class Command(BaseCommand):
+    help = "Archive les journaux échus (ActivityLog, PermissionAudit) dans des fichiers JSONL compressés mensuels"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--log',
+            action='append',
+            choices=LogArchiver.logs(),
+            help='Journal à archiver (répétable, tous par défaut)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Compte les lignes échues sans rien archiver ni supprimer',
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        counts = LogArchiver.archive(options.get('log'), dry_run=dry_run)
+        for name, total in counts.items():
+            label = 'à archiver' if dry_run else 'archivée(s)'
+            self.stdout.write(self.style.SUCCESS(f'{name}: {total} ligne(s) {label}'))
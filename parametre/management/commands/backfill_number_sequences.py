@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from parametre.services.sequence_allocator import SEQUENCES, SequenceAllocator
+
+
+class Command(BaseCommand):
+    help = 'Aligne les séquences de numérotation (PAC, processus, objectifs, détails CDR) sur les numéros existants'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sequence',
+            action='append',
+            choices=list(SEQUENCES),
+            help='Séquence à aligner (répétable, toutes par défaut)',
+        )
+
+    def handle(self, *args, **options):
+        counts = SequenceAllocator.backfill(options.get('sequence'))
+        for name, total in counts.items():
+            self.stdout.write(self.style.SUCCESS(f'{name}: {total} portée(s) créée(s) ou avancée(s)'))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from parametre.services.notification_materializer import NotificationMaterializer
+
+
+class Command(BaseCommand):
+    help = "Matérialise les notifications d'échéance (traitements PAC, plans d'action CDR) pour la date du jour"
+
+    def handle(self, *args, **options):
+        for source, (created, updated) in NotificationMaterializer.materialize_all().items():
+            self.stdout.write(self.style.SUCCESS(f'{source}: {created} créée(s), {updated} mise(s) à jour'))
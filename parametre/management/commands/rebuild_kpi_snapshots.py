@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from parametre.services.kpi_snapshot_service import KpiSnapshotService
+
+
+class Command(BaseCommand):
+    help = 'Reconstruit les snapshots KPI (PAC, CDR, Activités Périodiques, tableaux de bord)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--module',
+            action='append',
+            choices=KpiSnapshotService.MODULES,
+            help='Module à reconstruire (répétable, tous par défaut)',
+        )
+
+    def handle(self, *args, **options):
+        counts = KpiSnapshotService.rebuild(options.get('module'))
+        for module, total in counts.items():
+            self.stdout.write(self.style.SUCCESS(f'{module}: {total} snapshot(s) reconstruit(s)'))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from parametre.services.user_activity_stats import UserActivityStatsService
+
+
+class Command(BaseCommand):
+    help = "Reconstruit les compteurs d'activité par utilisateur depuis ActivityLog et FailedLoginAttempt"
+
+    def handle(self, *args, **options):
+        total = UserActivityStatsService.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'{total} utilisateur(s) reconstruit(s)'))
@@ -0,0 +1,88 @@
+"""
+Management command: démarre le worker des tâches de fond (BackgroundJob) comme service standalone.
+Même modèle que run_scheduler : processus dédié (service systemd kora-worker), jamais Gunicorn.
+Unité systemd et procédure : CRON_FILES.txt, section « Worker des tâches de fond ».
+
+Usage :
+    python manage.py run_worker
+    python manage.py run_worker --once     # exécute les tâches en attente puis s'arrête
+"""
+import logging
+import os
+import signal
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from parametre.services.background_jobs import BackgroundJobService, worker_name
+
+logger = logging.getLogger(__name__)
+
+# Recherche des tâches interrompues toutes les N attentes
+RECOVER_EVERY = 60
+
+
+class Command(BaseCommand):
+    help = 'Démarre le worker des tâches de fond comme processus dédié (service systemd)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help="Exécute les tâches en attente puis s'arrête"
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=None,
+            help='Attente entre deux recherches de tâche (secondes, défaut BACKGROUND_JOB_POLL_INTERVAL)'
+        )
+
+    def handle(self, *args, **options):
+        worker = worker_name()
+        BackgroundJobService.recover_stale()
+
+        if options['once']:
+            count = BackgroundJobService.run_pending(worker)
+            self.stdout.write(self.style.SUCCESS(f'{count} tâche(s) exécutée(s)'))
+            return
+
+        poll_interval = options['poll_interval'] or settings.BACKGROUND_JOB_POLL_INTERVAL
+        self.stdout.write(self.style.SUCCESS(
+            f'Démarrage worker {worker} (PID {os.getpid()}, attente {poll_interval}s)...'
+        ))
+
+        stop_event = threading.Event()
+
+        def _on_signal(signum, frame):
+            logger.info("Signal %s reçu — arrêt du worker après la tâche en cours", signum)
+            stop_event.set()
+
+        signal.signal(signal.SIGTERM, _on_signal)
+        signal.signal(signal.SIGINT, _on_signal)
+
+        idle = 0
+        last_beat = 0.0
+        while not stop_event.is_set():
+            close_old_connections()
+            # Présence du worker (les endpoints ?async=1 et le déclenchement manuel la vérifient)
+            if time.monotonic() - last_beat >= settings.BACKGROUND_WORKER_TTL / 3:
+                BackgroundJobService.record_worker_heartbeat(worker)
+                last_beat = time.monotonic()
+            try:
+                job = BackgroundJobService.claim(worker)
+                if job is not None:
+                    BackgroundJobService.run(job)
+                    continue
+                idle += 1
+                if idle % RECOVER_EVERY == 0:
+                    BackgroundJobService.recover_stale()
+            except Exception as e:
+                logger.error("Erreur dans la boucle du worker: %s", e, exc_info=True)
+            stop_event.wait(poll_interval)
+
+        close_old_connections()
+        self.stdout.write(self.style.SUCCESS('Worker arrêté proprement.'))
@@ -15,6 +15,7 @@ from django.template.loader import render_to_string
 
 from parametre.models import ReminderEmailLog, EmailSettings, Role, UserProcessusRole
 from parametre.services.cdr_notification_service import get_cdr_notifications
+from parametre.services.notification_materializer import NotificationMaterializer
 from parametre.utils.email_security import (
     EmailValidator,
     EmailContentSanitizer,
@@ -117,6 +118,9 @@ class Command(BaseCommand):
             return
 
         # ── 4. Envoi par utilisateur ─────────────────────────────────────────
+        # Notifications du jour à jour même si le job de matérialisation n'a pas tourné
+        NotificationMaterializer.materialize_cdr()
+
         total_sent    = 0
         total_errors  = 0
         total_skipped = 0
@@ -19,6 +19,7 @@ from django.db import transaction
 
 from parametre.models import ReminderEmailLog, EmailSettings, UserProcessusRole, Role
 from parametre.services.pac_notification_service import get_pac_notifications
+from parametre.services.notification_materializer import NotificationMaterializer
 from pac.models import TraitementPac
 from parametre.utils.email_security import (
     EmailValidator,
@@ -141,6 +142,9 @@ class Command(BaseCommand):
             return
         
         # ===== ÉTAPE 4 : Récupération et envoi des notifications =====
+        # Notifications du jour à jour même si le job de matérialisation n'a pas tourné
+        NotificationMaterializer.materialize_pac()
+
         total_emails = 0
         total_errors = 0
         total_skipped = 0
@@ -341,6 +345,21 @@ class Command(BaseCommand):
 
             return False
 
+    def load_traitements(self, notifications):
+        """
+        Charge en une requête les traitements référencés par les notifications
+        (au lieu d'un get() par notification). Clé : UUID du traitement (str).
+        """
+        entity_ids = {n.get('entity_id') for n in notifications if n.get('entity_id')}
+        if not entity_ids:
+            return {}
+        return {
+            str(traitement.uuid): traitement
+            for traitement in TraitementPac.objects.select_related(
+                'details_pac__pac__processus'
+            ).filter(uuid__in=entity_ids)
+        }
+
     def generate_secure_html_email(self, user, notifications, frontend_base):
         """
         Génère un email HTML sécurisé en utilisant un template Django
@@ -357,6 +376,7 @@ class Command(BaseCommand):
 
         # Préparer les notifications avec sanitization et formatage enrichi
         sanitized_notifications = []
+        traitements = self.load_traitements(notifications)
         for n in notifications:
             title = EmailContentSanitizer.sanitize_html(n.get('title', 'Échéance'))
             message = EmailContentSanitizer.sanitize_html(n.get('message', ''))
@@ -385,9 +405,9 @@ class Command(BaseCommand):
             
             if entity_id:
                 try:
-                    traitement = TraitementPac.objects.select_related(
-                        'details_pac__pac__processus'
-                    ).get(uuid=entity_id)
+                    traitement = traitements.get(str(entity_id))
+                    if traitement is None:
+                        raise TraitementPac.DoesNotExist
                     
                     if traitement.details_pac:
                         numero_pac = traitement.details_pac.numero_pac or "N/A"
@@ -439,6 +459,7 @@ class Command(BaseCommand):
 
         # Préparer les notifications avec formatage enrichi
         formatted_notifications = []
+        traitements = self.load_traitements(notifications)
         for n in notifications:
             title = n.get('title', 'Échéance')
             message = n.get('message', '')
@@ -454,9 +475,9 @@ class Command(BaseCommand):
             
             if entity_id:
                 try:
-                    traitement = TraitementPac.objects.select_related(
-                        'details_pac__pac__processus'
-                    ).get(uuid=entity_id)
+                    traitement = traitements.get(str(entity_id))
+                    if traitement is None:
+                        raise TraitementPac.DoesNotExist
                     
                     if traitement.details_pac:
                         numero_pac = traitement.details_pac.numero_pac or "N/A"
@@ -541,6 +562,9 @@ class Command(BaseCommand):
         unique_pacs = {}
         total_notifications = 0
         
+        traitements = self.load_traitements(
+            n for user_notif in all_user_notifications for n in user_notif['notifications']
+        )
         for user_notif in all_user_notifications:
             user = user_notif['user']
             notifications = user_notif['notifications']
@@ -554,9 +578,9 @@ class Command(BaseCommand):
                 
                 try:
                     # Récupérer le traitement pour obtenir le processus
-                    traitement = TraitementPac.objects.select_related(
-                        'details_pac__pac__processus'
-                    ).get(uuid=entity_id)
+                    traitement = traitements.get(str(entity_id))
+                    if traitement is None:
+                        raise TraitementPac.DoesNotExist
                     
                     processus_name = "N/A"
                     if traitement.details_pac and traitement.details_pac.pac and traitement.details_pac.pac.processus:
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.6 on 2026-10-16 20:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parametre', '0074_role_add_receive_reminders'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='KpiSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('module', models.CharField(choices=[('pac', 'PAC'), ('cdr', 'Cartographie des risques'), ('activite_periodique', 'Activité Périodique'), ('dashboard', 'Tableau de bord')], max_length=32)),
+                ('source_uuid', models.UUIDField(help_text='UUID du document (Pac, CDR, ActivitePeriodique, TableauBord)')),
+                ('annee', models.IntegerField(blank=True, null=True)),
+                ('num_amendement', models.PositiveIntegerField(default=0)),
+                ('is_validated', models.BooleanField(default=False)),
+                ('metrics', models.JSONField(default=dict, help_text='Compteurs du document (ex: traitements, suivis, échéances par date)')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('processus', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='kpi_snapshots', to='parametre.processus')),
+            ],
+            options={
+                'verbose_name': 'Snapshot KPI',
+                'verbose_name_plural': 'Snapshots KPI',
+                'db_table': 'kpi_snapshot',
+                'indexes': [models.Index(fields=['module', 'processus'], name='kpi_snapsho_module_85f880_idx')],
+                'constraints': [models.UniqueConstraint(fields=('module', 'source_uuid'), name='uniq_kpi_snapshot_module_source')],
+            },
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.6 on 2026-10-16 20:22
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('parametre', '0075_kpi_snapshot'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['user', 'read_at', 'due_date'], name='notificatio_user_id_65aaf5_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.6 on 2026-10-16 20:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parametre', '0076_notification_user_read_due'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReferenceChange',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('table', models.CharField(help_text='Table du bundle (ex: natures, processus)', max_length=50)),
+                ('object_uuid', models.UUIDField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Modification de référentiel',
+                'verbose_name_plural': 'Modifications de référentiels',
+                'db_table': 'reference_change',
+                'indexes': [models.Index(fields=['table', 'object_uuid'], name='reference_c_table_0cdcf3_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.6 on 2026-10-16 20:31
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parametre', '0077_reference_change'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='activitylog',
+            index=models.Index(fields=['-created_at', '-uuid'], name='activity_log_cursor_idx'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.6 on 2026-10-16 20:37
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('parametre', '0079_activity_log_created_at_default'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserActivityStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='activity_stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('last_login_at', models.DateTimeField(blank=True, null=True)),
+                ('last_login_ip', models.GenericIPAddressField(blank=True, null=True)),
+                ('last_login_device', models.CharField(blank=True, max_length=20, null=True)),
+                ('last_login_browser', models.CharField(blank=True, max_length=100, null=True)),
+                ('last_login_os', models.CharField(blank=True, max_length=100, null=True)),
+                ('last_logout_at', models.DateTimeField(blank=True, null=True)),
+                ('last_activity_at', models.DateTimeField(blank=True, null=True)),
+                ('total_logins', models.PositiveIntegerField(default=0)),
+                ('total_actions', models.PositiveIntegerField(default=0)),
+                ('failed_logins_count', models.PositiveIntegerField(default=0)),
+                ('recent_days', models.JSONField(default=dict, help_text="Compteurs par jour sur la fenêtre glissante : {'AAAA-MM-JJ': [connexions, actions, échecs]}")),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': "Statistiques d'activité utilisateur",
+                'verbose_name_plural': "Statistiques d'activité utilisateurs",
+                'db_table': 'user_activity_stats',
+            },
+        ),
+    ]
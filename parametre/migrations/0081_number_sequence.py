@@ -0,0 +1,25 @@
+# Generated by Django 5.2.6 on 2026-10-16 20:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parametre', '0080_user_activity_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NumberSequence',
+            fields=[
+                ('scope', models.CharField(max_length=150, primary_key=True, serialize=False)),
+                ('value', models.BigIntegerField(default=0, help_text='Dernier numéro attribué')),
+            ],
+            options={
+                'verbose_name': 'Séquence de numérotation',
+                'verbose_name_plural': 'Séquences de numérotation',
+                'db_table': 'number_sequence',
+            },
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.6 on 2026-10-16 20:59
+
+import django.core.serializers.json
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parametre', '0082_background_job'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SchedulerCommand',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('action', models.CharField(help_text='Action (reschedule, trigger)', max_length=30)),
+                ('job_id', models.CharField(max_length=255)),
+                ('params', models.JSONField(default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder, help_text='Paramètres (ex: hour, minute)')),
+                ('status', models.CharField(choices=[('pending', 'En attente'), ('acknowledged', 'Prise en charge'), ('done', 'Appliquée'), ('failed', 'Échouée')], default='pending', max_length=20)),
+                ('result', models.JSONField(blank=True, encoder=django.core.serializers.json.DjangoJSONEncoder, null=True)),
+                ('error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('acknowledged_at', models.DateTimeField(blank=True, null=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+                ('cree_par', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='scheduler_commands', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Commande du scheduler',
+                'verbose_name_plural': 'Commandes du scheduler',
+                'db_table': 'scheduler_command',
+                'indexes': [models.Index(fields=['status', 'id'], name='scheduler_c_status_47e9a3_idx')],
+            },
+        ),
+    ]
@@ -1,5 +1,7 @@
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 from django.core.validators import MinValueValidator, MaxValueValidator
+from django.utils import timezone
 import uuid
 from django.contrib.auth.models import User
 from django.contrib.contenttypes.models import ContentType
@@ -340,16 +342,8 @@ class Processus(HasActiveStatus):
         """
         Génère un numéro de processus unique (PRS01, PRS02, etc.)
         """
-        # Compter les processus existants
-        count = Processus.objects.count()
-        numero = f"PRS{count + 1:02d}"
-
-        # Vérifier l'unicité
-        while Processus.objects.filter(numero_processus=numero).exists():
-            count += 1
-            numero = f"PRS{count + 1:02d}"
-
-        return numero
+        from parametre.services.sequence_allocator import SequenceAllocator
+        return SequenceAllocator.next_number('numero_processus', 'PRS{:02d}')
 
 
 class DysfonctionnementRecommandation(HasActiveStatus):
@@ -483,7 +477,8 @@ class ActivityLog(models.Model):
     device_type = models.CharField(max_length=20, blank=True, null=True)  # desktop / mobile / tablet
     browser = models.CharField(max_length=100, blank=True, null=True)
     os_name = models.CharField(max_length=100, blank=True, null=True)
-    created_at = models.DateTimeField(auto_now_add=True)
+    # Horodatage fixé à la mise en file (écriture différée, parametre.services.activity_log_writer)
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
 
     class Meta:
         db_table = 'activity_log'
@@ -494,20 +489,47 @@ class ActivityLog(models.Model):
             models.Index(fields=['user', '-created_at']),
             models.Index(fields=['action', '-created_at']),
             models.Index(fields=['entity_type', '-created_at']),
+            # Pagination par curseur du flux global (created_at, uuid)
+            models.Index(fields=['-created_at', '-uuid'], name='activity_log_cursor_idx'),
         ]
 
     def __str__(self):
         return f"{self.user.username} - {self.get_action_display()} - {self.entity_name or self.entity_type}"
 
+    # Icône / couleur par action (lues telles quelles par les flux d'activité)
+    ACTION_ICONS = {
+        'create': {'icon': 'C', 'color': 'blue'},
+        'update': {'icon': 'M', 'color': 'green'},
+        'delete': {'icon': 'S', 'color': 'red'},
+        'view': {'icon': 'V', 'color': 'gray'},
+        'export': {'icon': 'E', 'color': 'purple'},
+        'import': {'icon': 'I', 'color': 'orange'},
+        'login': {'icon': 'L', 'color': 'green'},
+        'logout': {'icon': 'O', 'color': 'gray'},
+    }
+    STATUS_COLORS = {
+        'create': 'green',
+        'update': 'blue',
+        'delete': 'red',
+        'view': 'gray',
+        'export': 'purple',
+        'import': 'orange',
+        'login': 'green',
+        'logout': 'gray',
+    }
+
     @property
     def time_ago(self):
         """
         Retourne le temps écoulé depuis la création en français
         """
         from django.utils import timezone
-        from datetime import timedelta
-        
-        now = timezone.now()
+        return self.time_ago_at(timezone.now())
+
+    def time_ago_at(self, now):
+        """
+        Temps écoulé entre la création et `now` (une seule horloge pour toute une page)
+        """
         diff = now - self.created_at
         
         if diff.days > 0:
@@ -535,34 +557,14 @@ class ActivityLog(models.Model):
         """
         Retourne l'icône et la couleur selon le type d'action
         """
-        icons = {
-            'create': {'icon': 'C', 'color': 'blue'},
-            'update': {'icon': 'M', 'color': 'green'},
-            'delete': {'icon': 'S', 'color': 'red'},
-            'view': {'icon': 'V', 'color': 'gray'},
-            'export': {'icon': 'E', 'color': 'purple'},
-            'import': {'icon': 'I', 'color': 'orange'},
-            'login': {'icon': 'L', 'color': 'green'},
-            'logout': {'icon': 'O', 'color': 'gray'},
-        }
-        return icons.get(self.action, {'icon': '?', 'color': 'gray'})
+        return self.ACTION_ICONS.get(self.action, {'icon': '?', 'color': 'gray'})
 
     @property
     def status_color(self):
         """
         Retourne la couleur du statut selon l'action
         """
-        colors = {
-            'create': 'green',
-            'update': 'blue',
-            'delete': 'red',
-            'view': 'gray',
-            'export': 'purple',
-            'import': 'orange',
-            'login': 'green',
-            'logout': 'gray',
-        }
-        return colors.get(self.action, 'gray')
+        return self.STATUS_COLORS.get(self.action, 'gray')
 
 
 class NotificationSettings(models.Model):
@@ -991,6 +993,7 @@ class Notification(models.Model):
         ordering = ['-created_at']
         indexes = [
             models.Index(fields=['user', 'read_at', 'created_at']),
+            models.Index(fields=['user', 'read_at', 'due_date']),
             models.Index(fields=['user', 'source_app']),
             models.Index(fields=['content_type', 'object_id']),
             models.Index(fields=['user', 'dismissed_at']),
@@ -2335,4 +2338,265 @@ class TwoFactorUserSession(models.Model):
     def record(cls, user):
         """Enregistre ou met à jour la dernière vérification 2FA réussie."""
         from django.utils import timezone
-        cls.objects.update_or_create(user=user, defaults={'verified_at': timezone.now()})
\ No newline at end of file
+        cls.objects.update_or_create(user=user, defaults={'verified_at': timezone.now()})
+
+
+class KpiSnapshot(models.Model):
+    """
+    Indicateurs pré-calculés d'un PAC, d'une CDR, d'une Activité Périodique ou d'un
+    tableau de bord (une ligne par document, identifié par processus / année / version).
+
+    Mis à jour à chaque modification du document ou de ses lignes (signaux, voir
+    parametre/kpi_signals.py) ; les endpoints de statistiques lisent ces lignes au lieu
+    de recompter les données brutes. Reconstruction complète :
+        python manage.py rebuild_kpi_snapshots
+    """
+    MODULE_CHOICES = [
+        ('pac', 'PAC'),
+        ('cdr', 'Cartographie des risques'),
+        ('activite_periodique', 'Activité Périodique'),
+        ('dashboard', 'Tableau de bord'),
+    ]
+
+    module = models.CharField(max_length=32, choices=MODULE_CHOICES)
+    source_uuid = models.UUIDField(help_text="UUID du document (Pac, CDR, ActivitePeriodique, TableauBord)")
+    processus = models.ForeignKey(
+        Processus,
+        on_delete=models.CASCADE,
+        related_name='kpi_snapshots'
+    )
+    annee = models.IntegerField(null=True, blank=True)
+    num_amendement = models.PositiveIntegerField(default=0)
+    is_validated = models.BooleanField(default=False)
+    metrics = models.JSONField(
+        default=dict,
+        help_text="Compteurs du document (ex: traitements, suivis, échéances par date)"
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'kpi_snapshot'
+        verbose_name = 'Snapshot KPI'
+        verbose_name_plural = 'Snapshots KPI'
+        constraints = [
+            models.UniqueConstraint(fields=['module', 'source_uuid'], name='uniq_kpi_snapshot_module_source')
+        ]
+        indexes = [
+            models.Index(fields=['module', 'processus']),
+        ]
+
+    def __str__(self):
+        return f"{self.module} {self.processus_id} {self.annee} v{self.num_amendement}"
+
+
+class ReferenceChange(models.Model):
+    """
+    Journal des modifications des données de référence (synchronisation différentielle).
+
+    Une ligne par élément du bundle de référence modifié, créé, désactivé ou supprimé ;
+    l'id auto-incrémenté sert de numéro de version. Seule la dernière modification de
+    chaque élément est conservée (compactage à l'écriture, voir
+    parametre/reference_bundle_signals.py) : le journal reste borné par la taille des
+    référentiels et une version, même ancienne, reste toujours rattrapable.
+    """
+    id = models.BigAutoField(primary_key=True)
+    table = models.CharField(max_length=50, help_text="Table du bundle (ex: natures, processus)")
+    object_uuid = models.UUIDField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'reference_change'
+        verbose_name = 'Modification de référentiel'
+        verbose_name_plural = 'Modifications de référentiels'
+        indexes = [
+            models.Index(fields=['table', 'object_uuid']),
+        ]
+
+    def __str__(self):
+        return f"#{self.id} {self.table} {self.object_uuid}"
+
+
+class UserActivityStats(models.Model):
+    """
+    Compteurs d'activité pré-agrégés d'un utilisateur (liste et détail admin des utilisateurs).
+
+    Mis à jour à l'écriture des ActivityLog et des FailedLoginAttempt (voir
+    parametre/services/user_activity_stats.py) : les totaux couvrent tout l'historique,
+    y compris les lignes depuis archivées. Les compteurs sur 30 jours sont tenus par
+    jour dans `recent_days` ({'AAAA-MM-JJ': [connexions, actions, échecs]}).
+    Reconstruction complète :
+        python manage.py rebuild_user_activity_stats
+    """
+    RECENT_DAYS = 30
+
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='activity_stats'
+    )
+    last_login_at = models.DateTimeField(null=True, blank=True)
+    last_login_ip = models.GenericIPAddressField(null=True, blank=True)
+    last_login_device = models.CharField(max_length=20, null=True, blank=True)
+    last_login_browser = models.CharField(max_length=100, null=True, blank=True)
+    last_login_os = models.CharField(max_length=100, null=True, blank=True)
+    last_logout_at = models.DateTimeField(null=True, blank=True)
+    last_activity_at = models.DateTimeField(null=True, blank=True)
+    total_logins = models.PositiveIntegerField(default=0)
+    total_actions = models.PositiveIntegerField(default=0)
+    failed_logins_count = models.PositiveIntegerField(default=0)
+    recent_days = models.JSONField(
+        default=dict,
+        help_text="Compteurs par jour sur la fenêtre glissante : {'AAAA-MM-JJ': [connexions, actions, échecs]}"
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'user_activity_stats'
+        verbose_name = 'Statistiques d\'activité utilisateur'
+        verbose_name_plural = 'Statistiques d\'activité utilisateurs'
+
+    def __str__(self):
+        return f"{self.user_id} — {self.total_actions} action(s)"
+
+    def recent_counts(self, today=None):
+        """Connexions, actions et échecs de connexion des RECENT_DAYS derniers jours"""
+        from datetime import timedelta
+        today = today or timezone.localdate()
+        since = (today - timedelta(days=self.RECENT_DAYS - 1)).isoformat()
+        logins = actions = failed = 0
+        for day, counts in self.recent_days.items():
+            if day >= since:
+                logins += counts[0]
+                actions += counts[1]
+                failed += counts[2]
+        return {'logins_30d': logins, 'actions_30d': actions, 'failed_logins_30d': failed}
+
+
+class NumberSequence(models.Model):
+    """
+    Dernier numéro attribué par portée (numéros de PAC, processus, objectifs, détails CDR).
+
+    La portée est le nom de la séquence, suivi de la clé du parent pour les
+    numérotations locales (ex. 'objective_number:<uuid du tableau>'). Incrémentée
+    par parametre.services.sequence_allocator ; alignement sur les données existantes :
+        python manage.py backfill_number_sequences
+    """
+    scope = models.CharField(max_length=150, primary_key=True)
+    value = models.BigIntegerField(default=0, help_text="Dernier numéro attribué")
+
+    class Meta:
+        db_table = 'number_sequence'
+        verbose_name = 'Séquence de numérotation'
+        verbose_name_plural = 'Séquences de numérotation'
+
+    def __str__(self):
+        return f"{self.scope} = {self.value}"
+
+
+class BackgroundJob(models.Model):
+    """
+    Tâche longue exécutée hors requête HTTP (copie d'amendement, validation groupée,
+    déclenchement manuel d'un job du scheduler...).
+
+    Déposée par BackgroundJobService.enqueue() (parametre/services/background_jobs.py),
+    exécutée par le worker dédié :
+        python manage.py run_worker
+    Le client suit l'avancement sur /api/parametre/jobs/<uuid>/.
+    """
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_SUCCEEDED = 'succeeded'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'En attente'),
+        (STATUS_RUNNING, 'En cours'),
+        (STATUS_SUCCEEDED, 'Terminée'),
+        (STATUS_FAILED, 'Échouée'),
+    ]
+
+    uuid = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    task = models.CharField(max_length=100, help_text="Nom de la tâche (BackgroundJobService.TASKS)")
+    payload = models.JSONField(default=dict, encoder=DjangoJSONEncoder, help_text="Arguments de la tâche")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now, help_text="Pas d'exécution avant (reprise différée)")
+    progress = models.PositiveSmallIntegerField(default=0, help_text="Avancement (0-100)")
+    progress_message = models.CharField(max_length=255, blank=True, default='')
+    result = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    error = models.TextField(blank=True, default='')
+    worker = models.CharField(max_length=100, blank=True, default='', help_text="Worker (hôte:PID) en cours")
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    cree_par = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='background_jobs'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'background_job'
+        verbose_name = 'Tâche de fond'
+        verbose_name_plural = 'Tâches de fond'
+        indexes = [
+            models.Index(fields=['status', 'run_after']),
+        ]
+
+    def __str__(self):
+        return f"{self.task} {self.uuid} ({self.status})"
+
+
+class SchedulerCommand(models.Model):
+    """
+    Commande envoyée par un worker Gunicorn au service scheduler (reprogrammation,
+    déclenchement d'un job).
+
+    Déposée par SchedulerCommandChannel.send() et consommée par le service
+    (parametre/services/scheduler_commands.py) : le service l'acquitte dès sa prise
+    en charge puis enregistre son résultat, que l'admin lit sur
+    /api/parametre/admin/scheduler/commands/<id>/.
+    """
+    STATUS_PENDING = 'pending'
+    STATUS_ACKNOWLEDGED = 'acknowledged'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'En attente'),
+        (STATUS_ACKNOWLEDGED, 'Prise en charge'),
+        (STATUS_DONE, 'Appliquée'),
+        (STATUS_FAILED, 'Échouée'),
+    ]
+
+    id = models.BigAutoField(primary_key=True)
+    action = models.CharField(max_length=30, help_text="Action (reschedule, trigger)")
+    job_id = models.CharField(max_length=255)
+    params = models.JSONField(default=dict, encoder=DjangoJSONEncoder, help_text="Paramètres (ex: hour, minute)")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    result = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    error = models.TextField(blank=True, default='')
+    cree_par = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='scheduler_commands'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    acknowledged_at = models.DateTimeField(null=True, blank=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'scheduler_command'
+        verbose_name = 'Commande du scheduler'
+        verbose_name_plural = 'Commandes du scheduler'
+        indexes = [
+            models.Index(fields=['status', 'id']),
+        ]
+
+    def __str__(self):
+        return f"#{self.id} {self.action} {self.job_id} ({self.status})"
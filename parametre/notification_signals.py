@@ -0,0 +1,85 @@
+"""
+Signaux de matérialisation des notifications d'échéance.
+
+Un changement d'échéance (TraitementPac, PlanAction), de validation (CDR) ou d'attribution
+de rôle (UserProcessusRole) recalcule, après le commit, les notifications des objets
+concernés (NotificationMaterializer). Les suppressions retirent les notifications
+correspondantes (clé générique sans cascade). Après migrate, une base sans
+notification d'échéance est matérialisée entièrement (premier déploiement).
+"""
+import logging
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_migrate, post_save
+
+from parametre.services.notification_materializer import NotificationMaterializer
+
+logger = logging.getLogger(__name__)
+
+DISPATCH_UID_PREFIX = 'kora_notification_materializer'
+
+
+def _on_commit(func, *args, **kwargs):
+    def run():
+        try:
+            func(*args, **kwargs)
+        except Exception as e:
+            logger.error("[NotificationMaterializer] Erreur %s: %s", func.__name__, str(e))
+    transaction.on_commit(run)
+
+
+def traitement_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        _on_commit(NotificationMaterializer.materialize_pac, traitement_uuids=[instance.uuid])
+
+
+def plan_action_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        _on_commit(NotificationMaterializer.materialize_cdr, plan_uuids=[instance.uuid])
+
+
+def cdr_saved(sender, instance, raw=False, **kwargs):
+    # La validation d'une CDR rend ses plans d'action notifiables
+    if not raw:
+        _on_commit(NotificationMaterializer.materialize_cdr, processus_uuids=[instance.processus_id])
+
+
+def role_saved(sender, instance, raw=False, **kwargs):
+    # Nouveau destinataire potentiel pour les échéances du processus
+    if not raw and instance.processus_id and instance.is_active:
+        _on_commit(NotificationMaterializer.materialize_pac, processus_uuids=[instance.processus_id])
+        _on_commit(NotificationMaterializer.materialize_cdr, processus_uuids=[instance.processus_id])
+
+
+def object_deleted(sender, instance, **kwargs):
+    _on_commit(NotificationMaterializer.forget, sender, [instance.pk])
+
+
+def materialize_if_empty(sender, **kwargs):
+    """Après migrate : matérialise les notifications d'une base qui n'en a encore aucune"""
+    from parametre.models import Notification
+
+    try:
+        if not Notification.objects.filter(
+            source_app__in=('pac', 'cartographie_risque'), notification_type__in=('traitement', 'plan_action'),
+        ).exists():
+            NotificationMaterializer.materialize_all()
+    except Exception as e:
+        logger.error("[NotificationMaterializer] Matérialisation initiale impossible: %s", str(e))
+
+
+def register(app_config):
+    """Connecte les signaux des modèles porteurs d'échéances"""
+    from cartographie_risque.models import CDR, PlanAction
+    from pac.models import TraitementPac
+    from parametre.models import UserProcessusRole
+
+    post_save.connect(traitement_saved, sender=TraitementPac, dispatch_uid=f'{DISPATCH_UID_PREFIX}_traitement')
+    post_save.connect(plan_action_saved, sender=PlanAction, dispatch_uid=f'{DISPATCH_UID_PREFIX}_plan_action')
+    post_save.connect(cdr_saved, sender=CDR, dispatch_uid=f'{DISPATCH_UID_PREFIX}_cdr')
+    post_save.connect(role_saved, sender=UserProcessusRole, dispatch_uid=f'{DISPATCH_UID_PREFIX}_role')
+    for model in (TraitementPac, PlanAction):
+        post_delete.connect(
+            object_deleted, sender=model, dispatch_uid=f'{DISPATCH_UID_PREFIX}_{model._meta.model_name}_delete'
+        )
+    post_migrate.connect(materialize_if_empty, sender=app_config, dispatch_uid=f'{DISPATCH_UID_PREFIX}_post_migrate')
@@ -0,0 +1,53 @@
+"""
+Signaux du bundle des données de référence (journal et invalidation).
+
+Toute écriture sur un référentiel (modèles HasActiveStatus, plus Statut, Mois et
+Frequence qui figurent dans le bundle) :
+- est journalisée dans ReferenceChange, dans la transaction de l'écriture
+  (synchronisation différentielle) ;
+- incrémente après le commit la version de cache des tables qui en dépendent
+  (ReferenceBundleService) : la prochaine lecture les re-rend et l'ETag change.
+"""
+import logging
+
+from django.apps import apps
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+
+from parametre.services.reference_bundle_service import ReferenceBundleService
+
+logger = logging.getLogger(__name__)
+
+DISPATCH_UID_PREFIX = 'kora_reference_bundle'
+
+
+def reference_changed(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+
+    try:
+        # Point de sauvegarde : un échec du journal ne doit pas annuler l'écriture métier
+        with transaction.atomic():
+            ReferenceBundleService.record_changes(sender, [instance.pk])
+    except Exception as e:
+        logger.error("[ReferenceBundleService] Erreur de journalisation %s: %s", sender.__name__, str(e))
+
+    def run():
+        try:
+            ReferenceBundleService.invalidate_model(sender)
+        except Exception as e:
+            logger.error("[ReferenceBundleService] Erreur d'invalidation %s: %s", sender.__name__, str(e))
+    transaction.on_commit(run)
+
+
+def register():
+    """Connecte les signaux des modèles de référence"""
+    from parametre.models import HasActiveStatus
+
+    bundle_models = ReferenceBundleService.models()
+    for model in apps.get_models():
+        if not (issubclass(model, HasActiveStatus) or model in bundle_models):
+            continue
+        uid = f'{DISPATCH_UID_PREFIX}_{model._meta.label_lower}'
+        post_save.connect(reference_changed, sender=model, dispatch_uid=f'{uid}_save')
+        post_delete.connect(reference_changed, sender=model, dispatch_uid=f'{uid}_delete')
@@ -3,9 +3,11 @@ Configuration du scheduler APScheduler pour les notifications automatiques.
 
 Architecture production : le scheduler tourne comme service systemd séparé
 (python manage.py run_scheduler), indépendamment des workers Gunicorn.
-Les workers Gunicorn communiquent avec lui via des fichiers de commandes JSON
-déposés dans /tmp (préfixe kora_cmd_*.json) et lus toutes les 30 secondes par
-un thread dédié (_poller_loop), volontairement hors d'APScheduler.
+Les workers Gunicorn lui envoient leurs commandes par la table scheduler_command
+(parametre/services/scheduler_commands.py) : un thread dédié (_poller_loop),
+volontairement hors d'APScheduler, les applique dès le réveil par la socket Unix
+locale (au plus tard SCHEDULER_COMMAND_POLL_INTERVAL secondes après l'envoi),
+les acquitte et enregistre leur résultat.
 """
 import atexit
 import logging
@@ -13,6 +15,7 @@ import os
 import platform
 import tempfile
 import threading
+import time
 
 from apscheduler.schedulers.background import BackgroundScheduler
 from django_apscheduler.jobstores import DjangoJobStore, register_events
@@ -224,91 +227,97 @@ def flush_expired_tokens_job():
         logger.error("SCHEDULER — erreur purge tokens JWT: %s", e, exc_info=True)
 
 
+def materialize_notifications_job():
+    """Job pour recalculer les notifications d'échéance au changement de date."""
+    try:
+        logger.info("SCHEDULER — matérialisation des notifications d'échéance")
+        call_command('materialize_notifications')
+        logger.info("SCHEDULER — matérialisation des notifications d'échéance terminée")
+    except Exception as e:
+        logger.error("SCHEDULER — erreur matérialisation notifications: %s", e, exc_info=True)
+
+
+def rebuild_kpi_snapshots_job():
+    """Reconstruit les snapshots KPI (rattrape les écritures qui contournent les signaux)."""
+    try:
+        logger.info("SCHEDULER — reconstruction des snapshots KPI")
+        call_command('rebuild_kpi_snapshots')
+        logger.info("SCHEDULER — reconstruction des snapshots KPI terminée")
+    except Exception as e:
+        logger.error("SCHEDULER — erreur reconstruction snapshots KPI: %s", e, exc_info=True)
+
+
+def archive_logs_job():
+    """
+    Archive les journaux échus (ActivityLog, PermissionAudit) dans des fichiers mensuels compressés.
+    Sans effet tant qu'aucune rétention n'est configurée (LOG_ARCHIVE_RETENTION_DAYS).
+    """
+    try:
+        logger.info("SCHEDULER — archivage des journaux")
+        call_command('archive_logs')
+        logger.info("SCHEDULER — archivage des journaux terminé")
+    except Exception as e:
+        logger.error("SCHEDULER — erreur archivage des journaux: %s", e, exc_info=True)
+
+
 # ─────────────────────────────────────────────
 # IPC cross-process (Gunicorn ↔ scheduler service)
 # ─────────────────────────────────────────────
 
-# Préfixe des fichiers de commandes déposés par les workers Gunicorn.
-_CMD_PREFIX = 'kora_cmd_'
-
-
-def write_scheduler_command(action, job_id, **kwargs):
+def send_scheduler_command(action, job_id, user=None, **params):
     """
-    Dépose un fichier de commande JSON dans /tmp pour le scheduler service.
+    Dépose une commande pour le service scheduler et le réveille après le commit.
     Appelé depuis les workers Gunicorn (endpoints admin).
 
     Actions supportées : 'reschedule' (+ hour, minute), 'trigger'.
+
+    Returns:
+        SchedulerCommand: à suivre par son id (statut, acquittement, résultat)
     """
-    import json
-    import uuid
-    cmd = {'action': action, 'job_id': job_id, **kwargs}
-    cmd_file = os.path.join(tempfile.gettempdir(), f'{_CMD_PREFIX}{uuid.uuid4().hex}.json')
-    try:
-        with open(cmd_file, 'w') as f:
-            json.dump(cmd, f)
-        logger.debug("Commande scheduler écrite: %s → %s", action, cmd_file)
-    except Exception as e:
-        logger.error("Impossible d'écrire la commande scheduler: %s", e)
-        raise
+    from parametre.services.scheduler_commands import SchedulerCommandChannel
+    return SchedulerCommandChannel.send(action, job_id, user=user, **params)
 
 
-def _poll_scheduler_commands():
+def _apply_scheduler_command(command):
     """
-    Lit les fichiers de commandes déposés par les workers Gunicorn et les
-    applique au scheduler en mémoire. Appelé toutes les 30 secondes par
-    _poller_loop, un thread dédié — volontairement HORS d'APScheduler (voir
-    _poller_loop pour le pourquoi).
+    Applique une commande au scheduler en mémoire ; le résultat (dict) est
+    enregistré sur la commande, une exception la marque en échec.
     """
-    import glob
-    import json
+    action = command.action
+    job_id = command.job_id
+    logger.info("[SCHEDULER] Commande #%s: action=%s job_id=%s", command.id, action, job_id)
+
+    current_job = scheduler.get_job(job_id)
+    if current_job is None:
+        raise ValueError(f"Job inconnu : {job_id}")
+
+    if action == 'reschedule':
+        h = int(command.params['hour'])
+        m = int(command.params['minute'])
+        new_trigger = rebuild_cron_trigger(current_job.trigger, h, m)
+        scheduler.reschedule_job(job_id, trigger=new_trigger)
+        updated_job = scheduler.get_job(job_id)
+        next_run = updated_job.next_run_time if updated_job else None
+        sync_job_next_run_time(job_id, new_trigger, scheduler_instance=scheduler, next_run_time=next_run)
+        # Relire le job en mémoire pour confirmer que le changement a bien
+        # été appliqué au scheduler actif (pas seulement écrit en DB).
+        logger.info(
+            "[SCHEDULER] Job '%s' reprogrammé → %02dh%02d | prochaine exécution confirmée: %s",
+            job_id, h, m, next_run,
+        )
+        return {'hour': h, 'minute': m, 'next_run_time': next_run}
+
+    if action == 'trigger':
+        # Exécution confiée au worker des tâches de fond (run_worker) : suivie,
+        # reprise en cas d'arrêt, au lieu d'un thread nu dans ce process.
+        from parametre.services.background_jobs import BackgroundJobService
+        job = BackgroundJobService.enqueue(
+            'run_scheduler_job', {'job_id': job_id}, user=command.cree_par, max_attempts=1
+        )
+        logger.info("[SCHEDULER] Job '%s' déclenché manuellement (commande #%s)", job_id, command.id)
+        return {'background_job': str(job.uuid)}
 
-    pattern = os.path.join(tempfile.gettempdir(), f'{_CMD_PREFIX}*.json')
-    for cmd_file in sorted(glob.glob(pattern)):
-        cmd = None
-        try:
-            with open(cmd_file) as f:
-                cmd = json.load(f)
-            os.remove(cmd_file)
-        except Exception as e:
-            logger.error("Erreur lecture commande %s: %s", cmd_file, e)
-            try:
-                os.remove(cmd_file)
-            except Exception:
-                pass
-            continue
-
-        action = cmd.get('action')
-        job_id = cmd.get('job_id')
-        logger.info("[SCHEDULER] Commande détectée: action=%s job_id=%s", action, job_id)
-
-        try:
-            if action == 'reschedule':
-                h = int(cmd['hour'])
-                m = int(cmd['minute'])
-                current_job = scheduler.get_job(job_id)
-                base_trigger = current_job.trigger if current_job else None
-                new_trigger = rebuild_cron_trigger(base_trigger, h, m)
-                scheduler.reschedule_job(job_id, trigger=new_trigger)
-                updated_job = scheduler.get_job(job_id)
-                next_run = updated_job.next_run_time if updated_job else None
-                sync_job_next_run_time(job_id, new_trigger, scheduler_instance=scheduler, next_run_time=next_run)
-                # Relire le job en mémoire pour confirmer que le changement a bien
-                # été appliqué au scheduler actif (pas seulement écrit en DB).
-                logger.info(
-                    "[SCHEDULER] Job '%s' reprogrammé → %02dh%02d | prochaine exécution confirmée: %s",
-                    job_id, h, m, next_run,
-                )
-            elif action == 'trigger':
-                job = scheduler.get_job(job_id)
-                if job:
-                    threading.Thread(target=job.func, daemon=True).start()
-                    logger.info("[SCHEDULER] Job '%s' déclenché manuellement (commande externe)", job_id)
-                else:
-                    logger.warning("Trigger demandé pour job inconnu: %s", job_id)
-            else:
-                logger.warning("Action inconnue dans commande scheduler: %s", action)
-        except Exception as e:
-            logger.error("Erreur exécution commande %s/%s: %s", action, job_id, e)
+    raise ValueError(f"Action inconnue : {action}")
 
 
 # Le poller de commandes tourne dans un thread Python dédié, PAS comme job
@@ -317,7 +326,7 @@ def _poll_scheduler_commands():
 # démarre ; ce listener tente de logguer CHAQUE exécution de job (toutes
 # jobstores confondues) dans DjangoJobExecution via une FK vers DjangoJob(id).
 # Le poller vivait dans un jobstore 'memory' (MemoryJobStore standard, sans
-# ligne DjangoJob correspondante) : chaque cycle de 30s levait une
+# ligne DjangoJob correspondante) : chaque cycle levait une
 # IntegrityError avalée par django_apscheduler et journalisée comme
 # "Job '_kora_command_poller' no longer exists!". En sortant complètement le
 # poller du scheduler APScheduler, aucun JobExecutionEvent n'est jamais émis
@@ -326,12 +335,38 @@ _poller_stop_event = None
 _poller_thread = None
 
 
+# Purge des commandes traitées (secondes entre deux purges)
+_PURGE_INTERVAL = 3600
+
+
 def _poller_loop(stop_event):
-    while not stop_event.wait(30):
+    from django.conf import settings
+    from django.db import connection
+    from parametre.services.scheduler_commands import CommandWakeup, SchedulerCommandChannel
+
+    wakeup = CommandWakeup()
+    last_purge = 0.0
+    try:
         try:
-            _poll_scheduler_commands()
+            SchedulerCommandChannel.recover_interrupted()
         except Exception as e:
-            logger.error("Erreur dans la boucle du poller de commandes: %s", e, exc_info=True)
+            logger.error("Reprise des commandes interrompues impossible: %s", e, exc_info=True)
+            connection.close()
+        while not stop_event.is_set():
+            try:
+                # Commandes déposées pendant un arrêt du service appliquées dès le démarrage
+                SchedulerCommandChannel.consume(_apply_scheduler_command)
+                if time.monotonic() - last_purge > _PURGE_INTERVAL:
+                    SchedulerCommandChannel.purge()
+                    last_purge = time.monotonic()
+            except Exception as e:
+                logger.error("Erreur dans la boucle du poller de commandes: %s", e, exc_info=True)
+                # Connexion éventuellement perdue : rouverte au prochain passage
+                connection.close()
+            wakeup.wait(settings.SCHEDULER_COMMAND_POLL_INTERVAL, stop_event)
+    finally:
+        wakeup.close()
+        connection.close()
 
 
 # ─────────────────────────────────────────────
@@ -372,7 +407,6 @@ def start_scheduler(standalone=False):
         scheduler.start()
 
         # Laisser DjangoJobStore charger les jobs depuis la DB
-        import time
         time.sleep(0.2)
 
         existing_jobs = {job.id for job in scheduler.get_jobs()}
@@ -459,6 +493,57 @@ def start_scheduler(standalone=False):
         else:
             logger.info("Job %s deja charge depuis la DB", job_id_flush_tokens)
 
+        job_id_notifications = 'materialize_notifications_daily'
+        if job_id_notifications not in existing_jobs:
+            if not DjangoJob.objects.filter(id=job_id_notifications).exists():
+                scheduler.add_job(
+                    materialize_notifications_job,
+                    trigger='cron', hour=0, minute=5,
+                    id=job_id_notifications,
+                    name='Matérialisation quotidienne des notifications d échéance',
+                    replace_existing=False,
+                    max_instances=1, coalesce=True, misfire_grace_time=3600,
+                )
+                logger.info("Job %s cree (defaut 0h05)", job_id_notifications)
+            else:
+                logger.info("Job %s present en DB, DjangoJobStore doit le charger", job_id_notifications)
+        else:
+            logger.info("Job %s deja charge depuis la DB", job_id_notifications)
+
+        job_id_kpi = 'rebuild_kpi_snapshots_daily'
+        if job_id_kpi not in existing_jobs:
+            if not DjangoJob.objects.filter(id=job_id_kpi).exists():
+                scheduler.add_job(
+                    rebuild_kpi_snapshots_job,
+                    trigger='cron', hour=3, minute=0,
+                    id=job_id_kpi,
+                    name='Reconstruction quotidienne des snapshots KPI',
+                    replace_existing=False,
+                    max_instances=1, coalesce=True, misfire_grace_time=3600,
+                )
+                logger.info("Job %s cree (defaut 3h00)", job_id_kpi)
+            else:
+                logger.info("Job %s present en DB, DjangoJobStore doit le charger", job_id_kpi)
+        else:
+            logger.info("Job %s deja charge depuis la DB", job_id_kpi)
+
+        job_id_archive = 'archive_logs_daily'
+        if job_id_archive not in existing_jobs:
+            if not DjangoJob.objects.filter(id=job_id_archive).exists():
+                scheduler.add_job(
+                    archive_logs_job,
+                    trigger='cron', hour=3, minute=30,
+                    id=job_id_archive,
+                    name='Archivage quotidien des journaux',
+                    replace_existing=False,
+                    max_instances=1, coalesce=True, misfire_grace_time=3600,
+                )
+                logger.info("Job %s cree (defaut 3h30)", job_id_archive)
+            else:
+                logger.info("Job %s present en DB, DjangoJobStore doit le charger", job_id_archive)
+        else:
+            logger.info("Job %s deja charge depuis la DB", job_id_archive)
+
         # Poller de commandes : thread dédié, hors APScheduler (voir _poller_loop
         # pour le pourquoi — évite le warning "no longer exists!" de django_apscheduler).
         global _poller_stop_event, _poller_thread
@@ -468,7 +553,7 @@ def start_scheduler(standalone=False):
             name='kora-scheduler-command-poller', daemon=True,
         )
         _poller_thread.start()
-        logger.info("Poller de commandes démarré en thread dédié (intervalle 30s)")
+        logger.info("Poller de commandes démarré en thread dédié (réveil par socket Unix)")
 
         if not scheduler.running:
             raise RuntimeError("Le scheduler n'est pas actif apres le demarrage")
@@ -501,6 +586,9 @@ def _shutdown():
     global scheduler, _poller_stop_event, _poller_thread
     if _poller_stop_event:
         _poller_stop_event.set()
+        # Débloque l'attente sur la socket
+        from parametre.services.scheduler_commands import SchedulerCommandChannel
+        SchedulerCommandChannel.wake()
     if _poller_thread and _poller_thread.is_alive():
         _poller_thread.join(timeout=5)
     _poller_stop_event = None
@@ -0,0 +1,121 @@
+"""
+Flux d'activités (ActivityLog) paginés par curseur — logique métier pure, sans couche HTTP.
+
+Les endpoints recent_activities / user_activities acceptaient un ?limit= non
+borné et construisaient toute la liste en Python, sans moyen d'aller au-delà.
+Les pages sont désormais bornées (MAX_PAGE_SIZE) et découpées sur la clé
+(created_at, uuid), décroissante :
+
+    WHERE created_at < :c OR (created_at = :c AND uuid < :u)
+    ORDER BY created_at DESC, uuid DESC
+    LIMIT :limit + 1
+
+La requête parcourt l'index (user, -created_at) pour les flux d'un utilisateur,
+activity_log_cursor_idx (-created_at, -uuid) pour le flux global, et les index
+(action / entity_type, -created_at) pour les filtres admin : le coût d'une page
+ne dépend pas de sa position dans le journal.
+"""
+import base64
+import binascii
+import json
+import uuid as uuid_lib
+from datetime import datetime
+
+from django.db.models import Q
+from django.utils import timezone
+
+from parametre.models import ActivityLog
+
+
+class ActivityFeed:
+    """
+    Pagination par curseur et formatage des ActivityLog
+
+    Usage :
+        page = ActivityFeed.page(queryset, cursor=request.GET.get('cursor'), limit=request.GET.get('limit'))
+        # {'data': [...], 'count': int, 'next_cursor': str | None, 'has_more': bool}
+    """
+
+    DEFAULT_PAGE_SIZE = 20
+    MAX_PAGE_SIZE = 100
+
+    # ── Curseur ────────────────────────────────────────────────────────────────
+
+    @staticmethod
+    def encode_cursor(activity):
+        raw = json.dumps([activity.created_at.isoformat(), str(activity.uuid)])
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+    @staticmethod
+    def decode_cursor(cursor):
+        """(created_at, uuid) du dernier élément de la page précédente ; ValueError si invalide"""
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            created_at, object_uuid = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+            return datetime.fromisoformat(created_at), uuid_lib.UUID(object_uuid)
+        except (binascii.Error, UnicodeDecodeError, TypeError, ValueError) as e:
+            raise ValueError("Curseur invalide") from e
+
+    @classmethod
+    def page_size(cls, limit, default=None):
+        """Taille de page bornée à [1 ; MAX_PAGE_SIZE] ; valeur par défaut si absente ou invalide"""
+        default = default or cls.DEFAULT_PAGE_SIZE
+        try:
+            limit = int(limit) if limit not in (None, '') else default
+        except (TypeError, ValueError):
+            limit = default
+        return max(1, min(limit, cls.MAX_PAGE_SIZE))
+
+    # ── Pages ──────────────────────────────────────────────────────────────────
+
+    @classmethod
+    def page(cls, queryset, cursor=None, limit=None, default_limit=None):
+        """
+        Page suivant le curseur (première page si absent).
+
+        Raises:
+            ValueError: curseur invalide
+        """
+        limit = cls.page_size(limit, default_limit)
+        queryset = queryset.select_related('user').order_by('-created_at', '-uuid')
+        if cursor:
+            created_at, last_uuid = cls.decode_cursor(cursor)
+            queryset = queryset.filter(
+                Q(created_at__lt=created_at) | Q(created_at=created_at, uuid__lt=last_uuid)
+            )
+
+        activities = list(queryset[:limit + 1])
+        has_more = len(activities) > limit
+        activities = activities[:limit]
+
+        now = timezone.now()
+        data = [cls.serialize(activity, now) for activity in activities]
+        return {
+            'data': data,
+            'count': len(data),
+            'next_cursor': cls.encode_cursor(activities[-1]) if has_more else None,
+            'has_more': has_more,
+        }
+
+    @staticmethod
+    def serialize(activity, now):
+        """Format des flux d'activités (recent_activities, user_activities, admin)"""
+        user = activity.user
+        return {
+            'uuid': str(activity.uuid),
+            'user': {
+                'username': user.username,
+                'first_name': user.first_name,
+                'last_name': user.last_name,
+                'initials': f"{user.first_name[0] if user.first_name else ''}{user.last_name[0] if user.last_name else ''}".upper()
+            },
+            'action': activity.action,
+            'action_display': activity.get_action_display(),
+            'entity_type': activity.entity_type,
+            'entity_name': activity.entity_name,
+            'description': activity.description,
+            'time_ago': activity.time_ago_at(now),
+            'action_icon': ActivityLog.ACTION_ICONS.get(activity.action, {'icon': '?', 'color': 'gray'}),
+            'status_color': ActivityLog.STATUS_COLORS.get(activity.action, 'gray'),
+            'created_at': activity.created_at.isoformat()
+        }
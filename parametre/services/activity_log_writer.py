@@ -0,0 +1,191 @@
+"""
+Écriture asynchrone et groupée des ActivityLog
+
+log_activity faisait un ActivityLog.objects.create() synchrone (plus l'analyse du
+user-agent) dans chaque requête de création, modification, connexion et
+déconnexion. Les entrées sont désormais mises en file en mémoire (une file par
+worker) puis écrites par bulk_create, dès que la file atteint
+ACTIVITY_LOG_BATCH_SIZE ou toutes les ACTIVITY_LOG_FLUSH_INTERVAL secondes.
+
+- created_at est fixé à la mise en file : l'ordre et l'horodatage ne dépendent
+  pas du moment de l'écriture ;
+- la file est bornée (ACTIVITY_LOG_MAX_QUEUE_SIZE) : pleine, elle est vidée de
+  façon synchrone par l'appelant plutôt que de perdre des entrées ;
+- un lot refusé par la base est réécrit ligne par ligne : seule une entrée
+  elle-même invalide est écartée (et journalisée) ;
+- la file est vidée à l'arrêt du processus (atexit).
+"""
+import atexit
+import logging
+import os
+import threading
+from collections import deque
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+logger = logging.getLogger(__name__)
+
+
+class ActivityLogWriter:
+    """
+    File bornée d'ActivityLog, vidée par un thread de fond
+
+    Usage :
+        activity_log_writer.record(ActivityLog(user=..., action=..., ...))
+        activity_log_writer.flush()  # vidage synchrone (tests, arrêt du process)
+    """
+
+    def __init__(self):
+        self._queue = deque()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._pid = None
+        self.written = 0
+        self.overflows = 0
+
+    # ── Configuration ──────────────────────────────────────────────────────────
+
+    @property
+    def async_enabled(self):
+        return getattr(settings, 'ACTIVITY_LOG_ASYNC', True)
+
+    @property
+    def batch_size(self):
+        return getattr(settings, 'ACTIVITY_LOG_BATCH_SIZE', 200)
+
+    @property
+    def flush_interval(self):
+        return getattr(settings, 'ACTIVITY_LOG_FLUSH_INTERVAL', 2.0)
+
+    @property
+    def max_queue_size(self):
+        return getattr(settings, 'ACTIVITY_LOG_MAX_QUEUE_SIZE', 10000)
+
+    # ── API ────────────────────────────────────────────────────────────────────
+
+    def record(self, activity_log):
+        """
+        Met une entrée en file (ou l'écrit directement si le mode asynchrone est désactivé)
+        """
+        if not self.async_enabled:
+            self._write([activity_log])
+            return
+
+        with self._lock:
+            queue_full = len(self._queue) >= self.max_queue_size
+            if not queue_full:
+                self._queue.append(activity_log)
+                size = len(self._queue)
+
+        if queue_full:
+            # Écritures en retard : l'appelant vide la file plutôt que de perdre l'entrée
+            with self._lock:
+                self.overflows += 1
+                overflows = self.overflows
+            if overflows % 100 == 1:
+                logger.warning("[ActivityLogWriter] File pleine (%s), vidage synchrone", self.max_queue_size)
+            self.flush()
+            self._write([activity_log])
+            return
+
+        self._ensure_thread()
+        if size >= self.batch_size:
+            self._wakeup.set()
+
+    def flush(self):
+        """
+        Écrit toutes les entrées en file (appel synchrone)
+        """
+        with self._flush_lock:
+            while True:
+                with self._lock:
+                    batch = [self._queue.popleft() for _ in range(min(self.batch_size, len(self._queue)))]
+                if not batch:
+                    return
+                self._write(batch)
+
+    def stats(self):
+        """Compteurs du worker courant"""
+        with self._lock:
+            return {
+                'queued': len(self._queue),
+                'written': self.written,
+                'overflows': self.overflows,
+            }
+
+    # ── Interne ────────────────────────────────────────────────────────────────
+
+    def _write(self, activity_logs):
+        from django.contrib.auth.models import User
+        from parametre.models import ActivityLog
+        from parametre.services.user_activity_stats import UserActivityStatsService
+
+        try:
+            # Un utilisateur supprimé entre-temps ferait échouer tout le lot (FK) : on le filtre en une requête
+            user_ids = {activity_log.user_id for activity_log in activity_logs}
+            existing = set(User.objects.filter(id__in=user_ids).values_list('id', flat=True))
+            rows = [activity_log for activity_log in activity_logs if activity_log.user_id in existing]
+            with transaction.atomic():
+                ActivityLog.objects.bulk_create(rows, batch_size=self.batch_size)
+        except Exception as e:
+            logger.error(
+                "[ActivityLogWriter] Lot de %s activité(s) refusé, écriture ligne par ligne: %s",
+                len(activity_logs), str(e),
+            )
+            existing = None
+            rows = self._write_one_by_one(activity_logs)
+
+        with self._lock:
+            self.written += len(rows)
+
+        try:
+            # bulk_create n'émet pas post_save : les compteurs par utilisateur sont tenus ici
+            UserActivityStatsService.record_activities(rows, existing)
+        except Exception as e:
+            logger.error("[ActivityLogWriter] Erreur de mise à jour des compteurs utilisateurs: %s", str(e))
+
+    @staticmethod
+    def _write_one_by_one(activity_logs):
+        """Écrit chaque entrée sous son propre point de sauvegarde ; renvoie les entrées écrites"""
+        from parametre.models import ActivityLog
+
+        written = []
+        for activity_log in activity_logs:
+            try:
+                with transaction.atomic():
+                    ActivityLog.objects.bulk_create([activity_log])
+            except Exception as e:
+                logger.error(
+                    "[ActivityLogWriter] Activité écartée (user=%s, action=%s, %s): %s",
+                    activity_log.user_id, activity_log.action, activity_log.created_at, str(e),
+                )
+                continue
+            written.append(activity_log)
+        return written
+
+    def _ensure_thread(self):
+        # Après un fork (workers gunicorn), le thread du parent n'existe plus dans l'enfant
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='activity-log-writer', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            finally:
+                close_old_connections()
+
+
+activity_log_writer = ActivityLogWriter()
+atexit.register(activity_log_writer.flush)
@@ -0,0 +1,204 @@
+"""
+Copie groupée d'arborescences de documents (clonage des amendements) — logique métier pure.
+
+Le clonage d'un tableau de bord (objectifs, indicateurs, cibles, périodicités) et
+d'un PAC (détails, traitements, suivis) créait chaque ligne par objects.create()
+dans des boucles imbriquées, avec une requête de plus par indicateur pour sa
+cible : environ 1000 requêtes pour un tableau de 200 indicateurs.
+
+GraphCopier copie un niveau de l'arborescence à la fois : une lecture de toutes
+les lignes du niveau, un bulk_create, puis une lecture et un bulk_create par
+relation ManyToMany. Les clés étrangères vers le niveau parent sont remappées
+sur les copies ; les autres sont reprises telles quelles.
+
+bulk_create n'émet pas post_save : après la copie, les snapshots KPI, les
+notifications d'échéance et le cache des rendus du document cible sont
+recalculés ou invalidés explicitement.
+"""
+import logging
+
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+
+class CopyLevel:
+    """
+    Niveau d'une arborescence à copier
+
+    Args:
+        model: modèle des lignes du niveau
+        parent: nom de la clé étrangère vers le niveau parent
+        fields: champs copiés tels quels (clés étrangères comprises, par id)
+        m2m: relations ManyToMany copiées (mêmes cibles)
+        values: valeurs imposées sur les copies (ex. cree_par)
+        condition: Q limitant les lignes copiées
+        children: niveaux enfants
+    """
+
+    def __init__(self, model, parent, fields, m2m=(), values=None, condition=None, children=()):
+        self.model = model
+        self.parent = parent
+        self.fields = [model._meta.get_field(name).attname for name in fields]
+        self.m2m = list(m2m)
+        self.values = values or {}
+        self.condition = condition
+        self.children = list(children)
+
+
+class GraphCopier:
+    """
+    Copie d'arborescences niveau par niveau (lecture groupée + bulk_create)
+
+    Usage :
+        copies = GraphCopier.copy(levels, {source.pk: target.pk})
+        # {modèle: [copies créées]}
+    """
+
+    BATCH_SIZE = 500
+
+    @classmethod
+    def copy(cls, levels, mapping, copies=None):
+        """
+        Copie les niveaux sous les parents de `mapping` (ancienne clé -> nouvelle clé).
+
+        Returns:
+            dict: {modèle: [instances créées]}
+        """
+        copies = {} if copies is None else copies
+        for level in levels:
+            child_mapping = cls._copy_level(level, mapping, copies)
+            if level.children and child_mapping:
+                cls.copy(level.children, child_mapping, copies)
+        return copies
+
+    @classmethod
+    def _copy_level(cls, level, mapping, copies):
+        model = level.model
+        parent_attname = model._meta.get_field(level.parent).attname
+        sources = model.objects.filter(**{f'{level.parent}__in': list(mapping)})
+        if level.condition is not None:
+            sources = sources.filter(level.condition)
+
+        new_pks = {}
+        created = []
+        for source in sources:
+            copy = model(
+                **{attname: getattr(source, attname) for attname in level.fields},
+                **{parent_attname: mapping[getattr(source, parent_attname)]},
+                **level.values,
+            )
+            new_pks[source.pk] = copy.pk
+            created.append(copy)
+        if not created:
+            return {}
+
+        model.objects.bulk_create(created, batch_size=cls.BATCH_SIZE)
+        copies.setdefault(model, []).extend(created)
+
+        for name in level.m2m:
+            cls._copy_m2m(model, name, new_pks)
+        return new_pks
+
+    @classmethod
+    def _copy_m2m(cls, model, name, new_pks):
+        field = model._meta.get_field(name)
+        through = field.remote_field.through
+        source_attname = through._meta.get_field(field.m2m_field_name()).attname
+        target_attname = through._meta.get_field(field.m2m_reverse_field_name()).attname
+
+        links = through.objects.filter(**{f'{source_attname}__in': list(new_pks)}).values_list(
+            source_attname, target_attname
+        )
+        through.objects.bulk_create(
+            [through(**{source_attname: new_pks[source], target_attname: target}) for source, target in links],
+            batch_size=cls.BATCH_SIZE,
+        )
+
+
+class AmendmentCopier:
+    """
+    Clonage du contenu d'un document vers son amendement
+
+    Usage :
+        AmendmentCopier.copy_tableau_bord(source_tableau, amendement, user)
+        AmendmentCopier.copy_pac(source_pac, amendement, user)
+    """
+
+    @staticmethod
+    def tableau_bord_levels(user):
+        from dashboard.models import Indicateur, Objectives
+        from parametre.models import Cible, Periodicite
+
+        return [
+            CopyLevel(Objectives, 'tableau_bord', ['number', 'libelle'], values={'cree_par': user}, children=[
+                CopyLevel(Indicateur, 'objective_id', ['libelle', 'frequence_id'], children=[
+                    CopyLevel(Cible, 'indicateur_id', ['valeur', 'condition']),
+                    CopyLevel(Periodicite, 'indicateur_id', ['periode', 'a_realiser', 'realiser', 'taux']),
+                ]),
+            ]),
+        ]
+
+    @staticmethod
+    def pac_levels(user):
+        from django.db.models import Q
+        from pac.models import DetailsPac, PacSuivi, TraitementPac
+
+        return [
+            CopyLevel(DetailsPac, 'pac', [
+                'numero_pac', 'libelle', 'dysfonctionnement_recommandation', 'nature', 'categorie', 'source',
+                'periode_de_realisation',
+            ], children=[
+                CopyLevel(TraitementPac, 'details_pac', [
+                    'action', 'type_action', 'delai_realisation', 'responsable_direction', 'responsable_sous_direction',
+                ], m2m=['responsables_directions', 'responsables_sous_directions'], children=[
+                    # Chaque amendement repart avec sa propre preuve vide : partager la preuve
+                    # ferait apparaître les médias ajoutés sur le nouvel amendement dans les précédents.
+                    CopyLevel(PacSuivi, 'traitement', [
+                        'etat_mise_en_oeuvre', 'resultat', 'appreciation', 'statut',
+                        'date_mise_en_oeuvre_effective', 'date_cloture',
+                    ], values={'cree_par': user, 'preuve': None},
+                        condition=Q(etat_mise_en_oeuvre__isnull=False, appreciation__isnull=False)),
+                ]),
+            ]),
+        ]
+
+    @classmethod
+    def copy_tableau_bord(cls, source, target, user):
+        """Copie objectifs, indicateurs, cibles et périodicités ; renvoie le nombre d'objectifs copiés"""
+        from dashboard.models import Objectives
+        from parametre.services.document_cache import DocumentCache
+        from parametre.services.kpi_snapshot_service import KpiSnapshotService
+
+        with transaction.atomic():
+            copies = GraphCopier.copy(cls.tableau_bord_levels(user), {source.pk: target.pk})
+            KpiSnapshotService.mark_dirty('dashboard', target.pk)
+            DocumentCache.mark_changed(DocumentCache.TABLEAU_BORD, target.pk)
+        logger.info(
+            "[AmendmentCopier] Tableau %s -> %s : %s",
+            source.pk, target.pk, {model.__name__: len(rows) for model, rows in copies.items()},
+        )
+        return len(copies.get(Objectives, []))
+
+    @classmethod
+    def copy_pac(cls, source, target, user):
+        """Copie détails, traitements (avec responsables) et suivis ; renvoie le nombre de détails copiés"""
+        from pac.models import DetailsPac, TraitementPac
+        from parametre.services.document_cache import DocumentCache
+        from parametre.services.kpi_snapshot_service import KpiSnapshotService
+        from parametre.services.notification_materializer import NotificationMaterializer
+
+        with transaction.atomic():
+            copies = GraphCopier.copy(cls.pac_levels(user), {source.pk: target.pk})
+            KpiSnapshotService.mark_dirty('pac', target.pk)
+            DocumentCache.mark_changed(DocumentCache.PAC, target.pk)
+            traitement_uuids = [traitement.pk for traitement in copies.get(TraitementPac, [])]
+            if traitement_uuids:
+                transaction.on_commit(
+                    lambda: NotificationMaterializer.materialize_pac(traitement_uuids=traitement_uuids)
+                )
+        logger.info(
+            "[AmendmentCopier] PAC %s -> %s : %s",
+            source.pk, target.pk, {model.__name__: len(rows) for model, rows in copies.items()},
+        )
+        return len(copies.get(DetailsPac, []))
@@ -0,0 +1,198 @@
+"""
+Diffusion des changements de statut des applications (flux SSE app-status/stream)
+
+Chaque client SSE interrogeait ApplicationConfig toutes les 3 secondes et
+immobilisait un worker dans time.sleep(). L'état est désormais tenu une fois par
+processus et poussé à tous les abonnés :
+
+- post_save / post_delete d'ApplicationConfig publient un changement après le
+  commit (parametre/app_status_signals.py) : rechargement local immédiat et
+  incrément du compteur partagé `app_status:version` (cache 'shared') ;
+- un seul thread de fond par processus relit ce compteur toutes les
+  APP_STATUS_POLL_INTERVAL secondes (changements faits par les autres workers)
+  et la base toutes les APP_STATUS_DB_POLL_INTERVAL secondes en filet de
+  sécurité (queryset.update, modifications SQL directes) ;
+- les abonnés asynchrones (ASGI) sont réveillés via leur boucle asyncio, les
+  abonnés synchrones (WSGI) via une condition ; les heartbeats sont émis par
+  minuterie côté abonné, sans requête.
+"""
+import hashlib
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = 'app_status:version'
+
+
+class AppStatusBroadcaster:
+    """
+    État courant des ApplicationConfig, partagé par tous les flux SSE du processus
+
+    Usage :
+        state = app_status_broadcaster.current()          # (version, hash, configs)
+        app_status_broadcaster.publish()                  # après modification
+        state = app_status_broadcaster.wait(version, 15)  # abonné synchrone
+        event = app_status_broadcaster.subscribe_async()  # abonné asynchrone
+    """
+
+    def __init__(self):
+        self._state = None
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._async_subscribers = set()
+        self._thread = None
+        self._pid = None
+        self._shared_version = None
+        self._last_db_poll = 0.0
+
+    # ── Configuration ──────────────────────────────────────────────────────────
+
+    @property
+    def poll_interval(self):
+        return getattr(settings, 'APP_STATUS_POLL_INTERVAL', 1.0)
+
+    @property
+    def db_poll_interval(self):
+        return getattr(settings, 'APP_STATUS_DB_POLL_INTERVAL', 30.0)
+
+    @property
+    def heartbeat_interval(self):
+        return getattr(settings, 'APP_STATUS_HEARTBEAT_INTERVAL', 15.0)
+
+    @staticmethod
+    def _shared_cache():
+        from django.core.cache import caches
+        return caches['shared']
+
+    # ── État ───────────────────────────────────────────────────────────────────
+
+    @staticmethod
+    def _load():
+        """Retourne (hash_de_changement, configs) depuis la base."""
+        from parametre.models import ApplicationConfig
+        configs = tuple(
+            ApplicationConfig.objects.all()
+            .values('app_name', 'is_enabled', 'maintenance_message', 'maintenance_end')
+            .order_by('app_name')
+        )
+        # Hash basé uniquement sur les champs métier (is_enabled suffit)
+        change_hash = hashlib.md5(
+            str([(c['app_name'], c['is_enabled']) for c in configs]).encode()
+        ).hexdigest()
+        return change_hash, configs
+
+    def current(self):
+        """État courant (version, hash, configs) ; chargé depuis la base au premier appel"""
+        state = self._state
+        if state is None:
+            state = self.refresh()
+        return state
+
+    def refresh(self):
+        """Relit la base et notifie les abonnés si le statut a changé"""
+        change_hash, configs = self._load()
+        with self._changed:
+            state = self._state
+            if state is not None and state[1] == change_hash:
+                # Même statut : on garde les données à jour sans réveiller personne
+                self._state = (state[0], change_hash, configs)
+                return self._state
+            version = state[0] + 1 if state is not None else 1
+            self._state = (version, change_hash, configs)
+            self._changed.notify_all()
+            subscribers = list(self._async_subscribers)
+        closed = []
+        for loop, event in subscribers:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                # Boucle fermée : l'abonné a disparu sans se désinscrire
+                closed.append((loop, event))
+        if closed:
+            with self._lock:
+                self._async_subscribers.difference_update(closed)
+        return self._state
+
+    def publish(self):
+        """Signale un changement : rechargement local et diffusion aux autres processus"""
+        try:
+            cache = self._shared_cache()
+            cache.add(VERSION_KEY, 0, timeout=None)
+            self._shared_version = cache.incr(VERSION_KEY)
+        except Exception as e:
+            # Cache partagé indisponible : les autres workers rattraperont au poll de la base
+            logger.warning("[AppStatusBroadcaster] Publication impossible: %s", str(e))
+        return self.refresh()
+
+    # ── Abonnés ────────────────────────────────────────────────────────────────
+
+    def wait(self, version, timeout):
+        """Attend un état plus récent que `version` (abonné synchrone) ; None au timeout"""
+        self.ensure_poller()
+        with self._changed:
+            self._changed.wait_for(lambda: self._state is not None and self._state[0] != version, timeout)
+            state = self._state
+        return state if state is not None and state[0] != version else None
+
+    def subscribe_async(self):
+        """Inscrit un abonné asynchrone ; retourne l'asyncio.Event levé à chaque changement"""
+        import asyncio
+
+        self.ensure_poller()
+        event = asyncio.Event()
+        with self._lock:
+            self._async_subscribers.add((asyncio.get_running_loop(), event))
+        return event
+
+    def unsubscribe_async(self, event):
+        with self._lock:
+            self._async_subscribers = {item for item in self._async_subscribers if item[1] is not event}
+
+    # ── Thread de fond (un par processus) ──────────────────────────────────────
+
+    def ensure_poller(self):
+        # Après un fork (workers gunicorn), le thread du parent n'existe plus dans l'enfant
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='app-status-broadcaster', daemon=True)
+            self._thread.start()
+
+    def poll(self):
+        """Un passage du thread de fond : compteur partagé, puis base si nécessaire"""
+        try:
+            shared_version = self._shared_cache().get(VERSION_KEY, 0)
+        except Exception:
+            shared_version = None
+
+        now = time.monotonic()
+        if (
+            shared_version != self._shared_version
+            or self._state is None
+            or now - self._last_db_poll >= self.db_poll_interval
+        ):
+            self._shared_version = shared_version
+            self._last_db_poll = now
+            self.refresh()
+
+    def _run(self):
+        while True:
+            time.sleep(self.poll_interval)
+            try:
+                self.poll()
+            except Exception as e:
+                logger.error("[AppStatusBroadcaster] Erreur de rafraîchissement: %s", str(e))
+            finally:
+                close_old_connections()
+
+
+app_status_broadcaster = AppStatusBroadcaster()
@@ -0,0 +1,97 @@
+"""
+Instantané local (par processus) des ApplicationConfig
+
+ApplicationMaintenanceMiddleware faisait un ApplicationConfig.objects.get() à
+chaque appel d'API d'une application, pour une table modifiée quelques fois par an.
+Toutes les lignes sont désormais gardées en mémoire avec la version partagée
+`app_status:version` (cache 'shared', incrémentée par les signaux d'ApplicationConfig,
+parametre/app_status_signals.py) :
+
+- la version partagée est relue au plus toutes les APP_CONFIG_SNAPSHOT_CHECK_INTERVAL
+  secondes ; l'instantané n'est rechargé depuis la base que si elle a changé ;
+- dans le processus qui a fait la modification, l'instantané est invalidé
+  immédiatement après le commit.
+"""
+import logging
+import threading
+import time
+
+from django.conf import settings
+
+from parametre.services.app_status_broadcaster import VERSION_KEY
+
+logger = logging.getLogger(__name__)
+
+# Valeur sentinelle : version partagée illisible
+_UNKNOWN = object()
+
+
+class ApplicationConfigSnapshot:
+    """
+    ApplicationConfig indexées par app_name, partagées par toutes les requêtes du processus
+
+    Usage :
+        config = application_config_snapshot.get('pac')  # dict ou None si non configurée
+        application_config_snapshot.invalidate()         # après modification
+    """
+
+    FIELDS = ('app_name', 'is_enabled', 'maintenance_message', 'maintenance_start', 'maintenance_end')
+
+    def __init__(self):
+        self._configs = None
+        self._version = _UNKNOWN
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def check_interval(self):
+        return getattr(settings, 'APP_CONFIG_SNAPSHOT_CHECK_INTERVAL', 0.5)
+
+    @staticmethod
+    def _shared_version():
+        from django.core.cache import caches
+        try:
+            return caches['shared'].get(VERSION_KEY, 0)
+        except Exception:
+            return _UNKNOWN
+
+    def _load(self):
+        from parametre.models import ApplicationConfig
+        return {
+            config['app_name']: config
+            for config in ApplicationConfig.objects.values(*self.FIELDS)
+        }
+
+    def configs(self):
+        """Toutes les configurations ; rechargées si la version partagée a changé"""
+        now = time.monotonic()
+        if self._configs is not None and now - self._checked_at < self.check_interval:
+            return self._configs
+
+        with self._lock:
+            if self._configs is not None and now - self._checked_at < self.check_interval:
+                return self._configs
+            version = self._shared_version()
+            # Cache partagé illisible : rechargement à chaque vérification, comme avant
+            if self._configs is None or version is _UNKNOWN or version != self._version:
+                try:
+                    self._configs = self._load()
+                    self._version = version
+                except Exception as e:
+                    logger.error("[ApplicationConfigSnapshot] Rechargement impossible: %s", str(e))
+                    if self._configs is None:
+                        raise
+            self._checked_at = now
+            return self._configs
+
+    def get(self, app_name):
+        return self.configs().get(app_name)
+
+    def invalidate(self):
+        """Force le rechargement à la prochaine lecture"""
+        with self._lock:
+            self._configs = None
+            self._version = _UNKNOWN
+
+
+application_config_snapshot = ApplicationConfigSnapshot()
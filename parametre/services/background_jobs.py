@@ -0,0 +1,258 @@
+"""
+File de tâches de fond (BackgroundJob) — logique pure.
+
+Les opérations longues (copie d'un amendement, validation groupée de PACs,
+déclenchement manuel d'un job du scheduler) ne tiennent plus un worker Gunicorn
+pendant des dizaines de secondes : l'endpoint dépose une tâche et répond 202,
+le worker dédié l'exécute :
+
+    python manage.py run_worker
+
+- une tâche est réservée par un seul worker (select_for_update(skip_locked=True),
+  puis passage conditionnel pending → running) ;
+- une tâche en échec est reprise après BACKGROUND_JOB_RETRY_DELAY secondes,
+  délai doublé à chaque essai, jusqu'à max_attempts ; BackgroundJobError
+  l'arrête aussitôt (erreur métier, inutile de réessayer) ;
+- pendant l'exécution, un thread bat toutes les BACKGROUND_JOB_HEARTBEAT_INTERVAL
+  secondes (heartbeat_at), comme chaque appel à progress : une tâche en cours
+  silencieuse depuis BACKGROUND_JOB_STALE_AFTER secondes (worker tué) est reprise ;
+- chaque worker signale sa présence dans le cache partagé (worker_alive) : sans
+  worker actif, les endpoints n'ont pas à déposer une tâche qui resterait en attente.
+
+Les tâches sont des fonctions `tâche(progress, user=None, **payload)` déclarées
+dans TASKS (parametre/tasks.py) ; leur valeur de retour (JSON) devient `result`.
+"""
+import logging
+import os
+import socket
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+
+class BackgroundJobError(Exception):
+    """Échec définitif d'une tâche (pas de reprise) ; `result` est conservé sur la tâche"""
+
+    def __init__(self, message, result=None):
+        super().__init__(message)
+        self.result = result
+
+
+def worker_name():
+    """Identifiant du worker courant (hôte:PID)"""
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+# Clé de cache du dernier battement d'un worker (n'importe lequel)
+WORKER_HEARTBEAT_KEY = 'background_worker:heartbeat'
+
+
+class BackgroundJobService:
+    """
+    Dépôt, réservation et exécution des tâches de fond
+
+    Usage :
+        job = BackgroundJobService.enqueue('copy_pac_amendment', {'source': ..., 'target': ...}, user)
+        BackgroundJobService.run_pending()      # worker (run_worker) ou tests
+        BackgroundJobService.serialize(job)     # endpoint de statut
+    """
+
+    TASKS = {
+        'copy_pac_amendment': 'parametre.tasks.copy_pac_amendment',
+        'copy_tableau_bord_amendment': 'parametre.tasks.copy_tableau_bord_amendment',
+        'validate_pacs_by_amendement': 'parametre.tasks.validate_pacs_by_amendement',
+        'run_scheduler_job': 'parametre.tasks.run_scheduler_job',
+    }
+
+    @classmethod
+    def enqueue(cls, task, payload=None, user=None, max_attempts=3):
+        """Dépose une tâche ; elle n'est visible du worker qu'après le commit de la transaction courante"""
+        from parametre.models import BackgroundJob
+
+        if task not in cls.TASKS:
+            raise ValueError(f"Tâche de fond inconnue : {task}")
+        job = BackgroundJob.objects.create(
+            task=task,
+            payload=payload or {},
+            max_attempts=max_attempts,
+            cree_par=user if user is not None and user.is_authenticated else None,
+        )
+        logger.info("[BackgroundJob] %s déposée (%s)", task, job.uuid)
+        return job
+
+    # ── Présence des workers ───────────────────────────────────────────────────
+
+    @staticmethod
+    def record_worker_heartbeat(worker=None):
+        """Signale un worker actif pendant BACKGROUND_WORKER_TTL secondes"""
+        try:
+            cache.set(
+                WORKER_HEARTBEAT_KEY, {'worker': worker or worker_name(), 'at': timezone.now()},
+                timeout=settings.BACKGROUND_WORKER_TTL,
+            )
+        except Exception as e:
+            logger.warning("[BackgroundJob] Battement du worker non enregistré : %s", e)
+
+    @staticmethod
+    def worker_alive():
+        """Dernier battement d'un worker ({'worker', 'at'}) s'il est récent, sinon None"""
+        try:
+            return cache.get(WORKER_HEARTBEAT_KEY)
+        except Exception:
+            return None
+
+    # ── Worker ─────────────────────────────────────────────────────────────────
+
+    @classmethod
+    def claim(cls, worker=None):
+        """Réserve la plus ancienne tâche exécutable, ou None"""
+        from parametre.models import BackgroundJob
+
+        now = timezone.now()
+        worker = worker or worker_name()
+        with transaction.atomic():
+            job = (
+                BackgroundJob.objects.select_for_update(skip_locked=True)
+                .filter(status=BackgroundJob.STATUS_PENDING, run_after__lte=now)
+                .order_by('run_after', 'created_at')
+                .first()
+            )
+            if job is None:
+                return None
+            # Passage conditionnel : sûr même sans verrou de ligne (SQLite)
+            claimed = BackgroundJob.objects.filter(pk=job.pk, status=BackgroundJob.STATUS_PENDING).update(
+                status=BackgroundJob.STATUS_RUNNING, worker=worker, attempts=F('attempts') + 1,
+                started_at=now, heartbeat_at=now,
+            )
+        if not claimed:
+            return None
+        job.refresh_from_db()
+        return job
+
+    @classmethod
+    def run(cls, job):
+        """Exécute une tâche réservée et enregistre son résultat, sa reprise ou son échec"""
+        from parametre.models import BackgroundJob
+
+        def progress(percent, message=''):
+            BackgroundJob.objects.filter(pk=job.pk).update(
+                progress=max(0, min(100, int(percent))), progress_message=message[:255],
+                heartbeat_at=timezone.now(),
+            )
+
+        stop = threading.Event()
+        beat = threading.Thread(
+            target=cls._heartbeat, args=(job, stop), name=f'background-job-heartbeat-{job.pk}', daemon=True
+        )
+        beat.start()
+        try:
+            func = import_string(cls.TASKS[job.task])
+            result = func(progress, user=job.cree_par, **job.payload)
+        except Exception as e:
+            cls._failed(job, e)
+            return False
+        finally:
+            stop.set()
+            beat.join()
+
+        BackgroundJob.objects.filter(pk=job.pk).update(
+            status=BackgroundJob.STATUS_SUCCEEDED, progress=100, result=result, error='',
+            worker='', finished_at=timezone.now(),
+        )
+        logger.info("[BackgroundJob] %s terminée (%s)", job.task, job.uuid)
+        return True
+
+    @classmethod
+    def _heartbeat(cls, job, stop):
+        """Bat pendant une tâche longue qui n'appelle pas progress (ex. job du scheduler)"""
+        from parametre.models import BackgroundJob
+
+        try:
+            while not stop.wait(settings.BACKGROUND_JOB_HEARTBEAT_INTERVAL):
+                BackgroundJob.objects.filter(pk=job.pk, status=BackgroundJob.STATUS_RUNNING).update(
+                    heartbeat_at=timezone.now()
+                )
+                cls.record_worker_heartbeat(job.worker)
+        except Exception as e:
+            logger.warning("[BackgroundJob] Battement de %s (%s) interrompu : %s", job.task, job.uuid, e)
+        finally:
+            # Connexion propre à ce thread
+            connection.close()
+
+    @classmethod
+    def _failed(cls, job, error):
+        from parametre.models import BackgroundJob
+
+        now = timezone.now()
+        retry = not isinstance(error, BackgroundJobError) and job.attempts < job.max_attempts
+        if retry:
+            delay = settings.BACKGROUND_JOB_RETRY_DELAY * 2 ** (job.attempts - 1)
+            fields = {'status': BackgroundJob.STATUS_PENDING, 'run_after': now + timedelta(seconds=delay)}
+            logger.warning(
+                "[BackgroundJob] %s (%s) essai %s/%s en échec, reprise dans %ss : %s",
+                job.task, job.uuid, job.attempts, job.max_attempts, delay, error,
+            )
+        else:
+            fields = {'status': BackgroundJob.STATUS_FAILED, 'finished_at': now}
+            if isinstance(error, BackgroundJobError):
+                fields['result'] = error.result
+            logger.error(
+                "[BackgroundJob] %s (%s) échouée après %s essai(s) : %s",
+                job.task, job.uuid, job.attempts, error, exc_info=not isinstance(error, BackgroundJobError),
+            )
+        BackgroundJob.objects.filter(pk=job.pk).update(error=str(error)[:2000], worker='', **fields)
+
+    @classmethod
+    def run_pending(cls, worker=None, limit=None):
+        """Exécute les tâches exécutables jusqu'à épuisement (ou `limit`) ; renvoie le nombre exécuté"""
+        count = 0
+        while limit is None or count < limit:
+            job = cls.claim(worker)
+            if job is None:
+                break
+            cls.run(job)
+            count += 1
+        return count
+
+    @classmethod
+    def recover_stale(cls):
+        """Remet en attente les tâches en cours sans battement de cœur récent (worker arrêté en pleine tâche)"""
+        from parametre.models import BackgroundJob
+
+        limit = timezone.now() - timedelta(seconds=settings.BACKGROUND_JOB_STALE_AFTER)
+        stale = BackgroundJob.objects.filter(status=BackgroundJob.STATUS_RUNNING, heartbeat_at__lt=limit)
+        exhausted = stale.filter(attempts__gte=F('max_attempts')).update(
+            status=BackgroundJob.STATUS_FAILED, error='Worker arrêté pendant la tâche', worker='',
+            finished_at=timezone.now(),
+        )
+        recovered = stale.update(status=BackgroundJob.STATUS_PENDING, run_after=timezone.now(), worker='')
+        if recovered or exhausted:
+            logger.warning("[BackgroundJob] Tâches interrompues : %s reprise(s), %s échouée(s)", recovered, exhausted)
+        return recovered
+
+    # ── Lecture ────────────────────────────────────────────────────────────────
+
+    @staticmethod
+    def serialize(job):
+        return {
+            'uuid': str(job.uuid),
+            'task': job.task,
+            'status': job.status,
+            'progress': job.progress,
+            'progress_message': job.progress_message,
+            'attempts': job.attempts,
+            'max_attempts': job.max_attempts,
+            'result': job.result,
+            'error': job.error or None,
+            'created_at': job.created_at,
+            'started_at': job.started_at,
+            'finished_at': job.finished_at,
+        }
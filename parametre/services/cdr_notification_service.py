@@ -12,16 +12,17 @@ Chaîne de données :
             └── PlanActionResponsable [0..N] (Direction / SousDirection / Service)
 
 Utilisateurs notifiés : tous ceux qui ont un rôle actif sur le processus du CDR.
+Lecture seule : les lignes Notification sont écrites par NotificationMaterializer.
 """
 import logging
 
-from django.contrib.contenttypes.models import ContentType
 from django.utils import timezone
 
 from cartographie_risque.models import PlanAction
-from parametre.models import Notification, NotificationPolicy, UserProcessusRole
+from parametre.models import NotificationPolicy
+from parametre.services.notification_materializer import NotificationMaterializer
 from parametre.permissions import get_user_processus_list, is_super_admin
-from parametre.utils.notification_policy import should_notify_pac as should_notify  # même logique deadline
+from parametre.utils.notification_policy import deadline_window_q, should_notify_pac as should_notify  # même logique deadline
 
 logger = logging.getLogger(__name__)
 
@@ -30,15 +31,17 @@ logger = logging.getLogger(__name__)
 # Requêtes
 # ─────────────────────────────────────────────
 
-def _get_plans_for_user(user):
+def _get_plans_for_user(user, today, policy):
     """
     Retourne le queryset PlanAction filtré selon les droits de l'utilisateur.
     - Super admin : tous les plans des CDR validés
     - Autres : plans des CDR validés sur leurs processus uniquement
+    Limité en SQL à la fenêtre d'échéance de la politique (deadline_window_q).
     """
     user_processus_uuids = get_user_processus_list(user)
 
     base_qs = PlanAction.objects.filter(
+        deadline_window_q(today, policy),
         delai_realisation__isnull=False,
         details_cdr__cdr__is_validated=True,
     ).select_related(
@@ -122,7 +125,7 @@ def _build_notification_payload(plan, today):
         'responsables': _get_responsable_names(plan),
         'days_remaining': days_until_due,
         'delai_label': delai_label,
-        # Champs internes pour _sync_notifications
+        # Champs internes pour NotificationMaterializer
         '_plan_uuid': plan.uuid,
         '_title': title,
         '_message': message,
@@ -132,82 +135,6 @@ def _build_notification_payload(plan, today):
     }
 
 
-# ─────────────────────────────────────────────
-# Synchronisation Notification en base (bulk)
-# ─────────────────────────────────────────────
-
-def _sync_notifications(user, payloads):
-    """
-    Crée ou met à jour les objets Notification en base pour l'utilisateur
-    via bulk_create / bulk_update (pas de N+1).
-    Enrichit chaque payload avec 'notification_uuid' et 'read_at'.
-    """
-    if not payloads:
-        return
-
-    content_type = ContentType.objects.get_for_model(PlanAction)
-    plan_uuids = [p['_plan_uuid'] for p in payloads]
-
-    existing = {
-        n.object_id: n
-        for n in Notification.objects.filter(
-            user=user,
-            content_type=content_type,
-            object_id__in=plan_uuids,
-            source_app='cartographie_risque',
-            notification_type='plan_action',
-        )
-    }
-
-    to_create = []
-    to_update = []
-    update_fields = {'title', 'message', 'action_url', 'priority', 'due_date', 'updated_at'}
-
-    for payload in payloads:
-        uuid = payload['_plan_uuid']
-        title    = payload['_title']
-        message  = payload['_message']
-        action_url = payload['_action_url']
-        priority = payload['_priority']
-        due_date = payload['_due_date']
-
-        if uuid in existing:
-            notif = existing[uuid]
-            changed = False
-            if notif.title != title:       notif.title = title;             changed = True
-            if notif.message != message:   notif.message = message;         changed = True
-            if notif.action_url != action_url: notif.action_url = action_url; changed = True
-            if notif.priority != priority: notif.priority = priority;       changed = True
-            if notif.due_date != due_date: notif.due_date = due_date;       changed = True
-            if changed:
-                to_update.append(notif)
-            payload['notification_uuid'] = str(notif.uuid)
-            payload['read_at'] = notif.read_at.isoformat() if notif.read_at else None
-        else:
-            notif = Notification(
-                user=user,
-                content_type=content_type,
-                object_id=uuid,
-                source_app='cartographie_risque',
-                notification_type='plan_action',
-                title=title,
-                message=message,
-                action_url=action_url,
-                priority=priority,
-                due_date=due_date,
-            )
-            to_create.append((payload, notif))
-
-    if to_create:
-        new_notifs = Notification.objects.bulk_create([n for _, n in to_create])
-        for (payload, _), new_notif in zip(to_create, new_notifs):
-            payload['notification_uuid'] = str(new_notif.uuid)
-            payload['read_at'] = None
-
-    if to_update:
-        Notification.objects.bulk_update(to_update, fields=list(update_fields))
-
-
 # ─────────────────────────────────────────────
 # Point d'entrée principal
 # ─────────────────────────────────────────────
@@ -232,20 +159,21 @@ def get_cdr_notifications(user):
     today = timezone.now().date()
     policy = NotificationPolicy.get_for_scope(NotificationPolicy.SCOPE_CDR)
 
-    plans = _get_plans_for_user(user)
+    # Lecture seule : notifications matérialisées de l'utilisateur, puis plans correspondants
+    materialized = NotificationMaterializer.index(
+        user, PlanAction, 'cartographie_risque', 'plan_action', deadline_window_q(today, policy, field='due_date')
+    )
+    plans = _get_plans_for_user(user, today, policy).filter(uuid__in=list(materialized))
     payloads = []
 
     for plan in plans:
         if not should_notify(plan, today, policy):
             continue
-        payloads.append(_build_notification_payload(plan, today))
-
-    try:
-        _sync_notifications(user, payloads)
-    except Exception:
-        logger.exception(
-            "Erreur lors de la synchronisation des notifications CDR pour %s", user
-        )
+        payload = _build_notification_payload(plan, today)
+        notification_uuid, read_at = materialized[plan.uuid]
+        payload['notification_uuid'] = str(notification_uuid)
+        payload['read_at'] = read_at.isoformat() if read_at else None
+        payloads.append(payload)
 
     notifications = []
     for p in payloads:
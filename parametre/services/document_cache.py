@@ -0,0 +1,157 @@
+"""
+Cache des documents rendus (PAC complet, CDR, objectifs et analyse d'un tableau) — logique pure.
+
+Les vues « complet » sont lues bien plus souvent qu'elles ne sont modifiées, et
+une version validée ne change presque plus. Leur rendu est gardé en cache sous
+la clé :
+
+    document_cache:<type>:<uuid>:<vue>:<époque>.<révision>
+
+- la révision du document est incrémentée après le commit de toute écriture sur
+  le document ou une de ses lignes (signaux, parametre/document_cache_signals.py) ;
+- l'époque est incrémentée par les écritures sur les référentiels dont les noms
+  figurent dans les rendus (natures, directions, états...) ;
+- un document validé est gardé DOCUMENT_CACHE_VALIDATED_TIMEOUT secondes (quelques
+  jours), les autres DOCUMENT_CACHE_TIMEOUT secondes ; les rendus d'une révision
+  dépassée ne sont plus lus et expirent d'eux-mêmes ;
+- l'ETag (fort) est l'empreinte du rendu : If-None-Match → 304.
+
+Un compteur absent (premier accès, éviction) repart d'une valeur horodatée : une
+révision déjà utilisée n'est jamais réattribuée, un rendu périmé ne peut pas
+redevenir courant.
+
+Les écritures sans signaux (queryset.update, bulk_create) doivent appeler
+DocumentCache.bump() elles-mêmes.
+"""
+import hashlib
+import json
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+_pending = threading.local()
+
+CACHE_PREFIX = 'document_cache'
+EPOCH_KEY = f'{CACHE_PREFIX}:epoch'
+
+
+def _seed():
+    return int(time.time() * 1000)
+
+
+class _PendingRevisions:
+    """Documents modifiés dans une transaction, révisés à son commit"""
+
+    def __init__(self):
+        self.keys = set()
+        self.done = False
+
+    def __call__(self):
+        self.done = True
+        for kind, uuid in self.keys:
+            DocumentCache._bump_logged(kind, uuid)
+
+
+class DocumentCache:
+    """
+    Rendu en cache des documents, invalidé par révision
+
+    Usage :
+        entry = DocumentCache.get_or_render(DocumentCache.PAC, pac_uuid, 'complet', render)  # {'etag', 'data'}
+        DocumentCache.mark_changed(DocumentCache.PAC, pac_uuid)   # depuis un signal
+        DocumentCache.bump(DocumentCache.PAC, pac_uuid)           # après le commit
+        DocumentCache.bump_epoch()                                # référentiel modifié
+    """
+
+    # Types de documents
+    PAC = 'pac'
+    CDR = 'cdr'
+    TABLEAU_BORD = 'tableau_bord'
+
+    @staticmethod
+    def _revision_key(kind, uuid):
+        return f'{CACHE_PREFIX}:{kind}:{uuid}:revision'
+
+    @classmethod
+    def bump(cls, kind, uuid):
+        """Nouvelle révision du document : ses rendus en cache ne sont plus lus"""
+        if not uuid:
+            return
+        key = cls._revision_key(kind, uuid)
+        cache.add(key, _seed(), timeout=None)
+        cache.incr(key)
+
+    @classmethod
+    def mark_changed(cls, kind, uuid):
+        """Planifie la nouvelle révision du document après le commit (une fois par document et par transaction)"""
+        if not uuid:
+            return
+        connection = transaction.get_connection()
+        if not connection.in_atomic_block:
+            # Autocommit : l'écriture est déjà commitée
+            cls._bump_logged(kind, str(uuid))
+            return
+        pending = getattr(_pending, 'revisions', None)
+        if pending is None or pending.done or not any(entry[1] is pending for entry in connection.run_on_commit):
+            # Première écriture de la transaction, ou transaction précédente annulée
+            # (son vidage a été retiré avec elle) : ses documents ne sont pas révisés
+            pending = _pending.revisions = _PendingRevisions()
+            transaction.on_commit(pending)
+        pending.keys.add((kind, str(uuid)))
+
+    @classmethod
+    def _bump_logged(cls, kind, uuid):
+        try:
+            cls.bump(kind, uuid)
+        except Exception as e:
+            logger.error("[DocumentCache] Invalidation impossible %s %s: %s", kind, uuid, str(e))
+
+    @staticmethod
+    def bump_epoch():
+        """Nouvelle époque : tous les rendus en cache ne sont plus lus"""
+        cache.add(EPOCH_KEY, _seed(), timeout=None)
+        cache.incr(EPOCH_KEY)
+
+    @classmethod
+    def _counters(cls, kind, uuid):
+        revision_key = cls._revision_key(kind, uuid)
+        counters = cache.get_many([revision_key, EPOCH_KEY])
+        for key in (revision_key, EPOCH_KEY):
+            if key not in counters:
+                cache.add(key, _seed(), timeout=None)
+                counters[key] = cache.get(key)
+        return counters[EPOCH_KEY], counters[revision_key]
+
+    @staticmethod
+    def _digest(data):
+        return hashlib.sha256(
+            json.dumps(data, sort_keys=True, default=str, separators=(',', ':')).encode()
+        ).hexdigest()
+
+    @classmethod
+    def get_or_render(cls, kind, uuid, view, render):
+        """
+        Rendu courant du document, depuis le cache ou calculé par `render`.
+
+        Args:
+            render: fonction sans argument -> (données, document validé ?)
+
+        Returns:
+            dict: {'etag': str, 'data': données rendues}
+        """
+        epoch, revision = cls._counters(kind, uuid)
+        key = f'{CACHE_PREFIX}:{kind}:{uuid}:{view}:{epoch}.{revision}'
+        entry = cache.get(key)
+        if entry is None:
+            data, validated = render()
+            entry = {'etag': cls._digest(data), 'data': data}
+            timeout = settings.DOCUMENT_CACHE_VALIDATED_TIMEOUT if validated else settings.DOCUMENT_CACHE_TIMEOUT
+            cache.set(key, entry, timeout=timeout)
+            logger.debug("[DocumentCache] %s %s (%s) rendu, révision %s", kind, uuid, view, revision)
+        return entry
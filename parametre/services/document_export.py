@@ -0,0 +1,198 @@
+"""
+Lignes des exports CSV/XLSX des documents (PAC, CDR, tableaux de bord, activités périodiques) — logique pure.
+
+Chaque export est une requête values_list() à plat sur le niveau le plus fin du
+document (détail PAC x traitement x suivi, détail CDR x plan d'action,
+indicateur x périodicité, détail AP x suivi mensuel), lue par lots de
+EXPORT_CHUNK_SIZE lignes avec .iterator() : un export d'une année sur tous
+les processus ne charge jamais toutes les lignes en mémoire.
+
+Le périmètre est celui des listes : processus de get_user_processus_list()
+(None = tous, [] = aucun), éventuellement restreint à une année et à un processus.
+
+L'écriture des formats est dans shared/exports.py.
+"""
+import logging
+
+from django.apps import apps
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+def _latest_evaluation(field):
+    """Libellé `field` de la dernière évaluation du détail CDR (dernière version)"""
+    from django.db.models import OuterRef, Subquery
+    from cartographie_risque.models import EvaluationRisque
+
+    latest = EvaluationRisque.objects.filter(details_cdr=OuterRef('pk')).order_by(
+        '-version_evaluation__created_at', '-created_at'
+    )
+    return Subquery(latest.values(f'{field}__libelle')[:1])
+
+
+def _cdr_annotations():
+    return {
+        f'evaluation_{field}': _latest_evaluation(field)
+        for field in ('frequence', 'gravite', 'criticite', 'risque')
+    }
+
+
+class DocumentExportService:
+    """
+    Export tabulaire des documents
+
+    Usage :
+        columns = DocumentExportService.columns(DocumentExportService.PAC)
+        rows = DocumentExportService.rows(DocumentExportService.PAC, processus_uuids, annee=2025)
+        streaming_export_response('pac_2025', 'csv', columns, rows)
+    """
+
+    PAC = 'pac'
+    CDR = 'cdr'
+    TABLEAU_BORD = 'tableau_bord'
+    ACTIVITE_PERIODIQUE = 'activite_periodique'
+
+    # model : niveau exporté ; processus / annee : chemins de filtre ;
+    # columns : (libellé, chemin values_list ou annotation)
+    EXPORTS = {
+        PAC: {
+            'model': 'pac.DetailsPac',
+            'processus': 'pac__processus',
+            'annee': 'pac__annee__annee',
+            'order_by': ('pac__processus__nom', 'pac__num_amendement', 'numero_pac'),
+            'columns': [
+                ('Processus', 'pac__processus__nom'),
+                ('Année', 'pac__annee__annee'),
+                ('Amendement', 'pac__num_amendement'),
+                ('N° PAC', 'numero_pac'),
+                ('Libellé', 'libelle'),
+                ('Dysfonctionnement / Recommandation', 'dysfonctionnement_recommandation__nom'),
+                ('Nature', 'nature__nom'),
+                ('Catégorie', 'categorie__nom'),
+                ('Source', 'source__nom'),
+                ('Période de réalisation', 'periode_de_realisation'),
+                ('Action', 'traitement__action'),
+                ("Type d'action", 'traitement__type_action__nom'),
+                ('Direction responsable', 'traitement__responsable_direction__nom'),
+                ('Sous-direction responsable', 'traitement__responsable_sous_direction__nom'),
+                ('Délai de réalisation', 'traitement__delai_realisation'),
+                ('État de mise en œuvre', 'traitement__suivi__etat_mise_en_oeuvre__nom'),
+                ('Résultat', 'traitement__suivi__resultat'),
+                ('Appréciation', 'traitement__suivi__appreciation__nom'),
+                ('Statut', 'traitement__suivi__statut__nom'),
+                ('Date de mise en œuvre effective', 'traitement__suivi__date_mise_en_oeuvre_effective'),
+                ('Date de clôture', 'traitement__suivi__date_cloture'),
+            ],
+        },
+        CDR: {
+            'model': 'cartographie_risque.DetailsCDR',
+            'processus': 'cdr__processus',
+            'annee': 'cdr__annee',
+            'order_by': ('cdr__processus__nom', 'cdr__num_amendement', 'numero_cdr'),
+            'annotations': _cdr_annotations,
+            'columns': [
+                ('Processus', 'cdr__processus__nom'),
+                ('Année', 'cdr__annee'),
+                ('Amendement', 'cdr__num_amendement'),
+                ('N° CDR', 'numero_cdr'),
+                ('Activités', 'activites'),
+                ('Objectifs', 'objectifs'),
+                ('Événements indésirables / risques', 'evenements_indesirables_risques'),
+                ('Causes', 'causes'),
+                ('Conséquences', 'consequences'),
+                ('Fréquence', 'evaluation_frequence'),
+                ('Gravité', 'evaluation_gravite'),
+                ('Criticité', 'evaluation_criticite'),
+                ('Risque', 'evaluation_risque'),
+                ('Actions / mesures', 'plans_action__actions_mesures'),
+                ('Responsable', 'plans_action__responsable__nom'),
+                ('Délai de réalisation', 'plans_action__delai_realisation'),
+            ],
+        },
+        TABLEAU_BORD: {
+            'model': 'dashboard.Indicateur',
+            'processus': 'objective_id__tableau_bord__processus',
+            'annee': 'objective_id__tableau_bord__annee',
+            'order_by': (
+                'objective_id__tableau_bord__processus__nom', 'objective_id__tableau_bord__num_amendement',
+                'objective_id__number', 'libelle', 'periodicites__periode',
+            ),
+            'columns': [
+                ('Processus', 'objective_id__tableau_bord__processus__nom'),
+                ('Année', 'objective_id__tableau_bord__annee'),
+                ('Amendement', 'objective_id__tableau_bord__num_amendement'),
+                ('N° objectif', 'objective_id__number'),
+                ('Objectif', 'objective_id__libelle'),
+                ('Indicateur', 'libelle'),
+                ('Fréquence', 'frequence_id__nom'),
+                ('Condition cible', 'cible__condition'),
+                ('Valeur cible', 'cible__valeur'),
+                ('Période', 'periodicites__periode'),
+                ('À réaliser', 'periodicites__a_realiser'),
+                ('Réalisé', 'periodicites__realiser'),
+                ('Taux', 'periodicites__taux'),
+            ],
+        },
+        ACTIVITE_PERIODIQUE: {
+            'model': 'activite_periodique.DetailsAP',
+            'processus': 'activite_periodique__processus',
+            'annee': 'activite_periodique__annee__annee',
+            'order_by': (
+                'activite_periodique__processus__nom', 'activite_periodique__num_amendement',
+                'numero_ap', 'suivis__mois__numero',
+            ),
+            'columns': [
+                ('Processus', 'activite_periodique__processus__nom'),
+                ('Année', 'activite_periodique__annee__annee'),
+                ('Amendement', 'activite_periodique__num_amendement'),
+                ('N° AP', 'numero_ap'),
+                ('Activité périodique', 'activites_periodiques'),
+                ('Fréquence', 'frequence__nom'),
+                ('Direction responsable', 'responsabilite_direction__nom'),
+                ('Mois', 'suivis__mois__nom'),
+                ('État de mise en œuvre', 'suivis__etat_mise_en_oeuvre__nom'),
+                ('Livrable', 'suivis__livrable'),
+                ('Date de réalisation', 'suivis__date_realisation'),
+            ],
+        },
+    }
+
+    @classmethod
+    def columns(cls, kind):
+        """Libellés des colonnes de l'export"""
+        return [label for label, _ in cls.EXPORTS[kind]['columns']]
+
+    @classmethod
+    def queryset(cls, kind, processus_uuids, annee=None, processus=None):
+        """
+        Requête des lignes de l'export (values_list, dans l'ordre des colonnes).
+
+        Args:
+            processus_uuids: résultat de get_user_processus_list (None = tous, [] = aucun)
+            annee: année (entier) ou None pour toutes
+            processus: UUID d'un processus pour restreindre l'export, ou None
+        """
+        spec = cls.EXPORTS[kind]
+        queryset = apps.get_model(spec['model']).objects.all()
+        if processus_uuids is not None:
+            queryset = queryset.filter(**{f"{spec['processus']}__in": processus_uuids})
+        if processus is not None:
+            queryset = queryset.filter(**{spec['processus']: processus})
+        if annee is not None:
+            queryset = queryset.filter(**{spec['annee']: annee})
+        if 'annotations' in spec:
+            queryset = queryset.annotate(**spec['annotations']())
+        return queryset.order_by(*spec['order_by']).values_list(*[path for _, path in spec['columns']])
+
+    @classmethod
+    def rows(cls, kind, processus_uuids, annee=None, processus=None):
+        """Générateur des lignes de l'export, lues par lots de EXPORT_CHUNK_SIZE"""
+        if processus_uuids is not None and not processus_uuids:
+            return
+        count = 0
+        queryset = cls.queryset(kind, processus_uuids, annee=annee, processus=processus)
+        for row in queryset.iterator(chunk_size=settings.EXPORT_CHUNK_SIZE):
+            count += 1
+            yield row
+        logger.info("[DocumentExportService] Export %s (année %s) : %s ligne(s)", kind, annee, count)
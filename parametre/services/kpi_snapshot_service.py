@@ -0,0 +1,517 @@
+"""
+Snapshots KPI — logique métier pure, sans couche HTTP.
+
+Chaque document (PAC, CDR, Activité Périodique, tableau de bord) a une ligne
+KpiSnapshot contenant ses compteurs. Les endpoints de statistiques agrègent ces
+lignes (une par document) au lieu de recompter les lignes brutes (détails,
+traitements, suivis, plans d'action, objectifs, indicateurs...).
+
+Mise à jour :
+  - incrémentale : les signaux (parametre/kpi_signals.py) marquent le document
+    modifié ; son snapshot est recalculé une seule fois, après le commit ;
+  - complète : rebuild() (commande rebuild_kpi_snapshots, job quotidien du scheduler)
+    rattrape les écritures qui contournent les signaux (queryset.update, SQL brut).
+
+Les compteurs dépendant de la date du jour (échéances passées / proches, objectifs
+créés aujourd'hui) sont stockés sous forme d'histogramme par date et évalués à la lecture.
+"""
+import decimal
+import logging
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from parametre.models import KpiSnapshot
+
+logger = logging.getLogger(__name__)
+
+_pending = threading.local()
+
+
+class _PendingSnapshots:
+    """Documents marqués par une transaction (ou un lot en autocommit), recalculés une seule fois"""
+
+    def __init__(self):
+        self.keys = set()
+        # (module, modèle, champ) -> clés primaires dont le parent reste à lire
+        self.related = defaultdict(set)
+        self.done = False
+
+    def __call__(self):
+        if self.done:
+            return
+        self.done = True
+        if self.keys or self.related:
+            KpiSnapshotService._refresh_pending(self.keys, self.related)
+
+
+class KpiSnapshotService:
+    """
+    Construction et lecture des snapshots KPI
+
+    Usage :
+        KpiSnapshotService.mark_dirty('pac', pac.uuid)     # depuis un signal
+        with KpiSnapshotService.batch(): ...               # écritures en autocommit regroupées
+        KpiSnapshotService.rebuild()                       # reconstruction complète
+        KpiSnapshotService.pac_stats(processus_uuids, scope)
+    """
+
+    MODULES = ('pac', 'cdr', 'activite_periodique', 'dashboard')
+    CHUNK_SIZE = 200
+
+    # ── Marquage (signaux) ─────────────────────────────────────────────────────
+
+    @staticmethod
+    def _state():
+        if not hasattr(_pending, 'batch_depth'):
+            _pending.batch_depth = 0
+            _pending.batch = None          # marquages en autocommit du lot en cours
+            _pending.transaction = None    # marquages de la transaction courante
+        return _pending
+
+    @classmethod
+    def _target(cls):
+        """
+        (marquages où ajouter, à vider aussitôt ?) : ceux de la transaction courante,
+        ceux du lot en cours, ou un ensemble isolé en autocommit hors lot
+        """
+        state = cls._state()
+        connection = transaction.get_connection()
+        if connection.in_atomic_block:
+            pending = state.transaction
+            if pending is None or pending.done or not any(entry[1] is pending for entry in connection.run_on_commit):
+                # Première écriture de la transaction, ou transaction précédente annulée
+                # (son vidage a été retiré avec elle) : ses marquages sont abandonnés
+                pending = state.transaction = _PendingSnapshots()
+                transaction.on_commit(pending)
+            return pending, False
+        if state.batch_depth:
+            if state.batch is None:
+                state.batch = _PendingSnapshots()
+            return state.batch, False
+        # Autocommit hors lot : l'écriture est déjà commitée
+        return _PendingSnapshots(), True
+
+    @classmethod
+    def mark_dirty(cls, module, source_uuid):
+        """
+        Planifie le recalcul du snapshot d'un document après le commit de la transaction courante
+        """
+        if not source_uuid:
+            return
+        pending, flush_now = cls._target()
+        pending.keys.add((module, str(source_uuid)))
+        if flush_now:
+            pending()
+
+    @classmethod
+    def mark_dirty_related(cls, module, model, pk, field):
+        """
+        Comme mark_dirty, le document étant la valeur `field` de la ligne `pk` de `model` ;
+        lue au vidage, en une requête par (modèle, champ) pour toutes les lignes marquées
+        """
+        if pk is None:
+            return
+        pending, flush_now = cls._target()
+        pending.related[(module, model, field)].add(pk)
+        if flush_now:
+            pending()
+
+    @classmethod
+    @contextmanager
+    def batch(cls):
+        """
+        Regroupe les marquages faits en autocommit (une requête HTTP, un script) :
+        un seul recalcul par document à la sortie du bloc au lieu d'un par écriture
+        """
+        state = cls._state()
+        state.batch_depth += 1
+        try:
+            yield
+        finally:
+            state.batch_depth -= 1
+            if not state.batch_depth and state.batch is not None:
+                pending, state.batch = state.batch, None
+                transaction.on_commit(pending)
+
+    @classmethod
+    def flush_pending(cls):
+        """Recalcule aussitôt les snapshots marqués par ce thread (transaction courante et lot en cours)"""
+        state = cls._state()
+        for pending in (state.transaction, state.batch):
+            if pending is not None:
+                pending()
+        state.batch = None
+
+    @classmethod
+    def _refresh_pending(cls, keys, related):
+        """Recalcule les snapshots marqués (une fois par document)"""
+        keys = set(keys)
+        for (module, model, field), pks in related.items():
+            try:
+                # Ligne parente éventuellement déjà supprimée (suppression en cascade) : ignorée
+                parents = model.objects.filter(pk__in=pks).order_by().values_list(field, flat=True).distinct()
+                keys.update((module, str(source_uuid)) for source_uuid in parents if source_uuid)
+            except Exception as e:
+                logger.error("[KpiSnapshotService] Résolution impossible %s.%s: %s", model.__name__, field, str(e))
+
+        by_module = defaultdict(set)
+        for module, source_uuid in keys:
+            by_module[module].add(source_uuid)
+        for module, uuids in by_module.items():
+            try:
+                cls.refresh(module, uuids)
+            except Exception as e:
+                logger.error("[KpiSnapshotService] Erreur lors du recalcul %s (%s document(s)): %s", module, len(uuids), str(e))
+
+    # ── Construction ───────────────────────────────────────────────────────────
+
+    @classmethod
+    def refresh(cls, module, uuids):
+        """
+        Recalcule les snapshots des documents donnés ; supprime ceux des documents disparus
+        """
+        uuids = [str(u) for u in uuids]
+        snapshots = getattr(cls, f'_build_{module}')(uuids)
+        built = {str(snapshot.source_uuid) for snapshot in snapshots}
+
+        missing = [u for u in uuids if u not in built]
+        if missing:
+            KpiSnapshot.objects.filter(module=module, source_uuid__in=missing).delete()
+        if snapshots:
+            KpiSnapshot.objects.bulk_create(
+                snapshots,
+                update_conflicts=True,
+                unique_fields=['module', 'source_uuid'],
+                update_fields=['processus', 'annee', 'num_amendement', 'is_validated', 'metrics', 'updated_at'],
+            )
+        return len(snapshots)
+
+    @classmethod
+    def rebuild(cls, modules=None):
+        """
+        Reconstruit entièrement les snapshots (tous les modules par défaut)
+
+        Returns:
+            dict: nombre de snapshots par module
+        """
+        counts = {}
+        for module in modules or cls.MODULES:
+            source_uuids = list(cls._source_model(module).objects.order_by().values_list('uuid', flat=True))
+            with transaction.atomic():
+                KpiSnapshot.objects.filter(module=module).exclude(source_uuid__in=source_uuids).delete()
+                total = 0
+                for start in range(0, len(source_uuids), cls.CHUNK_SIZE):
+                    total += cls.refresh(module, source_uuids[start:start + cls.CHUNK_SIZE])
+            counts[module] = total
+            logger.info("[KpiSnapshotService] %s snapshot(s) reconstruit(s) pour %s", total, module)
+        return counts
+
+    @staticmethod
+    def _source_model(module):
+        if module == 'pac':
+            from pac.models import Pac
+            return Pac
+        if module == 'cdr':
+            from cartographie_risque.models import CDR
+            return CDR
+        if module == 'activite_periodique':
+            from activite_periodique.models import ActivitePeriodique
+            return ActivitePeriodique
+        if module == 'dashboard':
+            from dashboard.models import TableauBord
+            return TableauBord
+        raise ValueError(f"Module KPI inconnu: {module}")
+
+    @staticmethod
+    def _counts(queryset, group_field):
+        return {
+            str(row[group_field]): row['n']
+            for row in queryset.order_by().values(group_field).annotate(n=Count('pk'))
+        }
+
+    @classmethod
+    def _build_pac(cls, uuids):
+        from pac.models import Pac, PacSuivi, TraitementPac
+
+        echeances = defaultdict(lambda: defaultdict(int))
+        traitements = defaultdict(int)
+        for pac_uuid, delai in TraitementPac.objects.filter(
+            details_pac__pac__in=uuids
+        ).order_by().values_list('details_pac__pac_id', 'delai_realisation'):
+            traitements[str(pac_uuid)] += 1
+            if delai is not None:
+                echeances[str(pac_uuid)][delai.isoformat()] += 1
+        suivis = cls._counts(
+            PacSuivi.objects.filter(traitement__details_pac__pac__in=uuids), 'traitement__details_pac__pac_id'
+        )
+
+        return [
+            KpiSnapshot(
+                module='pac',
+                source_uuid=pac['uuid'],
+                processus_id=pac['processus_id'],
+                annee=pac['annee__annee'],
+                num_amendement=pac['num_amendement'],
+                # Les PACs validés avant l'ajout du booléen n'ont que validated_at
+                is_validated=bool(pac['is_validated'] or pac['validated_at']),
+                metrics={
+                    'traitements': traitements[str(pac['uuid'])],
+                    'suivis': suivis.get(str(pac['uuid']), 0),
+                    'echeances': dict(echeances[str(pac['uuid'])]),
+                },
+            )
+            for pac in Pac.objects.filter(uuid__in=uuids).values(
+                'uuid', 'processus_id', 'annee__annee', 'num_amendement', 'is_validated', 'validated_at'
+            )
+        ]
+
+    @classmethod
+    def _build_cdr(cls, uuids):
+        from cartographie_risque.models import CDR, DetailsCDR, PlanAction
+
+        details = cls._counts(DetailsCDR.objects.filter(cdr__in=uuids), 'cdr_id')
+        plans = cls._counts(PlanAction.objects.filter(details_cdr__cdr__in=uuids), 'details_cdr__cdr_id')
+
+        return [
+            KpiSnapshot(
+                module='cdr',
+                source_uuid=cdr['uuid'],
+                processus_id=cdr['processus_id'],
+                annee=cdr['annee'],
+                num_amendement=cdr['num_amendement'],
+                is_validated=cdr['is_validated'],
+                metrics={
+                    'details': details.get(str(cdr['uuid']), 0),
+                    'plans_action': plans.get(str(cdr['uuid']), 0),
+                },
+            )
+            for cdr in CDR.objects.filter(uuid__in=uuids).values(
+                'uuid', 'processus_id', 'annee', 'num_amendement', 'is_validated'
+            )
+        ]
+
+    @classmethod
+    def _build_activite_periodique(cls, uuids):
+        from activite_periodique.models import ActivitePeriodique, DetailsAP, SuivisAP
+
+        details = cls._counts(DetailsAP.objects.filter(activite_periodique__in=uuids), 'activite_periodique_id')
+        suivis = cls._counts(
+            SuivisAP.objects.filter(details_ap__activite_periodique__in=uuids), 'details_ap__activite_periodique_id'
+        )
+
+        return [
+            KpiSnapshot(
+                module='activite_periodique',
+                source_uuid=ap['uuid'],
+                processus_id=ap['processus_id'],
+                annee=ap['annee__annee'],
+                num_amendement=ap['num_amendement'],
+                is_validated=ap['is_validated'],
+                metrics={
+                    'details': details.get(str(ap['uuid']), 0),
+                    'suivis': suivis.get(str(ap['uuid']), 0),
+                },
+            )
+            for ap in ActivitePeriodique.objects.filter(uuid__in=uuids).values(
+                'uuid', 'processus_id', 'annee__annee', 'num_amendement', 'is_validated'
+            )
+        ]
+
+    @classmethod
+    def _build_dashboard(cls, uuids):
+        from analyse_tableau.models import AnalyseTableau
+        from dashboard.models import Indicateur, Objectives, TableauBord
+        from parametre.models import Periodicite
+
+        objectives = defaultdict(lambda: defaultdict(int))
+        for tableau_uuid, created_at in Objectives.objects.filter(
+            tableau_bord__in=uuids
+        ).order_by().values_list('tableau_bord_id', 'created_at'):
+            objectives[str(tableau_uuid)][timezone.localtime(created_at).date().isoformat()] += 1
+
+        indicateurs = list(
+            Indicateur.objects.filter(objective_id__tableau_bord__in=uuids)
+            .select_related('frequence_id', 'cible', 'objective_id')
+            .order_by()
+        )
+        taux_by_indicateur = defaultdict(list)
+        for indicateur_pk, periode, taux in Periodicite.objects.filter(
+            indicateur_id__objective_id__tableau_bord__in=uuids
+        ).order_by().values_list('indicateur_id', 'periode', 'taux'):
+            taux_by_indicateur[indicateur_pk].append((periode, taux))
+        analyses = cls._counts(AnalyseTableau.objects.filter(tableau_bord__in=uuids), 'tableau_bord_id')
+
+        metrics = defaultdict(lambda: {
+            'indicateurs': 0, 'cibles': 0, 'indicateurs_atteints': 0, 'indicateurs_non_atteints': 0,
+        })
+        objective_status = defaultdict(dict)
+        for indicateur in indicateurs:
+            tableau_uuid = str(indicateur.objective_id.tableau_bord_id)
+            tableau_metrics = metrics[tableau_uuid]
+            tableau_metrics['indicateurs'] += 1
+            cible = getattr(indicateur, 'cible', None)
+            if cible:
+                tableau_metrics['cibles'] += 1
+
+            atteint = cls._indicateur_atteint(indicateur, cible, taux_by_indicateur.get(indicateur.pk, []))
+            if atteint is None:
+                continue
+            tableau_metrics['indicateurs_atteints' if atteint else 'indicateurs_non_atteints'] += 1
+            previous = objective_status[tableau_uuid].get(indicateur.objective_id_id)
+            objective_status[tableau_uuid][indicateur.objective_id_id] = atteint if previous is None else (previous and atteint)
+
+        snapshots = []
+        for tableau in TableauBord.objects.filter(uuid__in=uuids).order_by().values(
+            'uuid', 'processus_id', 'annee', 'num_amendement', 'is_validated'
+        ):
+            tableau_uuid = str(tableau['uuid'])
+            statuses = objective_status[tableau_uuid].values()
+            objectifs_atteints = sum(1 for status in statuses if status)
+            snapshots.append(KpiSnapshot(
+                module='dashboard',
+                source_uuid=tableau['uuid'],
+                processus_id=tableau['processus_id'],
+                annee=tableau['annee'],
+                num_amendement=tableau['num_amendement'],
+                is_validated=tableau['is_validated'],
+                metrics={
+                    **metrics[tableau_uuid],
+                    'objectives': sum(objectives[tableau_uuid].values()),
+                    'objectives_created': dict(objectives[tableau_uuid]),
+                    'objectifs_atteints': objectifs_atteints,
+                    'objectifs_non_atteints': len(statuses) - objectifs_atteints,
+                    'analyses': analyses.get(tableau_uuid, 0),
+                },
+            ))
+        return snapshots
+
+    @staticmethod
+    def _indicateur_atteint(indicateur, cible, periodes):
+        """
+        True / False si la moyenne des taux (périodes de la fréquence de l'indicateur quand il
+        y en a) satisfait la cible ; None si l'indicateur n'est pas évaluable
+        """
+        from parametre.models import Periodicite
+
+        if not cible or not periodes:
+            return None
+
+        frequence_nom = getattr(indicateur.frequence_id, 'nom', None)
+        if frequence_nom:
+            allowed_periodes = [code for code, _ in Periodicite.get_periodes_for_frequence(frequence_nom)]
+            filtered = [item for item in periodes if item[0] in allowed_periodes]
+            if filtered:
+                periodes = filtered
+
+        taux_values = []
+        for _, taux in periodes:
+            if taux is not None:
+                try:
+                    taux_values.append(float(taux))
+                except (ValueError, TypeError, decimal.InvalidOperation):
+                    continue
+        if not taux_values:
+            return None
+        return cible.is_objectif_atteint(sum(taux_values) / len(taux_values))
+
+    # ── Lecture ────────────────────────────────────────────────────────────────
+
+    @staticmethod
+    def snapshots(module, processus_uuids=None):
+        """
+        Snapshots d'un module, éventuellement restreints à des processus (None = tous)
+        """
+        queryset = KpiSnapshot.objects.filter(module=module)
+        if processus_uuids is not None:
+            queryset = queryset.filter(processus_id__in=list(processus_uuids))
+        return list(queryset.values(
+            'source_uuid', 'processus_id', 'annee', 'num_amendement', 'is_validated', 'metrics'
+        ))
+
+    @staticmethod
+    def latest_per_processus(rows, sort_key):
+        """Ligne de clé maximale pour chaque processus (égalité : plus petit UUID)"""
+        latest = {}
+        for row in sorted(rows, key=lambda r: r['source_uuid']):
+            current = latest.get(row['processus_id'])
+            if current is None or sort_key(row) > sort_key(current):
+                latest[row['processus_id']] = row
+        return list(latest.values())
+
+    @staticmethod
+    def _amendement_priority(row):
+        # Priorité historique des CDR / AP : Amendement 2 > Amendement 1 > Initial > autres
+        return {2: 3, 1: 2, 0: 1}.get(row['num_amendement'], 0)
+
+    @classmethod
+    def pac_stats(cls, processus_uuids, scope):
+        rows = cls.snapshots('pac', processus_uuids)
+        if scope == 'dernier':
+            # Dernier amendement par processus (à numéro égal, le plus petit UUID comme avant)
+            initiaux = cls.latest_per_processus(rows, lambda r: r['num_amendement'])
+        else:
+            initiaux = [row for row in rows if row['num_amendement'] == 0]
+
+        today = timezone.now().date()
+        soon = today + timedelta(days=7)
+        arrives_termes = 0
+        bientot_termes = 0
+        for row in initiaux:
+            for day, count in row['metrics'].get('echeances', {}).items():
+                if day < today.isoformat():
+                    arrives_termes += count
+                elif day <= soon.isoformat():
+                    bientot_termes += count
+
+        return {
+            'total_pacs': len(initiaux),
+            'pacs_valides': sum(1 for row in initiaux if row['is_validated']),
+            'pacs_avec_traitement': sum(1 for row in rows if row['metrics'].get('traitements')),
+            'pacs_avec_suivi': sum(1 for row in rows if row['metrics'].get('suivis')),
+            'total_traitements': sum(row['metrics'].get('traitements', 0) for row in initiaux),
+            'total_suivis': sum(row['metrics'].get('suivis', 0) for row in initiaux),
+            'traitements_arrives_termes': arrives_termes,
+            'traitements_bientot_termes': bientot_termes,
+        }
+
+    @classmethod
+    def cdr_stats(cls, processus_uuids, scope):
+        rows = cls.snapshots('cdr', processus_uuids)
+        if scope == 'dernier':
+            # À priorité égale, l'année la plus récente (ordre par défaut du modèle CDR)
+            initiaux = cls.latest_per_processus(rows, lambda r: (cls._amendement_priority(r), r['annee'] or 0))
+        else:
+            initiaux = [row for row in rows if row['num_amendement'] == 0]
+
+        valides = sum(1 for row in initiaux if row['is_validated'])
+        return {
+            'total_cdrs': len(initiaux),
+            'cdrs_valides': valides,
+            'total_amendements': sum(1 for row in rows if row['num_amendement'] > 0),
+            'cdrs_en_cours': len(initiaux) - valides,
+            'total_details': sum(row['metrics'].get('details', 0) for row in rows),
+            'total_plans_action': sum(row['metrics'].get('plans_action', 0) for row in rows),
+        }
+
+    @classmethod
+    def activite_periodique_stats(cls, processus_uuids, scope):
+        rows = cls.snapshots('activite_periodique', processus_uuids)
+        if scope == 'dernier':
+            initiaux = cls.latest_per_processus(rows, cls._amendement_priority)
+        else:
+            initiaux = [row for row in rows if row['num_amendement'] == 0]
+
+        valides = sum(1 for row in initiaux if row['is_validated'])
+        return {
+            'total_aps': len(initiaux),
+            'aps_valides': valides,
+            'aps_en_attente': len(initiaux) - valides,
+            'total_details': sum(row['metrics'].get('details', 0) for row in initiaux),
+            'total_suivis': sum(row['metrics'].get('suivis', 0) for row in initiaux),
+        }
@@ -0,0 +1,218 @@
+"""
+Archivage des journaux (ActivityLog, PermissionAudit) — logique métier pure, sans couche HTTP.
+
+Les deux tables croissaient sans limite (PermissionAudit reçoit une ligne par
+vérification de permission) et les requêtes admin ralentissaient d'un mois sur
+l'autre. Les lignes plus anciennes que leur durée de rétention sont déplacées
+dans des fichiers JSONL compressés, un par journal et par mois :
+
+    LOG_ARCHIVE_ROOT/<journal>/<AAAA-MM>.jsonl.gz
+
+- la rétention est définie par journal (LOG_ARCHIVE_RETENTION_DAYS) et peut être
+  surchargée par action (LOG_ARCHIVE_RETENTION_BY_ACTION) : les consultations
+  partent plus tôt que les suppressions ;
+- chaque passage ajoute un membre gzip au fichier du mois (gzip lit les membres
+  concaténés comme un seul flux) : les fichiers existants ne sont jamais réécrits ;
+- les lignes ne sont supprimées qu'une fois le lot écrit et synchronisé sur disque.
+  Une interruption entre les deux ré-archive le lot au passage suivant : la
+  lecture dédoublonne par clé primaire.
+"""
+import gzip
+import json
+import logging
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+logger = logging.getLogger(__name__)
+
+
+def _specs():
+    """
+    Journaux archivables : nom -> (modèle, champ d'horodatage, annotations ajoutées à l'archive).
+
+    Le nom d'utilisateur est copié dans l'archive : l'utilisateur peut être supprimé
+    bien avant la fin de la conservation du fichier.
+    """
+    from parametre.models import ActivityLog
+    from permissions.models import PermissionAudit
+
+    return {
+        'activity_log': (ActivityLog, 'created_at', {'username': F('user__username')}),
+        'permission_audit': (
+            PermissionAudit,
+            'timestamp',
+            {'username': F('user__username'), 'processus_nom': F('processus__nom')},
+        ),
+    }
+
+
+class LogArchiver:
+    """
+    Déplacement des journaux anciens vers des archives mensuelles et lecture de ces archives
+
+    Usage :
+        LogArchiver.archive()                          # {'activity_log': 1200, 'permission_audit': 48000}
+        LogArchiver.archive(['activity_log'], dry_run=True)
+        LogArchiver.read('activity_log', start, end, filters={'action': 'delete'}, limit=50)
+    """
+
+    DEFAULT_BATCH_SIZE = 5000
+
+    # ── Configuration ──────────────────────────────────────────────────────────
+
+    @staticmethod
+    def logs():
+        return list(_specs())
+
+    @staticmethod
+    def root():
+        # Jamais sous MEDIA_ROOT : les médias sont servis sans authentification
+        return getattr(settings, 'LOG_ARCHIVE_ROOT', os.path.join(settings.BASE_DIR, 'log_archives'))
+
+    @classmethod
+    def batch_size(cls):
+        return getattr(settings, 'LOG_ARCHIVE_BATCH_SIZE', cls.DEFAULT_BATCH_SIZE)
+
+    @staticmethod
+    def retention(name):
+        """
+        (rétention par défaut, {action: jours}) du journal ; 0 ou moins = conservation illimitée
+        """
+        default = getattr(settings, 'LOG_ARCHIVE_RETENTION_DAYS', {}).get(name, 0)
+        by_action = getattr(settings, 'LOG_ARCHIVE_RETENTION_BY_ACTION', {}).get(name, {})
+        return default, dict(by_action)
+
+    @classmethod
+    def policies(cls, name, now=None):
+        """
+        Querysets des lignes échues, un par règle de rétention (actions surchargées puis défaut)
+        """
+        model, field, _ = _specs()[name]
+        now = now or timezone.now()
+        default, by_action = cls.retention(name)
+
+        policies = []
+        for action, days in sorted(by_action.items()):
+            if days > 0:
+                policies.append(model.objects.filter(
+                    action=action, **{f'{field}__lt': now - timedelta(days=days)}
+                ))
+        if default > 0:
+            policies.append(model.objects.exclude(action__in=list(by_action)).filter(
+                **{f'{field}__lt': now - timedelta(days=default)}
+            ))
+        return policies
+
+    # ── Archivage ──────────────────────────────────────────────────────────────
+
+    @classmethod
+    def path(cls, name, month):
+        return os.path.join(cls.root(), name, f'{month}.jsonl.gz')
+
+    @classmethod
+    def archive(cls, logs=None, dry_run=False, now=None):
+        """
+        Archive puis supprime les lignes échues des journaux demandés (tous par défaut).
+
+        Returns:
+            dict: {journal: nombre de lignes archivées (à archiver si dry_run)}
+        """
+        counts = {}
+        for name in logs or cls.logs():
+            policies = cls.policies(name, now)
+            if dry_run:
+                counts[name] = sum(queryset.count() for queryset in policies)
+            else:
+                counts[name] = sum(cls._archive_queryset(name, queryset) for queryset in policies)
+            if counts[name]:
+                logger.info("[LogArchiver] %s: %s ligne(s) %s", name, counts[name], 'à archiver' if dry_run else 'archivée(s)')
+        return counts
+
+    @classmethod
+    def _archive_queryset(cls, name, queryset):
+        model, field, annotations = _specs()[name]
+        pk_name = model._meta.pk.attname
+        fields = [f.attname for f in model._meta.concrete_fields]
+        total = 0
+
+        while True:
+            rows = list(
+                queryset.order_by(field, pk_name)
+                .values(*fields, **annotations)[:cls.batch_size()]
+            )
+            if not rows:
+                return total
+
+            by_month = {}
+            for row in rows:
+                month = timezone.localtime(row[field]).strftime('%Y-%m')
+                by_month.setdefault(month, []).append(row)
+            for month, month_rows in by_month.items():
+                cls._append(cls.path(name, month), month_rows)
+
+            model.objects.filter(pk__in=[row[pk_name] for row in rows]).delete()
+            total += len(rows)
+
+    @staticmethod
+    def _append(path, rows):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'ab') as raw:
+            with gzip.GzipFile(fileobj=raw, mode='wb') as archive:
+                for row in rows:
+                    archive.write(json.dumps(row, cls=DjangoJSONEncoder, ensure_ascii=False).encode())
+                    archive.write(b'\n')
+            raw.flush()
+            os.fsync(raw.fileno())
+
+    # ── Lecture ────────────────────────────────────────────────────────────────
+
+    @classmethod
+    def months(cls, name):
+        """Mois archivés du journal (AAAA-MM), du plus récent au plus ancien"""
+        directory = os.path.join(cls.root(), name)
+        if not os.path.isdir(directory):
+            return []
+        return sorted(
+            (filename[:-len('.jsonl.gz')] for filename in os.listdir(directory) if filename.endswith('.jsonl.gz')),
+            reverse=True,
+        )
+
+    @classmethod
+    def read(cls, name, start, end, filters=None, limit=100, offset=0):
+        """
+        Lignes archivées entre start (inclus) et end (exclu), les plus récentes d'abord.
+
+        Seuls les fichiers des mois couverts par l'intervalle sont ouverts. Les filtres
+        sont des égalités sur les champs de l'archive (ex. {'action': 'delete', 'user_id': 3}).
+
+        Returns:
+            dict: {'data': [lignes], 'count': int, 'total': int}
+        """
+        model, field, _ = _specs()[name]
+        pk_name = model._meta.pk.attname
+        filters = filters or {}
+        first, last = timezone.localtime(start).strftime('%Y-%m'), timezone.localtime(end).strftime('%Y-%m')
+
+        rows = {}
+        for month in cls.months(name):
+            if not first <= month <= last:
+                continue
+            with gzip.open(cls.path(name, month), 'rt', encoding='utf-8') as archive:
+                for line in archive:
+                    row = json.loads(line)
+                    moment = parse_datetime(row[field])
+                    if not start <= moment < end:
+                        continue
+                    if any(row.get(key) != value for key, value in filters.items()):
+                        continue
+                    rows[row[pk_name]] = row
+
+        ordered = sorted(rows.values(), key=lambda row: parse_datetime(row[field]), reverse=True)
+        data = ordered[offset:offset + limit]
+        return {'data': data, 'count': len(data), 'total': len(ordered)}
@@ -0,0 +1,262 @@
+"""
+Matérialisation des notifications d'échéance — logique métier pure, sans couche HTTP.
+
+Les lignes Notification (une par destinataire et par traitement PAC / plan d'action CDR)
+sont écrites quand les échéances changent, jamais pendant une requête GET :
+  - à l'enregistrement d'un TraitementPac / PlanAction / CDR et à l'attribution
+    d'un rôle (signaux, parametre/notification_signals.py) ;
+  - une fois par jour au changement de date (job materialize_notifications_daily),
+    pour les libellés « dans N jours » et les relances périodiques.
+
+Les endpoints de notifications ne font plus que lire l'index
+Notification(user, due_date) puis les objets métier correspondants.
+
+Destinataires d'un objet : utilisateurs actifs ayant un rôle actif sur son processus,
+plus ceux qui voient tous les processus (super admin, superviseur SMI), comme
+get_user_processus_list.
+"""
+import logging
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.db.models import Q
+from django.utils import timezone
+
+from parametre.models import Notification, NotificationPolicy, UserProcessusRole
+from parametre.utils.notification_policy import deadline_window_q
+from shared.permissions.principal import SUPER_ADMIN_PROCESSUS
+
+logger = logging.getLogger(__name__)
+
+# Champs recopiés du payload vers la ligne Notification
+_SYNCED_FIELDS = ('title', 'message', 'action_url', 'priority', 'due_date')
+
+
+class NotificationMaterializer:
+    """
+    Écriture groupée des notifications d'échéance
+
+    Usage :
+        NotificationMaterializer.materialize_all()                      # job quotidien
+        NotificationMaterializer.materialize_pac(traitement_uuids=[...])  # signal
+        NotificationMaterializer.index(user, TraitementPac, 'pac', 'traitement', due_q)  # lecture
+    """
+
+    BATCH_SIZE = 500
+
+    # ── Points d'entrée ────────────────────────────────────────────────────────
+
+    @classmethod
+    def materialize_all(cls, today=None):
+        """Recalcule toutes les notifications d'échéance (PAC et CDR)"""
+        return {
+            'pac': cls.materialize_pac(today=today),
+            'cartographie_risque': cls.materialize_cdr(today=today),
+        }
+
+    @classmethod
+    def materialize_pac(cls, traitement_uuids=None, processus_uuids=None, today=None):
+        """
+        Notifications des traitements PAC en retard ou à terme dans la fenêtre
+        la plus large entre la politique PAC et pac_upcoming_notifications (7 jours)
+
+        Returns:
+            tuple: (créées, mises à jour)
+        """
+        from pac.models import TraitementPac
+        from pac.services.pac_service import UPCOMING_WINDOW_DAYS
+        from parametre.services.pac_notification_service import _build_notification_payload
+
+        today = today or timezone.now().date()
+        policy = NotificationPolicy.get_for_scope(NotificationPolicy.SCOPE_PAC)
+        horizon = today + timedelta(days=max(UPCOMING_WINDOW_DAYS, policy.days_before))
+
+        traitements = TraitementPac.objects.filter(
+            details_pac__pac__isnull=False,
+            delai_realisation__isnull=False,
+            delai_realisation__lte=horizon,
+        ).select_related(
+            'details_pac',
+            'details_pac__pac',
+            'details_pac__nature',
+            'type_action',
+        )
+        if traitement_uuids is not None:
+            traitements = traitements.filter(uuid__in=list(traitement_uuids))
+        if processus_uuids is not None:
+            traitements = traitements.filter(details_pac__pac__processus__in=list(processus_uuids))
+
+        items = [
+            (traitement.details_pac.pac.processus_id, traitement.uuid, _build_notification_payload(traitement, today))
+            for traitement in traitements
+        ]
+        return cls._materialize(TraitementPac, 'pac', 'traitement', items)
+
+    @classmethod
+    def materialize_cdr(cls, plan_uuids=None, processus_uuids=None, today=None):
+        """
+        Notifications des plans d'action des CDR validées dans la fenêtre de la politique CDR
+
+        Returns:
+            tuple: (créées, mises à jour)
+        """
+        from cartographie_risque.models import PlanAction
+        from parametre.services.cdr_notification_service import _build_notification_payload
+
+        today = today or timezone.now().date()
+        policy = NotificationPolicy.get_for_scope(NotificationPolicy.SCOPE_CDR)
+
+        plans = PlanAction.objects.filter(
+            deadline_window_q(today, policy),
+            delai_realisation__isnull=False,
+            details_cdr__cdr__is_validated=True,
+        ).select_related(
+            'details_cdr',
+            'details_cdr__cdr',
+            'details_cdr__cdr__processus',
+        ).prefetch_related('responsables')
+        if plan_uuids is not None:
+            plans = plans.filter(uuid__in=list(plan_uuids))
+        if processus_uuids is not None:
+            plans = plans.filter(details_cdr__cdr__processus__in=list(processus_uuids))
+
+        items = [
+            (plan.details_cdr.cdr.processus_id, plan.uuid, _build_notification_payload(plan, today))
+            for plan in plans
+        ]
+        return cls._materialize(PlanAction, 'cartographie_risque', 'plan_action', items)
+
+    @staticmethod
+    def forget(model, object_ids):
+        """Supprime les notifications d'objets supprimés (pas de cascade sur la clé générique)"""
+        content_type = ContentType.objects.get_for_model(model)
+        return Notification.objects.filter(content_type=content_type, object_id__in=list(object_ids)).delete()[0]
+
+    # ── Lecture ────────────────────────────────────────────────────────────────
+
+    @staticmethod
+    def index(user, model, source_app, notification_type, due_q=Q()):
+        """
+        Notifications matérialisées d'un utilisateur (lecture seule)
+
+        Returns:
+            dict: object_id -> (uuid de la notification, read_at)
+        """
+        content_type = ContentType.objects.get_for_model(model)
+        rows = Notification.objects.filter(
+            due_q,
+            user=user,
+            content_type=content_type,
+            source_app=source_app,
+            notification_type=notification_type,
+        ).values_list('object_id', 'uuid', 'read_at')
+        return {object_id: (notification_uuid, read_at) for object_id, notification_uuid, read_at in rows}
+
+    # ── Destinataires ──────────────────────────────────────────────────────────
+
+    @staticmethod
+    def recipients_by_processus(processus_ids):
+        """
+        Destinataires par processus, en deux requêtes
+
+        Returns:
+            dict: processus_id -> set(user_id)
+        """
+        processus_ids = set(processus_ids)
+        if not processus_ids:
+            return {}
+
+        all_access = set(
+            User.objects.filter(is_active=True).filter(
+                Q(is_staff=True, is_superuser=True)
+                | Q(
+                    user_processus_roles__is_active=True,
+                    user_processus_roles__is_global=True,
+                    user_processus_roles__role__code='superviseur_smi',
+                )
+                | Q(
+                    user_processus_roles__is_active=True,
+                    user_processus_roles__role__code='admin',
+                    user_processus_roles__processus__nom__iregex=r'^({})$'.format('|'.join(SUPER_ADMIN_PROCESSUS)),
+                )
+            ).values_list('id', flat=True).distinct()
+        )
+
+        recipients = {processus_id: set(all_access) for processus_id in processus_ids}
+        for processus_id, user_id in UserProcessusRole.objects.filter(
+            is_active=True,
+            user__is_active=True,
+            processus_id__in=processus_ids,
+        ).values_list('processus_id', 'user_id').distinct():
+            recipients[processus_id].add(user_id)
+        return recipients
+
+    # ── Écriture ───────────────────────────────────────────────────────────────
+
+    @classmethod
+    def _materialize(cls, model, source_app, notification_type, items):
+        """
+        Lecture / comparaison / écriture groupée des notifications
+
+        items : liste de (processus_id, object_id, payload) ; le payload fournit
+        '_title', '_message', '_action_url', '_priority' et '_due_date'.
+        """
+        if not items:
+            return 0, 0
+
+        content_type = ContentType.objects.get_for_model(model)
+        recipients = cls.recipients_by_processus(processus_id for processus_id, _, _ in items)
+
+        desired = {}
+        for processus_id, object_id, payload in items:
+            values = {field: payload[f'_{field}'] for field in _SYNCED_FIELDS}
+            for user_id in recipients.get(processus_id, ()):
+                desired[(user_id, object_id)] = values
+
+        existing = {
+            (notification.user_id, notification.object_id): notification
+            for notification in Notification.objects.filter(
+                content_type=content_type,
+                source_app=source_app,
+                notification_type=notification_type,
+                object_id__in=[object_id for _, object_id, _ in items],
+            ).only('uuid', 'user_id', 'object_id', *_SYNCED_FIELDS)
+        }
+
+        now = timezone.now()
+        to_create = []
+        to_update = []
+        for (user_id, object_id), values in desired.items():
+            notification = existing.get((user_id, object_id))
+            if notification is None:
+                to_create.append(Notification(
+                    user_id=user_id,
+                    content_type=content_type,
+                    object_id=object_id,
+                    source_app=source_app,
+                    notification_type=notification_type,
+                    **values,
+                ))
+                continue
+            changed = False
+            for field, value in values.items():
+                if getattr(notification, field) != value:
+                    setattr(notification, field, value)
+                    changed = True
+            if changed:
+                notification.updated_at = now
+                to_update.append(notification)
+
+        if to_create:
+            Notification.objects.bulk_create(to_create, batch_size=cls.BATCH_SIZE)
+        if to_update:
+            Notification.objects.bulk_update(
+                to_update, fields=[*_SYNCED_FIELDS, 'updated_at'], batch_size=cls.BATCH_SIZE
+            )
+
+        logger.info(
+            "[NotificationMaterializer] %s/%s : %s créée(s), %s mise(s) à jour",
+            source_app, notification_type, len(to_create), len(to_update),
+        )
+        return len(to_create), len(to_update)
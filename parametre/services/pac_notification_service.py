@@ -5,26 +5,31 @@ Peut être appelé depuis :
   - une view DRF  (parametre/views.py)
   - un management command / scheduler  (send_reminders_secure)
   - des tests unitaires sans request factory
+
+Lecture seule : les lignes Notification sont écrites par NotificationMaterializer.
 """
 import logging
-from datetime import date
 
-from django.contrib.contenttypes.models import ContentType
 from django.utils import timezone
 
 from pac.models import TraitementPac
-from parametre.models import Notification, NotificationPolicy
+from parametre.models import NotificationPolicy
+from parametre.services.notification_materializer import NotificationMaterializer
 from parametre.permissions import get_user_processus_list
-from parametre.utils.notification_policy import should_notify_pac
+from parametre.utils.notification_policy import deadline_window_q, should_notify_pac
 
 logger = logging.getLogger(__name__)
 
 
-def _get_traitements_for_user(user):
-    """Retourne le queryset TraitementPac filtré selon les droits de l'utilisateur."""
+def _get_traitements_for_user(user, today, policy):
+    """
+    Retourne le queryset TraitementPac filtré selon les droits de l'utilisateur,
+    limité en SQL à la fenêtre d'échéance de la politique (deadline_window_q).
+    """
     user_processus_uuids = get_user_processus_list(user)
 
     base_qs = TraitementPac.objects.filter(
+        deadline_window_q(today, policy),
         details_pac__isnull=False,
         delai_realisation__isnull=False,
     ).select_related(
@@ -101,7 +106,7 @@ def _build_notification_payload(traitement, today):
         'type_action': type_action,
         'days_remaining': days_until_due,
         'delai_label': delai_label,
-        # Champs internes utilisés par _sync_notifications
+        # Champs internes utilisés par NotificationMaterializer
         '_title': title,
         '_message': message,
         '_action_url': action_url,
@@ -111,92 +116,6 @@ def _build_notification_payload(traitement, today):
     }
 
 
-def _sync_notifications(user, payloads):
-    """
-    Crée ou met à jour les objets Notification en base pour l'utilisateur,
-    en utilisant bulk_create / bulk_update pour éviter le N+1.
-
-    Enrichit chaque payload avec 'notification_uuid' et 'read_at'.
-    """
-    if not payloads:
-        return
-
-    content_type = ContentType.objects.get_for_model(TraitementPac)
-    traitement_uuids = [p['_traitement_uuid'] for p in payloads]
-
-    # 1 seule requête pour charger les notifications existantes
-    existing = {
-        n.object_id: n
-        for n in Notification.objects.filter(
-            user=user,
-            content_type=content_type,
-            object_id__in=traitement_uuids,
-            source_app='pac',
-            notification_type='traitement',
-        )
-    }
-
-    to_create = []
-    to_update = []
-    updated_fields_set = {'title', 'message', 'action_url', 'priority', 'due_date', 'updated_at'}
-
-    for payload in payloads:
-        uuid = payload['_traitement_uuid']
-        title = payload['_title']
-        message = payload['_message']
-        action_url = payload['_action_url']
-        priority = payload['_priority']
-        due_date = payload['_due_date']
-
-        if uuid in existing:
-            notif = existing[uuid]
-            changed = False
-            if notif.title != title:
-                notif.title = title
-                changed = True
-            if notif.message != message:
-                notif.message = message
-                changed = True
-            if notif.action_url != action_url:
-                notif.action_url = action_url
-                changed = True
-            if notif.priority != priority:
-                notif.priority = priority
-                changed = True
-            if notif.due_date != due_date:
-                notif.due_date = due_date
-                changed = True
-            if changed:
-                to_update.append(notif)
-            payload['notification_uuid'] = str(notif.uuid)
-            payload['read_at'] = notif.read_at.isoformat() if notif.read_at else None
-        else:
-            notif = Notification(
-                user=user,
-                content_type=content_type,
-                object_id=uuid,
-                source_app='pac',
-                notification_type='traitement',
-                title=title,
-                message=message,
-                action_url=action_url,
-                priority=priority,
-                due_date=due_date,
-            )
-            to_create.append((payload, notif))
-
-    # Bulk create
-    if to_create:
-        new_notifs = Notification.objects.bulk_create([n for _, n in to_create])
-        for (payload, _), new_notif in zip(to_create, new_notifs):
-            payload['notification_uuid'] = str(new_notif.uuid)
-            payload['read_at'] = None
-
-    # Bulk update
-    if to_update:
-        Notification.objects.bulk_update(to_update, fields=list(updated_fields_set))
-
-
 def get_pac_notifications(user):
     """
     Point d'entrée principal du service.
@@ -213,7 +132,11 @@ def get_pac_notifications(user):
     today = timezone.now().date()
     policy = NotificationPolicy.get_for_scope(NotificationPolicy.SCOPE_PAC)
 
-    traitements = _get_traitements_for_user(user)
+    # Lecture seule : notifications matérialisées de l'utilisateur, puis traitements correspondants
+    materialized = NotificationMaterializer.index(
+        user, TraitementPac, 'pac', 'traitement', deadline_window_q(today, policy, field='due_date')
+    )
+    traitements = _get_traitements_for_user(user, today, policy).filter(uuid__in=list(materialized))
     payloads = []
 
     for traitement in traitements:
@@ -221,12 +144,11 @@ def get_pac_notifications(user):
             continue
         if not should_notify_pac(traitement, today, policy):
             continue
-        payloads.append(_build_notification_payload(traitement, today))
-
-    try:
-        _sync_notifications(user, payloads)
-    except Exception:
-        logger.exception("Erreur lors de la synchronisation des notifications PAC pour %s", user)
+        payload = _build_notification_payload(traitement, today)
+        notification_uuid, read_at = materialized[traitement.uuid]
+        payload['notification_uuid'] = str(notification_uuid)
+        payload['read_at'] = read_at.isoformat() if read_at else None
+        payloads.append(payload)
 
     # Nettoyer les champs internes avant de retourner
     notifications = []
@@ -250,13 +250,13 @@ class RecaptchaService:
         else:
             token_hash = hashlib.sha256(token.encode('utf-8')).hexdigest()
             cache_key = f'recaptcha:replay:{token_hash}'
-            if cache.get(cache_key):
+            # cache.add est atomique sur le cache partagé : deux workers ne peuvent pas accepter le même token
+            if not cache.add(cache_key, True, timeout=120):
                 logger.warning(
                     "reCAPTCHA replay détecté (action=%s score=%.2f) — token rejeté",
                     actual_action, score,
                 )
                 return False, {'error': 'Token reCAPTCHA déjà utilisé', 'replay': True}
-            cache.set(cache_key, True, timeout=120)
 
         logger.info(
             "reCAPTCHA validé: score=%.2f action=%s",
@@ -0,0 +1,413 @@
+"""
+Bundle des données de référence — logique métier pure, sans couche HTTP.
+
+Le SPA appelait à chaque écran une quinzaine d'endpoints de listes (natures,
+catégories, directions, processus, fréquences, mois, années...), chacun
+re-requêtant et re-sérialisant ses données. /api/parametre/reference-bundle/
+les renvoie en une réponse :
+
+- chaque table est rendue une fois puis gardée en cache avec son empreinte
+  (clé `reference_bundle:<table>:<version>`) ;
+- la version d'une table est incrémentée après le commit de toute écriture sur
+  un modèle dont elle dépend (signaux, parametre/reference_bundle_signals.py) ;
+- l'ETag de la réponse est l'empreinte des tables demandées (If-None-Match → 304).
+
+Synchronisation différentielle : chaque écriture est aussi journalisée dans
+ReferenceChange (id = version). Un client qui détient la version N reçoit via
+/api/parametre/reference-bundle/changes/?since=N les seuls éléments créés, modifiés
+(upserted) ou désactivés / supprimés (removed) depuis N, et la nouvelle version.
+
+Les éléments sont ceux des endpoints de listes « actifs uniquement », sans les
+champs qui dépendent d'autres tables que les référentiels (cree_par, pacs_count).
+"""
+import hashlib
+import json
+import logging
+from datetime import timedelta
+
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+CACHE_PREFIX = 'reference_bundle'
+CACHE_TIMEOUT = 60 * 60 * 24
+
+
+# ─────────────────────────────────────────────
+# Rendu des tables
+# ─────────────────────────────────────────────
+
+def _only(queryset, uuids):
+    """Restreint le rendu aux éléments demandés (synchronisation différentielle)."""
+    return queryset if uuids is None else queryset.filter(uuid__in=list(uuids))
+
+
+def _simple(model):
+    """Éléments nom/description communs aux référentiels simples (natures, catégories...)."""
+    def load(uuids=None):
+        return [
+            {
+                'uuid': str(obj.uuid),
+                'nom': obj.nom,
+                'description': obj.description,
+                'created_at': obj.created_at.isoformat(),
+                'is_active': obj.is_active,
+            }
+            for obj in _only(model.objects.filter(is_active=True), uuids).order_by('nom')
+        ]
+    return load
+
+
+def _statuts(uuids=None):
+    from parametre.models import Statut
+    return [
+        {
+            'uuid': str(statut.uuid),
+            'nom': statut.nom,
+            'description': statut.description,
+            'created_at': statut.created_at.isoformat(),
+            'updated_at': statut.updated_at.isoformat(),
+        }
+        for statut in _only(Statut.objects.all(), uuids).order_by('nom')
+    ]
+
+
+def _sous_directions(uuids=None):
+    from parametre.models import SousDirection
+    return [
+        {
+            'uuid': str(sous_direction.uuid),
+            'nom': sous_direction.nom,
+            'description': sous_direction.description,
+            'direction': {
+                'uuid': str(sous_direction.direction.uuid),
+                'nom': sous_direction.direction.nom,
+            },
+            'created_at': sous_direction.created_at.isoformat(),
+            'is_active': sous_direction.is_active,
+        }
+        for sous_direction in _only(SousDirection.objects.select_related('direction').filter(is_active=True), uuids)
+        .order_by('direction__nom', 'nom')
+    ]
+
+
+def _services(uuids=None):
+    from parametre.models import Service
+    return [
+        {
+            'uuid': str(service.uuid),
+            'nom': service.nom,
+            'description': service.description,
+            'sous_direction': {
+                'uuid': str(service.sous_direction.uuid),
+                'nom': service.sous_direction.nom,
+                'direction': {
+                    'uuid': str(service.sous_direction.direction.uuid),
+                    'nom': service.sous_direction.direction.nom,
+                },
+            },
+            'created_at': service.created_at.isoformat(),
+            'is_active': service.is_active,
+        }
+        for service in _only(Service.objects.select_related('sous_direction__direction').filter(is_active=True), uuids)
+        .order_by('sous_direction__direction__nom', 'sous_direction__nom', 'nom')
+    ]
+
+
+def _processus(uuids=None):
+    from parametre.models import Processus
+    return [
+        {
+            'uuid': str(processus.uuid),
+            'numero_processus': processus.numero_processus,
+            'nom': processus.nom,
+            'description': processus.description,
+            'created_at': processus.created_at.isoformat(),
+            'is_active': processus.is_active,
+        }
+        for processus in _only(Processus.objects.filter(is_active=True), uuids).order_by('numero_processus')
+    ]
+
+
+def _mois(uuids=None):
+    from parametre.models import Mois
+    return [
+        {'uuid': str(m.uuid), 'numero': m.numero, 'nom': m.nom, 'abreviation': m.abreviation}
+        for m in _only(Mois.objects.all(), uuids).order_by('numero')
+    ]
+
+
+def _annees(uuids=None):
+    from parametre.models import Annee
+    return [
+        {
+            'uuid': str(annee.uuid),
+            'annee': annee.annee,
+            'libelle': annee.libelle,
+            'description': annee.description,
+            'is_active': annee.is_active,
+            'created_at': annee.created_at.isoformat(),
+            'updated_at': annee.updated_at.isoformat(),
+        }
+        for annee in _only(Annee.objects.filter(is_active=True), uuids).order_by('-annee')
+    ]
+
+
+def _libelles(model, *fields):
+    """Référentiels de risque indexés par libellé (fréquences, gravités, criticités)."""
+    def load(uuids=None):
+        return [
+            {
+                'uuid': str(obj.uuid),
+                'libelle': obj.libelle,
+                **{field: getattr(obj, field) for field in fields},
+                'is_active': obj.is_active,
+            }
+            for obj in _only(model.objects.filter(is_active=True), uuids).order_by('libelle')
+        ]
+    return load
+
+
+def _serialized(model, serializer_name, order_by, active_only=True):
+    """Tables dont l'endpoint de liste renvoie directement un serializer DRF."""
+    def load(uuids=None):
+        from parametre import serializers
+        queryset = _only(model.objects.all(), uuids)
+        if active_only:
+            queryset = queryset.filter(is_active=True)
+        return list(getattr(serializers, serializer_name)(queryset.order_by(order_by), many=True).data)
+    return load
+
+
+def _tables():
+    """
+    Tables du bundle : nom -> (modèle, dépendances, fonction de rendu).
+
+    Les dépendances associent les modèles imbriqués dans le rendu au chemin qui
+    y mène depuis le modèle de la table (ex. le nom de la direction d'un service).
+    L'ordre est celui de la réponse.
+    """
+    from parametre import models as m
+
+    return {
+        'natures': (m.Nature, {}, _simple(m.Nature)),
+        'categories': (m.Categorie, {}, _simple(m.Categorie)),
+        'sources': (m.Source, {}, _simple(m.Source)),
+        'action_types': (m.ActionType, {}, _simple(m.ActionType)),
+        'statuts': (m.Statut, {}, _statuts),
+        'etats_mise_en_oeuvre': (m.EtatMiseEnOeuvre, {}, _simple(m.EtatMiseEnOeuvre)),
+        'appreciations': (m.Appreciation, {}, _simple(m.Appreciation)),
+        'statuts_action_cdr': (m.StatutActionCDR, {}, _simple(m.StatutActionCDR)),
+        'directions': (m.Direction, {}, _simple(m.Direction)),
+        'sous_directions': (m.SousDirection, {m.Direction: 'direction'}, _sous_directions),
+        'services': (
+            m.Service,
+            {m.SousDirection: 'sous_direction', m.Direction: 'sous_direction__direction'},
+            _services,
+        ),
+        'processus': (m.Processus, {}, _processus),
+        'dysfonctionnements': (m.DysfonctionnementRecommandation, {}, _simple(m.DysfonctionnementRecommandation)),
+        'frequences': (m.Frequence, {}, _serialized(m.Frequence, 'FrequenceSerializer', 'nom', active_only=False)),
+        'mois': (m.Mois, {}, _mois),
+        'annees': (m.Annee, {}, _annees),
+        'frequences_risque': (m.FrequenceRisque, {}, _libelles(m.FrequenceRisque, 'valeur')),
+        'gravites_risque': (m.GraviteRisque, {}, _libelles(m.GraviteRisque, 'code')),
+        'criticites_risque': (m.CriticiteRisque, {}, _libelles(m.CriticiteRisque)),
+        'risques': (m.Risque, {}, _serialized(m.Risque, 'RisqueSerializer', 'libelle')),
+        'types_document': (m.TypeDocument, {}, _serialized(m.TypeDocument, 'TypeDocumentSerializer', 'nom')),
+    }
+
+
+# ─────────────────────────────────────────────
+# Service
+# ─────────────────────────────────────────────
+
+class ReferenceBundleService:
+    """
+    Rendu, cache versionné et journal des tables de référence
+
+    Usage :
+        bundle = ReferenceBundleService.get_bundle(['natures', 'processus'])  # {'etag', 'version', 'tables'}
+        delta = ReferenceBundleService.get_changes(since=42)                  # {'version', 'changes'}
+        ReferenceBundleService.record_changes(Nature, [nature.uuid])          # dans la transaction d'écriture
+        ReferenceBundleService.invalidate_model(Nature)                        # après le commit
+    """
+
+    # Les entrées plus récentes peuvent appartenir à des transactions encore ouvertes
+    # dont les ids inférieurs ne sont pas visibles : la version rendue reste en deçà,
+    # ces entrées seront renvoyées au passage suivant (upsert idempotent).
+    VERSION_SAFETY_SECONDS = 5
+
+    _table_specs = None
+
+    @classmethod
+    def tables(cls):
+        if cls._table_specs is None:
+            cls._table_specs = _tables()
+        return cls._table_specs
+
+    @classmethod
+    def table_names(cls):
+        return list(cls.tables())
+
+    @classmethod
+    def models(cls):
+        """Modèles dont les écritures modifient le bundle"""
+        models = set()
+        for model, dependencies, _ in cls.tables().values():
+            models.add(model)
+            models.update(dependencies)
+        return models
+
+    @classmethod
+    def tables_for_model(cls, model):
+        """Tables dont le rendu dépend du modèle (proxies et sous-classes compris)"""
+        return [
+            name for name, (table_model, dependencies, _) in cls.tables().items()
+            if issubclass(model, table_model) or any(issubclass(model, dependency) for dependency in dependencies)
+        ]
+
+    # ── Cache du rendu ─────────────────────────────────────────────────────────
+
+    @staticmethod
+    def _version_key(table):
+        return f'{CACHE_PREFIX}:{table}:version'
+
+    @classmethod
+    def invalidate_model(cls, model):
+        """Incrémente la version de cache des tables qui dépendent du modèle"""
+        tables = cls.tables_for_model(model)
+        for table in tables:
+            key = cls._version_key(table)
+            cache.add(key, 0, timeout=None)
+            cache.incr(key)
+        return tables
+
+    @staticmethod
+    def _digest(data):
+        return hashlib.sha256(
+            json.dumps(data, sort_keys=True, default=str, separators=(',', ':')).encode()
+        ).hexdigest()
+
+    @classmethod
+    def get_bundle(cls, tables=None):
+        """
+        Tables demandées (toutes par défaut), depuis le cache ou rendues à la demande.
+
+        Returns:
+            dict: {'etag': str, 'version': int, 'tables': {nom: [éléments]}}
+        """
+        specs = cls.tables()
+        names = list(specs) if not tables else [name for name in specs if name in set(tables)]
+
+        # Lue avant le rendu : au pire le client rejouera des changements déjà reçus
+        version = cls.current_version()
+
+        versions = cache.get_many([cls._version_key(name) for name in names])
+        entry_keys = {
+            name: f'{CACHE_PREFIX}:{name}:{versions.get(cls._version_key(name), 0)}'
+            for name in names
+        }
+        entries = cache.get_many(list(entry_keys.values()))
+
+        missing = {}
+        for name in names:
+            if entry_keys[name] not in entries:
+                data = specs[name][2]()
+                entry = {'hash': cls._digest(data), 'data': data}
+                entries[entry_keys[name]] = entry
+                missing[entry_keys[name]] = entry
+        if missing:
+            cache.set_many(missing, timeout=CACHE_TIMEOUT)
+            logger.info("[ReferenceBundleService] %s table(s) rendue(s)", len(missing))
+
+        rendered = {name: entries[entry_keys[name]] for name in names}
+        etag = hashlib.sha256(
+            '|'.join(f"{name}:{entry['hash']}" for name, entry in rendered.items()).encode()
+        ).hexdigest()
+        return {
+            'etag': etag,
+            'version': version,
+            'tables': {name: entry['data'] for name, entry in rendered.items()},
+        }
+
+    # ── Journal (synchronisation différentielle) ───────────────────────────────
+
+    @classmethod
+    def record_changes(cls, model, object_uuids):
+        """
+        Journalise les éléments du bundle touchés par une écriture sur `model`,
+        y compris les éléments qui l'imbriquent (ex. services d'une direction renommée).
+        Seule la dernière entrée de chaque élément est conservée.
+        """
+        from parametre.models import ReferenceChange
+
+        object_uuids = list(object_uuids)
+        changes = []
+        for name, (table_model, dependencies, _) in cls.tables().items():
+            if issubclass(model, table_model):
+                uuids = object_uuids
+            else:
+                path = next((p for dep, p in dependencies.items() if issubclass(model, dep)), None)
+                if path is None:
+                    continue
+                uuids = list(
+                    table_model.objects.filter(**{f'{path}__in': object_uuids}).values_list('uuid', flat=True)
+                )
+            changes.extend((name, object_uuid) for object_uuid in uuids)
+
+        if not changes:
+            return 0
+        for name in {name for name, _ in changes}:
+            ReferenceChange.objects.filter(
+                table=name, object_uuid__in=[object_uuid for table, object_uuid in changes if table == name]
+            ).delete()
+        ReferenceChange.objects.bulk_create(
+            [ReferenceChange(table=name, object_uuid=object_uuid) for name, object_uuid in changes]
+        )
+        return len(changes)
+
+    @classmethod
+    def current_version(cls, since=0):
+        """Plus haute version sûre (voir VERSION_SAFETY_SECONDS), au moins `since`"""
+        from django.db.models import Max
+        from django.utils import timezone
+        from parametre.models import ReferenceChange
+
+        settled = timezone.now() - timedelta(seconds=cls.VERSION_SAFETY_SECONDS)
+        version = ReferenceChange.objects.filter(created_at__lte=settled).aggregate(v=Max('id'))['v'] or 0
+        return max(version, since)
+
+    @classmethod
+    def get_changes(cls, since, tables=None):
+        """
+        Éléments créés, modifiés, désactivés ou supprimés depuis la version `since`.
+
+        Returns:
+            dict: {'version': int, 'changes': {nom: {'upserted': [éléments], 'removed': [uuids]}}}
+        """
+        from parametre.models import ReferenceChange
+
+        specs = cls.tables()
+        version = cls.current_version(since)
+        entries = ReferenceChange.objects.filter(id__gt=since)
+        if tables:
+            entries = entries.filter(table__in=list(tables))
+
+        changed = {}
+        for name, object_uuid in entries.values_list('table', 'object_uuid'):
+            if name in specs:
+                changed.setdefault(name, set()).add(str(object_uuid))
+
+        changes = {}
+        for name in specs:
+            if name not in changed:
+                continue
+            # Éléments absents du rendu actif : désactivés ou supprimés
+            upserted = specs[name][2](changed[name])
+            present = {item['uuid'] for item in upserted}
+            changes[name] = {
+                'upserted': upserted,
+                'removed': sorted(changed[name] - present),
+            }
+        return {'version': version, 'changes': changes}
@@ -0,0 +1,248 @@
+"""
+Canal de commandes workers Gunicorn → service scheduler — logique pure.
+
+Les commandes (reprogrammer un job, le déclencher) étaient des fichiers
+kora_cmd_*.json déposés dans /tmp et lus toutes les 30 secondes : jusqu'à 30 s
+avant application, aucun retour vers l'admin, et un /tmp partagé obligatoire.
+
+Elles sont désormais des lignes SchedulerCommand :
+
+1. le worker Gunicorn insère la commande puis, après le commit, envoie un
+   datagramme de réveil sur la socket Unix du service (SCHEDULER_COMMAND_SOCKET) ;
+2. le service, réveillé aussitôt (ou au plus tard après
+   SCHEDULER_COMMAND_POLL_INTERVAL secondes si la socket est indisponible),
+   réserve les commandes en attente avec select_for_update(skip_locked=True),
+   les acquitte, les applique et enregistre leur résultat ; au démarrage, les
+   commandes restées acquittées (service arrêté en cours d'application) sont
+   marquées en échec ;
+3. l'admin lit le statut et le résultat sur l'API (attente bornée possible).
+
+La table fait foi : le datagramme n'est qu'un accélérateur, sa perte ne retarde
+une commande que jusqu'au prochain passage.
+"""
+import logging
+import os
+import select
+import socket
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+class CommandWakeup:
+    """
+    Socket Unix d'écoute du service scheduler
+
+    Usage (thread de consommation) :
+        wakeup = CommandWakeup()
+        wakeup.wait(1.0, stop_event)    # réveil par SchedulerCommandChannel.wake() ou délai
+        wakeup.close()
+    """
+
+    def __init__(self, path=None):
+        self.path = path or settings.SCHEDULER_COMMAND_SOCKET
+        self._sock = None
+        if not hasattr(socket, 'AF_UNIX'):
+            logger.info("[SchedulerCommand] Sockets Unix indisponibles : lecture périodique de la table")
+            return
+        try:
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            sock.bind(self.path)
+            sock.setblocking(False)
+            # Les workers Gunicorn tournent sous le même utilisateur ou le même groupe
+            os.chmod(self.path, 0o660)
+            self._sock = sock
+        except OSError as e:
+            logger.warning("[SchedulerCommand] Socket %s indisponible (%s) : lecture périodique de la table", self.path, e)
+
+    def wait(self, timeout, stop_event=None):
+        """Attend un réveil (True) ou la fin du délai (False)"""
+        if self._sock is None:
+            if stop_event is not None:
+                stop_event.wait(timeout)
+            else:
+                time.sleep(timeout)
+            return False
+        ready, _, _ = select.select([self._sock], [], [], timeout)
+        if not ready:
+            return False
+        # Plusieurs envois rapprochés : un seul passage suffit
+        try:
+            while True:
+                self._sock.recv(16)
+        except (BlockingIOError, OSError):
+            pass
+        return True
+
+    def close(self):
+        if self._sock is None:
+            return
+        self._sock.close()
+        self._sock = None
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+
+
+class SchedulerCommandChannel:
+    """
+    Envoi, consommation et suivi des commandes du scheduler
+
+    Usage :
+        command = SchedulerCommandChannel.send('reschedule', job_id, user, hour=8, minute=0)   # Gunicorn
+        SchedulerCommandChannel.recover_interrupted()                                         # démarrage du service
+        SchedulerCommandChannel.consume(handler)                                              # service
+        SchedulerCommandChannel.wait_for(command.id, timeout=2)                               # API admin
+    """
+
+    @classmethod
+    def send(cls, action, job_id, user=None, **params):
+        """Dépose une commande ; le service est réveillé après le commit"""
+        from parametre.models import SchedulerCommand
+
+        command = SchedulerCommand.objects.create(
+            action=action,
+            job_id=job_id,
+            params=params,
+            cree_par=user if user is not None and user.is_authenticated else None,
+        )
+        transaction.on_commit(cls.wake)
+        logger.debug("[SchedulerCommand] #%s %s %s déposée", command.id, action, job_id)
+        return command
+
+    @staticmethod
+    def wake():
+        """Datagramme de réveil ; sans effet si le service n'écoute pas (il relira la table)"""
+        if not hasattr(socket, 'AF_UNIX'):
+            return
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sock:
+                sock.setblocking(False)
+                sock.sendto(b'1', settings.SCHEDULER_COMMAND_SOCKET)
+        except OSError:
+            pass
+
+    @classmethod
+    def _acknowledge_next(cls):
+        """Réserve et acquitte la plus ancienne commande en attente, ou None"""
+        from parametre.models import SchedulerCommand
+
+        with transaction.atomic():
+            command = (
+                SchedulerCommand.objects.select_for_update(skip_locked=True)
+                .filter(status=SchedulerCommand.STATUS_PENDING)
+                .order_by('id')
+                .first()
+            )
+            if command is None:
+                return None
+            now = timezone.now()
+            acknowledged = SchedulerCommand.objects.filter(
+                pk=command.pk, status=SchedulerCommand.STATUS_PENDING
+            ).update(status=SchedulerCommand.STATUS_ACKNOWLEDGED, acknowledged_at=now)
+        if not acknowledged:
+            return None
+        command.status = SchedulerCommand.STATUS_ACKNOWLEDGED
+        command.acknowledged_at = now
+        return command
+
+    @classmethod
+    def consume(cls, handler, limit=100):
+        """
+        Applique les commandes en attente dans l'ordre d'envoi.
+
+        Args:
+            handler: fonction commande -> résultat (JSON) ; une exception marque la commande en échec
+
+        Returns:
+            int: nombre de commandes traitées
+        """
+        from parametre.models import SchedulerCommand
+
+        count = 0
+        while count < limit:
+            command = cls._acknowledge_next()
+            if command is None:
+                break
+            count += 1
+            try:
+                result = handler(command)
+            except Exception as e:
+                logger.error("[SchedulerCommand] #%s %s %s en échec : %s", command.id, command.action, command.job_id, e)
+                SchedulerCommand.objects.filter(pk=command.pk).update(
+                    status=SchedulerCommand.STATUS_FAILED, error=str(e)[:2000], completed_at=timezone.now(),
+                )
+                continue
+            SchedulerCommand.objects.filter(pk=command.pk).update(
+                status=SchedulerCommand.STATUS_DONE, result=result, completed_at=timezone.now(),
+            )
+        return count
+
+    @staticmethod
+    def recover_interrupted():
+        """
+        Marque en échec les commandes acquittées mais jamais terminées (service arrêté entre
+        l'acquittement et l'application). À appeler au démarrage du service, avant consume() :
+        le service étant unique, aucune commande acquittée n'est alors en cours.
+
+        Elles ne sont pas remises en attente : l'admin relance la commande si besoin, plutôt
+        qu'un déclenchement éventuellement déjà appliqué ne soit rejoué.
+        """
+        from parametre.models import SchedulerCommand
+
+        failed = SchedulerCommand.objects.filter(status=SchedulerCommand.STATUS_ACKNOWLEDGED).update(
+            status=SchedulerCommand.STATUS_FAILED,
+            error='Service scheduler arrêté pendant la commande',
+            completed_at=timezone.now(),
+        )
+        if failed:
+            logger.warning("[SchedulerCommand] %s commande(s) interrompue(s) marquée(s) en échec", failed)
+        return failed
+
+    @staticmethod
+    def purge():
+        """Supprime les commandes traitées depuis plus de SCHEDULER_COMMAND_RETENTION_DAYS jours"""
+        from parametre.models import SchedulerCommand
+
+        limit = timezone.now() - timedelta(days=settings.SCHEDULER_COMMAND_RETENTION_DAYS)
+        deleted, _ = SchedulerCommand.objects.filter(
+            status__in=[SchedulerCommand.STATUS_DONE, SchedulerCommand.STATUS_FAILED], completed_at__lt=limit,
+        ).delete()
+        return deleted
+
+    @staticmethod
+    def wait_for(command_id, timeout, interval=0.1):
+        """Commande relue jusqu'à son traitement ou la fin du délai (secondes) ; None si inconnue"""
+        from parametre.models import SchedulerCommand
+
+        deadline = time.monotonic() + timeout
+        while True:
+            command = SchedulerCommand.objects.filter(pk=command_id).first()
+            if command is None or command.status in (SchedulerCommand.STATUS_DONE, SchedulerCommand.STATUS_FAILED):
+                return command
+            if time.monotonic() >= deadline:
+                return command
+            time.sleep(interval)
+
+    @staticmethod
+    def serialize(command):
+        return {
+            'id': command.id,
+            'action': command.action,
+            'job_id': command.job_id,
+            'params': command.params,
+            'status': command.status,
+            'result': command.result,
+            'error': command.error or None,
+            'created_at': command.created_at,
+            'acknowledged_at': command.acknowledged_at,
+            'completed_at': command.completed_at,
+        }
@@ -0,0 +1,143 @@
+"""
+Allocation des numéros séquentiels (PAC, processus, objectifs, détails CDR) — logique métier pure.
+
+Les générateurs relisaient la table cible à chaque création : generate_numero_pac
+verrouillait toutes les lignes DetailsPac (select_for_update) et analysait chaque
+numéro en Python, les autres comptaient les lignes puis sondaient l'unicité en
+boucle. Le dernier numéro attribué est désormais tenu par portée dans
+NumberSequence et incrémenté par un UPDATE d'une seule ligne :
+
+    UPDATE number_sequence SET value = value + 1 WHERE scope = :scope
+
+La ligne reste verrouillée jusqu'à la fin de la transaction englobante : seules
+les créations d'une même portée sont sérialisées. Une portée absente est
+initialisée au plus grand numéro existant (premier appel ou commande
+backfill_number_sequences).
+"""
+import logging
+import re
+
+from django.apps import apps
+from django.db import transaction
+from django.db.models import F
+
+logger = logging.getLogger(__name__)
+
+TRAILING_NUMBER = re.compile(r'(\d+)\s*$')
+
+# Séquences : nom -> (modèle, champ du numéro, champ de portée ou None pour une séquence globale)
+SEQUENCES = {
+    'numero_pac': ('pac.DetailsPac', 'numero_pac', None),
+    'numero_processus': ('parametre.Processus', 'numero_processus', None),
+    'objective_number': ('dashboard.Objectives', 'number', 'tableau_bord'),
+    'numero_cdr': ('cartographie_risque.DetailsCDR', 'numero_cdr', 'cdr'),
+}
+
+
+def _parse(numero):
+    """Valeur numérique finale d'un numéro (PAC07 -> 7, CDR-12 -> 12), None si absente"""
+    match = TRAILING_NUMBER.search(str(numero or ''))
+    return int(match.group(1)) if match else None
+
+
+class SequenceAllocator:
+    """
+    Compteurs transactionnels par portée
+
+    Usage :
+        numero = SequenceAllocator.next_number('numero_pac', 'PAC{:02d}')
+        numero = SequenceAllocator.next_number('objective_number', 'OB{:02d}', group=tableau_bord.pk)
+        SequenceAllocator.backfill()
+    """
+
+    @staticmethod
+    def scope(name, group=None):
+        return name if group is None else f'{name}:{group}'
+
+    @staticmethod
+    def _queryset(name, group=None):
+        label, field, group_field = SEQUENCES[name]
+        queryset = apps.get_model(label).objects.all()
+        if group_field is not None:
+            queryset = queryset.filter(**{group_field: group})
+        return queryset
+
+    @classmethod
+    def highest(cls, name, group=None):
+        """Plus grand numéro existant de la portée (0 si aucun)"""
+        field = SEQUENCES[name][1]
+        values = cls._queryset(name, group).exclude(**{f'{field}__isnull': True}).values_list(field, flat=True)
+        return max((n for n in map(_parse, values) if n is not None), default=0)
+
+    @classmethod
+    def next_value(cls, name, group=None):
+        """Incrémente et renvoie le compteur de la portée (verrou de ligne jusqu'au commit)"""
+        from parametre.models import NumberSequence
+
+        scope = cls.scope(name, group)
+        with transaction.atomic():
+            sequences = NumberSequence.objects.filter(scope=scope)
+            if not sequences.update(value=F('value') + 1):
+                # Première allocation : deux créations concurrentes insèrent la même graine, une seule gagne
+                NumberSequence.objects.bulk_create(
+                    [NumberSequence(scope=scope, value=cls.highest(name, group))], ignore_conflicts=True
+                )
+                sequences.update(value=F('value') + 1)
+            return sequences.values_list('value', flat=True).get()
+
+    @classmethod
+    def next_number(cls, name, template, group=None):
+        """
+        Prochain numéro formaté de la portée.
+
+        Un numéro saisi à la main peut devancer le compteur : il est alors sauté
+        (une requête d'existence par numéro attribué, sans relecture de la table).
+        """
+        field = SEQUENCES[name][1]
+        queryset = cls._queryset(name, group)
+        while True:
+            numero = template.format(cls.next_value(name, group))
+            if not queryset.filter(**{field: numero}).exists():
+                return numero
+            logger.warning("[SequenceAllocator] %s déjà utilisé (%s), numéro suivant", numero, cls.scope(name, group))
+
+    @classmethod
+    def backfill(cls, names=None):
+        """
+        Aligne chaque compteur sur le plus grand numéro existant de sa portée
+        (jamais en arrière). Une lecture de chaque table cible.
+
+        Returns:
+            dict: {nom: nombre de portées créées ou avancées}
+        """
+        from parametre.models import NumberSequence
+
+        counts = {}
+        for name in names or list(SEQUENCES):
+            label, field, group_field = SEQUENCES[name]
+            model = apps.get_model(label)
+            columns = [field] if group_field is None else [field, f'{group_field}_id']
+
+            highest = {}
+            for row in model.objects.exclude(**{f'{field}__isnull': True}).values_list(*columns):
+                number = _parse(row[0])
+                if number is None:
+                    continue
+                scope = cls.scope(name, None if group_field is None else row[1])
+                highest[scope] = max(highest.get(scope, 0), number)
+
+            with transaction.atomic():
+                current = dict(
+                    NumberSequence.objects.select_for_update()
+                    .filter(scope__in=list(highest)).values_list('scope', 'value')
+                )
+                NumberSequence.objects.bulk_create(
+                    [NumberSequence(scope=scope, value=value) for scope, value in highest.items() if scope not in current]
+                )
+                advanced = [
+                    NumberSequence(scope=scope, value=value)
+                    for scope, value in highest.items() if scope in current and value > current[scope]
+                ]
+                NumberSequence.objects.bulk_update(advanced, ['value'], batch_size=500)
+            counts[name] = len(highest) - len(current) + len(advanced)
+        return counts
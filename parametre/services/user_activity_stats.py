@@ -0,0 +1,236 @@
+"""
+Compteurs d'activité par utilisateur (UserActivityStats) — logique métier pure, sans couche HTTP.
+
+users_list annotait chaque utilisateur de sous-requêtes corrélées sur ActivityLog
+(dernière connexion, dernière déconnexion) et admin_user_detail comptait tout
+l'historique de l'utilisateur (connexions, actions, échecs de connexion) : leur
+coût croissait avec le journal. Les compteurs sont désormais tenus à l'écriture :
+
+- ActivityLog : après chaque lot de ActivityLogWriter, et par signal pour les
+  créations directes (parametre/user_activity_stats_signals.py) ;
+- FailedLoginAttempt : par signal, comptée pour l'utilisateur de la tentative et
+  pour chaque utilisateur dont l'email a été tenté (comme le filtre
+  Q(user=user) | Q(email_attempted=user.email) d'admin_user_detail).
+
+Les mises à jour d'un lot sont agrégées par utilisateur puis appliquées en une
+transaction, lignes verrouillées (select_for_update).
+"""
+import logging
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import Count, Max, OuterRef, Q, Subquery
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+LOGINS, ACTIONS, FAILED = range(3)
+
+
+def _empty_delta():
+    return {
+        'logins': 0, 'actions': 0, 'failed': 0,
+        'last_login': None, 'last_logout_at': None, 'last_activity_at': None,
+        'days': {},
+    }
+
+
+def _add_day(delta, moment, index, count=1):
+    day = timezone.localdate(moment).isoformat()
+    delta['days'].setdefault(day, [0, 0, 0])[index] += count
+
+
+def _credited_users(user_id, email_attempted, users_by_email):
+    """Utilisateurs à qui compter un échec de connexion : celui de la tentative et les titulaires de l'email"""
+    credited = set(users_by_email.get(email_attempted, ())) if email_attempted else set()
+    if user_id is not None:
+        credited.add(user_id)
+    return credited
+
+
+def _later(current, candidate):
+    return candidate if current is None or (candidate is not None and candidate > current) else current
+
+
+class UserActivityStatsService:
+    """
+    Mise à jour incrémentale et reconstruction des UserActivityStats
+
+    Usage :
+        UserActivityStatsService.record_activities(activity_logs)   # lot écrit en base
+        UserActivityStatsService.record_failed_logins([attempt])
+        UserActivityStatsService.rebuild()                           # depuis les journaux en base
+    """
+
+    # ── Mise à jour incrémentale ───────────────────────────────────────────────
+
+    @classmethod
+    def record_activities(cls, activity_logs, existing_user_ids=None):
+        deltas = {}
+        for activity in activity_logs:
+            delta = deltas.setdefault(activity.user_id, _empty_delta())
+            delta['actions'] += 1
+            delta['last_activity_at'] = _later(delta['last_activity_at'], activity.created_at)
+            _add_day(delta, activity.created_at, ACTIONS)
+            if activity.action == 'login':
+                delta['logins'] += 1
+                _add_day(delta, activity.created_at, LOGINS)
+                if delta['last_login'] is None or activity.created_at > delta['last_login'].created_at:
+                    delta['last_login'] = activity
+            elif activity.action == 'logout':
+                delta['last_logout_at'] = _later(delta['last_logout_at'], activity.created_at)
+        cls._apply(deltas, existing_user_ids)
+
+    @classmethod
+    def record_failed_logins(cls, attempts):
+        from django.contrib.auth.models import User
+
+        emails = {attempt.email_attempted for attempt in attempts if attempt.email_attempted}
+        users_by_email = {}
+        if emails:
+            for email, user_id in User.objects.filter(email__in=emails).values_list('email', 'id'):
+                users_by_email.setdefault(email, set()).add(user_id)
+
+        deltas = {}
+        for attempt in attempts:
+            for user_id in _credited_users(attempt.user_id, attempt.email_attempted, users_by_email):
+                delta = deltas.setdefault(user_id, _empty_delta())
+                delta['failed'] += 1
+                _add_day(delta, attempt.created_at or timezone.now(), FAILED)
+        cls._apply(deltas)
+
+    @classmethod
+    def _apply(cls, deltas, existing_user_ids=None):
+        from django.contrib.auth.models import User
+        from parametre.models import UserActivityStats
+
+        if not deltas:
+            return
+        with transaction.atomic():
+            # Un utilisateur supprimé entre-temps ferait échouer tout le lot (FK)
+            if existing_user_ids is None:
+                existing_user_ids = User.objects.filter(id__in=list(deltas)).values_list('id', flat=True)
+            user_ids = [user_id for user_id in existing_user_ids if user_id in deltas]
+            UserActivityStats.objects.bulk_create(
+                [UserActivityStats(user_id=user_id) for user_id in user_ids], ignore_conflicts=True
+            )
+            stats_rows = list(UserActivityStats.objects.select_for_update().filter(user_id__in=user_ids))
+            for stats in stats_rows:
+                cls._merge(stats, deltas[stats.user_id])
+            UserActivityStats.objects.bulk_update(stats_rows, [
+                'last_login_at', 'last_login_ip', 'last_login_device', 'last_login_browser', 'last_login_os',
+                'last_logout_at', 'last_activity_at', 'total_logins', 'total_actions', 'failed_logins_count',
+                'recent_days', 'updated_at',
+            ])
+
+    @staticmethod
+    def _merge(stats, delta):
+        stats.total_logins += delta['logins']
+        stats.total_actions += delta['actions']
+        stats.failed_logins_count += delta['failed']
+        stats.last_activity_at = _later(stats.last_activity_at, delta['last_activity_at'])
+        stats.last_logout_at = _later(stats.last_logout_at, delta['last_logout_at'])
+
+        login = delta['last_login']
+        if login is not None and (stats.last_login_at is None or login.created_at > stats.last_login_at):
+            stats.last_login_at = login.created_at
+            stats.last_login_ip = login.ip_address
+            stats.last_login_device = login.device_type
+            stats.last_login_browser = login.browser
+            stats.last_login_os = login.os_name
+
+        since = (timezone.localdate() - timedelta(days=stats.RECENT_DAYS - 1)).isoformat()
+        days = {day: counts for day, counts in stats.recent_days.items() if day >= since}
+        for day, counts in delta['days'].items():
+            if day >= since:
+                current = days.get(day, [0, 0, 0])
+                days[day] = [current[i] + counts[i] for i in range(3)]
+        stats.recent_days = days
+        stats.updated_at = timezone.now()
+
+    # ── Reconstruction ─────────────────────────────────────────────────────────
+
+    @classmethod
+    def rebuild(cls):
+        """
+        Recalcule tous les compteurs depuis ActivityLog et FailedLoginAttempt.
+
+        Les totaux repartent des lignes présentes en base : à lancer avant le premier
+        archivage (archive_logs), pas après. Lancé automatiquement après migrate tant
+        que la table est vide (user_activity_stats_signals.rebuild_if_empty).
+
+        Returns:
+            int: nombre d'utilisateurs reconstruits
+        """
+        from django.contrib.auth.models import User
+        from parametre.models import ActivityLog, FailedLoginAttempt, UserActivityStats
+
+        since_day = timezone.localdate() - timedelta(days=UserActivityStats.RECENT_DAYS - 1)
+        since = timezone.make_aware(datetime.combine(since_day, time.min))
+        last_login = ActivityLog.objects.filter(user=OuterRef('pk'), action='login').order_by('-created_at')
+        users = list(User.objects.annotate(
+            total_actions=Count('activity_logs'),
+            total_logins=Count('activity_logs', filter=Q(activity_logs__action='login')),
+            last_activity_at=Max('activity_logs__created_at'),
+            last_logout_at=Max('activity_logs__created_at', filter=Q(activity_logs__action='logout')),
+        ).values('id', 'email', 'total_actions', 'total_logins', 'last_activity_at', 'last_logout_at'))
+        last_logins = {
+            row['id']: row for row in User.objects.annotate(
+                last_login_at=Subquery(last_login.values('created_at')[:1]),
+                last_login_ip=Subquery(last_login.values('ip_address')[:1]),
+                last_login_device=Subquery(last_login.values('device_type')[:1]),
+                last_login_browser=Subquery(last_login.values('browser')[:1]),
+                last_login_os=Subquery(last_login.values('os_name')[:1]),
+            ).values('id', 'last_login_at', 'last_login_ip', 'last_login_device', 'last_login_browser', 'last_login_os')
+        }
+
+        rows = {}
+        for user in users:
+            rows[user['id']] = UserActivityStats(
+                user_id=user['id'],
+                total_actions=user['total_actions'],
+                total_logins=user['total_logins'],
+                last_activity_at=user['last_activity_at'],
+                last_logout_at=user['last_logout_at'],
+                **{key: value for key, value in last_logins[user['id']].items() if key != 'id'},
+                recent_days={},
+            )
+        users_by_email = {}
+        for user in users:
+            if user['email']:
+                users_by_email.setdefault(user['email'], set()).add(user['id'])
+
+        def add(user_id, day, index, count):
+            stats = rows.get(user_id)
+            if stats is not None and day is not None:
+                stats.recent_days.setdefault(day.isoformat(), [0, 0, 0])[index] += count
+
+        recent = (
+            ActivityLog.objects.filter(created_at__gte=since)
+            .annotate(day=TruncDate('created_at'))
+            .values('user_id', 'day')
+            .annotate(actions=Count('uuid'), logins=Count('uuid', filter=Q(action='login')))
+        )
+        for row in recent:
+            add(row['user_id'], row['day'], ACTIONS, row['actions'])
+            add(row['user_id'], row['day'], LOGINS, row['logins'])
+
+        failed = (
+            FailedLoginAttempt.objects
+            .annotate(day=TruncDate('created_at'))
+            .values('user_id', 'email_attempted', 'day')
+            .annotate(total=Count('id'))
+        )
+        for row in failed:
+            for user_id in _credited_users(row['user_id'], row['email_attempted'], users_by_email):
+                if user_id in rows:
+                    rows[user_id].failed_logins_count += row['total']
+                    if row['day'] >= since_day:
+                        add(user_id, row['day'], FAILED, row['total'])
+
+        with transaction.atomic():
+            UserActivityStats.objects.all().delete()
+            UserActivityStats.objects.bulk_create(rows.values(), batch_size=500)
+        logger.info("[UserActivityStatsService] %s utilisateur(s) reconstruit(s)", len(rows))
+        return len(rows)
@@ -0,0 +1,86 @@
+"""
+Tâches de fond exécutées par le worker (python manage.py run_worker).
+
+Chaque tâche reçoit `progress(pourcentage, message)` et l'utilisateur qui l'a
+déposée ; son retour (JSON) est enregistré comme résultat. Déclaration :
+BackgroundJobService.TASKS (parametre/services/background_jobs.py).
+"""
+import logging
+
+from parametre.services.background_jobs import BackgroundJobError
+
+logger = logging.getLogger(__name__)
+
+
+def copy_pac_amendment(progress, source, target, user=None, ip_address=None, user_agent=None):
+    """
+    Copie détails, traitements et suivis du PAC `source` vers l'amendement `target`,
+    avec l'entrée d'audit « clone » que pac_create écrit en mode synchrone
+    """
+    from pac.models import Pac
+    from parametre.services.amendment_copier import AmendmentCopier
+    from parametre.views.utils import log_activity
+
+    progress(10, 'Copie des lignes du PAC')
+    source_pac = Pac.objects.get(pk=source)
+    copied = AmendmentCopier.copy_pac(source_pac, Pac.objects.get(pk=target), user)
+    if copied > 0 and user is not None:
+        log_activity(
+            user=user,
+            action='clone',
+            entity_type='pac',
+            entity_id=str(target),
+            entity_name=f"PAC {target}",
+            description=f"Clonage d'amendement depuis {source_pac.uuid} (amendement {source_pac.num_amendement}) - {copied} détails copiés",
+            ip_address=ip_address,
+            user_agent=user_agent,
+        )
+    return {'target': target, 'copied': copied}
+
+
+def copy_tableau_bord_amendment(progress, source, target, user=None):
+    """Copie objectifs, indicateurs, cibles et périodicités du tableau `source` vers l'amendement `target`"""
+    from dashboard.models import TableauBord
+    from parametre.services.amendment_copier import AmendmentCopier
+
+    progress(10, 'Copie des objectifs du tableau de bord')
+    copied = AmendmentCopier.copy_tableau_bord(
+        TableauBord.objects.get(pk=source), TableauBord.objects.get(pk=target), user
+    )
+    return {'target': target, 'copied': copied}
+
+
+def validate_pacs_by_amendement(progress, processus, annee, num_amendement, user=None):
+    """Valide tous les PACs d'un amendement ; PACs incomplets → échec sans reprise, détails en résultat"""
+    from pac.services.pac_service import PacValidationError, validate_pacs_by_amendement as validate
+
+    try:
+        result = validate(processus, annee, num_amendement, user, progress=progress)
+    except PacValidationError as e:
+        raise BackgroundJobError(str(e), result={'details': e.details})
+    logger.info(
+        "%s PAC(s) validé(s) par %s: processus=%s, annee=%s, num_amendement=%s (tâche de fond)",
+        result['validated_count'], getattr(user, 'username', None), processus, annee, num_amendement,
+    )
+    return result
+
+
+def run_scheduler_job(progress, job_id, user=None):
+    """Exécute une fois la fonction d'un job APScheduler (déclenchement manuel depuis l'admin)"""
+    import pickle
+
+    from apscheduler.util import ref_to_obj
+    from django_apscheduler.models import DjangoJob
+
+    job = DjangoJob.objects.filter(id=job_id).first()
+    if job is None or not job.job_state:
+        raise BackgroundJobError(f'Job introuvable : {job_id}')
+    state = pickle.loads(job.job_state) if isinstance(job.job_state, bytes) else job.job_state
+    func = state['func']
+    if isinstance(func, str):
+        func = ref_to_obj(func)
+
+    progress(10, f'Exécution de {job_id}')
+    logger.info("[SCHEDULER] Job '%s' déclenché manuellement par %s", job_id, getattr(user, 'username', None))
+    func(*state.get('args', ()), **state.get('kwargs', {}))
+    return {'job_id': job_id}
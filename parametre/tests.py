@@ -0,0 +1,1096 @@
+import asyncio
+import os
+import tempfile
+import time
+import zipfile
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.cache import cache, caches
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django_apscheduler.models import DjangoJob
+from rest_framework.request import Request
+from rest_framework.test import APIClient
+
+from cartographie_risque.models import CDR, DetailsCDR, PlanAction
+from middleware.application_maintenance import ApplicationMaintenanceMiddleware
+from pac.management.commands.benchmark_pac_complet import seed_pac
+from pac.models import DetailsPac, Pac, PacSuivi, TraitementPac
+from pac.services.pac_service import get_upcoming_notifications_data
+from permissions.models import PermissionAudit
+from parametre.notification_signals import materialize_if_empty
+from parametre.user_activity_stats_signals import rebuild_if_empty as stats_rebuild_if_empty
+from parametre.views.background_jobs import wants_async
+from parametre.views.utils import _parse_user_agent, log_activity
+from parametre.models import (
+    ActivityLog, Annee, ApplicationConfig, BackgroundJob, Direction, KpiSnapshot, Media, Nature, Notification,
+    Processus, FailedLoginAttempt, NumberSequence, ReferenceChange, SchedulerCommand, Service, SousDirection, UserActivityStats,
+)
+from parametre.services.activity_log_writer import ActivityLogWriter
+from parametre.services.background_jobs import BackgroundJobError, BackgroundJobService
+from parametre.services.app_status_broadcaster import VERSION_KEY, AppStatusBroadcaster, app_status_broadcaster
+from parametre.services.application_config_snapshot import application_config_snapshot
+from parametre.services.document_cache import DocumentCache, _PendingRevisions
+from parametre.services.document_export import DocumentExportService
+from parametre.services.kpi_snapshot_service import KpiSnapshotService, _PendingSnapshots
+from parametre.services.log_archiver import LogArchiver
+from parametre.services.notification_materializer import NotificationMaterializer
+from parametre.services.reference_bundle_service import ReferenceBundleService
+from parametre.services.scheduler_commands import CommandWakeup, SchedulerCommandChannel
+from parametre.services.sequence_allocator import SequenceAllocator
+from parametre.services.user_activity_stats import UserActivityStatsService
+from shared.exports import csv_stream
+
+CDR_STATS_URL = '/api/cartographie-risque/cdrs/stats/'
+
+
+@override_settings(PERMISSION_AUDIT_ENABLED=False)
+class KpiSnapshotTests(TestCase):
+    """Snapshots KPI : mise à jour incrémentale et lecture à coût constant"""
+
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create(username='admin', is_staff=True, is_superuser=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def _create_cdrs(self, nb_cdrs, nb_details=2):
+        with self.captureOnCommitCallbacks(execute=True):
+            for _ in range(nb_cdrs):
+                processus = Processus.objects.create(nom=f'Processus {Processus.objects.count()}', cree_par=self.admin)
+                cdr = CDR.objects.create(annee=2025, processus=processus, cree_par=self.admin)
+                for _ in range(nb_details):
+                    details = DetailsCDR.objects.create(cdr=cdr)
+                    PlanAction.objects.create(details_cdr=details, actions_mesures='Action')
+
+    def _stats(self):
+        response = self.client.get(CDR_STATS_URL)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_snapshot_follows_writes(self):
+        self._create_cdrs(1)
+        stats = self._stats()
+        self.assertEqual((stats['total_cdrs'], stats['total_details'], stats['total_plans_action']), (1, 2, 2))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            PlanAction.objects.first().delete()
+        self.assertEqual(self._stats()['total_plans_action'], 1)
+
+        # queryset.update() ne déclenche pas de signal : rattrapé par la reconstruction
+        CDR.objects.update(is_validated=True)
+        self.assertEqual(self._stats()['cdrs_valides'], 0)
+        call_command('rebuild_kpi_snapshots', module=['cdr'], stdout=StringIO())
+        self.assertEqual(self._stats()['cdrs_valides'], 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            CDR.objects.get().delete()
+        self.assertFalse(KpiSnapshot.objects.filter(module='cdr').exists())
+
+    def test_query_count_independent_of_row_count(self):
+        self._create_cdrs(1, nb_details=1)
+        self._stats()  # caches froids (config, throttles)
+        with CaptureQueriesContext(connection) as small:
+            self._stats()
+
+        self._create_cdrs(10, nb_details=5)
+        with CaptureQueriesContext(connection) as large:
+            stats = self._stats()
+
+        self.assertEqual(len(small.captured_queries), len(large.captured_queries))
+        self.assertEqual((stats['total_cdrs'], stats['total_plans_action']), (11, 51))
+
+    def test_child_writes_resolve_parent_without_extra_queries(self):
+        self._create_cdrs(1, nb_details=1)
+        details = DetailsCDR.objects.get()
+        loaded = PlanAction(details_cdr=details, actions_mesures='Parent chargé')
+        unloaded = [PlanAction(details_cdr_id=details.pk, actions_mesures=f'FK seule {n}') for n in range(5)]
+
+        with self.captureOnCommitCallbacks():
+            with mock.patch.object(KpiSnapshotService, 'mark_dirty_related', wraps=KpiSnapshotService.mark_dirty_related) as related:
+                loaded.save()
+                for plan in unloaded:
+                    plan.save()
+        # Parent chargé : UUID du document lu sur l'objet ; sinon résolution différée
+        self.assertEqual(related.call_count, 5)
+
+        with CaptureQueriesContext(connection) as flush:
+            KpiSnapshotService.flush_pending()
+        # Une seule résolution groupée pour toutes les lignes marquées
+        self.assertEqual(sum('"details_cdr"."uuid" IN' in q['sql'] for q in flush.captured_queries), 1)
+        self.assertEqual(self._stats()['total_plans_action'], 7)
+
+
+    def test_one_commit_callback_per_transaction(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            self._create_cdrs(1, nb_details=1)
+        self.assertEqual(sum(isinstance(callback, _PendingSnapshots) for callback in callbacks), 1)
+
+    def test_rolled_back_marks_are_not_flushed_later(self):
+        self._create_cdrs(1, nb_details=1)
+        cdr = CDR.objects.get()
+        KpiSnapshot.objects.all().delete()
+        with self.assertRaises(ValueError):
+            with transaction.atomic():
+                KpiSnapshotService.mark_dirty('cdr', cdr.uuid)
+                raise ValueError
+        with self.captureOnCommitCallbacks(execute=True):
+            KpiSnapshotService.mark_dirty('pac', 'autre')
+        self.assertFalse(KpiSnapshot.objects.filter(module='cdr').exists())
+
+@override_settings(PERMISSION_AUDIT_ENABLED=False)
+class PacUpcomingNotificationsTests(TestCase):
+    """Notifications PAC : matérialisées à l'écriture, lues sans écriture par les GET"""
+
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create(username='admin', is_staff=True, is_superuser=True)
+        processus = Processus.objects.create(nom='Processus', cree_par=self.admin)
+        self.pac = Pac.objects.create(processus=processus, cree_par=self.admin)
+        self.today = timezone.now().date()
+
+    def _traitement(self, days):
+        with self.captureOnCommitCallbacks(execute=True):
+            details = DetailsPac.objects.create(pac=self.pac, numero_pac=f'PAC-{days}')
+            return TraitementPac.objects.create(
+                details_pac=details, action='Action', delai_realisation=self.today + timedelta(days=days)
+            )
+
+    def _writes(self, queries):
+        return [q['sql'] for q in queries if q['sql'].startswith(('INSERT', 'UPDATE', 'DELETE'))]
+
+    def test_get_is_a_pure_read_of_materialized_notifications(self):
+        for days in (-3, 0, 5):
+            self._traitement(days)
+        self._traitement(30)
+        self.assertEqual(Notification.objects.filter(user=self.admin).count(), 3)
+
+        get_upcoming_notifications_data(self.admin)  # caches froids (ContentType)
+        with CaptureQueriesContext(connection) as first:
+            data = get_upcoming_notifications_data(self.admin)
+        self.assertEqual(self._writes(first.captured_queries), [])
+        self.assertEqual(len(data['notifications']), 3)
+        self.assertTrue(all(n['notification_uuid'] for n in data['notifications']))
+
+        # Traitements hors fenêtre : ni chargés, ni requêtes supplémentaires
+        for days in range(10, 30):
+            self._traitement(days)
+        with CaptureQueriesContext(connection) as second:
+            data = get_upcoming_notifications_data(self.admin)
+        self.assertEqual(len(data['notifications']), 3)
+        self.assertEqual(len(second.captured_queries), len(first.captured_queries))
+
+    def test_empty_table_is_materialized_after_migrate(self):
+        self._traitement(2)
+        Notification.objects.all().delete()
+
+        materialize_if_empty(sender=None)
+        self.assertEqual(Notification.objects.filter(user=self.admin).count(), 1)
+        with CaptureQueriesContext(connection) as again:
+            materialize_if_empty(sender=None)
+        self.assertEqual(self._writes(again.captured_queries), [])
+
+    def test_deadline_changes_are_materialized(self):
+        traitement = self._traitement(30)
+        self.assertEqual(get_upcoming_notifications_data(self.admin)['notifications'], [])
+
+        traitement.delai_realisation = self.today + timedelta(days=2)
+        with self.captureOnCommitCallbacks(execute=True):
+            traitement.save()
+        notifications = get_upcoming_notifications_data(self.admin)['notifications']
+        self.assertEqual([n['traitement_uuid'] for n in notifications], [str(traitement.uuid)])
+
+        # Passage du temps : le job quotidien reprend les échéances entrées dans la fenêtre
+        far = self._traitement(40)
+        created, _ = NotificationMaterializer.materialize_pac(today=self.today + timedelta(days=35))
+        self.assertEqual(created, 1)
+        self.assertTrue(Notification.objects.filter(object_id=far.uuid).exists())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            traitement.delete()
+        self.assertFalse(Notification.objects.filter(object_id=traitement.uuid).exists())
+
+
+class AppStatusBroadcasterTests(TestCase):
+    """Flux app-status : un état par processus, publié à l'écriture, sans requête par client"""
+
+    def setUp(self):
+        cache.clear()
+        caches['shared'].delete(VERSION_KEY)
+
+    def test_save_publishes_to_waiting_subscribers(self):
+        config = ApplicationConfig.objects.create(app_name='pac')
+        version, _, _ = app_status_broadcaster.refresh()
+
+        with mock.patch.object(app_status_broadcaster, 'ensure_poller'):
+            with CaptureQueriesContext(connection) as idle:
+                self.assertIsNone(app_status_broadcaster.wait(version, 0))
+            self.assertEqual(idle.captured_queries, [])
+
+            config.is_enabled = False
+            with self.captureOnCommitCallbacks(execute=True):
+                config.save()
+            state = app_status_broadcaster.wait(version, 0)
+
+        self.assertEqual(state[0], version + 1)
+        self.assertFalse(state[2][0]['is_enabled'])
+        self.assertEqual(caches['shared'].get(VERSION_KEY), 1)
+
+    def test_async_subscribers_are_woken_once_per_change(self):
+        broadcaster = AppStatusBroadcaster()
+        states = iter([('a', ()), ('a', ()), ('b', ())])
+
+        async def scenario():
+            with mock.patch.object(broadcaster, 'ensure_poller'), \
+                    mock.patch.object(broadcaster, '_load', side_effect=lambda: next(states)):
+                broadcaster.refresh()
+                changed = broadcaster.subscribe_async()
+                broadcaster.refresh()  # même statut : pas de réveil
+                await asyncio.sleep(0)
+                woken_without_change = changed.is_set()
+                broadcaster.refresh()
+                await asyncio.wait_for(changed.wait(), timeout=1)
+                broadcaster.unsubscribe_async(changed)
+                return woken_without_change
+
+        self.assertFalse(asyncio.run(scenario()))
+        self.assertEqual(broadcaster.current()[:2], (2, 'b'))
+
+
+@override_settings(APP_CONFIG_SNAPSHOT_CHECK_INTERVAL=0)
+class ApplicationMaintenanceMiddlewareTests(TestCase):
+    """Middleware de maintenance : instantané par processus rechargé sur changement de version"""
+
+    def setUp(self):
+        caches['shared'].delete(VERSION_KEY)
+        application_config_snapshot.invalidate()
+        self.middleware = ApplicationMaintenanceMiddleware(lambda request: None)
+        self.config = ApplicationConfig.objects.create(app_name='pac')
+
+    def _check(self, path='/api/pac/pacs/'):
+        request = RequestFactory().get(path)
+        request.user = AnonymousUser()
+        return self.middleware.process_request(request)
+
+    def test_route_lookup(self):
+        resolve = ApplicationMaintenanceMiddleware.resolve_app_name
+        self.assertEqual(resolve('/api/activite-periodique/aps/'), 'activite_periodique')
+        self.assertEqual(resolve('/api/pac/'), 'pac')
+        self.assertIsNone(resolve('/api/pac'))
+        self.assertIsNone(resolve('/api/parametre/app-status/'))
+        self.assertIsNone(resolve('/admin/pac/'))
+
+    def test_toggle_applies_without_per_request_query(self):
+        self.assertIsNone(self._check())
+        with CaptureQueriesContext(connection) as queries:
+            self.assertIsNone(self._check())
+        self.assertEqual(queries.captured_queries, [])
+
+        self.config.is_enabled = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.config.save()
+        response = self._check()
+        self.assertEqual(response.status_code, 503)
+
+        # Modification faite par un autre worker : seule la version partagée change
+        ApplicationConfig.objects.update(is_enabled=True)
+        self.assertEqual(self._check().status_code, 503)
+        caches['shared'].incr(VERSION_KEY)
+        self.assertIsNone(self._check())
+
+
+class ReferenceBundleTests(TestCase):
+    """Bundle des référentiels : rendu mis en cache, ETag, invalidation à l'écriture"""
+
+    URL = '/api/parametre/reference-bundle/'
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='lecteur')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            Nature.objects.create(nom='Recommandation')
+            Nature.objects.create(nom='Archivée', is_active=False)
+            Processus.objects.create(nom='Processus', cree_par=self.user)
+
+    def test_bundle_matches_list_endpoints(self):
+        bundle = self.client.get(self.URL).json()['data']
+        self.assertEqual(bundle['natures'], self.client.get('/api/parametre/natures/').json()['data'])
+        processus = self.client.get('/api/parametre/processus/').json()['data']
+        self.assertEqual(bundle['processus'], [{k: v for k, v in p.items() if k != 'cree_par'} for p in processus])
+
+    def test_etag_selection_and_invalidation(self):
+        response = self.client.get(self.URL, {'tables': 'natures,processus'})
+        self.assertEqual(list(response.json()['data']), ['natures', 'processus'])
+        etag = response['ETag']
+
+        with CaptureQueriesContext(connection) as queries:
+            not_modified = self.client.get(self.URL, {'tables': 'natures,processus'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertFalse([q for q in queries.captured_queries if 'parametre_nature' in q['sql']])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Nature.objects.create(nom='Dysfonctionnement')
+        response = self.client.get(self.URL, {'tables': 'natures,processus'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(len(response.json()['data']['natures']), 2)
+
+        self.assertEqual(self.client.get(self.URL, {'tables': 'inconnue'}).status_code, 400)
+
+    @mock.patch.object(ReferenceBundleService, 'VERSION_SAFETY_SECONDS', 0)
+    def test_delta_since_version(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            direction = Direction.objects.create(nom='Direction')
+            sous_direction = SousDirection.objects.create(nom='Sous-direction', direction=direction)
+            Service.objects.create(nom='Service', sous_direction=sous_direction)
+        version = self.client.get(self.URL).json()['version']
+        self.assertEqual(self.client.get(f'{self.URL}changes/', {'since': version}).json()['changes'], {})
+
+        nature = Nature.objects.get(nom='Recommandation')
+        with self.captureOnCommitCallbacks(execute=True):
+            nature.is_active = False
+            nature.save()
+            Nature.objects.create(nom='Dysfonctionnement')
+            direction.nom = 'Direction renommée'
+            direction.save()
+
+        delta = self.client.get(f'{self.URL}changes/', {'since': version}).json()
+        changes = delta['changes']
+        self.assertEqual([n['nom'] for n in changes['natures']['upserted']], ['Dysfonctionnement'])
+        self.assertEqual(changes['natures']['removed'], [str(nature.uuid)])
+        self.assertEqual(changes['services']['upserted'][0]['sous_direction']['direction']['nom'], 'Direction renommée')
+        self.assertEqual(set(changes), {'natures', 'directions', 'sous_directions', 'services'})
+        self.assertGreater(delta['version'], version)
+
+        # Compactage : une seule entrée par élément, la delta reste exacte
+        with self.captureOnCommitCallbacks(execute=True):
+            nature.save()
+        self.assertEqual(ReferenceChange.objects.filter(object_uuid=nature.uuid).count(), 1)
+        self.assertEqual(self.client.get(f'{self.URL}changes/', {'since': 'x'}).status_code, 400)
+
+
+class ActivityFeedTests(TestCase):
+    """Flux d'activités : pagination par curseur stable et taille de page bornée"""
+
+    def setUp(self):
+        self.admin = User.objects.create(username='admin', is_staff=True, is_superuser=True)
+        self.user = User.objects.create(username='agent')
+        self.client = APIClient()
+        ActivityLog.objects.bulk_create([
+            ActivityLog(user=self.user, action='create', entity_type='pac', description=f'Activité {i}')
+            for i in range(25)
+        ] + [ActivityLog(user=self.user, action='login', entity_type='user', description='Connexion')])
+        # Même horodatage pour tous : l'ordre ne tient qu'au départage sur l'uuid
+        ActivityLog.objects.update(created_at=timezone.now() - timedelta(hours=2))
+
+    def _walk(self, url, **params):
+        seen, cursor = [], None
+        while True:
+            response = self.client.get(url, {**params, **({'cursor': cursor} if cursor else {})})
+            self.assertEqual(response.status_code, 200)
+            body = response.json()
+            seen.extend(item['uuid'] for item in body['data'])
+            cursor = body['next_cursor']
+            if not cursor:
+                return seen
+
+    def test_user_feed_pages_are_stable(self):
+        self.client.force_authenticate(self.user)
+        seen = self._walk('/api/parametre/activities/user/', limit=10)
+        expected = ActivityLog.objects.exclude(action='login').order_by('-created_at', '-uuid')
+        self.assertEqual(seen, [str(a.uuid) for a in expected])
+
+        first = self.client.get('/api/parametre/activities/user/', {'limit': 100000}).json()
+        self.assertEqual(first['count'], 25)
+        self.assertEqual(first['data'][0]['time_ago'], 'Il y a 2 heures')
+        self.assertEqual(self.client.get('/api/parametre/activities/recent/', {'cursor': 'x'}).status_code, 400)
+
+    def test_admin_feed_filters(self):
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.client.get('/api/parametre/admin/activities/').status_code, 403)
+
+        self.client.force_authenticate(self.admin)
+        self.assertEqual(len(self._walk('/api/parametre/admin/activities/', limit=7)), 26)
+        self.assertEqual(len(self._walk('/api/parametre/admin/activities/', action='login', user=self.user.id)), 1)
+        today = timezone.localdate()
+        self.assertEqual(len(self._walk('/api/parametre/admin/activities/', date_from=today + timedelta(days=1))), 0)
+        self.assertEqual(self.client.get('/api/parametre/admin/activities/', {'date_to': 'hier'}).status_code, 400)
+
+
+@override_settings(
+    ACTIVITY_LOG_ASYNC=True,
+    ACTIVITY_LOG_BATCH_SIZE=1000,
+    ACTIVITY_LOG_FLUSH_INTERVAL=3600,
+    ACTIVITY_LOG_MAX_QUEUE_SIZE=2,
+)
+class ActivityLogWriterTests(TestCase):
+    """Journal d'activités : file bornée, écriture groupée, horodatage à la mise en file"""
+
+    def setUp(self):
+        self.user = User.objects.create(username='agent')
+        self.writer = ActivityLogWriter()
+
+    def _entry(self, description):
+        return ActivityLog(
+            user=self.user, action='create', entity_type='pac', description=description,
+            created_at=timezone.now() - timedelta(minutes=5),
+        )
+
+    def test_entries_are_buffered_then_bulk_written(self):
+        first, second = self._entry('Première'), self._entry('Seconde')
+        self.writer.record(first)
+        self.writer.record(second)
+        self.assertEqual(ActivityLog.objects.count(), 0)
+
+        # Un INSERT groupé (sous point de sauvegarde), puis la mise à jour des compteurs de l'utilisateur
+        with self.assertNumQueries(9):
+            self.writer.flush()
+        self.assertEqual(ActivityLog.objects.get(uuid=first.uuid).created_at, first.created_at)
+        self.assertEqual(self.writer.stats()['written'], 2)
+
+    def test_full_queue_is_flushed_by_the_caller(self):
+        for i in range(3):
+            self.writer.record(self._entry(f'Activité {i}'))
+        self.assertEqual(self.writer.overflows, 1)
+        self.assertEqual(ActivityLog.objects.count(), 3)
+
+    def test_rejected_batch_is_written_row_by_row(self):
+        entries = [self._entry(f'Activité {i}') for i in range(3)]
+        bulk_create = ActivityLog.objects.bulk_create
+
+        def reject_batch_and_second_entry(rows, **kwargs):
+            if len(rows) > 1 or rows[0] is entries[1]:
+                raise ValueError('Refusé')
+            return bulk_create(rows, **kwargs)
+
+        with mock.patch.object(ActivityLog.objects, 'bulk_create', side_effect=reject_batch_and_second_entry):
+            for entry in entries:
+                self.writer.record(entry)
+            self.writer.flush()
+        self.assertEqual(
+            set(ActivityLog.objects.values_list('uuid', flat=True)), {entries[0].uuid, entries[2].uuid}
+        )
+        self.assertEqual(self.writer.stats()['written'], 2)
+
+    def test_log_activity_parses_each_user_agent_once(self):
+        _parse_user_agent.cache_clear()
+        with mock.patch('parametre.services.activity_log_writer.activity_log_writer', self.writer):
+            for _ in range(3):
+                log_activity(self.user, 'update', 'pac', user_agent='Mozilla/5.0 (X11; Linux x86_64) Firefox/120.0')
+        self.assertEqual(_parse_user_agent.cache_info().misses, 1)
+        self.writer.flush()
+        self.assertEqual(ActivityLog.objects.filter(action='update').count(), 3)
+
+
+@override_settings(
+    PERMISSION_AUDIT_ENABLED=False,
+    LOG_ARCHIVE_RETENTION_DAYS={'activity_log': 365, 'permission_audit': 30},
+    LOG_ARCHIVE_RETENTION_BY_ACTION={'activity_log': {'view': 90}, 'permission_audit': {}},
+    LOG_ARCHIVE_BATCH_SIZE=2,
+)
+class LogArchiverTests(TestCase):
+    """Archivage des journaux : rétention par action, fichiers mensuels, lecture des archives"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.settings_override = override_settings(LOG_ARCHIVE_ROOT=self.tmp.name)
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+
+        self.admin = User.objects.create(username='admin', is_staff=True, is_superuser=True)
+        self.now = timezone.now()
+
+    def _activity(self, action, days):
+        return ActivityLog.objects.create(
+            user=self.admin, action=action, entity_type='pac', description=f'{action} {days}',
+            created_at=self.now - timedelta(days=days),
+        )
+
+    def test_expired_rows_are_moved_to_monthly_archives(self):
+        old_view = self._activity('view', 100)
+        self._activity('create', 100)
+        old_deletes = [self._activity('delete', 400), self._activity('delete', 401), self._activity('delete', 402)]
+
+        self.assertEqual(LogArchiver.archive(['activity_log'], dry_run=True), {'activity_log': 4})
+        self.assertEqual(ActivityLog.objects.count(), 5)
+
+        self.assertEqual(LogArchiver.archive(['activity_log']), {'activity_log': 4})
+        self.assertEqual(list(ActivityLog.objects.values_list('action', flat=True)), ['create'])
+        self.assertTrue(os.path.exists(LogArchiver.path('activity_log', old_view.created_at.strftime('%Y-%m'))))
+
+        result = LogArchiver.read('activity_log', self.now - timedelta(days=500), self.now)
+        self.assertEqual(result['total'], 4)
+        self.assertEqual(result['data'][0]['uuid'], str(old_view.uuid))
+        self.assertEqual(result['data'][0]['username'], 'admin')
+
+        deletes = LogArchiver.read(
+            'activity_log', self.now - timedelta(days=500), self.now, filters={'action': 'delete'}, limit=2,
+        )
+        self.assertEqual(deletes['total'], 3)
+        self.assertEqual([row['uuid'] for row in deletes['data']], [str(a.uuid) for a in old_deletes[:2]])
+
+    def test_rearchived_rows_are_read_once(self):
+        activity = self._activity('delete', 400)
+        month = activity.created_at.strftime('%Y-%m')
+        row = ActivityLog.objects.filter(pk=activity.pk).values().get()
+        LogArchiver._append(LogArchiver.path('activity_log', month), [row])
+        LogArchiver.archive(['activity_log'])
+
+        result = LogArchiver.read('activity_log', self.now - timedelta(days=500), self.now)
+        self.assertEqual(result['total'], 1)
+
+    def test_permission_audits_and_admin_endpoint(self):
+        processus = Processus.objects.create(nom='Processus', cree_par=self.admin)
+        for granted in (True, False):
+            PermissionAudit.objects.create(
+                user=self.admin, app_name='pac', action='create_pac', processus=processus, granted=granted,
+                timestamp=self.now - timedelta(days=40),
+            )
+        call_command('archive_logs', '--log', 'permission_audit', stdout=StringIO())
+        self.assertEqual(PermissionAudit.objects.count(), 0)
+
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        day = (self.now - timedelta(days=40)).date().isoformat()
+        response = client.get('/api/parametre/admin/log-archives/', {
+            'log': 'permission_audit', 'date_from': day, 'date_to': day, 'granted': 'false',
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['total'], 1)
+        self.assertEqual(response.data['data'][0]['processus_nom'], 'Processus')
+
+        response = client.get('/api/parametre/admin/log-archives/', {'log': 'permission_audit'})
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(PERMISSION_AUDIT_ENABLED=False)
+class UserActivityStatsTests(TestCase):
+    """Compteurs d'activité par utilisateur : mise à jour à l'écriture, lecture sans parcourir le journal"""
+
+    def setUp(self):
+        self.admin = User.objects.create(username='admin', email='admin@kora.test', is_staff=True, is_superuser=True)
+        self.user = User.objects.create(username='agent', email='agent@kora.test')
+        self.writer = ActivityLogWriter()
+
+    def _log(self, action, days=0, **fields):
+        self.writer.record(ActivityLog(
+            user=self.user, action=action, entity_type='user', description=action,
+            created_at=timezone.now() - timedelta(days=days), **fields,
+        ))
+
+    def test_counters_follow_writes(self):
+        self._log('login', days=40, browser='Firefox')
+        self._log('login', browser='Chrome', ip_address='10.0.0.1')
+        self._log('update')
+        self._log('logout')
+        self.writer.flush()
+        ActivityLog.objects.create(user=self.user, action='create', entity_type='pac', description='Direct')
+        FailedLoginAttempt.objects.create(email_attempted='agent@kora.test', reason='user_not_found')
+        FailedLoginAttempt.objects.create(email_attempted='inconnu@kora.test', reason='user_not_found')
+
+        stats = UserActivityStats.objects.get(user=self.user)
+        self.assertEqual((stats.total_logins, stats.total_actions, stats.failed_logins_count), (2, 5, 1))
+        self.assertEqual((stats.last_login_browser, stats.last_login_ip), ('Chrome', '10.0.0.1'))
+        self.assertEqual(stats.recent_counts(), {'logins_30d': 1, 'actions_30d': 4, 'failed_logins_30d': 1})
+
+        incremental = UserActivityStats.objects.values().get(user=self.user)
+        UserActivityStatsService.rebuild()
+        rebuilt = UserActivityStats.objects.values().get(user=self.user)
+        incremental.pop('updated_at'), rebuilt.pop('updated_at')
+        self.assertEqual(rebuilt, incremental)
+
+    def test_failed_login_counts_for_user_and_email_owner(self):
+        # Même sens que Q(user=user) | Q(email_attempted=user.email)
+        FailedLoginAttempt.objects.create(user=self.admin, email_attempted='agent@kora.test', reason='wrong_password')
+        counts = lambda: dict(UserActivityStats.objects.values_list('user__username', 'failed_logins_count'))
+        self.assertEqual(counts(), {'admin': 1, 'agent': 1})
+        UserActivityStatsService.rebuild()
+        self.assertEqual(counts(), {'admin': 1, 'agent': 1})
+
+    def test_existing_history_is_rebuilt_after_migrate(self):
+        self._log('login', browser='Firefox')
+        self._log('update')
+        self.writer.flush()
+        UserActivityStats.objects.all().delete()
+
+        stats_rebuild_if_empty(sender=None)
+        stats = UserActivityStats.objects.get(user=self.user)
+        self.assertEqual((stats.total_logins, stats.total_actions, stats.last_login_browser), (1, 2, 'Firefox'))
+
+    def test_admin_views_read_the_rollup(self):
+        self._log('login', browser='Firefox')
+        self.writer.flush()
+        client = APIClient()
+        client.force_authenticate(self.admin)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get('/api/parametre/users/')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(any('activity_log' in q['sql'] for q in queries.captured_queries))
+        agent = next(u for u in response.data['data'] if u['username'] == 'agent')
+        self.assertEqual(agent['last_login_browser'], 'Firefox')
+
+        response = client.get(f'/api/parametre/users/{self.user.id}/detail/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['stats']['total_logins'], 1)
+        self.assertEqual(response.data['stats']['logins_30d'], 1)
+        self.assertEqual(response.data['last_session']['browser'], 'Firefox')
+
+
+@override_settings(PERMISSION_AUDIT_ENABLED=False)
+class SequenceAllocatorTests(TestCase):
+    """Séquences de numérotation : incrément d'une ligne, graine sur l'existant, backfill"""
+
+    def setUp(self):
+        self.admin = User.objects.create(username='admin', is_staff=True, is_superuser=True)
+
+    def test_processus_numbers_continue_after_the_highest_existing(self):
+        Processus.objects.create(nom='Manuel', numero_processus='PRS05', cree_par=self.admin)
+        self.assertEqual(Processus.objects.create(nom='Premier', cree_par=self.admin).numero_processus, 'PRS06')
+
+        # Numéro saisi à la main en avance sur le compteur : sauté
+        Processus.objects.create(nom='Avance', numero_processus='PRS07', cree_par=self.admin)
+        with CaptureQueriesContext(connection) as queries:
+            numero = SequenceAllocator.next_number('numero_processus', 'PRS{:02d}')
+        self.assertEqual(numero, 'PRS08')
+        # Aucune relecture de la table : seules des sondes d'existence (une par numéro essayé)
+        processus_queries = [q['sql'] for q in queries.captured_queries if '"processus"' in q['sql']]
+        self.assertEqual(len(processus_queries), 2)
+        self.assertTrue(all(sql.startswith('SELECT 1 AS') for sql in processus_queries))
+
+    def test_detail_cdr_numbers_are_scoped_per_cdr(self):
+        processus = Processus.objects.create(nom='Processus', cree_par=self.admin)
+        first = CDR.objects.create(annee=2025, processus=processus, cree_par=self.admin)
+        second = CDR.objects.create(annee=2026, processus=processus, cree_par=self.admin)
+        DetailsCDR.objects.create(cdr=first, numero_cdr='CDR-3')
+
+        self.assertEqual(SequenceAllocator.next_number('numero_cdr', 'CDR-{}', group=first.pk), 'CDR-4')
+        self.assertEqual(SequenceAllocator.next_number('numero_cdr', 'CDR-{}', group=second.pk), 'CDR-1')
+
+    def test_backfill_never_moves_a_sequence_backwards(self):
+        Processus.objects.create(nom='Manuel', numero_processus='PRS04', cree_par=self.admin)
+        NumberSequence.objects.create(scope='numero_processus', value=2)
+        call_command('backfill_number_sequences', '--sequence', 'numero_processus', stdout=StringIO())
+        self.assertEqual(NumberSequence.objects.get(scope='numero_processus').value, 4)
+
+        NumberSequence.objects.filter(scope='numero_processus').update(value=9)
+        SequenceAllocator.backfill(['numero_processus'])
+        self.assertEqual(NumberSequence.objects.get(scope='numero_processus').value, 9)
+
+
+@override_settings(PERMISSION_AUDIT_ENABLED=False)
+class DocumentCacheTests(TestCase):
+    """Rendus des documents en cache par révision, invalidés à l'écriture, avec ETag"""
+
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create(username='admin', is_staff=True, is_superuser=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.pac = seed_pac(3, self.admin)
+        self.url = f'/api/pac/{self.pac.uuid}/complet/'
+
+    def _get(self, **headers):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.url, **headers)
+        return response, len(ctx.captured_queries)
+
+    def test_cached_render_and_not_modified(self):
+        first, cold = self._get()
+        self.assertEqual(first.status_code, 200)
+        etag = first['ETag']
+
+        second, warm = self._get()
+        self.assertEqual((second['ETag'], second.json()), (etag, first.json()))
+        self.assertLess(warm, cold)
+
+        not_modified, _ = self._get(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified['ETag'], etag)
+
+    def test_descendant_write_bumps_revision(self):
+        etag = self._get()[0]['ETag']
+        suivi = PacSuivi.objects.filter(traitement__details_pac__pac=self.pac).first()
+        with self.captureOnCommitCallbacks(execute=True):
+            suivi.resultat = 'Nouveau résultat'
+            suivi.save()
+
+        response, _ = self._get(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        resultats = [detail['traitement']['suivi']['resultat'] for detail in response.json()['data']['details']]
+        self.assertIn('Nouveau résultat', resultats)
+
+    def test_preuve_media_and_reference_writes_invalidate(self):
+        etag = self._get()[0]['ETag']
+        preuve = TraitementPac.objects.filter(details_pac__pac=self.pac).first().preuve
+        with self.captureOnCommitCallbacks(execute=True):
+            preuve.medias.add(Media.objects.create(url_fichier='https://example.org/ajout.pdf'))
+        media_etag = self._get()[0]['ETag']
+        self.assertNotEqual(media_etag, etag)
+
+        warm = self._get()[1]
+        with self.captureOnCommitCallbacks(execute=True):
+            Nature.objects.create(nom='Nouvelle nature')
+        # Nouvelle époque : rendu recalculé, même contenu donc même ETag
+        response, queries = self._get()
+        self.assertGreater(queries, warm)
+        self.assertEqual(response['ETag'], media_etag)
+
+    def test_one_commit_callback_per_transaction(self):
+        suivis = PacSuivi.objects.filter(traitement__details_pac__pac=self.pac)
+        with self.captureOnCommitCallbacks() as callbacks:
+            for suivi in suivis:
+                suivi.save()
+        pending = [callback for callback in callbacks if isinstance(callback, _PendingRevisions)]
+        self.assertEqual(len(pending), 1)
+        self.assertEqual(pending[0].keys, {(DocumentCache.PAC, str(self.pac.uuid))})
+
+    def test_rolled_back_changes_are_not_flushed_later(self):
+        revision_key = DocumentCache._revision_key(DocumentCache.PAC, self.pac.uuid)
+        before = cache.get(revision_key)
+        with self.assertRaises(ValueError):
+            with transaction.atomic():
+                DocumentCache.mark_changed(DocumentCache.PAC, self.pac.uuid)
+                raise ValueError
+        with self.captureOnCommitCallbacks(execute=True):
+            DocumentCache.mark_changed(DocumentCache.CDR, 'autre')
+        self.assertEqual(cache.get(revision_key), before)
+
+    @override_settings(DOCUMENT_CACHE_TIMEOUT=0, DOCUMENT_CACHE_VALIDATED_TIMEOUT=60)
+    def test_validated_documents_are_kept_longer(self):
+        renders = []
+
+        def render(validated):
+            def run():
+                renders.append(validated)
+                return {'validated': validated}, validated
+            return run
+
+        for _ in range(2):
+            DocumentCache.get_or_render(DocumentCache.PAC, 'brouillon', 'complet', render(False))
+            DocumentCache.get_or_render(DocumentCache.PAC, 'valide', 'complet', render(True))
+        self.assertEqual(renders, [False, True, False])
+
+
+class DocumentExportTests(TestCase):
+    """Exports CSV/XLSX en streaming, limités aux processus de l'utilisateur"""
+
+    def setUp(self):
+        self.admin = User.objects.create(username='admin', is_staff=True, is_superuser=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        self.pac = seed_pac(3, self.admin)
+
+    def _export(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content)
+
+    def test_csv_streams_header_then_rows(self):
+        content = self._export('/api/pac/export/').decode('utf-8-sig')
+        lines = content.splitlines()
+        self.assertEqual(lines[0].split(';')[:4], ['Processus', 'Année', 'Amendement', 'N° PAC'])
+        self.assertEqual(len(lines), 4)
+        self.assertTrue(all(line.startswith(self.pac.processus.nom) for line in lines[1:]))
+
+    def test_csv_neutralizes_formula_cells(self):
+        rows = [['=HYPERLINK("http://x")', '+1', '-2', '@SUM(A1)', '\tx', 'texte', -3]]
+        content = ''.join(csv_stream(['a', 'b', 'c', 'd', 'e', 'f', 'g'], rows))
+        cells = content.splitlines()[1].split(';')
+        self.assertEqual(cells[0], '"\'=HYPERLINK(""http://x"")"')
+        self.assertEqual(cells[1:5], ["'+1", "'-2", "'@SUM(A1)", "'\tx"])
+        self.assertEqual(cells[5:], ['texte', '-3'])
+
+    def test_first_chunk_is_sent_before_reading_rows(self):
+        response = self.client.get('/api/pac/export/', {'type': 'xlsx'})
+        with CaptureQueriesContext(connection) as ctx:
+            first = next(iter(response.streaming_content))
+        self.assertEqual(len(ctx.captured_queries), 0)
+        self.assertTrue(first.startswith(b'PK'))
+
+    def test_xlsx_is_a_valid_workbook(self):
+        content = self._export('/api/pac/export/', type='xlsx')
+        with zipfile.ZipFile(BytesIO(content)) as archive:
+            self.assertIsNone(archive.testzip())
+            sheet = archive.read('xl/worksheets/sheet1.xml').decode()
+        self.assertEqual(sheet.count('<row>'), 4)
+        self.assertIn('PAC0001', sheet)
+
+    def test_rows_are_limited_to_user_processus(self):
+        autre = Processus.objects.create(nom='Autre processus', cree_par=self.admin)
+        rows = lambda uuids: list(DocumentExportService.rows(DocumentExportService.PAC, uuids))
+        self.assertEqual(len(rows(None)), 3)
+        self.assertEqual(len(rows([str(self.pac.processus_id)])), 3)
+        self.assertEqual(rows([str(autre.pk)]), [])
+        self.assertEqual(rows([]), [])
+
+        client = APIClient()
+        client.force_authenticate(User.objects.create(username='sans_role'))
+        response = client.get('/api/pac/export/')
+        self.assertEqual(b''.join(response.streaming_content).decode('utf-8-sig').count('\n'), 1)
+
+    def test_exports_require_the_list_permission(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.create(username='sans_role'))
+        self.assertEqual(client.get('/api/activite-periodique/activites-periodiques/export/').status_code, 403)
+        self.assertEqual(client.get('/api/pac/export/').status_code, 200)
+
+    def test_every_document_exports(self):
+        for url in (
+            '/api/cartographie-risque/cdrs/export/',
+            '/api/dashboard/tableaux-bord/export/',
+            '/api/activite-periodique/activites-periodiques/export/',
+        ):
+            with self.subTest(url=url):
+                self.assertEqual(len(self._export(url, annee=2025).decode('utf-8-sig').splitlines()), 1)
+
+    def test_invalid_parameters(self):
+        self.assertEqual(self.client.get('/api/pac/export/', {'type': 'pdf'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/pac/export/', {'annee': 'deux'}).status_code, 400)
+
+
+def _flaky_task(progress, user=None, fail=True):
+    progress(40, 'À mi-chemin')
+    if fail:
+        raise RuntimeError('Indisponible')
+    return {'ok': True}
+
+
+def _rejected_task(progress, user=None):
+    raise BackgroundJobError('Données incomplètes', result={'details': ['ligne 1']})
+
+
+@override_settings(BACKGROUND_JOB_RETRY_DELAY=0)
+class BackgroundJobTests(TestCase):
+    """Tâches de fond : réservation, reprises, avancement, endpoints 202 et statut"""
+
+    TEST_TASKS = {
+        'flaky': 'parametre.tests._flaky_task',
+        'rejected': 'parametre.tests._rejected_task',
+    }
+
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create(username='admin', is_staff=True, is_superuser=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        BackgroundJobService.record_worker_heartbeat('hote:1')
+
+    def test_job_runs_once_and_records_result(self):
+        with mock.patch.dict(BackgroundJobService.TASKS, self.TEST_TASKS):
+            job = BackgroundJobService.enqueue('flaky', {'fail': False}, user=self.admin)
+            self.assertEqual(BackgroundJobService.run_pending(), 1)
+            self.assertEqual(BackgroundJobService.run_pending(), 0)
+        job.refresh_from_db()
+        self.assertEqual(
+            (job.status, job.progress, job.result, job.attempts),
+            (BackgroundJob.STATUS_SUCCEEDED, 100, {'ok': True}, 1),
+        )
+
+    def test_failed_job_is_retried_then_marked_failed(self):
+        with mock.patch.dict(BackgroundJobService.TASKS, self.TEST_TASKS):
+            job = BackgroundJobService.enqueue('flaky', max_attempts=2)
+            BackgroundJobService.run_pending(limit=1)
+            job.refresh_from_db()
+            self.assertEqual((job.status, job.attempts, job.progress), (BackgroundJob.STATUS_PENDING, 1, 40))
+            self.assertEqual(job.error, 'Indisponible')
+
+            BackgroundJobService.run_pending()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (BackgroundJob.STATUS_FAILED, 2))
+
+    def test_business_error_is_not_retried(self):
+        with mock.patch.dict(BackgroundJobService.TASKS, self.TEST_TASKS):
+            job = BackgroundJobService.enqueue('rejected')
+            BackgroundJobService.run_pending()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (BackgroundJob.STATUS_FAILED, 1))
+        self.assertEqual(job.result, {'details': ['ligne 1']})
+
+    @override_settings(BACKGROUND_JOB_STALE_AFTER=60)
+    def test_stale_running_job_is_recovered(self):
+        job = BackgroundJob.objects.create(
+            task='flaky', status=BackgroundJob.STATUS_RUNNING, attempts=1, worker='hote:1',
+            heartbeat_at=timezone.now() - timedelta(minutes=5),
+        )
+        self.assertEqual(BackgroundJobService.recover_stale(), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.worker), (BackgroundJob.STATUS_PENDING, ''))
+
+    @override_settings(BACKGROUND_JOB_HEARTBEAT_INTERVAL=0)
+    def test_long_task_keeps_beating(self):
+        job = BackgroundJob.objects.create(
+            task='run_scheduler_job', status=BackgroundJob.STATUS_RUNNING, attempts=1, worker='hote:1',
+            heartbeat_at=timezone.now() - timedelta(minutes=20),
+        )
+        stop = mock.Mock(wait=mock.Mock(side_effect=[False, True]))
+        with mock.patch('parametre.services.background_jobs.connection'):
+            BackgroundJobService._heartbeat(job, stop)
+        job.refresh_from_db()
+        self.assertGreater(job.heartbeat_at, timezone.now() - timedelta(minutes=1))
+        self.assertEqual(BackgroundJobService.recover_stale(), 0)
+
+    def test_without_worker_trigger_is_refused_and_async_runs_inline(self):
+        cache.clear()
+        self.assertIsNone(BackgroundJobService.worker_alive())
+        DjangoJob.objects.create(id='rappels', next_run_time=None, job_state=b'')
+        response = self.client.post('/api/parametre/admin/scheduler/jobs/rappels/trigger/')
+        self.assertEqual(response.status_code, 503)
+        self.assertFalse(BackgroundJob.objects.exists())
+
+        request = RequestFactory().get('/api/pac/validate-by-type/', {'async': '1'})
+        self.assertFalse(wants_async(Request(request)))
+
+    def test_status_endpoint_is_limited_to_owner(self):
+        job = BackgroundJobService.enqueue('run_scheduler_job', {'job_id': 'inconnu'}, user=self.admin)
+        url = f'/api/parametre/jobs/{job.uuid}/'
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['data']['status'], BackgroundJob.STATUS_PENDING)
+
+        other = APIClient()
+        other.force_authenticate(User.objects.create(username='autre'))
+        self.assertEqual(other.get(url).status_code, 404)
+
+    def test_pac_validation_by_amendement_runs_in_background(self):
+        pac = seed_pac(2, self.admin)
+        annee = Annee.objects.create(annee=2025)
+        Pac.objects.filter(pk=pac.pk).update(annee=annee)
+
+        response = self.client.post('/api/pac/validate-by-type/?async=1', {
+            'processus': str(pac.processus_id), 'annee': str(annee.pk), 'num_amendement': 0,
+        }, format='json')
+        self.assertEqual(response.status_code, 202)
+        job_uuid = response.json()['data']['uuid']
+
+        call_command('run_worker', once=True, stdout=StringIO())
+        data = self.client.get(f'/api/parametre/jobs/{job_uuid}/').json()['data']
+        # Lignes du PAC synthétique incomplètes : échec métier, sans reprise, détails en résultat
+        self.assertEqual((data['status'], data['attempts']), (BackgroundJob.STATUS_FAILED, 1))
+        self.assertTrue(data['result']['details'])
+        self.assertFalse(Pac.objects.get(pk=pac.pk).is_validated)
+
+    def test_amendment_copy_task(self):
+        source = seed_pac(3, self.admin)
+        target = Pac.objects.create(processus=source.processus, cree_par=self.admin, num_amendement=1)
+        job = BackgroundJobService.enqueue(
+            'copy_pac_amendment', {'source': source.uuid, 'target': target.uuid}, user=self.admin
+        )
+        BackgroundJobService.run_pending()
+        job.refresh_from_db()
+        self.assertEqual(job.status, BackgroundJob.STATUS_SUCCEEDED)
+        self.assertEqual(job.result['copied'], 3)
+        self.assertEqual(DetailsPac.objects.filter(pac=target).count(), 3)
+
+    def test_amendment_copy_task_writes_clone_audit(self):
+        source = seed_pac(3, self.admin)
+        target = Pac.objects.create(processus=source.processus, cree_par=self.admin, num_amendement=1)
+        BackgroundJobService.enqueue('copy_pac_amendment', {
+            'source': source.uuid, 'target': target.uuid, 'ip_address': '10.0.0.1', 'user_agent': None,
+        }, user=self.admin)
+        writer = ActivityLogWriter()
+        with mock.patch('parametre.services.activity_log_writer.activity_log_writer', writer):
+            BackgroundJobService.run_pending()
+        writer.flush()
+        log = ActivityLog.objects.get(action='clone', entity_type='pac')
+        self.assertEqual((log.user, log.entity_id, log.ip_address), (self.admin, str(target.uuid), '10.0.0.1'))
+        self.assertIn('3 détails copiés', log.description)
+
+
+class SchedulerCommandTests(TestCase):
+    """Canal de commandes du scheduler : acquittement, résultat, réveil par socket, API admin"""
+
+    def setUp(self):
+        self.admin = User.objects.create(username='admin', is_staff=True, is_superuser=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_command_is_acknowledged_and_result_recorded(self):
+        command = SchedulerCommandChannel.send('reschedule', 'job_a', user=self.admin, hour=8, minute=30)
+        self.assertEqual(command.status, SchedulerCommand.STATUS_PENDING)
+
+        seen = []
+
+        def handler(cmd):
+            seen.append(cmd.status)
+            return {'hour': cmd.params['hour'], 'minute': cmd.params['minute']}
+
+        self.assertEqual(SchedulerCommandChannel.consume(handler), 1)
+        self.assertEqual(SchedulerCommandChannel.consume(handler), 0)
+        command.refresh_from_db()
+        self.assertEqual(seen, [SchedulerCommand.STATUS_ACKNOWLEDGED])
+        self.assertEqual((command.status, command.result), (SchedulerCommand.STATUS_DONE, {'hour': 8, 'minute': 30}))
+        self.assertIsNotNone(command.acknowledged_at)
+        self.assertIsNotNone(command.completed_at)
+
+    def test_failing_command_is_marked_failed(self):
+        command = SchedulerCommandChannel.send('trigger', 'inconnu')
+
+        def handler(cmd):
+            raise ValueError('Job inconnu : inconnu')
+
+        SchedulerCommandChannel.consume(handler)
+        command.refresh_from_db()
+        self.assertEqual((command.status, command.error), (SchedulerCommand.STATUS_FAILED, 'Job inconnu : inconnu'))
+
+    def test_interrupted_commands_are_failed_at_startup(self):
+        interrupted = SchedulerCommandChannel.send('trigger', 'job_a')
+        SchedulerCommandChannel._acknowledge_next()
+        pending = SchedulerCommandChannel.send('trigger', 'job_b')
+
+        self.assertEqual(SchedulerCommandChannel.recover_interrupted(), 1)
+        interrupted.refresh_from_db()
+        pending.refresh_from_db()
+        self.assertEqual(interrupted.status, SchedulerCommand.STATUS_FAILED)
+        self.assertIsNotNone(interrupted.completed_at)
+        self.assertEqual(pending.status, SchedulerCommand.STATUS_PENDING)
+        self.assertEqual(SchedulerCommandChannel.wait_for(interrupted.id, timeout=0).status, SchedulerCommand.STATUS_FAILED)
+
+    def test_wake_interrupts_wait(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'cmd.sock')
+            with override_settings(SCHEDULER_COMMAND_SOCKET=path):
+                wakeup = CommandWakeup()
+                try:
+                    self.assertFalse(wakeup.wait(0.01))
+                    SchedulerCommandChannel.wake()
+                    started = time.monotonic()
+                    self.assertTrue(wakeup.wait(5))
+                    self.assertLess(time.monotonic() - started, 1)
+                finally:
+                    wakeup.close()
+
+    @override_settings(SCHEDULER_COMMAND_RETENTION_DAYS=7)
+    def test_purge_keeps_recent_and_pending_commands(self):
+        old = timezone.now() - timedelta(days=8)
+        SchedulerCommand.objects.create(action='trigger', job_id='a', status=SchedulerCommand.STATUS_DONE, completed_at=old)
+        SchedulerCommand.objects.create(action='trigger', job_id='b', status=SchedulerCommand.STATUS_DONE, completed_at=timezone.now())
+        SchedulerCommand.objects.create(action='trigger', job_id='c')
+        self.assertEqual(SchedulerCommandChannel.purge(), 1)
+        self.assertEqual(SchedulerCommand.objects.count(), 2)
+
+    def test_command_detail_endpoint(self):
+        command = SchedulerCommandChannel.send('reschedule', 'job_a', user=self.admin, hour=7, minute=0)
+        SchedulerCommandChannel.consume(lambda cmd: {'hour': 7, 'minute': 0})
+
+        response = self.client.get(f'/api/parametre/admin/scheduler/commands/{command.id}/?wait=1')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.json()['status'], response.json()['result']), ('done', {'hour': 7, 'minute': 0}))
+        self.assertEqual(self.client.get('/api/parametre/admin/scheduler/commands/999999/').status_code, 404)
+        self.assertEqual([c['id'] for c in self.client.get('/api/parametre/admin/scheduler/commands/').json()], [command.id])
+
+        other = APIClient()
+        other.force_authenticate(User.objects.create(username='autre'))
+        self.assertEqual(other.get(f'/api/parametre/admin/scheduler/commands/{command.id}/').status_code, 403)
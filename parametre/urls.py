@@ -8,6 +8,8 @@ urlpatterns = [
     # ==================== ACTIVITÉS ====================
     path('activities/recent/', views.recent_activities, name='recent_activities'),
     path('activities/user/', views.user_activities, name='user_activities'),
+    path('admin/activities/', views.admin_activity_logs, name='admin_activity_logs'),
+    path('admin/log-archives/', views.admin_log_archives, name='admin_log_archives'),
     path('admin/email-logs/', views.admin_email_logs, name='admin_email_logs'),
     path('admin/notifications/', views.admin_notifications_list, name='admin_notifications_list'),
     path('admin/security/', views.admin_security, name='admin_security'),
@@ -16,11 +18,16 @@ urlpatterns = [
     path('admin/scheduler/jobs/', views.admin_scheduler_jobs, name='admin_scheduler_jobs'),
     path('admin/scheduler/jobs/<str:job_id>/update/', views.admin_scheduler_job_update, name='admin_scheduler_job_update'),
     path('admin/scheduler/jobs/<str:job_id>/trigger/', views.admin_scheduler_job_trigger, name='admin_scheduler_job_trigger'),
+    path('admin/scheduler/commands/', views.admin_scheduler_commands, name='admin_scheduler_commands'),
+    path('admin/scheduler/commands/<int:command_id>/', views.admin_scheduler_command_detail, name='admin_scheduler_command_detail'),
     path('admin/scheduler/executions/', views.admin_scheduler_executions, name='admin_scheduler_executions'),
+    path('jobs/<uuid:uuid>/', views.background_job_status, name='background_job_status'),
     path('admin/two-factor/config/', views.two_factor_admin_config, name='two_factor_admin_config'),
     
     # ==================== PARAMÈTRES ====================
     # Endpoints pour les formulaires (éléments actifs uniquement)
+    path('reference-bundle/', views.reference_bundle, name='reference_bundle'),
+    path('reference-bundle/changes/', views.reference_bundle_changes, name='reference_bundle_changes'),
     path('natures/', views.natures_list, name='natures_list'),
     path('categories/', views.categories_list, name='categories_list'),
     path('sources/', views.sources_list, name='sources_list'),
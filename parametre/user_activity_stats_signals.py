@@ -0,0 +1,64 @@
+"""
+Signaux des compteurs d'activité par utilisateur (UserActivityStats).
+
+Les ActivityLog écrits par ActivityLogWriter (bulk_create, sans signal) sont
+comptés par le writer lui-même ; ces signaux couvrent les créations directes
+d'ActivityLog et les tentatives de connexion échouées. Le compteur est mis à jour
+dans la transaction de l'écriture, sous un point de sauvegarde : un échec ne doit
+pas annuler l'écriture du journal.
+
+Après migrate, une table vide devant des journaux existants (premier déploiement)
+est reconstruite depuis l'historique, avant tout archivage.
+"""
+import logging
+
+from django.db import transaction
+from django.db.models.signals import post_migrate, post_save
+
+from parametre.services.user_activity_stats import UserActivityStatsService
+
+logger = logging.getLogger(__name__)
+
+DISPATCH_UID_PREFIX = 'kora_user_activity_stats'
+
+
+def _record(method, instance):
+    try:
+        with transaction.atomic():
+            method([instance])
+    except Exception as e:
+        logger.error("[UserActivityStatsService] Erreur de mise à jour: %s", str(e))
+
+
+def activity_log_created(sender, instance, created=False, raw=False, **kwargs):
+    if created and not raw:
+        _record(UserActivityStatsService.record_activities, instance)
+
+
+def failed_login_created(sender, instance, created=False, raw=False, **kwargs):
+    if created and not raw:
+        _record(UserActivityStatsService.record_failed_logins, instance)
+
+
+def rebuild_if_empty(sender, **kwargs):
+    """Après migrate : construit les compteurs d'une base qui a des journaux mais aucun compteur"""
+    from parametre.models import ActivityLog, FailedLoginAttempt, UserActivityStats
+
+    try:
+        if not UserActivityStats.objects.exists() and (
+            ActivityLog.objects.exists() or FailedLoginAttempt.objects.exists()
+        ):
+            UserActivityStatsService.rebuild()
+    except Exception as e:
+        logger.error("[UserActivityStatsService] Construction initiale impossible: %s", str(e))
+
+
+def register(app_config):
+    """Connecte les signaux d'ActivityLog et de FailedLoginAttempt"""
+    from parametre.models import ActivityLog, FailedLoginAttempt
+
+    post_save.connect(activity_log_created, sender=ActivityLog, dispatch_uid=f'{DISPATCH_UID_PREFIX}_activity_log')
+    post_save.connect(
+        failed_login_created, sender=FailedLoginAttempt, dispatch_uid=f'{DISPATCH_UID_PREFIX}_failed_login'
+    )
+    post_migrate.connect(rebuild_if_empty, sender=app_config, dispatch_uid=f'{DISPATCH_UID_PREFIX}_post_migrate')
@@ -250,6 +250,22 @@ class EmailRateLimiter:
     MAX_EMAILS_PER_DAY_GLOBAL = 1000
     MAX_TEST_EMAILS_PER_MINUTE = 1
     
+    @staticmethod
+    def _increment(cache_key: str, timeout: int) -> int:
+        """
+        Incrémente un compteur à fenêtre fixe et retourne sa nouvelle valeur
+        
+        cache.add ne crée la clé (et ne fixe son expiration) qu'au premier envoi
+        de la fenêtre ; cache.incr conserve ensuite cette expiration.
+        """
+        cache.add(cache_key, 0, timeout)
+        try:
+            return cache.incr(cache_key)
+        except ValueError:
+            # Clé expirée entre add() et incr()
+            cache.set(cache_key, 1, timeout)
+            return 1
+    
     @classmethod
     def check_user_limit(cls, user_id: int) -> bool:
         """
@@ -262,14 +278,13 @@ class EmailRateLimiter:
             True si autorisé, False sinon
         """
         cache_key = f'email_rate_limit_user_{user_id}'
-        count = cache.get(cache_key, 0)
+        # Incrément atomique (expire dans 1 heure) : exact même avec plusieurs workers
+        count = cls._increment(cache_key, 3600)
         
-        if count >= cls.MAX_EMAILS_PER_HOUR_USER:
+        if count > cls.MAX_EMAILS_PER_HOUR_USER:
             logger.warning("Limite d'emails dépassée pour l'utilisateur %s", user_id)
             return False
         
-        # Incrémenter le compteur (expire dans 1 heure)
-        cache.set(cache_key, count + 1, 3600)
         return True
     
     @classmethod
@@ -281,14 +296,13 @@ class EmailRateLimiter:
             True si autorisé, False sinon
         """
         cache_key = 'email_rate_limit_global_day'
-        count = cache.get(cache_key, 0)
+        # Incrément atomique (expire dans 24 heures) : exact même avec plusieurs workers
+        count = cls._increment(cache_key, 86400)
         
-        if count >= cls.MAX_EMAILS_PER_DAY_GLOBAL:
+        if count > cls.MAX_EMAILS_PER_DAY_GLOBAL:
             logger.error("🚨 Limite globale d'emails dépassée !")
             return False
         
-        # Incrémenter le compteur (expire dans 24 heures)
-        cache.set(cache_key, count + 1, 86400)
         return True
     
     @classmethod
@@ -303,14 +317,13 @@ class EmailRateLimiter:
             True si autorisé, False sinon
         """
         cache_key = f'email_test_limit_user_{user_id}'
-        count = cache.get(cache_key, 0)
+        # Incrément atomique (expire dans 1 minute) : exact même avec plusieurs workers
+        count = cls._increment(cache_key, 60)
         
-        if count >= cls.MAX_TEST_EMAILS_PER_MINUTE:
+        if count > cls.MAX_TEST_EMAILS_PER_MINUTE:
             logger.warning("Limite de tests dépassée pour l'utilisateur %s", user_id)
             return False
         
-        # Incrémenter le compteur (expire dans 1 minute)
-        cache.set(cache_key, count + 1, 60)
         return True
 
 
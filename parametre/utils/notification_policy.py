@@ -60,6 +60,27 @@ def should_notify_pac(traitement, today, policy):
   return (days_since_deadline - days_after) % reminder_frequency == 0
 
 
+def deadline_window_q(today, policy, field="delai_realisation"):
+  """
+  Pré-filtre SQL équivalent à should_notify_pac (sans la périodicité des relances).
+
+  Ne retient que les échéances dans [today ; today + days_before] ou dépassées
+  depuis au moins days_after jours : le coût d'un passage est proportionnel aux
+  éléments potentiellement dus, pas au nombre total de lignes. should_notify_pac
+  reste appliqué ensuite pour la fréquence des relances.
+  """
+  from datetime import timedelta
+  from django.db.models import Q
+
+  today = _normalize_date(today)
+  days_before = max(0, getattr(policy, "days_before", 0))
+  days_after = max(0, getattr(policy, "days_after", 0))
+
+  upcoming = Q(**{f"{field}__gte": today, f"{field}__lte": today + timedelta(days=days_before)})
+  overdue = Q(**{f"{field}__lte": today - timedelta(days=max(1, days_after))})
+  return upcoming | overdue
+
+
 def should_notify_dashboard(periode_end_date, today, policy):
   """
   Détermine si un indicateur de tableau de bord doit être notifié à la date `today`
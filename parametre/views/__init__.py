@@ -1,13 +1,14 @@
 """Auto-generated exports — do not edit manually."""
 from .utils import ServerSentEventRenderer, get_client_ip, _parse_user_agent, log_activity, get_model_list_data
 from .notifications import resolve_notification_settings, notification_settings_get, notification_settings_update, notification_settings_effective, dashboard_notification_settings_get, dashboard_notification_settings_update, upcoming_notifications, notifications_list, notification_mark_read
-from .activity_logs import log_pac_creation, log_pac_update, log_traitement_creation, log_suivi_creation, log_user_login, log_user_logout, log_activite_periodique_creation, log_activite_periodique_update, log_activite_periodique_validation, log_cdr_creation, log_cdr_update, log_cdr_validation, log_document_creation, log_document_update, log_document_edition_creation, log_document_amendement_creation, log_tableau_bord_creation, log_tableau_bord_update, log_objectif_creation, log_indicateur_creation, recent_activities, user_activities, admin_notifications_list, admin_email_logs
-from .reference_data import natures_list, categories_list, sources_list, action_types_list, statuts_list, etats_mise_en_oeuvre_list, appreciations_list, statuts_action_cdr_list, directions_list, sous_directions_list, services_list, processus_list, dysfonctionnements_list, dysfonctionnements_all_list, appreciation_create, appreciation_update, appreciation_delete, categorie_create, categorie_update, categorie_delete, direction_create, direction_update, direction_delete, sous_direction_create, sous_direction_update, sous_direction_delete, action_type_create, action_type_update, action_type_delete, natures_all_list, categories_all_list, sources_all_list, action_types_all_list, statuts_all_list, etats_mise_en_oeuvre_all_list, appreciations_all_list, directions_all_list, sous_directions_all_list, services_all_list, processus_all_list, frequences_list, mois_list, periodicites_list, annees_list, annees_all_list, annee_create, annee_update, annee_delete, frequences_risque_list, gravites_risque_list, criticités_risque_list, criticites_all_list, criticite_create, criticite_update, criticite_delete, dysfonctionnement_create, dysfonctionnement_update, dysfonctionnement_delete, risques_list, risques_all_list, risque_create, risque_update, risque_delete, nature_create, nature_update, nature_delete, service_create, service_update, service_delete, processus_create, processus_update, processus_delete, mois_create, mois_update, mois_delete, frequences_all_list, frequence_create, frequence_update, frequence_delete, frequences_risque_all_list, frequence_risque_create, frequence_risque_update, frequence_risque_delete, gravites_risque_all_list, gravite_risque_create, gravite_risque_update, gravite_risque_delete, statuts_action_cdr_all_list, statut_action_cdr_create, statut_action_cdr_update, statut_action_cdr_delete, types_document_list, types_document_all_list, type_document_create, type_document_update, type_document_delete
+from .activity_logs import log_pac_creation, log_pac_update, log_traitement_creation, log_suivi_creation, log_user_login, log_user_logout, log_activite_periodique_creation, log_activite_periodique_update, log_activite_periodique_validation, log_cdr_creation, log_cdr_update, log_cdr_validation, log_document_creation, log_document_update, log_document_edition_creation, log_document_amendement_creation, log_tableau_bord_creation, log_tableau_bord_update, log_objectif_creation, log_indicateur_creation, recent_activities, user_activities, admin_activity_logs, admin_log_archives, admin_notifications_list, admin_email_logs
+from .reference_data import natures_list, categories_list, sources_list, action_types_list, statuts_list, etats_mise_en_oeuvre_list, appreciations_list, statuts_action_cdr_list, directions_list, sous_directions_list, services_list, processus_list, dysfonctionnements_list, dysfonctionnements_all_list, appreciation_create, appreciation_update, appreciation_delete, categorie_create, categorie_update, categorie_delete, direction_create, direction_update, direction_delete, sous_direction_create, sous_direction_update, sous_direction_delete, action_type_create, action_type_update, action_type_delete, natures_all_list, categories_all_list, sources_all_list, action_types_all_list, statuts_all_list, etats_mise_en_oeuvre_all_list, appreciations_all_list, directions_all_list, sous_directions_all_list, services_all_list, processus_all_list, frequences_list, mois_list, periodicites_list, annees_list, annees_all_list, annee_create, annee_update, annee_delete, frequences_risque_list, gravites_risque_list, criticités_risque_list, criticites_all_list, criticite_create, criticite_update, criticite_delete, dysfonctionnement_create, dysfonctionnement_update, dysfonctionnement_delete, risques_list, risques_all_list, risque_create, risque_update, risque_delete, nature_create, nature_update, nature_delete, service_create, service_update, service_delete, processus_create, processus_update, processus_delete, mois_create, mois_update, mois_delete, frequences_all_list, frequence_create, frequence_update, frequence_delete, frequences_risque_all_list, frequence_risque_create, frequence_risque_update, frequence_risque_delete, gravites_risque_all_list, gravite_risque_create, gravite_risque_update, gravite_risque_delete, statuts_action_cdr_all_list, statut_action_cdr_create, statut_action_cdr_update, statut_action_cdr_delete, types_document_list, types_document_all_list, type_document_create, type_document_update, type_document_delete, reference_bundle, reference_bundle_changes
 from .email import email_settings_detail, email_settings_update, test_email_configuration
 from .media import media_create, media_update_description, media_list, preuve_create_with_medias, preuve_add_medias, preuve_remove_media, preuves_list
 from .users import roles_list, roles_all_list, role_create, role_update, role_delete, user_processus_list, user_processus_create, user_processus_update, user_processus_delete, user_processus_role_list, user_processus_role_create, user_processus_role_update, user_processus_role_delete, users_list, admin_user_detail, admin_user_toggle_active, users_create, users_invite, admin_get_user_processus
 from .app_config import application_config_list, application_config_toggle, app_status_stream, app_status
 from .security import admin_security, admin_security_config, admin_throttle_config
-from .scheduler import admin_scheduler_jobs, admin_scheduler_job_update, admin_scheduler_job_trigger, admin_scheduler_executions
+from .scheduler import admin_scheduler_jobs, admin_scheduler_job_update, admin_scheduler_job_trigger, admin_scheduler_commands, admin_scheduler_command_detail, admin_scheduler_executions
 from .recaptcha import recaptcha_config_public, recaptcha_admin_config, recaptcha_admin_test
 from .two_factor import two_factor_admin_config
+from .background_jobs import wants_async, job_accepted, background_job_status
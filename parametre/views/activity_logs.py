@@ -21,7 +21,7 @@ import json
 import time
 import hashlib
 import logging
-from datetime import timedelta
+from datetime import date, datetime, timedelta
 from django.http import StreamingHttpResponse
 from django.db.models import Max, Subquery, OuterRef
 
@@ -467,47 +467,28 @@ def log_indicateur_creation(user, indicateur, ip_address=None, user_agent=None):
 def recent_activities(request):
     """
     API pour récupérer les activités récentes
+
+    Pagination par curseur : ?limit= (max ActivityFeed.MAX_PAGE_SIZE) et ?cursor=
+    (next_cursor de la page précédente).
     """
+    from ..services.activity_feed import ActivityFeed
+
     try:
-        limit = int(request.GET.get('limit', 10))
         user_specific = request.GET.get('user_only', 'false').lower() == 'true'
         
         # Récupération des activités directement (exclure login/logout)
-        queryset = ActivityLog.objects.select_related('user').exclude(action__in=['login', 'logout'])
+        queryset = ActivityLog.objects.exclude(action__in=['login', 'logout'])
 
         if user_specific:
             queryset = queryset.filter(user=request.user)
 
-        activities = queryset.order_by('-created_at')[:limit]
-        
-        # Formatage des données
-        data = []
-        for activity in activities:
-            data.append({
-                'uuid': str(activity.uuid),
-                'user': {
-                    'username': activity.user.username,
-                    'first_name': activity.user.first_name,
-                    'last_name': activity.user.last_name,
-                    'initials': f"{activity.user.first_name[0] if activity.user.first_name else ''}{activity.user.last_name[0] if activity.user.last_name else ''}".upper()
-                },
-                'action': activity.action,
-                'action_display': activity.get_action_display(),
-                'entity_type': activity.entity_type,
-                'entity_name': activity.entity_name,
-                'description': activity.description,
-                'time_ago': activity.time_ago,
-                'action_icon': activity.action_icon,
-                'status_color': activity.status_color,
-                'created_at': activity.created_at.isoformat()
-            })
-        
-        return Response({
-            'success': True,
-            'data': data,
-            'count': len(data)
-        }, status=status.HTTP_200_OK)
-            
+        page = ActivityFeed.page(
+            queryset, cursor=request.GET.get('cursor'), limit=request.GET.get('limit'), default_limit=10
+        )
+        return Response({'success': True, **page}, status=status.HTTP_200_OK)
+
+    except ValueError as e:
+        return Response({'success': False, 'message': str(e)}, status=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
         logger.error("Erreur lors de la récupération des activités: %s", e)
         return Response({
@@ -522,46 +503,146 @@ def recent_activities(request):
 def user_activities(request):
     """
     API pour récupérer les activités d'un utilisateur spécifique
+
+    Pagination par curseur : ?limit= (max ActivityFeed.MAX_PAGE_SIZE) et ?cursor=.
     """
-    try:
-        limit = int(request.GET.get('limit', 20))
+    from ..services.activity_feed import ActivityFeed
 
+    try:
         # Récupération des activités de l'utilisateur (exclure login/logout)
-        activities = ActivityLog.objects.filter(user=request.user).exclude(action__in=['login', 'logout']).select_related('user').order_by('-created_at')[:limit]
-        
-        # Formatage des données
-        data = []
-        for activity in activities:
-            data.append({
-                'uuid': str(activity.uuid),
-                'user': {
-                    'username': activity.user.username,
-                    'first_name': activity.user.first_name,
-                    'last_name': activity.user.last_name,
-                    'initials': f"{activity.user.first_name[0] if activity.user.first_name else ''}{activity.user.last_name[0] if activity.user.last_name else ''}".upper()
-                },
-                'action': activity.action,
-                'action_display': activity.get_action_display(),
-                'entity_type': activity.entity_type,
-                'entity_name': activity.entity_name,
-                'description': activity.description,
-                'time_ago': activity.time_ago,
-                'action_icon': activity.action_icon,
-                'status_color': activity.status_color,
-                'created_at': activity.created_at.isoformat()
-            })
-        
+        queryset = ActivityLog.objects.filter(user=request.user).exclude(action__in=['login', 'logout'])
+
+        page = ActivityFeed.page(
+            queryset, cursor=request.GET.get('cursor'), limit=request.GET.get('limit'), default_limit=20
+        )
+        return Response({'success': True, **page}, status=status.HTTP_200_OK)
+
+    except ValueError as e:
+        return Response({'success': False, 'message': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    except Exception as e:
+        logger.error("Erreur lors de la récupération des activités utilisateur: %s", e)
+        return Response({
+            'success': False,
+            'message': 'Erreur lors de la récupération des activités',
+            'error': "Une erreur inattendue s'est produite. Veuillez réessayer."
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def admin_activity_logs(request):
+    """
+    API admin : journal d'activités de tous les utilisateurs, paginé par curseur.
+    Security by Design : is_staff ET is_superuser requis.
+    Filtres : action, entity_type, user (id), date_from / date_to (AAAA-MM-JJ, inclusifs),
+    limit (max ActivityFeed.MAX_PAGE_SIZE), cursor.
+    """
+    from ..services.activity_feed import ActivityFeed
+
+    if not (request.user.is_staff and request.user.is_superuser):
+        return Response({'success': False, 'message': 'Accès refusé'}, status=status.HTTP_403_FORBIDDEN)
+
+    try:
+        qs = ActivityLog.objects.all()
+
+        action = request.GET.get('action')
+        if action:
+            qs = qs.filter(action=action)
+
+        entity_type = request.GET.get('entity_type')
+        if entity_type:
+            qs = qs.filter(entity_type=entity_type)
+
+        user_id = request.GET.get('user')
+        if user_id:
+            qs = qs.filter(user_id=int(user_id))
+
+        # Bornes de dates converties en instants : la comparaison reste sur l'index created_at
+        tz = timezone.get_current_timezone()
+        date_from = request.GET.get('date_from')
+        if date_from:
+            start = datetime.combine(date.fromisoformat(date_from), datetime.min.time())
+            qs = qs.filter(created_at__gte=timezone.make_aware(start, tz))
+        date_to = request.GET.get('date_to')
+        if date_to:
+            end = datetime.combine(date.fromisoformat(date_to) + timedelta(days=1), datetime.min.time())
+            qs = qs.filter(created_at__lt=timezone.make_aware(end, tz))
+
+        page = ActivityFeed.page(qs, cursor=request.GET.get('cursor'), limit=request.GET.get('limit'), default_limit=50)
+        return Response({'success': True, **page}, status=status.HTTP_200_OK)
+
+    except ValueError:
+        return Response({
+            'success': False,
+            'message': 'Paramètre invalide (user, date_from, date_to ou cursor)',
+        }, status=status.HTTP_400_BAD_REQUEST)
+    except Exception as e:
+        logger.error("Erreur admin_activity_logs: %s", e)
+        return Response({
+            'success': False,
+            'message': 'Erreur lors de la récupération du journal d\'activités',
+            'error': "Une erreur inattendue s'est produite. Veuillez réessayer."
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def admin_log_archives(request):
+    """
+    API admin : lecture des journaux archivés (parametre.services.log_archiver).
+    Security by Design : is_staff ET is_superuser requis.
+    Paramètres : log (activity_log | permission_audit), date_from / date_to (AAAA-MM-JJ,
+    inclusifs, obligatoires), filtres action, entity_type, app_name, granted, user (id),
+    limit (max 500), offset.
+    """
+    from ..services.log_archiver import LogArchiver
+
+    if not (request.user.is_staff and request.user.is_superuser):
+        return Response({'success': False, 'message': 'Accès refusé'}, status=status.HTTP_403_FORBIDDEN)
+
+    log_name = request.GET.get('log', 'activity_log')
+    if log_name not in LogArchiver.logs():
+        return Response({'success': False, 'message': 'Journal inconnu'}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        tz = timezone.get_current_timezone()
+        start = timezone.make_aware(
+            datetime.combine(date.fromisoformat(request.GET['date_from']), datetime.min.time()), tz
+        )
+        end = timezone.make_aware(
+            datetime.combine(date.fromisoformat(request.GET['date_to']) + timedelta(days=1), datetime.min.time()), tz
+        )
+
+        filters = {
+            field: request.GET[field]
+            for field in ('action', 'entity_type', 'app_name')
+            if request.GET.get(field)
+        }
+        if request.GET.get('granted') in ('true', 'false'):
+            filters['granted'] = request.GET['granted'] == 'true'
+        if request.GET.get('user'):
+            filters['user_id'] = int(request.GET['user'])
+
+        limit = max(1, min(int(request.GET.get('limit', 100)), 500))
+        offset = max(0, int(request.GET.get('offset', 0)))
+    except (KeyError, ValueError):
+        return Response({
+            'success': False,
+            'message': 'Paramètre invalide (date_from et date_to obligatoires, user, limit ou offset)',
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        result = LogArchiver.read(log_name, start, end, filters=filters, limit=limit, offset=offset)
         return Response({
             'success': True,
-            'data': data,
-            'count': len(data)
+            **result,
+            'months': LogArchiver.months(log_name),
         }, status=status.HTTP_200_OK)
-        
     except Exception as e:
-        logger.error("Erreur lors de la récupération des activités utilisateur: %s", e)
+        logger.error("Erreur admin_log_archives: %s", e)
         return Response({
             'success': False,
-            'message': 'Erreur lors de la récupération des activités',
+            'message': 'Erreur lors de la lecture des archives',
             'error': "Une erreur inattendue s'est produite. Veuillez réessayer."
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
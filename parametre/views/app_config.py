@@ -18,8 +18,6 @@ from django.core.mail import send_mail
 from django.conf import settings
 from django.template.loader import render_to_string
 import json
-import time
-import hashlib
 import logging
 from datetime import timedelta
 from django.http import StreamingHttpResponse
@@ -126,25 +124,17 @@ def app_status_stream(request):
     - Données filtrées selon le rôle (superadmin bypass)
     - Aucune donnée sensible dans le stream
     - Heartbeat toutes les 15 s pour détecter les déconnexions
-    - Détection de changements via updated_at (requête légère)
-    - GeneratorExit capturé pour libérer proprement la connexion
+    - Aucune requête par client : l'état est partagé par processus (app_status_broadcaster)
+    - Sous ASGI le flux est asynchrone et n'occupe aucun thread par client
+    - GeneratorExit / annulation capturés pour libérer proprement la connexion
     """
+    from django.core.handlers.asgi import ASGIRequest
+    from ..services.app_status_broadcaster import app_status_broadcaster
+
     is_superadmin = request.user.is_staff and request.user.is_superuser
     username = request.user.username
 
-    def _snapshot():
-        """Retourne (données_effectives, hash_de_changement)."""
-        from parametre.models import ApplicationConfig
-        configs = list(
-            ApplicationConfig.objects.all()
-            .values('app_name', 'is_enabled', 'maintenance_message', 'maintenance_end')
-            .order_by('app_name')
-        )
-        # Hash basé uniquement sur les champs métier (is_enabled suffit)
-        change_hash = hashlib.md5(
-            str([(c['app_name'], c['is_enabled']) for c in configs]).encode()
-        ).hexdigest()
-
+    def _payload(configs):
         data = {}
         for c in configs:
             data[c['app_name']] = {
@@ -154,41 +144,37 @@ def app_status_stream(request):
                     c['maintenance_end'].isoformat() if c['maintenance_end'] else None
                 ),
             }
-        return data, change_hash
+        return data
 
     def _event(event_name, payload):
         return f"event: {event_name}\ndata: {json.dumps(payload)}\n\n"
 
-    def stream():
-        last_hash = None
-        heartbeat_ticks = 0
-        POLL_INTERVAL = 3       # secondes entre chaque vérification DB
-        HEARTBEAT_EVERY = 5     # ticks → heartbeat toutes les 15 s
+    try:
+        # État initial lu ici (requête synchrone) : mémoire du processus, base au premier appel
+        initial_state = app_status_broadcaster.current()
+    except Exception as e:
+        logger.error("[SSE] Erreur initialisation (%s): %s", username, e)
+        initial_state = None
 
-        try:
-            # État initial envoyé immédiatement à la connexion
-            data, last_hash = _snapshot()
-            yield _event('status', data)
-        except Exception as e:
-            logger.error("[SSE] Erreur initialisation (%s): %s", username, e)
+    heartbeat_interval = app_status_broadcaster.heartbeat_interval
+
+    def stream():
+        """Variante WSGI : attente sur la condition partagée, sans requête par client."""
+        if initial_state is None:
             return
+        version, last_hash, configs = initial_state
+        yield _event('status', _payload(configs))
 
         while True:
             try:
-                time.sleep(POLL_INTERVAL)
-
-                data, current_hash = _snapshot()
-
+                state = app_status_broadcaster.wait(version, heartbeat_interval)
+                if state is None:
+                    yield ": heartbeat\n\n"
+                    continue
+                version, current_hash, configs = state
                 if current_hash != last_hash:
-                    yield _event('status', data)
+                    yield _event('status', _payload(configs))
                     last_hash = current_hash
-                    heartbeat_ticks = 0
-                else:
-                    heartbeat_ticks += 1
-                    if heartbeat_ticks >= HEARTBEAT_EVERY:
-                        yield ": heartbeat\n\n"
-                        heartbeat_ticks = 0
-
             except GeneratorExit:
                 logger.info("[SSE] Client déconnecté : %s", username)
                 break
@@ -196,8 +182,39 @@ def app_status_stream(request):
                 logger.error("[SSE] Erreur stream (%s): %s", username, e)
                 break
 
+    async def astream():
+        """Variante ASGI : réveil par la boucle asyncio, heartbeat par minuterie."""
+        import asyncio
+
+        if initial_state is None:
+            return
+        version, last_hash, configs = initial_state
+        changed = app_status_broadcaster.subscribe_async()
+        try:
+            yield _event('status', _payload(configs))
+            while True:
+                try:
+                    await asyncio.wait_for(changed.wait(), timeout=heartbeat_interval)
+                except asyncio.TimeoutError:
+                    yield ": heartbeat\n\n"
+                    continue
+                changed.clear()
+                version, current_hash, configs = app_status_broadcaster.current()
+                if current_hash != last_hash:
+                    yield _event('status', _payload(configs))
+                    last_hash = current_hash
+        except asyncio.CancelledError:
+            logger.info("[SSE] Client déconnecté : %s", username)
+            raise
+        except Exception as e:
+            logger.error("[SSE] Erreur stream (%s): %s", username, e)
+        finally:
+            app_status_broadcaster.unsubscribe_async(changed)
+
+    is_asgi = isinstance(getattr(request, '_request', request), ASGIRequest)
+
     response = StreamingHttpResponse(
-        streaming_content=stream(),
+        streaming_content=astream() if is_asgi else stream(),
         content_type='text/event-stream; charset=utf-8',
     )
     response['Cache-Control'] = 'no-cache, no-store, must-revalidate'
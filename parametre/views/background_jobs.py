@@ -0,0 +1,57 @@
+"""
+Tâches de fond : réponse 202 des endpoints longs et suivi de l'avancement.
+
+Un endpoint long appelé avec ?async=1 dépose une tâche (BackgroundJobService)
+et répond aussitôt 202 avec la tâche ; le client interroge ensuite
+/api/parametre/jobs/<uuid>/ jusqu'à status 'succeeded' ou 'failed'. Sans worker
+actif, l'endpoint répond comme sans ?async=1.
+"""
+import logging
+
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAuthenticated
+
+from shared.responses import accepted, not_found, ok
+
+from ..models import BackgroundJob
+from ..services.background_jobs import BackgroundJobService
+
+logger = logging.getLogger(__name__)
+
+
+def wants_async(request):
+    """
+    Le client demande l'exécution en tâche de fond (?async=1) et un worker est actif.
+    Sans worker (run_worker arrêté), la tâche resterait en attente : exécution synchrone.
+    """
+    if request.query_params.get('async', '').lower() not in ('1', 'true'):
+        return False
+    if BackgroundJobService.worker_alive() is None:
+        logger.warning("[BackgroundJob] Aucun worker actif : %s exécuté en synchrone", request.path)
+        return False
+    return True
+
+
+def job_accepted(job, message=None, **kwargs):
+    """Réponse 202 : tâche déposée et URL de suivi"""
+    return accepted(
+        data=BackgroundJobService.serialize(job),
+        message=message,
+        status_url=f'/api/parametre/jobs/{job.uuid}/',
+        **kwargs
+    )
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def background_job_status(request, uuid):
+    """Statut et avancement d'une tâche de fond (celles de l'utilisateur ; toutes pour le superadmin)"""
+    from parametre.permissions import can_manage_users
+
+    jobs = BackgroundJob.objects.all()
+    if not can_manage_users(request.user):
+        jobs = jobs.filter(cree_par=request.user)
+    job = jobs.filter(uuid=uuid).first()
+    if job is None:
+        return not_found('Tâche introuvable.')
+    return ok(data=BackgroundJobService.serialize(job))
@@ -239,7 +239,7 @@ def notifications_list(request):
     - limit, offset pour la pagination simple
     """
     try:
-        qs = Notification.objects.filter(user=request.user)
+        qs = Notification.objects.filter(user=request.user).select_related('content_type')
 
         # Filtre masquées
         include_dismissed = request.query_params.get('include_dismissed')
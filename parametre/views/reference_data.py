@@ -25,6 +25,7 @@ from datetime import timedelta
 from django.http import StreamingHttpResponse
 from django.db.models import Max, Subquery, OuterRef
 
+from shared.responses import etag_response
 from ..media_paths import validate_uploaded_file
 from ..models import (
     Nature, Categorie, Source, ActionType, Statut,
@@ -2107,5 +2108,102 @@ def type_document_delete(request, uuid):
         return Response({'error': 'Impossible de supprimer le type de document'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+# ==================== BUNDLE DES RÉFÉRENTIELS ====================
+
+def _requested_reference_tables(request):
+    """Tables demandées via ?tables=a,b ; (tables, None) ou (None, réponse 400)."""
+    from ..services.reference_bundle_service import ReferenceBundleService
+
+    requested = [name.strip() for name in request.GET.get('tables', '').split(',') if name.strip()]
+    unknown = sorted(set(requested) - set(ReferenceBundleService.table_names()))
+    if unknown:
+        return None, Response({
+            'success': False,
+            'message': f"Table(s) inconnue(s) : {', '.join(unknown)}",
+            'tables': ReferenceBundleService.table_names(),
+        }, status=status.HTTP_400_BAD_REQUEST)
+    return requested, None
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def reference_bundle(request):
+    """
+    Toutes les tables de référence actives en une réponse, avec ETag.
+
+    Paramètres :
+    - tables : sélection séparée par des virgules (ex. ?tables=natures,processus)
+
+    If-None-Match identique à l'ETag courant → 304 sans corps.
+    """
+    from ..services.reference_bundle_service import ReferenceBundleService
+
+    requested, error = _requested_reference_tables(request)
+    if error is not None:
+        return error
+
+    try:
+        bundle = ReferenceBundleService.get_bundle(requested or None)
+    except Exception as e:
+        logger.error("Erreur lors de la récupération du bundle de référence: %s", e)
+        return Response({
+            'success': False,
+            'message': 'Erreur lors de la récupération des données de référence',
+            'error': "Une erreur inattendue s'est produite. Veuillez réessayer."
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    return etag_response(request, {
+        'success': True,
+        'version': bundle['version'],
+        'data': bundle['tables'],
+    }, bundle['etag'])
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def reference_bundle_changes(request):
+    """
+    Synchronisation différentielle des tables de référence.
+
+    Paramètres :
+    - since : version détenue par le client (champ 'version' du bundle ou d'un appel précédent)
+    - tables : sélection séparée par des virgules (optionnel)
+
+    Renvoie, par table modifiée, les éléments créés ou modifiés ('upserted') et les
+    uuids désactivés ou supprimés ('removed'), ainsi que la nouvelle version.
+    """
+    from ..services.reference_bundle_service import ReferenceBundleService
+
+    try:
+        since = int(request.GET.get('since', ''))
+        if since < 0:
+            raise ValueError
+    except ValueError:
+        return Response({
+            'success': False,
+            'message': "Le paramètre 'since' doit être un entier positif",
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    requested, error = _requested_reference_tables(request)
+    if error is not None:
+        return error
+
+    try:
+        delta = ReferenceBundleService.get_changes(since, requested or None)
+    except Exception as e:
+        logger.error("Erreur lors de la synchronisation des données de référence: %s", e)
+        return Response({
+            'success': False,
+            'message': 'Erreur lors de la synchronisation des données de référence',
+            'error': "Une erreur inattendue s'est produite. Veuillez réessayer."
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    return Response({
+        'success': True,
+        'version': delta['version'],
+        'changes': delta['changes'],
+    }, status=status.HTTP_200_OK)
+
+
 # ==================== SYSTÈME DE RÔLES ====================
 
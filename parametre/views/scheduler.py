@@ -9,6 +9,7 @@ from rest_framework.decorators import api_view, permission_classes, renderer_cla
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.renderers import BaseRenderer
 from rest_framework.response import Response
+from django.db import transaction
 from django.db.models import Q
 from django.contrib.auth.tokens import default_token_generator
 from django.utils import timezone
@@ -36,6 +37,7 @@ from ..models import (
     ReminderEmailLog, FailedLoginAttempt, LoginSecurityConfig, LoginBlock,
 )
 from ..utils.notification_policy import should_notify_pac
+from ..services.scheduler_commands import SchedulerCommandChannel
 from ..serializers import (
     AppreciationSerializer, CategorieSerializer, DirectionSerializer,
     SousDirectionSerializer, ActionTypeSerializer, NotificationSettingsSerializer,
@@ -105,7 +107,7 @@ def _extract_job_info(job):
     Le trigger est renvoyé en plus de (hour, minute) pour permettre de calculer
     next_run_time à la volée (voir _serialize_job) : la colonne DjangoJob.next_run_time
     n'est resynchronisée que par le service scheduler séparé, de façon asynchrone
-    (jusqu'à 30s de délai, et pas du tout si ce service est indisponible) —
+    (à l'application de la commande, et pas du tout si ce service est indisponible) —
     la calculer depuis le trigger réel évite tout affichage périmé.
     """
     import pickle
@@ -201,10 +203,14 @@ def admin_scheduler_jobs(request):
     from django_apscheduler.models import DjangoJob
     from parametre.scheduler import is_scheduler_service_running
 
+    from parametre.services.background_jobs import BackgroundJobService
+
     jobs = DjangoJob.objects.all().order_by('id')
     scheduler_running = is_scheduler_service_running()
     return Response({
         'scheduler_running': scheduler_running,
+        # Worker des tâches de fond : requis par le déclenchement manuel
+        'worker_running': BackgroundJobService.worker_alive() is not None,
         'jobs': [_serialize_job(j) for j in jobs],
     })
 
@@ -218,12 +224,13 @@ def admin_scheduler_job_update(request, job_id):
     Architecture : le scheduler tourne dans un service systemd séparé. Ce worker
     Gunicorn ne peut pas appeler reschedule_job() directement. Il :
       1. Met à jour le pickle du DjangoJob en DB (rend le GET immédiatement cohérent).
-      2. Dépose un fichier de commande JSON dans /tmp.
-    Le service scheduler lit ce fichier dans les 30 secondes et applique le changement.
+      2. Dépose une commande (table scheduler_command) et réveille le service.
+    La réponse contient la commande ; ?wait=<secondes> (5 max) attend son
+    application, sinon l'admin la suit sur admin/scheduler/commands/<id>/.
     """
     import pickle
     from django_apscheduler.models import DjangoJob
-    from parametre.scheduler import write_scheduler_command, rebuild_cron_trigger
+    from parametre.scheduler import send_scheduler_command, rebuild_cron_trigger
 
     if not _can_access_scheduler_admin(request.user):
         return Response({'error': 'Accès refusé.'}, status=status.HTTP_403_FORBIDDEN)
@@ -267,10 +274,10 @@ def admin_scheduler_job_update(request, job_id):
         except Exception as e:
             logger.warning("[SCHEDULER] Mise à jour pickle DB échouée pour %s: %s", job_id, e)
 
-    # 2. Signaler au service scheduler de reschedule_job dans les 30 s.
+    # 2. Signaler au service scheduler de reschedule_job.
     try:
-        write_scheduler_command('reschedule', job_id, hour=hour, minute=minute)
-        logger.info("[SCHEDULER] Commande reschedule envoyée: %s → %02dh%02d", job_id, hour, minute)
+        command = send_scheduler_command('reschedule', job_id, user=request.user, hour=hour, minute=minute)
+        logger.info("[SCHEDULER] Commande reschedule #%s envoyée: %s → %02dh%02d", command.id, job_id, hour, minute)
     except Exception as e:
         logger.error("[SCHEDULER] Impossible d'envoyer la commande reschedule: %s", e)
         return Response(
@@ -278,8 +285,9 @@ def admin_scheduler_job_update(request, job_id):
             status=status.HTTP_500_INTERNAL_SERVER_ERROR,
         )
 
+    command = _wait_for_command(request, command)
     job.refresh_from_db()
-    return Response(_serialize_job(job))
+    return Response({**_serialize_job(job), 'command': SchedulerCommandChannel.serialize(command)})
 
 
 @api_view(['POST'])
@@ -287,10 +295,12 @@ def admin_scheduler_job_update(request, job_id):
 def admin_scheduler_job_trigger(request, job_id):
     """
     Déclenche manuellement un job.
-    Dépose une commande 'trigger' lue par le service scheduler dans les 30 s.
+    Dépose une tâche de fond exécutée par le worker (run_worker) et répond 202 :
+    l'avancement se suit sur /api/parametre/jobs/<uuid>/. 503 si aucun worker n'est actif.
     """
     from django_apscheduler.models import DjangoJob
-    from parametre.scheduler import write_scheduler_command
+    from parametre.services.background_jobs import BackgroundJobService
+    from .background_jobs import job_accepted
 
     if not _can_access_scheduler_admin(request.user):
         return Response({'error': 'Accès refusé.'}, status=status.HTTP_403_FORBIDDEN)
@@ -298,17 +308,67 @@ def admin_scheduler_job_trigger(request, job_id):
     if not DjangoJob.objects.filter(id=job_id).exists():
         return Response({'error': 'Job introuvable.'}, status=status.HTTP_404_NOT_FOUND)
 
-    try:
-        write_scheduler_command('trigger', job_id)
-        logger.info("[SCHEDULER] Commande trigger envoyée pour %s par %s", job_id, request.user.username)
-    except Exception as e:
-        logger.error("[SCHEDULER] Impossible d'envoyer la commande trigger: %s", e)
+    # Sans worker, la tâche resterait en attente puis partirait au redémarrage du service
+    if BackgroundJobService.worker_alive() is None:
+        logger.error("[SCHEDULER] Déclenchement de %s refusé : aucun worker de tâches de fond actif", job_id)
         return Response(
-            {'error': 'Impossible de contacter le service scheduler.'},
-            status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            {'error': "Aucun worker de tâches de fond actif (service kora-worker / python manage.py run_worker)."},
+            status=status.HTTP_503_SERVICE_UNAVAILABLE,
         )
 
-    return Response({'message': f'Job « {job_id} » sera déclenché dans moins de 30 secondes.'})
+    # Une seule tentative : un job de rappels relancé renverrait les e-mails déjà partis
+    job = BackgroundJobService.enqueue('run_scheduler_job', {'job_id': job_id}, user=request.user, max_attempts=1)
+    logger.info("[SCHEDULER] Déclenchement de %s par %s (tâche %s)", job_id, request.user.username, job.uuid)
+    return job_accepted(job, message=f'Job « {job_id} » déclenché.')
+
+
+# Attente maximale (secondes) de l'application d'une commande par le service
+MAX_COMMAND_WAIT = 5
+
+
+def _wait_for_command(request, command):
+    """?wait=<secondes> : relit la commande jusqu'à son application (MAX_COMMAND_WAIT au plus)"""
+    try:
+        wait = min(float(request.query_params.get('wait', 0)), MAX_COMMAND_WAIT)
+    except (TypeError, ValueError):
+        wait = 0
+    if wait <= 0:
+        return command
+    # La commande n'est visible du service qu'après le commit (ATOMIC_REQUESTS)
+    if transaction.get_connection().in_atomic_block:
+        return command
+    return SchedulerCommandChannel.wait_for(command.id, wait) or command
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def admin_scheduler_commands(request):
+    """50 dernières commandes envoyées au service scheduler (statut, acquittement, résultat)."""
+    if not _can_access_scheduler_admin(request.user):
+        return Response({'error': 'Accès refusé.'}, status=status.HTTP_403_FORBIDDEN)
+
+    from parametre.models import SchedulerCommand
+
+    commands = SchedulerCommand.objects.order_by('-id')[:50]
+    return Response([SchedulerCommandChannel.serialize(c) for c in commands])
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def admin_scheduler_command_detail(request, command_id):
+    """
+    Statut et résultat d'une commande.
+    ?wait=<secondes> (5 max) : répond dès que la commande est appliquée ou en échec.
+    """
+    if not _can_access_scheduler_admin(request.user):
+        return Response({'error': 'Accès refusé.'}, status=status.HTTP_403_FORBIDDEN)
+
+    from parametre.models import SchedulerCommand
+
+    command = SchedulerCommand.objects.filter(pk=command_id).first()
+    if command is None:
+        return Response({'error': 'Commande introuvable.'}, status=status.HTTP_404_NOT_FOUND)
+    return Response(SchedulerCommandChannel.serialize(_wait_for_command(request, command)))
 
 
 @api_view(['GET'])
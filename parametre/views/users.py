@@ -23,7 +23,7 @@ import hashlib
 import logging
 from datetime import timedelta
 from django.http import StreamingHttpResponse
-from django.db.models import Max, Subquery, OuterRef
+from django.db.models import Max
 
 from ..media_paths import validate_uploaded_file
 from ..models import (
@@ -734,16 +734,8 @@ def users_list(request):
         search = request.GET.get('search', '')
         is_active = request.GET.get('is_active')
         
-        _last_login_qs = ActivityLog.objects.filter(user=OuterRef('pk'), action='login').order_by('-created_at')
-        _last_logout_qs = ActivityLog.objects.filter(user=OuterRef('pk'), action='logout').order_by('-created_at')
-
-        queryset = User.objects.annotate(
-            last_login_activity=Subquery(_last_login_qs.values('created_at')[:1]),
-            last_login_device=Subquery(_last_login_qs.values('device_type')[:1]),
-            last_login_browser=Subquery(_last_login_qs.values('browser')[:1]),
-            last_login_os=Subquery(_last_login_qs.values('os_name')[:1]),
-            last_logout=Subquery(_last_logout_qs.values('created_at')[:1]),
-        ).order_by('-date_joined')
+        # Compteurs pré-agrégés (UserActivityStats) : une jointure, sans parcourir ActivityLog
+        queryset = User.objects.select_related('activity_stats').order_by('-date_joined')
 
         if search:
             queryset = queryset.filter(
@@ -757,17 +749,17 @@ def users_list(request):
             queryset = queryset.filter(is_active=is_active.lower() == 'true')
 
         serializer = UserSerializer(queryset, many=True)
-        data = [
-            {
+        data = []
+        for d, u in zip(serializer.data, queryset):
+            stats = getattr(u, 'activity_stats', None)
+            data.append({
                 **dict(d),
-                'last_login':         u.last_login_activity.isoformat() if u.last_login_activity else None,
-                'last_login_device':  u.last_login_device,
-                'last_login_browser': u.last_login_browser,
-                'last_login_os':      u.last_login_os,
-                'last_logout':        u.last_logout.isoformat()          if u.last_logout          else None,
-            }
-            for d, u in zip(serializer.data, queryset)
-        ]
+                'last_login':         stats.last_login_at.isoformat()  if stats and stats.last_login_at  else None,
+                'last_login_device':  stats.last_login_device          if stats                         else None,
+                'last_login_browser': stats.last_login_browser         if stats                         else None,
+                'last_login_os':      stats.last_login_os              if stats                         else None,
+                'last_logout':        stats.last_logout_at.isoformat() if stats and stats.last_logout_at else None,
+            })
         return Response({
             'success': True,
             'data': data,
@@ -795,7 +787,7 @@ def admin_user_detail(request, user_id):
     from django.contrib.auth.models import User
     from parametre.models import (
         ActivityLog, FailedLoginAttempt, LoginBlock,
-        UserProcessus, UserProcessusRole, ReminderEmailLog,
+        UserProcessus, UserProcessusRole, ReminderEmailLog, UserActivityStats,
     )
 
     try:
@@ -819,33 +811,24 @@ def admin_user_detail(request, user_id):
         'last_login':   user.last_login,
     }
 
-    # ── Dernière session (depuis ActivityLog) ─────────────────────────────────
-    last_login_log = (
-        ActivityLog.objects
-        .filter(user=user, action='login')
-        .order_by('-created_at')
-        .values('ip_address', 'device_type', 'browser', 'os_name', 'created_at')
-        .first()
-    )
-
-    # ── Statistiques ──────────────────────────────────────────────────────────
-    total_logins  = ActivityLog.objects.filter(user=user, action='login').count()
-    total_actions = ActivityLog.objects.filter(user=user).count()
-    last_activity = (
-        ActivityLog.objects.filter(user=user)
-        .order_by('-created_at')
-        .values_list('created_at', flat=True)
-        .first()
-    )
-    failed_logins_count = FailedLoginAttempt.objects.filter(
-        Q(user=user) | Q(email_attempted=user.email)
-    ).count()
+    # ── Dernière session et statistiques (compteurs pré-agrégés) ──────────────
+    activity_stats = UserActivityStats.objects.filter(user=user).first() or UserActivityStats(user=user)
+    last_login_log = None
+    if activity_stats.last_login_at:
+        last_login_log = {
+            'ip_address':  activity_stats.last_login_ip,
+            'device_type': activity_stats.last_login_device,
+            'browser':     activity_stats.last_login_browser,
+            'os_name':     activity_stats.last_login_os,
+            'created_at':  activity_stats.last_login_at,
+        }
 
     stats = {
-        'total_logins':       total_logins,
-        'total_actions':      total_actions,
-        'failed_logins_count': failed_logins_count,
-        'last_activity_at':   last_activity,
+        'total_logins':        activity_stats.total_logins,
+        'total_actions':       activity_stats.total_actions,
+        'failed_logins_count': activity_stats.failed_logins_count,
+        'last_activity_at':    activity_stats.last_activity_at,
+        **activity_stats.recent_counts(),
     }
 
     # ── Sécurité ─────────────────────────────────────────────────────────────
@@ -22,6 +22,7 @@ import time
 import hashlib
 import logging
 from datetime import timedelta
+from functools import lru_cache
 from django.http import StreamingHttpResponse
 from django.db.models import Max, Subquery, OuterRef
 
@@ -96,8 +97,12 @@ def get_client_ip(request):
     return request.META.get('REMOTE_ADDR')
 
 
+@lru_cache(maxsize=1024)
 def _parse_user_agent(ua_string):
-    """Parse un user-agent string et retourne (device_type, browser, os_name)."""
+    """Parse un user-agent string et retourne (device_type, browser, os_name).
+
+    Mémorisé (LRU) : quelques user-agents représentent l'essentiel du trafic.
+    """
     if not ua_string:
         return None, None, None
     try:
@@ -119,10 +124,16 @@ def _parse_user_agent(ua_string):
 def log_activity(user, action, entity_type, entity_id=None, entity_name=None, description=None, ip_address=None, user_agent=None):
     """
     Enregistre une activité utilisateur
+
+    L'entrée est mise en file et écrite par lot en arrière-plan
+    (parametre.services.activity_log_writer) ; l'instance retournée n'est pas encore
+    en base quand le mode asynchrone est actif.
     """
+    from ..services.activity_log_writer import activity_log_writer
+
     try:
         device_type, browser, os_name = _parse_user_agent(user_agent)
-        activity_log = ActivityLog.objects.create(
+        activity_log = ActivityLog(
             user=user,
             action=action,
             entity_type=entity_type,
@@ -134,7 +145,9 @@ def log_activity(user, action, entity_type, entity_id=None, entity_name=None, de
             device_type=device_type,
             browser=browser,
             os_name=os_name,
+            created_at=timezone.now(),
         )
+        activity_log_writer.record(activity_log)
         logger.info("Activité enregistrée: %s", activity_log)
         return activity_log
     except Exception as e:
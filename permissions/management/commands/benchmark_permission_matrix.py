@@ -0,0 +1,190 @@
+"""
+Benchmark du calcul des permissions : nombre de requêtes SQL avant/après la matrice compilée
+
+Crée des données synthétiques dans une transaction annulée à la fin :
+rien n'est conservé en base.
+
+Usage :
+    python manage.py benchmark_permission_matrix
+    python manage.py benchmark_permission_matrix --sizes 1 5 20 --actions 30 --roles 3
+"""
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from parametre.models import Processus, Role, UserProcessus, UserProcessusRole
+from permissions.models import PermissionAction, RolePermissionMapping
+from permissions.services.permission_matrix import PermissionMatrix
+from permissions.services.permission_service import PermissionService
+
+BENCH_APP = 'bench_matrix'
+
+
+class Command(BaseCommand):
+    help = 'Compare le nombre de requêtes du calcul des permissions (ancien calcul vs matrice compilée)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            type=int,
+            nargs='+',
+            default=[1, 5, 20],
+            help='Nombres de processus (avec rôle) à tester par utilisateur'
+        )
+        parser.add_argument(
+            '--actions',
+            type=int,
+            default=30,
+            help="Nombre d'actions de l'application synthétique"
+        )
+        parser.add_argument(
+            '--roles',
+            type=int,
+            default=3,
+            help='Nombre de rôles attribués par processus'
+        )
+
+    def handle(self, *args, **options):
+        sizes = options['sizes']
+        nb_actions = options['actions']
+        nb_roles = options['roles']
+
+        self.stdout.write(self.style.SUCCESS(f'\n{"=" * 80}'))
+        self.stdout.write(self.style.SUCCESS('BENCHMARK MATRICE DE PERMISSIONS'))
+        self.stdout.write(self.style.SUCCESS(f'{"=" * 80}\n'))
+        self.stdout.write(f'Actions: {nb_actions} — rôles par processus: {nb_roles}\n')
+        self.stdout.write(
+            f'{"Processus":>10} | {"Avant (req.)":>12} | {"Après (req.)":>12} | '
+            f'{"Après, matrice en cache":>23} | {"Avant (ms)":>10} | {"Après (ms)":>10}'
+        )
+        self.stdout.write('-' * 92)
+
+        with transaction.atomic():
+            roles, users = self._seed(max(sizes), nb_actions, nb_roles, sizes)
+
+            for size in sizes:
+                user = users[size]
+
+                with CaptureQueriesContext(connection) as legacy_ctx:
+                    start = time.perf_counter()
+                    legacy = self._legacy_permissions(user, BENCH_APP)
+                    legacy_ms = (time.perf_counter() - start) * 1000
+
+                self._clear_cache(user)
+                with CaptureQueriesContext(connection) as cold_ctx:
+                    start = time.perf_counter()
+                    compiled = PermissionService.get_user_permissions(user, BENCH_APP)
+                    compiled_ms = (time.perf_counter() - start) * 1000
+
+                PermissionService.invalidate_user_cache(user.id)
+                with CaptureQueriesContext(connection) as warm_ctx:
+                    PermissionService.get_user_permissions(user, BENCH_APP)
+
+                if compiled != legacy:
+                    self.stdout.write(self.style.ERROR(
+                        f'❌ Résultats différents pour {size} processus'
+                    ))
+
+                self.stdout.write(
+                    f'{size:>10} | {len(legacy_ctx.captured_queries):>12} | '
+                    f'{len(cold_ctx.captured_queries):>12} | {len(warm_ctx.captured_queries):>23} | '
+                    f'{legacy_ms:>10.1f} | {compiled_ms:>10.1f}'
+                )
+                self._clear_cache(user)
+
+            transaction.set_rollback(True)
+
+        PermissionMatrix.invalidate(BENCH_APP)
+        self.stdout.write(self.style.SUCCESS('\n✓ Données synthétiques annulées\n'))
+
+    def _clear_cache(self, user):
+        PermissionService.invalidate_user_cache(user.id)
+        PermissionMatrix.invalidate(BENCH_APP)
+
+    def _seed(self, max_size, nb_actions, nb_roles, sizes):
+        """Crée rôles, actions, mappings, processus et un utilisateur par taille testée"""
+        owner = User.objects.create(username='bench_matrix_owner')
+        roles = [
+            Role.objects.create(code=f'bench_matrix_role_{i}', nom=f'Bench rôle {i}')
+            for i in range(nb_roles)
+        ]
+        actions = [
+            PermissionAction.objects.create(app_name=BENCH_APP, code=f'action_{i}', nom=f'Action {i}')
+            for i in range(nb_actions)
+        ]
+        RolePermissionMapping.objects.bulk_create([
+            RolePermissionMapping(
+                role=role,
+                permission_action=action,
+                granted=(r + a) % 3 != 0,
+                priority=(r * 7 + a) % 5,
+            )
+            for r, role in enumerate(roles)
+            for a, action in enumerate(actions)
+            if (r + a) % 4 != 0
+        ])
+        processus_list = [
+            Processus.objects.create(nom=f'bench_matrix_processus_{i}', cree_par=owner)
+            for i in range(max_size)
+        ]
+
+        users = {}
+        for size in sizes:
+            user = User.objects.create(username=f'bench_matrix_user_{size}')
+            for processus in processus_list[:size]:
+                UserProcessus.objects.create(user=user, processus=processus)
+                for role in roles:
+                    UserProcessusRole.objects.create(user=user, processus=processus, role=role)
+            users[size] = user
+        return roles, users
+
+    def _legacy_permissions(self, user, app_name):
+        """
+        Reproduction du calcul historique : une requête par (processus × action × rôle),
+        plus le count() évalué pour le log à chaque itération.
+        """
+        specific_roles = list(
+            UserProcessusRole.objects.filter(
+                user=user, is_active=True, is_global=False
+            ).select_related('role', 'processus')
+        )
+        list(UserProcessusRole.objects.filter(user=user, is_active=True, is_global=True).select_related('role'))
+        actions = PermissionAction.objects.filter(
+            app_name=app_name, is_active=True
+        ).prefetch_related('role_mappings')
+
+        roles_by_processus = {}
+        for user_role in specific_roles:
+            roles_by_processus.setdefault(str(user_role.processus.uuid), []).append(user_role.role)
+
+        result = {}
+        for processus_uuid_str, roles in roles_by_processus.items():
+            result[processus_uuid_str] = {}
+            for action in actions:
+                max_priority_granted = -1
+                max_priority_denied = -1
+                granted_mapping = None
+                denied_mapping = None
+                for role in roles:
+                    mappings = RolePermissionMapping.objects.filter(
+                        role=role, permission_action=action, is_active=True
+                    ).order_by('-priority')
+                    mappings.count()
+                    for mapping in mappings:
+                        if mapping.granted:
+                            if mapping.priority > max_priority_granted:
+                                max_priority_granted = mapping.priority
+                                granted_mapping = mapping
+                        elif mapping.priority > max_priority_denied:
+                            max_priority_denied = mapping.priority
+                            denied_mapping = mapping
+                chosen = granted_mapping or denied_mapping
+                result[processus_uuid_str][action.code] = {
+                    'granted': bool(granted_mapping),
+                    'conditions': (chosen.conditions if chosen else None) or {},
+                    'source': 'role_mapping'
+                }
+        return result
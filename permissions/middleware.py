@@ -7,8 +7,10 @@ from django.dispatch import receiver
 import logging
 
 from permissions.services.permission_service import PermissionService
-from parametre.models import UserProcessusRole
-from permissions.models import RolePermissionMapping, PermissionOverride     
+from permissions.services.permission_matrix import PermissionMatrix
+from shared.permissions.principal import invalidate_principal
+from parametre.models import Role, UserProcessusRole
+from permissions.models import PermissionAction, RolePermissionMapping, PermissionOverride
 
 logger = logging.getLogger(__name__)
 
@@ -46,6 +48,8 @@ def invalidate_cache_on_user_processus_role_change(sender, instance, **kwargs):
         if user_id:
             # Invalider le cache pour toutes les apps pour cet utilisateur
             PermissionService.invalidate_user_cache(user_id, app_name=None)
+            # Les rôles mémorisés pour la requête en cours ne sont plus à jour
+            invalidate_principal(user_id)
             logger.info(
                 "[PermissionCache] Cache invalid\u00e9 pour user_id=%s (UserProcessusRole modifi\u00e9/supprim\u00e9)", user_id           )
     except Exception as e:
@@ -75,44 +79,15 @@ def invalidate_cache_on_role_mapping_change(sender, instance, **kwargs):
             "[PermissionCache] Signal déclenché pour RolePermissionMapping: role=%s, action=%s, granted=%s, app_name=%s",
             role.code, action_code, granted_value, app_name
         )
+
+        # La matrice compilée de l'app ne reflète plus les mappings : la recompiler au prochain accès
+        PermissionMatrix.invalidate(app_name)
         
-        # RÃ©cupÃ©rer tous les utilisateurs ayant ce rÃ´le avec leurs processus
-        user_processus_roles = UserProcessusRole.objects.filter(
-            role=role,
-            is_active=True
-        ).select_related('processus').values('user_id', 'processus__uuid').distinct()
-        
-        user_ids = list(set([upr['user_id'] for upr in user_processus_roles]))
-        processus_uuids = list(set([str(upr['processus__uuid']) for upr in user_processus_roles if upr['processus__uuid']]))
-        
+        # Tous les utilisateurs ayant ce rôle : une seule incrémentation de l'époque du rôle
+        PermissionService.invalidate_role_cache(role.pk)
         logger.info(
-            "[PermissionCache] %s utilisateurs trouv\u00e9s avec le r\u00f4le %s, %s processus distincts", len(user_ids), role.code, len(processus_uuids)
+            "[PermissionCache] Cache invalidé pour le rôle=%s (RolePermissionMapping modifié, app=%s)", role.code, app_name
         )
-        
-        # RÃ©cupÃ©rer le code de l'action
-        action_code = instance.permission_action.code if hasattr(instance, 'permission_action') and instance.permission_action else None
-        
-        # Invalider le cache pour tous ces utilisateurs
-        print(f"[PermissionCache]  Invalidation du cache pour {len(user_ids)} utilisateurs")
-        for user_id in user_ids:
-            if app_name and action_code and processus_uuids:
-                # Invalider pour chaque processus et action spÃ©cifique
-                print(f"[PermissionCache] Invalidation ciblÃ©e pour user_id={user_id}, app={app_name}, action={action_code}, processus={len(processus_uuids)} processus")
-                for processus_uuid in processus_uuids:
-                    PermissionService.invalidate_user_cache(
-                        user_id, 
-                        app_name=app_name, 
-                        processus_uuid=processus_uuid, 
-                        action=action_code
-                    )
-                    print(f"[PermissionCache] Cache invalidÃ© pour user_id={user_id}, processus={processus_uuid}, action={action_code}")
-            else:
-                # Invalidation gÃ©nÃ©rale si on n'a pas les dÃ©tails
-                print(f"[PermissionCache]  Invalidation gÃ©nÃ©rale pour user_id={user_id}, app={app_name}")
-                PermissionService.invalidate_user_cache(user_id, app_name=app_name)
-        
-        logger.info(
-            "[PermissionCache]  Cache invalid\u00e9 pour %s utilisateurs (RolePermissionMapping modifi\u00e9 pour r\u00f4le=%s, app=%s)", len(user_ids), role.code, app_name       )
     except Exception as e:
         logger.error(
             "[PermissionCache] Erreur lors de l'invalidation du cache pour RolePermissionMapping: %s", str(e)
@@ -137,3 +112,36 @@ def invalidate_cache_on_override_change(sender, instance, **kwargs):
         logger.error(
             "[PermissionCache] Erreur lors de l'invalidation du cache pour PermissionOverride: %s", str(e)
         )
+
+
+@receiver(post_save, sender=PermissionAction)
+@receiver(post_delete, sender=PermissionAction)
+def invalidate_matrix_on_permission_action_change(sender, instance, **kwargs):
+    """
+    Invalide la matrice compilée quand une PermissionAction est créée, modifiée ou supprimée
+    """
+    try:
+        PermissionMatrix.invalidate(instance.app_name)
+        # Les permissions en cache de tous les utilisateurs peuvent référencer cette action
+        PermissionService.invalidate_all_cache()
+        logger.info(
+            "[PermissionCache] Matrice invalidée pour app_name=%s (PermissionAction modifiée/supprimée)", instance.app_name
+        )
+    except Exception as e:
+        logger.error(
+            "[PermissionCache] Erreur lors de l'invalidation de la matrice pour PermissionAction: %s", str(e)
+        )
+
+
+@receiver(post_save, sender=Role)
+@receiver(post_delete, sender=Role)
+def invalidate_cache_on_role_change(sender, instance, **kwargs):
+    """
+    Invalide le cache des permissions des détenteurs d'un rôle modifié (ex: désactivé) ou supprimé
+    """
+    try:
+        PermissionService.invalidate_role_cache(instance.pk)
+    except Exception as e:
+        logger.error(
+            "[PermissionCache] Erreur lors de l'invalidation du cache pour Role: %s", str(e)
+        )
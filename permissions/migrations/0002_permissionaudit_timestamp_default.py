@@ -0,0 +1,19 @@
+# Generated by Django 5.2.6 on 2026-10-16 19:58
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('permissions', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='permissionaudit',
+            name='timestamp',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now, help_text='Quand la vérification a eu lieu'),
+        ),
+    ]
@@ -393,7 +393,7 @@ class PermissionAudit(models.Model):
         help_text="User agent du navigateur"
     )
     timestamp = models.DateTimeField(
-        auto_now_add=True,
+        default=timezone.now,
         db_index=True,
         help_text="Quand la vérification a eu lieu"
     )
@@ -47,12 +47,8 @@ class DashboardMediaUpdatePermission(BasePermission):
         if is_supervisor_smi(request.user):
             return True
         try:
-            from parametre.models import UserProcessusRole
-            processus_uuids = list(
-                UserProcessusRole.objects.filter(
-                    user=request.user, is_active=True, processus__isnull=False
-                ).values_list('processus__uuid', flat=True).distinct()
-            )
+            from shared.permissions.principal import get_principal
+            processus_uuids = get_principal(request.user).processus_uuids
             for proc_uuid in processus_uuids:
                 proc_uuid_str = str(proc_uuid)
                 can, _ = PermissionService.can_perform_action(
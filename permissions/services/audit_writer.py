@@ -0,0 +1,200 @@
+"""
+Écriture asynchrone et groupée des PermissionAudit
+
+Chaque vérification de permission produisait un INSERT synchrone (plus un
+Processus.objects.get) dans la requête HTTP. Les événements sont désormais mis
+en file en mémoire (une file par worker) puis écrits par bulk_create, dès que
+la file atteint PERMISSION_AUDIT_BATCH_SIZE ou toutes les
+PERMISSION_AUDIT_FLUSH_INTERVAL secondes.
+
+Security by Design :
+- Les refus sont TOUJOURS enregistrés : jamais échantillonnés, et si la file
+  est pleine ils déclenchent un vidage synchrone au lieu d'être perdus.
+- Seuls les accès accordés peuvent être échantillonnés (hits de cache,
+  PERMISSION_AUDIT_CACHE_HIT_SAMPLE_RATE) ou abandonnés quand la file est pleine ;
+  les abandons sont comptés.
+"""
+import atexit
+import logging
+import os
+import random
+import threading
+import uuid
+from collections import deque
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+class PermissionAuditWriter:
+    """
+    File bornée d'événements d'audit, vidée par un thread de fond
+
+    Usage :
+        audit_writer.record(user_id=..., app_name=..., action=..., processus_id=..., granted=...)
+        audit_writer.flush()  # vidage synchrone (tests, arrêt du process)
+    """
+
+    def __init__(self):
+        self._queue = deque()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._pid = None
+        self.dropped = 0
+        self.sampled_out = 0
+        self.written = 0
+
+    # ── Configuration ──────────────────────────────────────────────────────────
+
+    @property
+    def enabled(self):
+        return getattr(settings, 'PERMISSION_AUDIT_ENABLED', True)
+
+    @property
+    def async_enabled(self):
+        return getattr(settings, 'PERMISSION_AUDIT_ASYNC', True)
+
+    @property
+    def batch_size(self):
+        return getattr(settings, 'PERMISSION_AUDIT_BATCH_SIZE', 100)
+
+    @property
+    def flush_interval(self):
+        return getattr(settings, 'PERMISSION_AUDIT_FLUSH_INTERVAL', 5.0)
+
+    @property
+    def max_queue_size(self):
+        return getattr(settings, 'PERMISSION_AUDIT_MAX_QUEUE_SIZE', 10000)
+
+    @property
+    def cache_hit_sample_rate(self):
+        return getattr(settings, 'PERMISSION_AUDIT_CACHE_HIT_SAMPLE_RATE', 1.0)
+
+    # ── API ────────────────────────────────────────────────────────────────────
+
+    def record(self, *, user_id, app_name, action, processus_id, granted, reason=None,
+               resolution_method='db', execution_time_ms=None, cache_hit=False):
+        """
+        Met un événement d'audit en file (ou l'écrit directement si le mode asynchrone est désactivé)
+        """
+        if not self.enabled or not user_id or not processus_id:
+            # PermissionAudit.user et .processus sont obligatoires
+            return
+        try:
+            processus_id = uuid.UUID(str(processus_id))
+        except (ValueError, TypeError):
+            return
+
+        if granted and cache_hit and random.random() >= self.cache_hit_sample_rate:
+            self.sampled_out += 1
+            return
+
+        event = {
+            'user_id': user_id,
+            'app_name': app_name,
+            'action': action,
+            'processus_id': str(processus_id),
+            'granted': granted,
+            'reason': reason,
+            'resolution_method': resolution_method,
+            'execution_time_ms': execution_time_ms,
+            'cache_hit': cache_hit,
+            'timestamp': timezone.now(),
+        }
+
+        if not self.async_enabled:
+            self._write([event])
+            return
+
+        with self._lock:
+            queue_full = len(self._queue) >= self.max_queue_size
+            if not queue_full:
+                self._queue.append(event)
+                size = len(self._queue)
+
+        if queue_full:
+            if granted:
+                self.dropped += 1
+                if self.dropped % 1000 == 1:
+                    logger.warning(
+                        "[PermissionAuditWriter] File pleine (%s), %s événement(s) accordé(s) abandonné(s)", self.max_queue_size, self.dropped
+                    )
+                return
+            # Refus : vidage synchrone pour ne jamais le perdre
+            self.flush()
+            self._write([event])
+            return
+
+        self._ensure_thread()
+        if size >= self.batch_size:
+            self._wakeup.set()
+
+    def flush(self):
+        """
+        Écrit tous les événements en file (appel synchrone)
+        """
+        with self._flush_lock:
+            while True:
+                with self._lock:
+                    batch = [self._queue.popleft() for _ in range(min(self.batch_size, len(self._queue)))]
+                if not batch:
+                    return
+                self._write(batch)
+
+    def stats(self):
+        """Compteurs du worker courant"""
+        return {
+            'queued': len(self._queue),
+            'written': self.written,
+            'dropped': self.dropped,
+            'sampled_out': self.sampled_out,
+        }
+
+    # ── Interne ────────────────────────────────────────────────────────────────
+
+    def _write(self, events):
+        from permissions.models import PermissionAudit
+        from parametre.models import Processus
+
+        try:
+            # Un processus inexistant ferait échouer tout le lot (FK) : on le filtre en une requête
+            processus_ids = {event['processus_id'] for event in events}
+            existing = {
+                str(pk) for pk in Processus.objects.filter(uuid__in=processus_ids).values_list('uuid', flat=True)
+            }
+            audits = [
+                PermissionAudit(**event) for event in events if event['processus_id'] in existing
+            ]
+            PermissionAudit.objects.bulk_create(audits, batch_size=self.batch_size)
+            self.written += len(audits)
+        except Exception as e:
+            logger.error("[PermissionAuditWriter] Erreur lors de l'écriture de %s audit(s): %s", len(events), str(e))
+
+    def _ensure_thread(self):
+        # Après un fork (workers gunicorn), le thread du parent n'existe plus dans l'enfant
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='permission-audit-writer', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            finally:
+                close_old_connections()
+
+
+audit_writer = PermissionAuditWriter()
+atexit.register(audit_writer.flush)
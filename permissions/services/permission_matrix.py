@@ -0,0 +1,147 @@
+"""
+Matrice de permissions précompilée par application
+
+Charge en une fois toutes les PermissionAction actives d'une app et tous les
+RolePermissionMapping actifs associés, puis les indexe par (role_id, action_code).
+La résolution des permissions d'un ensemble de rôles se fait ensuite entièrement
+en mémoire : le nombre de requêtes ne dépend plus du nombre de rôles, d'actions
+ni de processus de l'utilisateur.
+"""
+from django.core.cache import cache
+import logging
+from typing import Dict, Iterable, List, Optional, Any
+
+from permissions.models import PermissionAction, RolePermissionMapping
+
+logger = logging.getLogger(__name__)
+
+
+class PermissionMatrix:
+    """
+    Index {(role_id, action_code): [mappings]} compilé pour une application
+
+    Usage :
+        matrix = PermissionMatrix.for_app('dashboard')
+        permissions = matrix.resolve(roles)  # {action_code: {granted, conditions, source}}
+    """
+
+    CACHE_TIMEOUT = 300  # 5 minutes — invalidation explicite via signal post_save
+    CACHE_PREFIX = 'perm:matrix'
+
+    def __init__(self, app_name: str, action_codes: List[str], entries: Dict[tuple, List[tuple]]):
+        self.app_name = app_name
+        self.action_codes = action_codes
+        # entries[(role_id, action_code)] = [(granted, priority, conditions), ...] trié par priorité décroissante
+        self.entries = entries
+        self._resolved = {}
+
+    def __getstate__(self):
+        # Le mémo de résolution est propre au processus : inutile de le stocker dans le cache
+        state = self.__dict__.copy()
+        state['_resolved'] = {}
+        return state
+
+    @classmethod
+    def _get_cache_key(cls, app_name: str) -> str:
+        return f"{cls.CACHE_PREFIX}:{app_name}"
+
+    @classmethod
+    def compile(cls, app_name: str) -> 'PermissionMatrix':
+        """
+        Construit la matrice depuis la DB en exactement 2 requêtes
+        """
+        action_codes = list(
+            PermissionAction.objects.filter(
+                app_name=app_name,
+                is_active=True
+            ).values_list('code', flat=True)
+        )
+
+        mappings = RolePermissionMapping.objects.filter(
+            permission_action__app_name=app_name,
+            permission_action__is_active=True,
+            is_active=True
+        ).values_list(
+            'role_id', 'permission_action__code', 'granted', 'priority', 'conditions'
+        ).order_by('-priority')
+
+        entries = {}
+        for role_id, action_code, granted, priority, conditions in mappings:
+            entries.setdefault((role_id, action_code), []).append((granted, priority, conditions))
+
+        logger.debug(
+            "[PermissionMatrix.compile] app=%s, %s action(s), %s couple(s) rôle/action", app_name, len(action_codes), len(entries)
+        )
+        return cls(app_name, action_codes, entries)
+
+    @classmethod
+    def for_app(cls, app_name: str) -> 'PermissionMatrix':
+        """
+        Retourne la matrice compilée de l'app (depuis le cache si disponible)
+        """
+        cache_key = cls._get_cache_key(app_name)
+        matrix = cache.get(cache_key)
+        if matrix is None:
+            matrix = cls.compile(app_name)
+            cache.set(cache_key, matrix, cls.CACHE_TIMEOUT)
+        return matrix
+
+    @classmethod
+    def invalidate(cls, app_name: Optional[str] = None):
+        """
+        Invalide la matrice compilée d'une app (ou de toutes les apps connues)
+        """
+        if app_name:
+            app_names = [app_name]
+        else:
+            app_names = PermissionAction.objects.values_list('app_name', flat=True).distinct()
+        cache.delete_many([cls._get_cache_key(name) for name in app_names])
+
+    def resolve(self, roles: Iterable[Any]) -> Dict[str, Dict[str, Any]]:
+        """
+        Résout les permissions d'un ensemble de rôles pour toutes les actions de l'app
+
+        Même règle que le calcul historique rôle par rôle :
+        - si au moins un rôle accorde l'action, on retient le mapping accordant de plus haute priorité
+        - sinon on retient le mapping refusant de plus haute priorité
+        - sans mapping, refus par défaut
+
+        Args:
+            roles: Rôles (instances Role) dans l'ordre de priorité de l'appelant
+
+        Returns:
+            dict: {action_code: {granted: bool, conditions: dict, source: 'role_mapping'}}
+        """
+        role_ids = tuple(role.pk for role in roles)
+        resolved = self._resolved.get(role_ids)
+        if resolved is None:
+            resolved = {
+                action_code: self._resolve_action(role_ids, action_code)
+                for action_code in self.action_codes
+            }
+            self._resolved[role_ids] = resolved
+        # Copie : l'appelant peut enrichir/écraser le résultat (overrides)
+        return {action_code: dict(permission) for action_code, permission in resolved.items()}
+
+    def _resolve_action(self, role_ids: tuple, action_code: str) -> Dict[str, Any]:
+        max_priority_granted = -1
+        max_priority_denied = -1
+        granted_mapping = None
+        denied_mapping = None
+
+        for role_id in role_ids:
+            for mapping in self.entries.get((role_id, action_code), ()):
+                granted, priority, _conditions = mapping
+                if granted:
+                    if priority > max_priority_granted:
+                        max_priority_granted = priority
+                        granted_mapping = mapping
+                elif priority > max_priority_denied:
+                    max_priority_denied = priority
+                    denied_mapping = mapping
+
+        if granted_mapping:
+            return {'granted': True, 'conditions': granted_mapping[2] or {}, 'source': 'role_mapping'}
+        if denied_mapping:
+            return {'granted': False, 'conditions': denied_mapping[2] or {}, 'source': 'role_mapping'}
+        return {'granted': False, 'conditions': {}, 'source': 'role_mapping'}
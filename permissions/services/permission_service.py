@@ -3,23 +3,25 @@ Service générique pour la gestion des permissions
 Supporte plusieurs applications : CDR, Dashboard, PAC, etc.
 """
 from django.core.cache import cache
-from django.db.models import Q, Prefetch
+from django.db.models import Prefetch
 from django.utils import timezone
 from django.contrib.auth.models import User
 import hashlib
 import json
 import logging
+import time
 from typing import Dict, Tuple, Optional, Any
 from datetime import datetime
 
 from permissions.models import (
     PermissionAction,
-    RolePermissionMapping,
     AppPermission,
     PermissionOverride,
-    PermissionAudit
 )
-from parametre.models import Role, Processus, UserProcessusRole
+from parametre.models import Role, Processus
+from permissions.services.permission_matrix import PermissionMatrix
+from permissions.services.audit_writer import audit_writer
+from shared.permissions.principal import get_principal
 
 logger = logging.getLogger(__name__)
 
@@ -27,29 +29,70 @@ logger = logging.getLogger(__name__)
 class PermissionService:
     """
     Service ultra-performant pour la gestion des permissions génériques
-    Utilise Redis pour le cache et optimise les requêtes DB
+    Utilise le cache partagé (époques global / rôle / utilisateur) et optimise les requêtes DB
     
     Méthodes génériques utilisables par toutes les apps :
     - can_perform_action() : Vérifie si un user peut effectuer une action
     - get_user_permissions() : Récupère toutes les permissions d'un user
-    - invalidate_user_cache() : Invalide le cache des permissions
+    - invalidate_user_cache() / invalidate_role_cache() / invalidate_all_cache() : Invalide le cache des permissions
     """
     
     CACHE_TIMEOUT = 60  # 60 secondes — invalidation explicite via signal post_save
     CACHE_PREFIX = 'perm'
+    EPOCH_PREFIX = 'perm:epoch'
+    
+    # ── Époques de cache ───────────────────────────────────────────────────────
+    # Chaque clé de permission embarque les époques globale, de l'utilisateur et de
+    # chacun de ses rôles. Invalider = incrémenter un compteur : les anciennes clés
+    # ne sont plus jamais lues et expirent seules (CACHE_TIMEOUT), quelles que
+    # soient l'app, l'action ou le nombre d'utilisateurs concernés.
+    
+    @classmethod
+    def _epoch_key(cls, scope, identifier=None):
+        if identifier is None:
+            return f"{cls.EPOCH_PREFIX}:{scope}"
+        return f"{cls.EPOCH_PREFIX}:{scope}:{identifier}"
+    
+    @staticmethod
+    def _new_epoch():
+        # Valeur initiale horodatée : une époque évincée du cache ne repart jamais
+        # d'une valeur déjà utilisée, les anciennes clés restent donc illisibles
+        return time.time_ns() // 1000
+    
+    @classmethod
+    def _bump_epoch(cls, epoch_key):
+        if cache.add(epoch_key, cls._new_epoch(), None):
+            return
+        try:
+            cache.incr(epoch_key)
+        except ValueError:
+            cache.set(epoch_key, cls._new_epoch(), None)
+    
+    @classmethod
+    def _get_epoch_token(cls, user) -> str:
+        """Empreinte des époques globale / utilisateur / rôles de l'utilisateur (un seul get_many)"""
+        epoch_keys = [cls._epoch_key('global'), cls._epoch_key('user', user.id)]
+        epoch_keys += [cls._epoch_key('role', role_id) for role_id in get_principal(user).role_ids]
+        epochs = cache.get_many(epoch_keys)
+        for epoch_key in epoch_keys:
+            if epoch_key not in epochs:
+                cache.add(epoch_key, cls._new_epoch(), None)
+                epochs[epoch_key] = cache.get(epoch_key, 0)
+        raw = ':'.join(str(epochs[epoch_key]) for epoch_key in epoch_keys)
+        return hashlib.md5(raw.encode()).hexdigest()[:12]
     
     @classmethod
-    def _get_cache_key(cls, user_id, app_name, processus_uuid, action_code):
+    def _get_cache_key(cls, user_id, app_name, processus_uuid, action_code, epoch=''):
         """Génère une clé de cache unique"""
-        key_data = f"{user_id}:{app_name}:{processus_uuid}:{action_code}"
+        key_data = f"{user_id}:{app_name}:{processus_uuid}:{action_code}:{epoch}"
         return f"{cls.CACHE_PREFIX}:{hashlib.md5(key_data.encode()).hexdigest()}"
     
     @classmethod
-    def _get_bulk_cache_key(cls, user_id, app_name, processus_uuid=None):
+    def _get_bulk_cache_key(cls, user_id, app_name, processus_uuid=None, epoch=''):
         """Clé pour le cache bulk des permissions d'un user pour une app"""
         if processus_uuid:
-            return f"{cls.CACHE_PREFIX}:{app_name}:bulk:{user_id}:{processus_uuid}"
-        return f"{cls.CACHE_PREFIX}:{app_name}:bulk:{user_id}"
+            return f"{cls.CACHE_PREFIX}:{app_name}:bulk:{user_id}:{epoch}:{processus_uuid}"
+        return f"{cls.CACHE_PREFIX}:{app_name}:bulk:{user_id}:{epoch}"
     
     @classmethod
     def _is_super_admin(cls, user: User) -> bool:
@@ -74,12 +117,7 @@ class PermissionService:
             return True
         
         try:
-            return UserProcessusRole.objects.filter(
-                Q(processus__nom__iexact='smi') | Q(processus__nom__iexact='prs-smi'),
-                user=user,
-                role__code__in=['admin', 'validateur'],
-                is_active=True
-            ).exists()
+            return get_principal(user).is_permission_super_admin
         except Exception as e:
             logger.error("[PermissionService._is_super_admin] Erreur: %s", str(e))
             return False
@@ -145,7 +183,7 @@ class PermissionService:
                 }
         
         # Vérifier le cache
-        cache_key = cls._get_bulk_cache_key(user.id, app_name, processus_uuid)
+        cache_key = cls._get_bulk_cache_key(user.id, app_name, processus_uuid, cls._get_epoch_token(user))
         cached_permissions = cache.get(cache_key)
         if cached_permissions is not None:
             logger.debug("[PermissionService] Cache HIT pour %s", cache_key)
@@ -154,27 +192,13 @@ class PermissionService:
         # Cache miss : calculer les permissions depuis la DB
         logger.debug("[PermissionService] Cache MISS pour %s", cache_key)
 
-        # 1a. Récupérer les rôles spécifiques (non-globaux) de l'utilisateur
-        specific_roles_query = UserProcessusRole.objects.filter(
-            user=user,
-            is_active=True,
-            is_global=False
-        ).select_related('role', 'processus')
+        # 1a. Rôles spécifiques (non-globaux) de l'utilisateur, depuis le Principal de la requête
+        principal = get_principal(user)
+        specific_roles = principal.get_specific_roles(processus_uuid or None)
 
-        if processus_uuid:
-            specific_roles_query = specific_roles_query.filter(processus__uuid=processus_uuid)
-
-        specific_roles = list(specific_roles_query)
-
-        # 1b. Récupérer les rôles globaux de l'utilisateur (is_global=True)
+        # 1b. Rôles globaux de l'utilisateur (is_global=True)
         #     Ces rôles s'appliquent à TOUS les processus (ex: superviseur_smi).
-        global_roles = list(
-            UserProcessusRole.objects.filter(
-                user=user,
-                is_active=True,
-                is_global=True
-            ).select_related('role')
-        )
+        global_roles = list(principal.global_roles)
 
         logger.info(
             "[PermissionService.get_user_permissions] User %s (%s), app=%s, processus_uuid=%s, %s rôle(s) spécifique(s), %s rôle(s) global/globaux", user.username, user.id, app_name, processus_uuid, len(specific_roles), len(global_roles)
@@ -198,11 +222,8 @@ class PermissionService:
             )
             return result
 
-        # 2. Récupérer les PermissionAction pour cette app
-        actions = PermissionAction.objects.filter(
-            app_name=app_name,
-            is_active=True
-        ).prefetch_related('role_mappings')
+        # 2. Matrice compilée (rôle, action) → mappings pour cette app
+        matrix = PermissionMatrix.for_app(app_name)
 
         # 3. Récupérer les PermissionOverride pour cet utilisateur
         override_query = PermissionOverride.objects.filter(
@@ -256,109 +277,33 @@ class PermissionService:
                             roles_by_processus[p_str].append(role_obj)
         
         # Pour chaque processus, calculer les permissions
+        # Logique : Si au moins un rôle accorde la permission, elle est accordée
+        # En cas de conflit, on prend le mapping avec la plus haute priorité parmi ceux qui accordent
+        # Si aucun rôle n'accorde, on prend le mapping avec la plus haute priorité (même s'il refuse)
+        now = timezone.now()
         for processus_uuid_str, roles in roles_by_processus.items():
-            result[processus_uuid_str] = {}
-            
-            for action in actions:
-                action_code = action.code
-                override_key = (processus_uuid_str, action_code)
-                
-                # Vérifier si un override existe
-                if override_key in overrides:
-                    override = overrides[override_key]
-                    # Vérifier la validité temporelle
-                    now = timezone.now()
-                    if override.date_debut and override.date_debut > now:
-                        continue
-                    if override.date_fin and override.date_fin < now:
-                        continue
-                    
-                    result[processus_uuid_str][action_code] = {
-                        'granted': override.granted,
-                        'conditions': override.conditions or {},
-                        'source': 'override'
-                    }
+            result[processus_uuid_str] = matrix.resolve(roles)
+
+            for action_code in matrix.action_codes:
+                override = overrides.get((processus_uuid_str, action_code))
+                if override is None:
                     continue
-                
-                # Sinon, calculer depuis les rôles
-                # Logique : Si au moins un rôle accorde la permission, elle est accordée
-                # En cas de conflit, on prend le mapping avec la plus haute priorité parmi ceux qui accordent
-                # Si aucun rôle n'accorde, on prend le mapping avec la plus haute priorité (même s'il refuse)
-                granted = False
-                conditions = {}
-                max_priority_granted = -1
-                max_priority_denied = -1
-                granted_mapping = None
-                denied_mapping = None
-                
-                for role in roles:
-                    # Récupérer les mappings pour ce rôle et cette action
-                    mappings = RolePermissionMapping.objects.filter(
-                        role=role,
-                        permission_action=action,
-                        is_active=True
-                    ).order_by('-priority')
-                    
-                    logger.info(
-                        "[PermissionService] Rôle %s pour action %s: %s mappings trouvés", role.code, action_code, mappings.count()
-                    )
-                    
-                    # Log spécifique pour update_cible
-                    if action_code == 'update_cible':
-                        mappings_list = [(m.id, m.granted, m.priority, m.is_active) for m in mappings]
-                        logger.info(
-                            "[PermissionService] 🔍 DEBUG update_cible - Rôle %s: %s mappings, détails: %s", role.code, mappings.count(), mappings_list
-                        )
-                    
-                    for mapping in mappings:
-                        logger.info(
-                            "[PermissionService] Mapping trouvé: role=%s, action=%s, granted=%s, priority=%s, is_active=%s", role.code, action_code, mapping.granted, mapping.priority, mapping.is_active
-                        )
-                        if mapping.granted:
-                            # Permission accordée : prendre celle avec la plus haute priorité
-                            if mapping.priority > max_priority_granted:
-                                max_priority_granted = mapping.priority
-                                granted_mapping = mapping
-                        else:
-                            # Permission refusée : garder trace de la plus haute priorité
-                            if mapping.priority > max_priority_denied:
-                                max_priority_denied = mapping.priority
-                                denied_mapping = mapping
-                
-                # Si au moins un rôle accorde la permission, elle est accordée
-                # Sinon, on prend le mapping avec la plus haute priorité (même s'il refuse)
-                if granted_mapping:
-                    granted = True
-                    conditions = granted_mapping.conditions or {}
-                    logger.info(
-                        "[PermissionService] ✅ Permission %s ACCORDÉE (rôle: %s, priorité: %s)", action_code, granted_mapping.role.code, granted_mapping.priority
-                    )
-                elif denied_mapping:
-                    granted = False
-                    conditions = denied_mapping.conditions or {}
-                    logger.info(
-                        "[PermissionService] ❌ Permission %s REFUSÉE (rôle: %s, priorité: %s)", action_code, denied_mapping.role.code, denied_mapping.priority
-                    )
-                else:
-                    logger.info(
-                        "[PermissionService] ⚠️ Permission %s NON TROUVÉE (refus par défaut) - Aucun mapping trouvé pour les rôles: %s", action_code, [r.code for r in roles]
-                    )
-                
+
+                # Vérifier la validité temporelle : un override hors période masque l'action
+                if (override.date_debut and override.date_debut > now) or (override.date_fin and override.date_fin < now):
+                    del result[processus_uuid_str][action_code]
+                    continue
+
                 result[processus_uuid_str][action_code] = {
-                    'granted': granted,
-                    'conditions': conditions,
-                    'source': 'role_mapping'
+                    'granted': override.granted,
+                    'conditions': override.conditions or {},
+                    'source': 'override'
                 }
-                
-                # Log spécifique pour update_cible pour déboguer
-                if action_code == 'update_cible':
-                    logger.info(
-                        "[PermissionService] 🔍 DEBUG update_cible pour user=%s, processus=%s: granted=%s, granted_mapping=%s (priority=%s), denied_mapping=%s (priority=%s)", user.username, processus_uuid_str, granted, granted_mapping.role.code if granted_mapping else None, granted_mapping.priority if granted_mapping else None, denied_mapping.role.code if denied_mapping else None, denied_mapping.priority if denied_mapping else None
-                    )
-                    logger.info(
-                        "[PermissionService] 🔍 DEBUG update_cible - Résultat final: granted=%s, conditions=%s, source=role_mapping", granted, conditions
-                    )
-        
+
+        logger.debug(
+            "[PermissionService.get_user_permissions] %s processus résolu(s) pour user=%s, app=%s", len(result), user.username, app_name
+        )
+
         # Mettre en cache
         cache.set(cache_key, result, cls.CACHE_TIMEOUT)
         
@@ -396,12 +341,12 @@ class PermissionService:
         if cls._is_super_admin(user):
             cls._log_audit(
                 user, app_name, action, processus_uuid, True, 
-                "Super admin", entity_instance, start_time
+                "Super admin", entity_instance, start_time, super_admin=True
             )
             return True, "Super admin"
         
         # 2. Vérifier le cache pour cette action spécifique
-        cache_key = cls._get_cache_key(user.id, app_name, processus_uuid, action)
+        cache_key = cls._get_cache_key(user.id, app_name, processus_uuid, action, cls._get_epoch_token(user))
         cached_result = cache.get(cache_key)
         
         logger.warning(
@@ -479,17 +424,9 @@ class PermissionService:
             # Récupérer les rôles de l'utilisateur pour ce processus
             # (inclut les rôles spécifiques ET les rôles globaux)
             try:
-                specific_user_roles = UserProcessusRole.objects.filter(
-                    user=user,
-                    processus__uuid=processus_uuid,
-                    is_active=True,
-                    is_global=False
-                ).select_related('role')
-                global_user_roles = UserProcessusRole.objects.filter(
-                    user=user,
-                    is_active=True,
-                    is_global=True
-                ).select_related('role')
+                principal = get_principal(user)
+                specific_user_roles = principal.get_specific_roles(processus_uuid)
+                global_user_roles = principal.global_roles
                 roles_noms = (
                     [ur.role.nom for ur in specific_user_roles if ur.role]
                     + [f"{ur.role.nom} (global)" for ur in global_user_roles if ur.role]
@@ -557,45 +494,30 @@ class PermissionService:
     @classmethod
     def invalidate_user_cache(cls, user_id: int, app_name: Optional[str] = None, processus_uuid: Optional[str] = None, action: Optional[str] = None):
         """
-        Invalide le cache des permissions d'un user
+        Invalide le cache des permissions d'un user (toutes apps, tous processus)
         
-        Args:
-            user_id: ID de l'utilisateur
-            app_name: Nom de l'application (optionnel, si None invalide toutes les apps)
-            processus_uuid: UUID du processus (optionnel, pour invalidation ciblée)
-            action: Code de l'action (optionnel, pour invalidation ciblée)
+        Une seule incrémentation de l'époque de l'utilisateur. app_name, processus_uuid
+        et action sont conservés pour compatibilité : l'invalidation couvre toujours
+        l'ensemble des permissions de l'utilisateur, y compris activite_periodique et documentation.
         """
-        # Invalider le cache bulk
-        if app_name:
-            # Invalider seulement pour cette app
-            bulk_key = cls._get_bulk_cache_key(user_id, app_name)
-            cache.delete(bulk_key)
-            logger.info("[PermissionService] Cache bulk invalidé: %s", bulk_key)
-            
-            # Si processus_uuid et action sont fournis, invalider aussi le cache individuel
-            if processus_uuid and action:
-                individual_key = cls._get_cache_key(user_id, app_name, processus_uuid, action)
-                cache.delete(individual_key)
-                logger.info("[PermissionService] Cache individuel invalidé: %s", individual_key)
-            elif processus_uuid:
-                # Invalider tous les caches individuels pour ce processus
-                # On ne peut pas faire de wildcard, mais on peut essayer de récupérer toutes les actions
-                try:
-                    from permissions.models import PermissionAction
-                    actions = PermissionAction.objects.filter(app_name=app_name, is_active=True).values_list('code', flat=True)
-                    for action_code in actions:
-                        individual_key = cls._get_cache_key(user_id, app_name, processus_uuid, action_code)
-                        cache.delete(individual_key)
-                    logger.info("[PermissionService] Tous les caches individuels invalidés pour processus %s", processus_uuid)
-                except Exception as e:
-                    logger.warning("[PermissionService] Erreur lors de l'invalidation des caches individuels: %s", e)
-        else:
-            # Invalider toutes les apps connues
-            logger.info("[PermissionService] Invalidation complète du cache pour user %s", user_id)
-            for app in ['cdr', 'dashboard', 'pac']:  # Applications connues
-                bulk_key = cls._get_bulk_cache_key(user_id, app)
-                cache.delete(bulk_key)
-                logger.info("[PermissionService] Cache bulk invalidé: %s", bulk_key)
+        cls._bump_epoch(cls._epoch_key('user', user_id))
+        logger.info("[PermissionService] Époque de cache incrémentée pour user %s (app=%s)", user_id, app_name)
+    
+    @classmethod
+    def invalidate_role_cache(cls, role_id: int):
+        """
+        Invalide le cache des permissions de tous les utilisateurs ayant ce rôle (un compteur)
+        """
+        cls._bump_epoch(cls._epoch_key('role', role_id))
+        logger.info("[PermissionService] Époque de cache incrémentée pour le rôle %s", role_id)
+    
+    @classmethod
+    def invalidate_all_cache(cls):
+        """
+        Invalide le cache des permissions de tous les utilisateurs (un compteur)
+        """
+        cls._bump_epoch(cls._epoch_key('global'))
+        logger.info("[PermissionService] Époque globale du cache des permissions incrémentée")
     
     @classmethod
     def _log_audit(
@@ -608,37 +530,28 @@ class PermissionService:
         reason: str,
         entity_instance: Optional[Any] = None,
         start_time: Optional[datetime] = None,
-        cache_hit: bool = False
+        cache_hit: bool = False,
+        super_admin: bool = False
     ):
         """
-        Log une vérification de permission dans PermissionAudit
+        Met en file une vérification de permission pour PermissionAudit
+        (écriture groupée en arrière-plan, voir permissions.services.audit_writer)
         """
         try:
             execution_time_ms = None
             if start_time:
                 execution_time_ms = (timezone.now() - start_time).total_seconds() * 1000
-            
-            processus = None
-            if processus_uuid:
-                try:
-                    processus = Processus.objects.get(uuid=processus_uuid)
-                except Processus.DoesNotExist:
-                    pass
-            
+
             # Déterminer la méthode de résolution
             resolution_method = 'cache' if cache_hit else 'db'
-            if cls._is_super_admin(user):
+            if super_admin:
                 resolution_method = 'super_admin'
-            
-            # Récupérer l'IP et user agent (si disponible dans le contexte)
-            # Note: Pour l'instant, on ne les récupère pas car on n'a pas accès à la request
-            # On pourrait passer la request en paramètre si nécessaire
-            
-            PermissionAudit.objects.create(
-                user=user,
+
+            audit_writer.record(
+                user_id=user.id if user and user.is_authenticated else None,
                 app_name=app_name,
-                action=action_code,  # Correction : le champ s'appelle 'action' pas 'action_code'
-                processus=processus,
+                action=action_code,
+                processus_id=processus_uuid,
                 granted=granted,
                 reason=reason,
                 resolution_method=resolution_method,
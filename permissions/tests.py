@@ -1,3 +1,344 @@
-from django.test import TestCase
+import os
+import tempfile
+import threading
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from parametre.models import Processus, Role, UserProcessus, UserProcessusRole
+from permissions.models import PermissionAction, PermissionAudit, PermissionOverride, RolePermissionMapping
+from permissions.services.audit_writer import PermissionAuditWriter
+from permissions.services.permission_matrix import PermissionMatrix
+from permissions.services.permission_service import PermissionService
+from shared.cache import SQLiteCache, TwoTierCache
+
+
+class PermissionMatrixTests(TestCase):
+    """Calcul des permissions via la matrice compilée (rôle, action)"""
+
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create(username='owner')
+        self.lire = Role.objects.create(code='lire', nom='Lecture')
+        self.ecrire = Role.objects.create(code='ecrire', nom='Écriture')
+        self.read = PermissionAction.objects.create(app_name='pac', code='read_pac', nom='Lire')
+        self.update = PermissionAction.objects.create(app_name='pac', code='update_pac', nom='Modifier')
+        self.delete = PermissionAction.objects.create(app_name='pac', code='delete_pac', nom='Supprimer')
+        RolePermissionMapping.objects.create(role=self.lire, permission_action=self.read, granted=True)
+        RolePermissionMapping.objects.create(role=self.lire, permission_action=self.update, granted=False, priority=5)
+        RolePermissionMapping.objects.create(
+            role=self.ecrire, permission_action=self.update, granted=True, priority=1,
+            conditions={'can_edit_only_own': True}
+        )
+        self.processus = [
+            Processus.objects.create(nom=f'Processus {i}', cree_par=self.owner) for i in range(20)
+        ]
+
+    def _user_with_roles(self, username, nb_processus, roles):
+        user = User.objects.create(username=username)
+        for processus in self.processus[:nb_processus]:
+            UserProcessus.objects.create(user=user, processus=processus)
+            for role in roles:
+                UserProcessusRole.objects.create(user=user, processus=processus, role=role)
+        return user
+
+    def test_resolution_rules(self):
+        user = self._user_with_roles('alice', 1, [self.lire, self.ecrire])
+        permissions = PermissionService.get_user_permissions(user, 'pac')[str(self.processus[0].uuid)]
+
+        self.assertTrue(permissions['read_pac']['granted'])
+        # Un rôle qui accorde l'emporte sur un refus de priorité supérieure
+        self.assertTrue(permissions['update_pac']['granted'])
+        self.assertEqual(permissions['update_pac']['conditions'], {'can_edit_only_own': True})
+        # Aucun mapping → refus par défaut
+        self.assertFalse(permissions['delete_pac']['granted'])
+
+    def test_override_applies_per_processus(self):
+        user = self._user_with_roles('bob', 2, [self.lire])
+        PermissionOverride.objects.create(
+            user=user, processus=self.processus[1], app_name='pac',
+            permission_action=self.delete, granted=True, raison='test'
+        )
+        permissions = PermissionService.get_user_permissions(user, 'pac')
+
+        self.assertFalse(permissions[str(self.processus[0].uuid)]['delete_pac']['granted'])
+        self.assertEqual(permissions[str(self.processus[1].uuid)]['delete_pac']['source'], 'override')
+        self.assertTrue(permissions[str(self.processus[1].uuid)]['delete_pac']['granted'])
+
+    def test_query_count_independent_of_processus_count(self):
+        counts = []
+        for nb_processus in (1, 5, 20):
+            user = self._user_with_roles(f'user_{nb_processus}', nb_processus, [self.lire, self.ecrire])
+            cache.clear()
+            with CaptureQueriesContext(connection) as ctx:
+                permissions = PermissionService.get_user_permissions(user, 'pac')
+            self.assertEqual(len(permissions), nb_processus)
+            counts.append(len(ctx.captured_queries))
+
+        self.assertEqual(len(set(counts)), 1, counts)
+
+    def test_mapping_change_recompiles_matrix(self):
+        user = self._user_with_roles('carol', 1, [self.lire])
+        processus_uuid = str(self.processus[0].uuid)
+        self.assertFalse(PermissionService.get_user_permissions(user, 'pac')[processus_uuid]['delete_pac']['granted'])
+
+        # Le signal incrémente l'époque du rôle : aucune suppression de clé nécessaire
+        RolePermissionMapping.objects.create(role=self.lire, permission_action=self.delete, granted=True)
+
+        self.assertTrue(PermissionService.get_user_permissions(user, 'pac')[processus_uuid]['delete_pac']['granted'])
+
+
+@override_settings(PERMISSION_AUDIT_ENABLED=False)
+class PermissionCacheEpochTests(TestCase):
+    """Invalidation par époques globale / rôle / utilisateur, pour toutes les apps"""
+
+    def setUp(self):
+        cache.clear()
+        owner = User.objects.create(username='owner')
+        self.processus = Processus.objects.create(nom='Processus', cree_par=owner)
+        self.lire = Role.objects.create(code='lire', nom='Lecture')
+        self.read_doc = PermissionAction.objects.create(app_name='documentation', code='read_document', nom='Lire')
+        self.read_ap = PermissionAction.objects.create(
+            app_name='activite_periodique', code='read_activite_periodique', nom='Lire'
+        )
+        self.users = []
+        for i in range(3):
+            user = User.objects.create(username=f'lecteur_{i}')
+            UserProcessus.objects.create(user=user, processus=self.processus)
+            UserProcessusRole.objects.create(user=user, processus=self.processus, role=self.lire)
+            self.users.append(user)
+
+    def _can(self, user, app_name, action):
+        return PermissionService.can_perform_action(user, app_name, str(self.processus.uuid), action)[0]
+
+    def test_role_mapping_change_reaches_every_holder(self):
+        for user in self.users:
+            self.assertFalse(self._can(user, 'documentation', 'read_document'))
+
+        with CaptureQueriesContext(connection) as ctx:
+            RolePermissionMapping.objects.create(role=self.lire, permission_action=self.read_doc, granted=True)
+        # Aucune requête par utilisateur : seule l'époque du rôle est incrémentée
+        self.assertFalse([q for q in ctx.captured_queries if '"user_processus_role"' in q['sql']])
+
+        for user in self.users:
+            self.assertTrue(self._can(user, 'documentation', 'read_document'))
+
+    def test_user_invalidation_covers_all_apps(self):
+        user, other = self.users[0], self.users[1]
+        self.assertFalse(self._can(user, 'activite_periodique', 'read_activite_periodique'))
+        self.assertFalse(self._can(other, 'activite_periodique', 'read_activite_periodique'))
+        documentation = PermissionService.get_user_permissions(user, 'documentation')
+        self.assertFalse(documentation[str(self.processus.uuid)]['read_document']['granted'])
+
+        # Modification directe en base (sans signal) puis invalidation explicite de l'utilisateur
+        RolePermissionMapping.objects.bulk_create([
+            RolePermissionMapping(role=self.lire, permission_action=self.read_ap, granted=True),
+            RolePermissionMapping(role=self.lire, permission_action=self.read_doc, granted=True),
+        ])
+        PermissionMatrix.invalidate()
+        self.assertFalse(self._can(user, 'activite_periodique', 'read_activite_periodique'))
+
+        PermissionService.invalidate_user_cache(user.id)
+        self.assertTrue(self._can(user, 'activite_periodique', 'read_activite_periodique'))
+        documentation = PermissionService.get_user_permissions(user, 'documentation')
+        self.assertTrue(documentation[str(self.processus.uuid)]['read_document']['granted'])
+        # Les autres utilisateurs gardent leur cache jusqu'à l'invalidation globale
+        self.assertFalse(self._can(other, 'activite_periodique', 'read_activite_periodique'))
+        PermissionService.invalidate_all_cache()
+        self.assertTrue(self._can(other, 'activite_periodique', 'read_activite_periodique'))
+
+
+@override_settings(
+    PERMISSION_AUDIT_ASYNC=True,
+    PERMISSION_AUDIT_BATCH_SIZE=1000,
+    PERMISSION_AUDIT_FLUSH_INTERVAL=3600,
+    PERMISSION_AUDIT_MAX_QUEUE_SIZE=2,
+    PERMISSION_AUDIT_CACHE_HIT_SAMPLE_RATE=0.0,
+)
+class PermissionAuditWriterTests(TestCase):
+    """File d'audit bornée, échantillonnage et écriture groupée"""
+
+    def setUp(self):
+        self.user = User.objects.create(username='audited')
+        self.processus = Processus.objects.create(nom='Processus audité', cree_par=self.user)
+        self.writer = PermissionAuditWriter()
+
+    def _record(self, granted, cache_hit=False):
+        self.writer.record(
+            user_id=self.user.id, app_name='pac', action='read_pac',
+            processus_id=self.processus.uuid, granted=granted, cache_hit=cache_hit
+        )
+
+    def test_events_are_buffered_then_bulk_written(self):
+        self._record(granted=True)
+        self._record(granted=False)
+        self.assertEqual(PermissionAudit.objects.count(), 0)
+
+        with self.assertNumQueries(2):
+            self.writer.flush()
+        self.assertEqual(PermissionAudit.objects.count(), 2)
+
+    def test_granted_cache_hits_are_sampled_but_denials_are_not(self):
+        self._record(granted=True, cache_hit=True)
+        self._record(granted=False, cache_hit=True)
+        self.writer.flush()
+
+        self.assertEqual(self.writer.sampled_out, 1)
+        self.assertEqual(list(PermissionAudit.objects.values_list('granted', flat=True)), [False])
+
+    def test_full_queue_drops_granted_and_keeps_denied(self):
+        self._record(granted=True)
+        self._record(granted=True)
+        self._record(granted=True)
+        self._record(granted=False)
+
+        self.assertEqual(self.writer.dropped, 1)
+        self.assertEqual(PermissionAudit.objects.filter(granted=False).count(), 1)
+        self.assertEqual(PermissionAudit.objects.count(), 3)
+
+
+@override_settings(PERMISSION_AUDIT_ENABLED=False)
+class PrincipalQueryBudgetTests(TestCase):
+    """Les rôles de l'utilisateur sont chargés une seule fois par requête"""
+
+    # Nombre maximal de requêtes SQL par endpoint de liste (hors données métier supplémentaires)
+    QUERY_BUDGET = {
+        '/api/pac/': 4,
+        '/api/dashboard/tableaux-bord/': 3,
+        '/api/cartographie-risque/cdrs/': 2,
+        '/api/activite-periodique/activites-periodiques/': 3,
+    }
+
+    def setUp(self):
+        cache.clear()
+        owner = User.objects.create(username='owner')
+        self.user = User.objects.create(username='reader')
+        lire = Role.objects.create(code='lire', nom='Lecture')
+        ecrire = Role.objects.create(code='ecrire', nom='Écriture')
+        read_ap = PermissionAction.objects.create(
+            app_name='activite_periodique', code='read_activite_periodique', nom='Lire'
+        )
+        RolePermissionMapping.objects.create(role=lire, permission_action=read_ap, granted=True)
+        for i in range(5):
+            processus = Processus.objects.create(nom=f'Processus {i}', cree_par=owner)
+            UserProcessus.objects.create(user=self.user, processus=processus)
+            UserProcessusRole.objects.create(user=self.user, processus=processus, role=lire)
+            UserProcessusRole.objects.create(user=self.user, processus=processus, role=ecrire)
+
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_list_endpoints_query_budget(self):
+        for url, budget in self.QUERY_BUDGET.items():
+            with self.subTest(url=url):
+                self.client.get(url)  # caches froids (config, throttles, matrice)
+                with CaptureQueriesContext(connection) as ctx:
+                    response = self.client.get(url)
+
+                self.assertEqual(response.status_code, 200)
+                role_queries = [q for q in ctx.captured_queries if '"user_processus_role"' in q['sql']]
+                self.assertEqual(len(role_queries), 1)
+                self.assertLessEqual(len(ctx.captured_queries), budget)
+
+    def test_helpers_share_one_principal_per_scope(self):
+        from shared.permissions import (
+            get_user_processus_list, is_super_admin, is_supervisor_smi, user_has_permission,
+        )
+        from shared.permissions.principal import close_principal_scope, open_principal_scope
+
+        token = open_principal_scope()
+        try:
+            with self.assertNumQueries(1):
+                self.assertFalse(is_super_admin(self.user))
+                self.assertFalse(is_supervisor_smi(self.user))
+                self.assertFalse(PermissionService._is_super_admin(self.user))
+                self.assertEqual(len(get_user_processus_list(self.user)), 5)
+                processus_uuid = get_user_processus_list(self.user)[0]
+                self.assertTrue(user_has_permission(self.user, str(processus_uuid), 'ecrire'))
+                self.assertFalse(user_has_permission(self.user, processus_uuid, 'valider'))
+        finally:
+            close_principal_scope(token)
+
+
+class SharedCacheTests(TestCase):
+    """Cache partagé entre workers : compteurs atomiques et invalidation des L1"""
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix='.sqlite3')
+        os.close(fd)
+        self.shared = SQLiteCache(self.path, {})
+
+    def tearDown(self):
+        self.shared.close_connection()
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(self.path + suffix):
+                os.remove(self.path + suffix)
+
+    def _worker(self):
+        """Un TwoTierCache par worker simulé, tous devant le même L2"""
+        worker = TwoTierCache('shared', {
+            'OPTIONS': {'L1_TIMEOUT': 300, 'BROADCAST_INTERVAL': 0, 'L1_KEY_PREFIXES': ['perm']},
+        })
+        worker._l2_cache = self.shared
+        return worker
+
+    def test_incr_is_atomic_across_connections(self):
+        self.shared.add('hits', 0, 60)
+
+        def hit():
+            counter = SQLiteCache(self.path, {})
+            for _ in range(50):
+                counter.incr('hits')
+            counter.close_connection()
+
+        threads = [threading.Thread(target=hit) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(self.shared.get('hits'), 200)
+        self.assertFalse(self.shared.add('hits', 0, 60))
+
+    def test_permission_invalidation_reaches_every_worker(self):
+        worker_a, worker_b = self._worker(), self._worker()
+        worker_a.set('perm:pac:bulk:1', {'read_pac': True}, 300)
+        self.assertEqual(worker_b.get('perm:pac:bulk:1'), {'read_pac': True})
+
+        # Le L1 de B sert la valeur même si le L2 change sans passer par le cache
+        self.shared.set('perm:pac:bulk:1', {'read_pac': 'l2'}, 300)
+        self.assertEqual(worker_b.get('perm:pac:bulk:1'), {'read_pac': True})
+
+        worker_a.delete('perm:pac:bulk:1')
+        self.assertIsNone(worker_b.get('perm:pac:bulk:1'))
+
+        worker_b.get('perm:pac:bulk:1')
+        worker_a.set('perm:pac:bulk:1', {'read_pac': False}, 300)
+        self.assertEqual(worker_b.get('perm:pac:bulk:1'), {'read_pac': False})
+
+    def test_clear_and_non_l1_keys(self):
+        worker_a, worker_b = self._worker(), self._worker()
+        worker_a.set('perm:matrix:pac', 'matrix', 300)
+        self.assertEqual(worker_b.get('perm:matrix:pac'), 'matrix')
+
+        worker_a.clear()
+        self.assertIsNone(worker_b.get('perm:matrix:pac'))
+
+        # Les clés hors L1 (compteurs) sont lues directement dans le L2
+        worker_a.add('throttle_counter', 1, 60)
+        worker_b.incr('throttle_counter')
+        self.assertEqual(worker_a.get('throttle_counter'), 2)
+
+    def test_many_keys_span_several_queries(self):
+        shared = SQLiteCache(self.path, {'OPTIONS': {'MAX_ENTRIES': 10000}})
+        keys = [f'key:{i}' for i in range(SQLiteCache.KEYS_PER_QUERY * 2 + 1)]
+        shared.set_many({key: i for i, key in enumerate(keys)}, 60)
+        self.assertEqual(shared.get_many(keys + ['absente']), {key: i for i, key in enumerate(keys)})
+
+        shared.delete_many(keys[1:])
+        self.assertEqual(shared.get_many(keys), {keys[0]: 0})
+        shared.close_connection()
@@ -0,0 +1,10 @@
+"""
+Backends de cache partagés entre les workers
+
+- SQLiteCache : cache partagé sur un fichier local, remplaçant de Redis quand il n'est pas disponible
+- TwoTierCache : L1 en mémoire du processus devant un cache partagé (Redis ou SQLiteCache)
+"""
+from .sqlite import SQLiteCache
+from .tiered import TwoTierCache
+
+__all__ = ['SQLiteCache', 'TwoTierCache']
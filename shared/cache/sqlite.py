@@ -0,0 +1,215 @@
+"""
+Backend de cache partagé sur un fichier SQLite
+
+Partagé par tous les workers gunicorn d'un même hôte, sans service externe.
+add() et incr() sont atomiques entre processus (transaction BEGIN IMMEDIATE),
+contrairement à FileBasedCache et DatabaseCache : les compteurs de rate limiting
+(cache.add + cache.incr) restent exacts avec plusieurs workers.
+
+    CACHES = {
+        'default': {
+            'BACKEND': 'shared.cache.SQLiteCache',
+            'LOCATION': '/var/lib/kora/cache.sqlite3',
+            'OPTIONS': {'MAX_ENTRIES': 50000, 'CULL_FREQUENCY': 3},
+        }
+    }
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+
+class SQLiteCache(BaseCache):
+    """Cache clé/valeur (valeurs picklées) dans une table SQLite en mode WAL"""
+
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    # Purge des entrées expirées toutes les N écritures (par processus)
+    PURGE_EVERY = 500
+
+    # Clés par requête IN (...) : sous la limite de paramètres des anciennes versions de SQLite (999)
+    KEYS_PER_QUERY = 500
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self._path = str(location)
+        self._local = threading.local()
+        self._writes = 0
+
+    # ── Connexion ──────────────────────────────────────────────────────────────
+
+    def _connection(self):
+        # Une connexion par thread et par processus (les connexions SQLite ne survivent pas à un fork)
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+
+        directory = os.path.dirname(self._path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self._path, timeout=10, isolation_level=None, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS cache_entry ('
+            'key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL)'
+        )
+        conn.execute('CREATE INDEX IF NOT EXISTS cache_entry_expires ON cache_entry (expires)')
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    def close(self, **kwargs):
+        # Appelé à la fin de chaque requête : la connexion du thread est conservée
+        # (sinon PRAGMA et CREATE TABLE rejoués à la requête suivante)
+        pass
+
+    def close_connection(self):
+        """Ferme réellement la connexion du thread courant"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            conn.close()
+        self._local.conn = None
+
+    # ── Helpers ────────────────────────────────────────────────────────────────
+
+    def _dumps(self, value):
+        return pickle.dumps(value, self.pickle_protocol)
+
+    @staticmethod
+    def _is_live(expires, now):
+        return expires is None or expires > now
+
+    def _select(self, conn, key):
+        row = conn.execute('SELECT value, expires FROM cache_entry WHERE key = ?', (key,)).fetchone()
+        if row is None or not self._is_live(row[1], time.time()):
+            return None
+        return row
+
+    def _after_write(self, conn):
+        self._writes += 1
+        if self._writes % self.PURGE_EVERY == 0:
+            self._cull(conn)
+
+    def _cull(self, conn):
+        conn.execute('DELETE FROM cache_entry WHERE expires IS NOT NULL AND expires <= ?', (time.time(),))
+        count = conn.execute('SELECT COUNT(*) FROM cache_entry').fetchone()[0]
+        if count > self._max_entries:
+            to_delete = count // self._cull_frequency if self._cull_frequency else count
+            conn.execute(
+                'DELETE FROM cache_entry WHERE key IN ('
+                'SELECT key FROM cache_entry ORDER BY expires IS NULL, expires LIMIT ?)',
+                (to_delete,)
+            )
+
+    # ── API BaseCache ──────────────────────────────────────────────────────────
+
+    def get(self, key, default=None, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        row = self._select(self._connection(), key)
+        if row is None:
+            return default
+        return pickle.loads(row[0])
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        conn = self._connection()
+        conn.execute(
+            'INSERT OR REPLACE INTO cache_entry (key, value, expires) VALUES (?, ?, ?)',
+            (key, self._dumps(value), self.get_backend_timeout(timeout))
+        )
+        self._after_write(conn)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            if self._select(conn, key) is not None:
+                conn.execute('ROLLBACK')
+                return False
+            conn.execute(
+                'INSERT OR REPLACE INTO cache_entry (key, value, expires) VALUES (?, ?, ?)',
+                (key, self._dumps(value), self.get_backend_timeout(timeout))
+            )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        self._after_write(conn)
+        return True
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = self._select(conn, key)
+            if row is None:
+                raise ValueError("Key '%s' not found" % key)
+            new_value = pickle.loads(row[0]) + delta
+            # L'expiration d'origine est conservée (fenêtre fixe de rate limiting)
+            conn.execute('UPDATE cache_entry SET value = ? WHERE key = ?', (self._dumps(new_value), key))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return new_value
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        conn = self._connection()
+        cursor = conn.execute(
+            'UPDATE cache_entry SET expires = ? WHERE key = ? AND (expires IS NULL OR expires > ?)',
+            (self.get_backend_timeout(timeout), key, time.time())
+        )
+        return cursor.rowcount > 0
+
+    def delete(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        cursor = self._connection().execute('DELETE FROM cache_entry WHERE key = ?', (key,))
+        return cursor.rowcount > 0
+
+    def has_key(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return self._select(self._connection(), key) is not None
+
+    def _chunks(self, keys):
+        keys = list(keys)
+        for start in range(0, len(keys), self.KEYS_PER_QUERY):
+            yield keys[start:start + self.KEYS_PER_QUERY]
+
+    def get_many(self, keys, version=None):
+        key_map = {self.make_and_validate_key(key, version=version): key for key in keys}
+        if not key_map:
+            return {}
+        conn = self._connection()
+        now = time.time()
+        result = {}
+        for chunk in self._chunks(key_map):
+            placeholders = ','.join('?' * len(chunk))
+            rows = conn.execute(
+                f'SELECT key, value, expires FROM cache_entry WHERE key IN ({placeholders})', chunk
+            ).fetchall()
+            result.update(
+                (key_map[key], pickle.loads(value))
+                for key, value, expires in rows
+                if self._is_live(expires, now)
+            )
+        return result
+
+    def delete_many(self, keys, version=None):
+        keys = [self.make_and_validate_key(key, version=version) for key in keys]
+        if not keys:
+            return
+        conn = self._connection()
+        for chunk in self._chunks(keys):
+            placeholders = ','.join('?' * len(chunk))
+            conn.execute(f'DELETE FROM cache_entry WHERE key IN ({placeholders})', chunk)
+
+    def clear(self):
+        self._connection().execute('DELETE FROM cache_entry')
@@ -0,0 +1,257 @@
+"""
+Cache à deux niveaux : L1 en mémoire du processus devant un L2 partagé
+
+Les clés très lues (permissions, utilisateur JWT, configuration) sont servies
+depuis un L1 LocMem à TTL court ; toutes les autres clés (compteurs de rate
+limiting, historiques de throttling...) vont directement au L2 partagé
+(Redis ou SQLiteCache), seul garant de la cohérence entre workers.
+
+Invalidation : chaque suppression/incrément d'une clé L1 est publié dans un
+journal stocké dans le L2 (compteur `<prefix>:seq` + une entrée par numéro).
+Les écritures (set, add) ne sont pas diffusées : elles repeuplent une clé après
+invalidation, et un set qui écrase une valeur encore en L1 ailleurs n'y est vu
+qu'après L1_TIMEOUT — invalider par delete() ce qui doit être vu aussitôt.
+Chaque processus relit le journal au plus toutes les BROADCAST_INTERVAL secondes
+et évince les clés concernées de son L1. Si le journal a expiré (processus inactif
+trop longtemps) ou si le cache a été vidé, le L1 est entièrement vidé. Dans le
+pire cas une valeur périmée reste servie L1_TIMEOUT secondes.
+
+    CACHES = {
+        'default': {
+            'BACKEND': 'shared.cache.TwoTierCache',
+            'LOCATION': 'shared',  # alias du cache L2
+            'OPTIONS': {
+                'L1_TIMEOUT': 5,
+                'L1_KEY_PREFIXES': ['perm', 'jwt_user:'],
+                'BROADCAST_INTERVAL': 0.5,
+            },
+        },
+        'shared': {'BACKEND': 'shared.cache.SQLiteCache', 'LOCATION': '/var/lib/kora/cache.sqlite3'},
+    }
+"""
+import logging
+import os
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.cache.backends.locmem import LocMemCache
+
+logger = logging.getLogger(__name__)
+
+# Valeur sentinelle : clé absente du L1
+_MISSING = object()
+
+# Retard maximal rattrapé entrée par entrée ; au-delà le L1 est vidé
+_MAX_JOURNAL_GAP = 1000
+
+
+class TwoTierCache(BaseCache):
+    """Cache Django : L1 LocMem par processus + L2 partagé, invalidation diffusée via le L2"""
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._l2_alias = location or 'shared'
+        self._l2_cache = None
+        self._l1_timeout = float(options.get('L1_TIMEOUT', 5))
+        self._l1_prefixes = tuple(options.get('L1_KEY_PREFIXES', ()))
+        self._broadcast_interval = float(options.get('BROADCAST_INTERVAL', 0.5))
+        self._journal_prefix = options.get('JOURNAL_PREFIX', '__kora_l1')
+        # Au-delà, les entrées du journal ont expiré : les L1 en retard se vident entièrement
+        self._journal_timeout = int(options.get('JOURNAL_TIMEOUT', max(60, int(self._l1_timeout) * 10)))
+
+        self._l1 = LocMemCache(
+            f'kora-l1-{id(self)}',
+            {'TIMEOUT': self._l1_timeout, 'OPTIONS': {'MAX_ENTRIES': options.get('L1_MAX_ENTRIES', 5000)}},
+        )
+        self._sync_lock = threading.Lock()
+        self._last_seq = None
+        self._last_sync = 0.0
+        self._pid = os.getpid()
+
+    # ── Niveaux ────────────────────────────────────────────────────────────────
+
+    @property
+    def l2(self):
+        if self._l2_cache is None:
+            from django.core.cache import caches
+            self._l2_cache = caches[self._l2_alias]
+        return self._l2_cache
+
+    def _uses_l1(self, key):
+        return bool(self._l1_prefixes) and key.startswith(self._l1_prefixes)
+
+    def _l1_timeout_for(self, timeout):
+        # Le L1 n'expire jamais après le L2
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        if timeout is None:
+            return self._l1_timeout
+        return min(timeout, self._l1_timeout)
+
+    # ── Journal d'invalidation ─────────────────────────────────────────────────
+
+    def _seq_key(self):
+        return f'{self._journal_prefix}:seq'
+
+    def _publish(self, keys, version=None):
+        """Ajoute les clés au journal partagé pour que les autres processus les évincent"""
+        if not keys:
+            return
+        seq_key = self._seq_key()
+        try:
+            self.l2.add(seq_key, 0, timeout=None)
+            seq = self.l2.incr(seq_key)
+            self.l2.set(f'{self._journal_prefix}:{seq}', (list(keys), version), timeout=self._journal_timeout)
+        except Exception as e:
+            # L2 indisponible : les autres workers retomberont sur le TTL du L1
+            logger.warning("[TwoTierCache] Publication de l'invalidation impossible: %s", str(e))
+            return
+        # Nos propres invalidations sont déjà appliquées localement
+        with self._sync_lock:
+            if self._last_seq is not None and seq == self._last_seq + 1:
+                self._last_seq = seq
+
+    def _sync(self, force=False):
+        """Applique au L1 les invalidations publiées depuis la dernière synchronisation"""
+        if os.getpid() != self._pid:
+            # Après un fork, le L1 hérité du parent n'est plus fiable
+            self._pid = os.getpid()
+            self._l1.clear()
+            self._last_seq = None
+
+        now = time.monotonic()
+        if not force and now - self._last_sync < self._broadcast_interval:
+            return
+        if not self._sync_lock.acquire(blocking=False):
+            return
+        try:
+            self._last_sync = now
+            try:
+                seq = self.l2.get(self._seq_key(), 0)
+            except Exception:
+                self._l1.clear()
+                return
+
+            if self._last_seq is None or seq < self._last_seq:
+                # Premier passage ou journal réinitialisé (L2 vidé)
+                self._l1.clear()
+            elif seq > self._last_seq:
+                gap = seq - self._last_seq
+                entries = {}
+                if gap <= _MAX_JOURNAL_GAP:
+                    entries = self.l2.get_many(
+                        [f'{self._journal_prefix}:{n}' for n in range(self._last_seq + 1, seq + 1)]
+                    )
+                if len(entries) < gap:
+                    # Entrées expirées ou retard trop important : on ne sait plus quoi évincer
+                    self._l1.clear()
+                else:
+                    for keys, version in entries.values():
+                        self._l1.delete_many(keys, version=version)
+            self._last_seq = seq
+        finally:
+            self._sync_lock.release()
+
+    # ── API BaseCache ──────────────────────────────────────────────────────────
+
+    def get(self, key, default=None, version=None):
+        if not self._uses_l1(key):
+            return self.l2.get(key, default, version=version)
+
+        self._sync()
+        value = self._l1.get(key, _MISSING, version=version)
+        if value is not _MISSING:
+            return value
+        value = self.l2.get(key, _MISSING, version=version)
+        if value is _MISSING:
+            return default
+        self._l1.set(key, value, version=version)
+        return value
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        result = {}
+        l1_keys = [key for key in keys if self._uses_l1(key)]
+        if l1_keys:
+            self._sync()
+            result.update(self._l1.get_many(l1_keys, version=version))
+        missing = [key for key in keys if key not in result]
+        if missing:
+            fetched = self.l2.get_many(missing, version=version)
+            for key, value in fetched.items():
+                if self._uses_l1(key):
+                    self._l1.set(key, value, version=version)
+            result.update(fetched)
+        return result
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.l2.set(key, value, timeout=timeout, version=version)
+        if self._uses_l1(key):
+            self._l1.set(key, value, timeout=self._l1_timeout_for(timeout), version=version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self.l2.set_many(data, timeout=timeout, version=version)
+        l1_data = {key: value for key, value in data.items() if self._uses_l1(key) and key not in failed}
+        if l1_data:
+            self._l1.set_many(l1_data, timeout=self._l1_timeout_for(timeout), version=version)
+        return failed
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        added = self.l2.add(key, value, timeout=timeout, version=version)
+        if added and self._uses_l1(key):
+            self._l1.set(key, value, timeout=self._l1_timeout_for(timeout), version=version)
+        return added
+
+    def incr(self, key, delta=1, version=None):
+        value = self.l2.incr(key, delta, version=version)
+        if self._uses_l1(key):
+            self._l1.delete(key, version=version)
+            self._publish([key], version)
+        return value
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        touched = self.l2.touch(key, timeout=timeout, version=version)
+        if self._uses_l1(key):
+            self._l1.delete(key, version=version)
+        return touched
+
+    def delete(self, key, version=None):
+        deleted = self.l2.delete(key, version=version)
+        if self._uses_l1(key):
+            self._l1.delete(key, version=version)
+            self._publish([key], version)
+        return deleted
+
+    def delete_many(self, keys, version=None):
+        keys = list(keys)
+        self.l2.delete_many(keys, version=version)
+        l1_keys = [key for key in keys if self._uses_l1(key)]
+        if l1_keys:
+            self._l1.delete_many(l1_keys, version=version)
+            self._publish(l1_keys, version)
+
+    def has_key(self, key, version=None):
+        if self._uses_l1(key):
+            self._sync()
+            if self._l1.has_key(key, version=version):
+                return True
+        return self.l2.has_key(key, version=version)
+
+    def clear(self):
+        self._l1.clear()
+        self.l2.clear()
+        # Le journal repart d'un numéro sans entrées : les autres processus constatent
+        # un trou (ou un recul) et vident leur L1
+        seq = int(time.time() * 1000)
+        self.l2.set(self._seq_key(), seq, timeout=None)
+        with self._sync_lock:
+            self._last_seq = seq
+
+    def clear_local(self):
+        """Vide uniquement le L1 du processus courant"""
+        self._l1.clear()
+
+    def close(self, **kwargs):
+        self.l2.close(**kwargs)
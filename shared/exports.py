@@ -0,0 +1,233 @@
+"""
+Écriture en streaming des exports tabulaires (CSV, XLSX).
+
+Les deux formats sont produits par des générateurs : l'en-tête part dès le
+premier tour, puis les lignes au fil de leur lecture, par lots. Aucune
+n'est gardée en mémoire après son envoi.
+
+- CSV : séparateur « ; » et BOM UTF-8 (ouverture directe dans Excel en français) ;
+- XLSX : classeur minimal d'une feuille (chaînes en ligne, pas de table de
+  chaînes partagées), écrit dans une archive zip sans retour en arrière
+  (descripteurs de données) : mémoire constante quel que soit le volume.
+
+Utilisation :
+    from shared.exports import streaming_export_response
+
+    return streaming_export_response('pac_2025', 'xlsx', columns, rows)
+"""
+import csv
+import datetime
+import decimal
+import re
+import zipfile
+from xml.sax.saxutils import escape
+
+from django.http import StreamingHttpResponse
+
+CSV = 'csv'
+XLSX = 'xlsx'
+EXPORT_FORMATS = (CSV, XLSX)
+
+CONTENT_TYPES = {
+    CSV: 'text/csv; charset=utf-8',
+    XLSX: 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+# Lignes écrites entre deux envois au client
+FLUSH_ROWS = 500
+
+# Caractères de contrôle interdits en XML 1.0
+_XML_ILLEGAL = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+# Premiers caractères qu'Excel interprète comme une formule à l'ouverture d'un CSV
+_FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def _text(value):
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 'Oui' if value else 'Non'
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    return str(value)
+
+
+# ── CSV ────────────────────────────────────────────────────────────────────────
+
+class _Echo:
+    """Pseudo-fichier : csv.writer renvoie la ligne écrite au lieu de la garder"""
+
+    def write(self, value):
+        return value
+
+
+def csv_stream(columns, rows):
+    """Générateur de l'export CSV (en-tête, puis lots de FLUSH_ROWS lignes)"""
+    writer = csv.writer(_Echo(), delimiter=';')
+    yield '\ufeff' + writer.writerow(columns)
+    batch = []
+    for row in rows:
+        batch.append(writer.writerow([_csv_cell(value) for value in row]))
+        if len(batch) >= FLUSH_ROWS:
+            yield ''.join(batch)
+            batch = []
+    if batch:
+        yield ''.join(batch)
+
+
+def _csv_cell(value):
+    """Neutralise les textes libres lus comme une formule par Excel (injection CSV)"""
+    text = _text(value)
+    if isinstance(value, str) and text.startswith(_FORMULA_PREFIXES):
+        return "'" + text
+    return text
+
+
+# ── XLSX ───────────────────────────────────────────────────────────────────────
+
+_XML_HEADER = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+_SPREADSHEET_NS = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+_RELATIONSHIPS_NS = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+_PACKAGE_RELS_NS = 'http://schemas.openxmlformats.org/package/2006/relationships'
+
+_XLSX_PARTS = [
+    ('[Content_Types].xml', _XML_HEADER + (
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    )),
+    ('_rels/.rels', _XML_HEADER + (
+        f'<Relationships xmlns="{_PACKAGE_RELS_NS}">'
+        f'<Relationship Id="rId1" Type="{_RELATIONSHIPS_NS}/officeDocument" Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    )),
+    ('xl/workbook.xml', _XML_HEADER + (
+        f'<workbook xmlns="{_SPREADSHEET_NS}" xmlns:r="{_RELATIONSHIPS_NS}">'
+        '<sheets><sheet name="Export" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    )),
+    ('xl/_rels/workbook.xml.rels', _XML_HEADER + (
+        f'<Relationships xmlns="{_PACKAGE_RELS_NS}">'
+        f'<Relationship Id="rId1" Type="{_RELATIONSHIPS_NS}/worksheet" Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'
+    )),
+]
+
+_SHEET_HEAD = _XML_HEADER + f'<worksheet xmlns="{_SPREADSHEET_NS}"><sheetData>'
+_SHEET_TAIL = '</sheetData></worksheet>'
+
+
+class _Sink:
+    """Flux en écriture seule : zipfile passe en mode sans retour en arrière, les octets sont drainés par lot"""
+
+    def __init__(self):
+        self._chunks = []
+        self._offset = 0
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._offset += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._offset
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _xlsx_cell(value):
+    if isinstance(value, (int, float, decimal.Decimal)) and not isinstance(value, bool):
+        return f'<c><v>{value}</v></c>'
+    text = _XML_ILLEGAL.sub('', _text(value))
+    if not text:
+        return '<c/>'
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{escape(text)}</t></is></c>'
+
+
+def _xlsx_row(values):
+    return ('<row>' + ''.join(_xlsx_cell(value) for value in values) + '</row>').encode()
+
+
+def xlsx_stream(columns, rows):
+    """Générateur de l'export XLSX (parties fixes et en-tête, puis lots de FLUSH_ROWS lignes)"""
+    sink = _Sink()
+    with zipfile.ZipFile(sink, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for name, content in _XLSX_PARTS:
+            archive.writestr(name, content)
+        with archive.open('xl/worksheets/sheet1.xml', 'w') as sheet:
+            sheet.write(_SHEET_HEAD.encode())
+            sheet.write(_xlsx_row(columns))
+            yield sink.drain()
+            for count, row in enumerate(rows, start=1):
+                sheet.write(_xlsx_row(row))
+                if count % FLUSH_ROWS == 0:
+                    chunk = sink.drain()
+                    if chunk:
+                        yield chunk
+            sheet.write(_SHEET_TAIL.encode())
+    yield sink.drain()
+
+
+# ── Réponse HTTP ───────────────────────────────────────────────────────────────
+
+def streaming_export_response(filename, export_format, columns, rows):
+    """
+    Réponse en streaming d'un export.
+
+    Args:
+        filename: nom du fichier sans extension
+        export_format: 'csv' ou 'xlsx'
+        columns: libellés des colonnes
+        rows: itérable des lignes (séquences de valeurs), consommé pendant l'envoi
+    """
+    stream = xlsx_stream if export_format == XLSX else csv_stream
+    response = StreamingHttpResponse(stream(columns, rows), content_type=CONTENT_TYPES[export_format])
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{export_format}"'
+    response['Cache-Control'] = 'private, no-store'
+    # Pas de mise en tampon par un proxy nginx : les lots partent au fil de l'eau
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def document_export_response(request, kind):
+    """
+    Export d'un type de document pour l'utilisateur de la requête.
+
+    Paramètres de requête :
+        type      : 'csv' (défaut) ou 'xlsx' — pas « format », réservé par DRF
+        annee     : année exportée (toutes par défaut)
+        processus : UUID d'un processus (tous les processus accessibles par défaut)
+    """
+    import uuid
+
+    from parametre.services.document_export import DocumentExportService
+    from shared.permissions import get_user_processus_list
+    from shared.responses import err
+
+    export_format = request.query_params.get('type', CSV).lower()
+    if export_format not in EXPORT_FORMATS:
+        return err(f"Format d'export inconnu : {export_format} (csv ou xlsx).", code='VALIDATION_ERROR')
+
+    annee = request.query_params.get('annee')
+    processus = request.query_params.get('processus')
+    try:
+        annee = int(annee) if annee else None
+        processus = uuid.UUID(processus) if processus else None
+    except ValueError:
+        return err('Paramètre annee ou processus invalide.', code='VALIDATION_ERROR')
+
+    rows = DocumentExportService.rows(kind, get_user_processus_list(request.user), annee=annee, processus=processus)
+    filename = f"{kind}_{annee or 'toutes_annees'}"
+    return streaming_export_response(filename, export_format, DocumentExportService.columns(kind), rows)
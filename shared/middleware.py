@@ -5,6 +5,7 @@ from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
 from django.conf import settings
+from shared.permissions.principal import open_principal_scope, close_principal_scope
 import logging
 import os
 
@@ -90,6 +91,24 @@ class JWTCookieMiddleware(MiddlewareMixin):
         return response
 
 
+class PrincipalMiddleware(MiddlewareMixin):
+    """
+    Ouvre une portée de cache du Principal (rôles, super admin, superviseur SMI,
+    processus accessibles) pour la durée de la requête.
+    Le Principal est construit au premier appel d'un helper de permission puis
+    réutilisé par les permission classes DRF et le corps de la vue.
+    """
+
+    def process_request(self, request):
+        request._principal_scope_token = open_principal_scope()
+
+    def process_response(self, request, response):
+        token = getattr(request, '_principal_scope_token', None)
+        if token is not None:
+            close_principal_scope(token)
+        return response
+
+
 class AdminLoginRateLimitMiddleware(MiddlewareMixin):
     """
     Rate limit sur le formulaire de login Django admin.
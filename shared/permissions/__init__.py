@@ -4,6 +4,7 @@ Security by Design : Vérification côté backend pour éviter le bypass du fron
 """
 from django.contrib.auth.models import User
 from parametre.models import UserProcessusRole, Processus, Role
+from shared.permissions.principal import get_principal
 
 
 def is_supervisor_smi(user):
@@ -20,12 +21,7 @@ def is_supervisor_smi(user):
     """
     if not user or not user.is_authenticated:
         return False
-    return UserProcessusRole.objects.filter(
-        user=user,
-        is_global=True,
-        role__code='superviseur_smi',
-        is_active=True
-    ).exists()
+    return get_principal(user).is_supervisor_smi
 
 
 def is_super_admin(user):
@@ -54,13 +50,7 @@ def is_super_admin(user):
         return True
 
     # Vérifier si l'utilisateur a le rôle "admin" pour le processus "smi" ou "prs-smi"
-    from django.db.models import Q
-    return UserProcessusRole.objects.filter(
-        Q(processus__nom__iexact='smi') | Q(processus__nom__iexact='prs-smi'),
-        user=user,
-        role__code='admin',
-        is_active=True
-    ).exists()
+    return get_principal(user).is_super_admin
 
 
 def can_manage_users(user):
@@ -137,22 +127,8 @@ def user_has_permission(user, processus_uuid, role_code):
         return True
     # ========== FIN BYPASS ==========
 
-    # Convertir processus_uuid en UUID si c'est un objet Processus
-    if isinstance(processus_uuid, Processus):
-        processus_uuid = processus_uuid.uuid
-    elif isinstance(processus_uuid, str):
-        try:
-            import uuid
-            uuid.UUID(processus_uuid)
-        except (ValueError, TypeError):
-            return False
-
-    return UserProcessusRole.objects.filter(
-        user=user,
-        processus__uuid=processus_uuid,
-        role__code=role_code,
-        is_active=True
-    ).exists()
+    # processus_uuid peut être un UUID, une chaîne ou un objet Processus (invalide → refus)
+    return get_principal(user).has_role(processus_uuid, role_code)
 
 
 def user_can_create_for_processus(user, processus_uuid):
@@ -192,13 +168,7 @@ def get_user_processus_list(user):
         return None
     # ========== FIN BYPASS ==========
 
-    processus_uuids = UserProcessusRole.objects.filter(
-        user=user,
-        is_active=True,
-        processus__isnull=False
-    ).values_list('processus__uuid', flat=True).distinct()
-
-    return list(processus_uuids)
+    return list(get_principal(user).processus_uuids)
 
 
 def user_has_access_to_processus(user, processus_uuid):
@@ -220,14 +190,7 @@ def user_has_access_to_processus(user, processus_uuid):
         return True
     # ========== FIN BYPASS ==========
 
-    if isinstance(processus_uuid, Processus):
-        processus_uuid = processus_uuid.uuid
-
-    return UserProcessusRole.objects.filter(
-        user=user,
-        processus__uuid=processus_uuid,
-        is_active=True
-    ).exists()
+    return get_principal(user).has_processus(processus_uuid)
 
 
 def user_has_write_permission_anywhere(user):
@@ -235,9 +198,6 @@ def user_has_write_permission_anywhere(user):
     Vérifie si l'utilisateur a le rôle 'ecrire' pour au moins un processus.
     Utile pour les ressources globales (comme les documents) non liées à un processus spécifique.
     """
-    import logging
-    logger = logging.getLogger(__name__)
-
     if not user or not user.is_authenticated:
         return False
 
@@ -246,21 +206,7 @@ def user_has_write_permission_anywhere(user):
         return True
     # ========== FIN BYPASS ==========
 
-    try:
-        try:
-            role_ecrire = Role.objects.get(code='ecrire', is_active=True)
-        except Role.DoesNotExist:
-            logger.warning("[user_has_write_permission_anywhere] Rôle 'ecrire' non trouvé")
-            return False
-
-        return UserProcessusRole.objects.filter(
-            user=user,
-            role=role_ecrire,
-            is_active=True
-        ).exists()
-    except Exception as e:
-        logger.error("[user_has_write_permission_anywhere] Erreur: %s", e)
-        return False
+    return get_principal(user).has_role_anywhere('ecrire')
 
 
 def check_permission_or_403(user, processus_uuid, role_code, error_message=None):
@@ -0,0 +1,145 @@
+"""
+Identité de l'utilisateur mise en cache pour la durée d'une requête
+
+Une même requête appelait plusieurs fois is_super_admin, is_supervisor_smi,
+get_user_processus_list, PermissionService._is_super_admin... et chacun de ces
+helpers relançait sa propre requête sur UserProcessusRole.
+
+Le Principal charge en UNE requête tous les rôles actifs de l'utilisateur
+(spécifiques et globaux) et en dérive les drapeaux super admin / superviseur SMI
+et la liste des processus accessibles. PrincipalMiddleware ouvre une portée par
+requête : le Principal y est construit au premier accès puis réutilisé par tous
+les helpers. Hors requête (commandes, scheduler), un Principal est reconstruit
+à chaque appel, comme les requêtes historiques.
+"""
+import uuid
+from contextvars import ContextVar
+
+from parametre.models import UserProcessusRole
+
+# Processus dont les rôles admin/validateur confèrent le statut de super admin
+SUPER_ADMIN_PROCESSUS = ('smi', 'prs-smi')
+
+_principal_scope = ContextVar('kora_principal_scope', default=None)
+
+
+def _normalize_processus_uuid(processus_uuid):
+    """Retourne l'UUID (str) d'un processus ou None si la valeur est invalide"""
+    from parametre.models import Processus
+
+    if isinstance(processus_uuid, Processus):
+        processus_uuid = processus_uuid.uuid
+    try:
+        return str(uuid.UUID(str(processus_uuid)))
+    except (ValueError, TypeError, AttributeError):
+        return None
+
+
+class Principal:
+    """
+    Rôles actifs d'un utilisateur et drapeaux dérivés, chargés en une requête
+    """
+
+    def __init__(self, user):
+        self.user_id = user.pk
+        self.is_staff_superuser = bool(user.is_staff and user.is_superuser)
+
+        user_roles = list(
+            UserProcessusRole.objects.filter(
+                user_id=user.pk,
+                is_active=True
+            ).select_related('role', 'processus')
+        )
+        # Rôles spécifiques (un processus) et globaux (tous les processus, ex: superviseur_smi)
+        self.specific_roles = [ur for ur in user_roles if not ur.is_global and ur.processus_id]
+        self.global_roles = [ur for ur in user_roles if ur.is_global]
+        # Rôles détenus (spécifiques ou globaux) : époques de cache des permissions
+        self.role_ids = sorted({ur.role_id for ur in self.specific_roles + self.global_roles})
+
+        self.roles_by_processus = {}
+        for user_role in user_roles:
+            if user_role.processus_id:
+                self.roles_by_processus.setdefault(str(user_role.processus_id), set()).add(user_role.role.code)
+
+        # Ordre de première apparition conservé, sans doublon
+        self.processus_uuids = list(dict.fromkeys(
+            user_role.processus_id for user_role in user_roles if user_role.processus_id
+        ))
+
+        smi_role_codes = {
+            user_role.role.code
+            for user_role in user_roles
+            if user_role.processus_id and user_role.processus.nom.lower() in SUPER_ADMIN_PROCESSUS
+        }
+        self._is_smi_admin = 'admin' in smi_role_codes
+        self._is_smi_validateur = 'validateur' in smi_role_codes
+        self.is_supervisor_smi = any(
+            user_role.role.code == 'superviseur_smi' for user_role in self.global_roles
+        )
+        self._active_role_codes = {
+            user_role.role.code for user_role in user_roles if user_role.role.is_active
+        }
+
+    @property
+    def is_super_admin(self):
+        """is_staff ET is_superuser, ou rôle admin sur le processus smi / prs-smi"""
+        return self.is_staff_superuser or self._is_smi_admin
+
+    @property
+    def is_permission_super_admin(self):
+        """Variante de PermissionService : le rôle validateur smi / prs-smi compte aussi"""
+        return self.is_staff_superuser or self._is_smi_admin or self._is_smi_validateur
+
+    def has_processus(self, processus_uuid):
+        """Au moins un rôle actif pour ce processus"""
+        return _normalize_processus_uuid(processus_uuid) in self.roles_by_processus
+
+    def has_role(self, processus_uuid, role_code):
+        """Rôle actif `role_code` pour ce processus (hors rôles globaux)"""
+        return role_code in self.roles_by_processus.get(_normalize_processus_uuid(processus_uuid), ())
+
+    def has_role_anywhere(self, role_code):
+        """Rôle actif `role_code` (rôle lui-même actif) sur au moins un processus"""
+        return role_code in self._active_role_codes
+
+    def get_specific_roles(self, processus_uuid=None):
+        """Rôles spécifiques actifs, éventuellement restreints à un processus"""
+        if processus_uuid is None:
+            return list(self.specific_roles)
+        processus_uuid = _normalize_processus_uuid(processus_uuid)
+        return [ur for ur in self.specific_roles if str(ur.processus_id) == processus_uuid]
+
+
+def get_principal(user):
+    """
+    Retourne le Principal de l'utilisateur, mis en cache dans la portée de la requête courante
+    """
+    scope = _principal_scope.get()
+    if scope is None:
+        return Principal(user)
+
+    principal = scope.get(user.pk)
+    if principal is None or principal.is_staff_superuser != bool(user.is_staff and user.is_superuser):
+        principal = Principal(user)
+        scope[user.pk] = principal
+    return principal
+
+
+def invalidate_principal(user_id):
+    """Oublie le Principal d'un utilisateur dans la portée courante (rôles modifiés en cours de requête)"""
+    scope = _principal_scope.get()
+    if scope is not None:
+        scope.pop(user_id, None)
+
+
+def open_principal_scope():
+    """Ouvre une portée de cache ; retourne le jeton à passer à close_principal_scope()"""
+    return _principal_scope.set({})
+
+
+def close_principal_scope(token):
+    try:
+        _principal_scope.reset(token)
+    except ValueError:
+        # Jeton créé dans un autre contexte : on se contente de vider la portée
+        _principal_scope.set(None)
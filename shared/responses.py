@@ -35,6 +35,11 @@ def created(data=None, message=None, **kwargs):
     return ok(data=data, message=message, http_status=http_status_module.HTTP_201_CREATED, **kwargs)
 
 
+def accepted(data=None, message=None, **kwargs):
+    """Raccourci pour HTTP 202 (traitement confié à une tâche de fond)."""
+    return ok(data=data, message=message, http_status=http_status_module.HTTP_202_ACCEPTED, **kwargs)
+
+
 def err(error, code=None, http_status=http_status_module.HTTP_400_BAD_REQUEST, **kwargs):
     """Réponse d'erreur normalisée."""
     body = {'success': False, 'error': error}
@@ -54,3 +59,22 @@ def forbidden(error='Accès refusé.', code='FORBIDDEN'):
 
 def server_error(error='Une erreur interne est survenue.', code='INTERNAL_ERROR'):
     return err(error, code=code, http_status=http_status_module.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+def etag_response(request, body, etag, http_status=http_status_module.HTTP_200_OK):
+    """
+    Réponse avec ETag fort : If-None-Match correspondant → 304 sans corps.
+
+    Le client revalide à chaque lecture (no-cache) ; le 304 évite le transfert.
+    """
+    from django.utils.http import parse_etags, quote_etag
+
+    etag = quote_etag(etag)
+    if_none_match = parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))
+    if etag in if_none_match or f'W/{etag}' in if_none_match or '*' in if_none_match:
+        response = Response(status=http_status_module.HTTP_304_NOT_MODIFIED)
+    else:
+        response = Response(body, status=http_status)
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    return response
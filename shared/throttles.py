@@ -8,9 +8,10 @@ Les modifications prennent effet en < 60s (TTL cache).
   - KoraUserThrottle       : users authentifiés   (défaut : 600/min)
   - KoraSensitiveThrottle  : login/reset/invitation (défaut : 10/min)
 
-Remarque production : DRF utilise le cache Django pour les compteurs.
-Avec plusieurs workers gunicorn, configurer Redis :
-    CACHES = {'default': {'BACKEND': 'django_redis.cache.RedisCache', ...}}
+Remarque production : DRF utilise le cache Django pour les compteurs. Le cache
+par défaut est partagé entre les workers gunicorn (SQLiteCache ou Redis selon
+CACHE_BACKEND, voir KORA/settings/base.py) : les limites sont donc globales et non
+multipliées par le nombre de workers.
 """
 
 from rest_framework.throttling import AnonRateThrottle, UserRateThrottle, SimpleRateThrottle